@@ -1,7 +1,8 @@
 import streamlit as st
+import time
 from datetime import datetime
-from core.graphs import create_rag_graph
-from core.utils import get_db_conn
+from core.client import RAGServiceError, get_service_client
+from config import RAG_SERVICE_URL, RERANK_ENABLED
 
 
 # --- Streamlit Application ---
@@ -12,25 +13,17 @@ st.set_page_config(page_title="RAG Agent", page_icon="🤖", layout="wide")
 #st.image("gra-logo.svg", width=100)
 st.title("RAG Template - Agent v3")
 
+# Questions are answered by the query service (python -m core.service) at RAG_SERVICE_URL, which holds
+# the compiled graphs, models, connection pools and caches; this page only sends questions and renders answers
+service = get_service_client()
+
 # --- Helper Functions ---
 def get_system_stats():
     """Get system statistics for dashboard"""
-    conn = get_db_conn()
-    if not conn:
-        return None, None, None
-    
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM documentation_staging")
-        total_docs = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(DISTINCT doc_id) FROM doc_chunks WHERE doc_id IS NOT NULL")
-        processed_docs = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM doc_chunks")
-        total_chunks = cursor.fetchone()[0]
-        cursor.close()
-        conn.close()
-        return total_docs, processed_docs, total_chunks
-    except Exception as e:
+        corpus = service.ingest_status()["corpus"]
+        return corpus["documents"], corpus["processed_documents"], corpus["chunks"]
+    except RAGServiceError as e:
         st.warning(f"Could not load statistics: {e}")
         return None, None, None
 
@@ -71,6 +64,24 @@ with st.sidebar:
         key="model_choice",
         help="Choose between OCI GenAI or the Qwen model"
     )
+    grade_context_enabled = st.toggle(
+        "Grade retrieved context",
+        value=True,
+        key="grade_context",
+        help="Check retrieved context for relevance before answering. Turn off for faster answers."
+    )
+    rerank_enabled = st.toggle(
+        "Rerank retrieved chunks",
+        value=RERANK_ENABLED,
+        key="rerank",
+        help="Score a wider set of chunks with a small cross-encoder and send only the best ones to the model."
+    )
+    show_timings = st.toggle(
+        "Show timing breakdown",
+        value=False,
+        key="show_timings",
+        help="Show where the last answer's time went: each graph node, LLM call and database query."
+    )
     st.markdown("---")
     st.markdown("### Chat Management")
     if st.button("Reset Chat", type="secondary", use_container_width=True):
@@ -80,12 +91,59 @@ with st.sidebar:
     if st.session_state.messages:
         st.info(f"Current conversation: {len(st.session_state.messages)} messages")
 
+    st.markdown("---")
+    try:
+        service_stats = service.stats()
+    except RAGServiceError as e:
+        service_stats = None
+        st.warning(f"Query service at {RAG_SERVICE_URL} unavailable: {e}")
+    if service_stats:
+        # Behind a load balancer each refresh may reach a different worker; its figures are its own
+        st.caption(f"Statistics from service worker {service_stats['instance']}")
+        with st.expander("Database Pool", expanded=False):
+            pool_stats = service_stats["pool"]
+            st.metric("Connections in use", f"{pool_stats['in_use']} / {pool_stats['opened']}")
+            st.caption(
+                f"Acquired: {pool_stats['acquired']} · Waits: {pool_stats['waits']} · "
+                f"Timeouts: {pool_stats['timeouts']} · Avg acquire: {pool_stats['avg_acquire_ms']:.1f} ms"
+            )
+            search_stats = service_stats["search"]
+            st.caption(
+                f"Vector searches: approximate {search_stats['approx']} · exact {search_stats['exact']} · "
+                f"fallbacks to exact {search_stats['fallbacks']}"
+            )
+        with st.expander("LLM Calls", expanded=False):
+            for provider_name, llm_stats in service_stats["llm"].items():
+                st.caption(
+                    f"**{provider_name}** · Calls: {llm_stats['calls']} · Retries: {llm_stats['retries']} · "
+                    f"Errors: {llm_stats['errors']} · Avg time to first token: {llm_stats['avg_ttft_ms']:.0f} ms"
+                )
+        with st.expander("Answer Cache", expanded=False):
+            cache_stats = service_stats["answer_cache"]
+            st.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+            st.caption(
+                f"Exact hits: {cache_stats['hits']} · Similar-question hits: {cache_stats['semantic_hits']} · "
+                f"Misses: {cache_stats['misses']} · Entries: {cache_stats['size']} · "
+                f"Evictions: {cache_stats['evictions']}"
+            )
+            # (generation_id, revision) of the active corpus the cached answers belong to; None until first read
+            if cache_stats["corpus_version"]:
+                generation_id, revision = cache_stats["corpus_version"]
+                st.caption(f"Corpus generation {generation_id}, revision {revision}")
+            else:
+                st.caption("Corpus version not read yet")
+    if show_timings and st.session_state.get("last_turn_timings"):
+        with st.expander("Last Turn Timing", expanded=True):
+            st.dataframe(st.session_state.last_turn_timings, hide_index=True, use_container_width=True)
+
 # Display chat history
 for i, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
         # Add a download button for assistant messages
         if message["role"] == "assistant":
+            if message.get("timing"):
+                st.caption(message["timing"])
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             st.download_button(
                 label="📥 Save Response",
@@ -98,36 +156,68 @@ for i, message in enumerate(st.session_state.messages):
 # Chat input and processing
 if prompt := st.chat_input("Ask your question..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
-    
-    # Generate assistant response
-    with st.spinner("Processing your request..."):
-        app = create_rag_graph()
-        inputs = {
-            "question": prompt, 
-            "chat_history": st.session_state.get('messages', []),
-            "model_choice": st.session_state.model_choice,
-        }
-        
-        response_text = ""
-        citations = []
-        
-        # Stream the graph output and capture the final answer
-        for output in app.stream(inputs):
-            for key, value in output.items():
-                if key in ["generate_answer", "synthesize_comparison", "run_summarization", "run_training_generation"]:
-                    response_text = value.get("answer", "")
-                    citations = value.get("citations", [])
-                elif key in ["handle_greeting", "handle_give_up"]:
-                    response_text = value.get("answer", "")
+    with st.chat_message("user"):
+        st.markdown(prompt)
+
+    # Generate assistant response, rendering answer tokens as they arrive
+    with st.chat_message("assistant"):
+        answer_placeholder = st.empty()
+        with st.spinner("Processing your request..."):
+            variant = ("rerank" if rerank_enabled else "default") if grade_context_enabled else (
+                "rerank_no_grading" if rerank_enabled else "no_grading"
+            )
+            response_text = ""
+            streamed_text = ""
+            citations = []
+            served_from_cache = False
+            packing = {}
+            timings = []
+            started_at = time.perf_counter()
+            first_token_at = None
+
+            # "token" events carry the answer as it is generated; "result" carries the finished turn
+            try:
+                for event, data in service.stream_query(
+                    prompt,
+                    chat_history=st.session_state.get('messages', []),
+                    model_choice=st.session_state.model_choice,
+                    variant=variant,
+                    timings=True,
+                ):
+                    if event == "token":
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        streamed_text += data["token"]
+                        answer_placeholder.markdown(streamed_text + "▌")
+                    elif event == "result":
+                        response_text = data["answer"]
+                        citations = data["citations"]
+                        served_from_cache = data["cache_hit"]
+                        packing = data["packing"]
+                        timings = data.get("timings", [])
+            except RAGServiceError as e:
+                st.error(str(e))
 
         if citations:
             response_text += "\n\n**Sources:**\n" + "\n".join([f"• {c}" for c in citations])
         
         if not response_text:
             response_text = "I could not find an answer to your question."
+        answer_placeholder.markdown(response_text)
+
+    total_seconds = time.perf_counter() - started_at
+    timing = f"Answered in {total_seconds:.1f} s"
+    if first_token_at is not None:
+        timing = f"First token after {first_token_at - started_at:.2f} s · {timing.lower()}"
+    if served_from_cache:
+        timing += " · served from answer cache"
+    if packing.get("budget_tokens"):
+        timing += f" · context {packing['used_tokens']:,}/{packing['budget_tokens']:,} tokens ({packing['utilization']:.0%})"
+
+    st.session_state.last_turn_timings = timings
 
     # Add response to session state and rerun to display everything
-    st.session_state.messages.append({"role": "assistant", "content": response_text})
+    st.session_state.messages.append({"role": "assistant", "content": response_text, "timing": timing})
     st.rerun()
 
 
@@ -0,0 +1,169 @@
+"""
+Load test of concurrent sessions: the sync graph (stream, one thread per session) against the
+async graph (astream, every session on one event loop), offline.
+
+The LLM stand-in (benchmarks/llm_stub.py, answering like bench_offline's StubResponder) runs
+in a separate process so its CPU time is not charged to the graph, and the in-memory corpus
+(benchmarks/memory_store.py) is installed behind both get_db_conn and async_db_connection.
+For each --sessions level, that many conversations run at once, each asking
+--questions-per-session questions back to back, first on the sync path and then on the async one.
+
+The report gives throughput, latency percentiles, the peak thread count and the process CPU
+time per question. "sessions/core" is sessions x wall time / CPU time: how many concurrent
+sessions one fully used core could carry at the measured per-session latency, i.e. how far a
+single process scales before it is CPU-bound rather than waiting on the LLM and the database.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_async --sessions 16 64 256
+    python -m benchmarks.bench_async --llm-latency 0.3 --tokens-per-second 40 --output async.json
+"""
+import os
+
+# Must be set before config is imported: repeated questions would otherwise be served from the cache
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_offline import SCENARIOS, StubResponder, current_commit
+from benchmarks.llm_stub import LLMStubServer
+from benchmarks.memory_store import InMemoryCorpus
+from core.batch import arun_question, percentile, run_question
+from core.embeddings import query_embeddings
+from core.graphs import GRAPH_VARIANTS, warm_up_graphs
+from core.llm import QwenProvider, aclose_providers, set_provider
+from core.utils import set_connection_factory
+
+
+def serve_stub(urls, latency, tokens_per_second, answer_tokens):
+    """Runs the LLM stand-in until the process is terminated; its URL is put on urls."""
+    stub = LLMStubServer(latency=latency, tokens_per_second=tokens_per_second or None, respond=StubResponder(answer_tokens))
+    stub.start()
+    urls.put(stub.url)
+    threading.Event().wait()
+
+
+class ThreadSampler:
+    """Records the peak number of live threads while running."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_sync(scenario, variant, sessions, questions_per_session):
+    def session(_):
+        return [run_question(scenario, "Qwen", variant)["total_ms"] for _ in range(questions_per_session)]
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        return [ms for latencies in pool.map(session, range(sessions)) for ms in latencies]
+
+async def run_async(scenario, variant, sessions, questions_per_session):
+    async def session():
+        return [(await arun_question(scenario, "Qwen", variant))["total_ms"] for _ in range(questions_per_session)]
+
+    return [ms for latencies in await asyncio.gather(*(session() for _ in range(sessions))) for ms in latencies]
+
+def measure(run, sessions, questions_per_session):
+    """Runs one level on cold query-embedding caches and returns its figures."""
+    query_embeddings.clear()
+    cpu_before, started = time.process_time(), time.perf_counter()
+    with ThreadSampler() as threads:
+        latencies = run(sessions, questions_per_session)
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_before
+    return {
+        "questions": len(latencies),
+        "questions_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "cpu_ms_per_question": cpu * 1000 / len(latencies),
+        "peak_threads": threads.peak,
+        "sessions_per_core": sessions * elapsed / cpu if cpu else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[16, 64, 256], help="Concurrent sessions per level.")
+    parser.add_argument("--questions-per-session", type=int, default=3, help="Questions each session asks in turn.")
+    parser.add_argument("--scenario", default="rag_query", choices=list(SCENARIOS), help="Question each session asks.")
+    parser.add_argument("--variant", default="default", choices=list(GRAPH_VARIANTS), help="Graph variant.")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Stand-in LLM latency before the first token, in seconds.")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="Stand-in LLM generation rate (0 for instant).")
+    parser.add_argument("--answer-tokens", type=int, default=100, help="Words in each generated answer.")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="In-memory database round trip, in seconds.")
+    parser.add_argument("--copies", type=int, default=20, help="Copies of the built-in corpus to load.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    urls = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=serve_stub, args=(urls, args.llm_latency, args.tokens_per_second, args.answer_tokens), daemon=True)
+    stub.start()
+    corpus = InMemoryCorpus.synthetic(args.copies, latency=args.db_latency)
+    set_connection_factory(corpus.connect, async_factory=corpus.connect_async)
+    # One pooled connection per session on both paths, so the HTTP pool is not the bottleneck
+    provider = QwenProvider(endpoint=urls.get(timeout=30), pool_size=max(args.sessions))
+    set_provider("Qwen", provider)
+
+    scenario = SCENARIOS[args.scenario]
+    # Every async level runs on the same event loop, so the provider's HTTP session is reused
+    loop = asyncio.new_event_loop()
+    runners = (
+        ("sync", lambda sessions, questions: run_sync(scenario, args.variant, sessions, questions)),
+        ("async", lambda sessions, questions: loop.run_until_complete(run_async(scenario, args.variant, sessions, questions))),
+    )
+    report = {"commit": current_commit(), "settings": {k: v for k, v in vars(args).items() if k != "output"},
+              "cpu_count": os.cpu_count(), "levels": []}
+    try:
+        warm_up_graphs([args.variant])
+        # Unmeasured runs load the intent classifier, tokenizers and connections
+        for _, run in runners:
+            run(1, 1)
+        for sessions in args.sessions:
+            level = {"sessions": sessions}
+            for mode, run in runners:
+                level[mode] = measure(run, sessions, args.questions_per_session)
+            report["levels"].append(level)
+    finally:
+        loop.run_until_complete(aclose_providers())
+        loop.close()
+        set_connection_factory(None)
+        stub.terminate()
+
+    print(f"commit {report['commit']}, scenario {args.scenario}, variant {args.variant}, {os.cpu_count()} CPUs, "
+          f"LLM {args.llm_latency * 1000:.0f} ms + {args.tokens_per_second:.0f} tokens/s, DB {args.db_latency * 1000:.0f} ms")
+    for level in report["levels"]:
+        for mode in ("sync", "async"):
+            result = level[mode]
+            print(f"{level['sessions']:>5} sessions {mode:<5}  {result['questions_per_second']:7.2f} q/s  "
+                  f"p50={result['p50_ms']:8.1f} ms  p95={result['p95_ms']:8.1f} ms  "
+                  f"cpu={result['cpu_ms_per_question']:6.1f} ms/q  threads={result['peak_threads']:4d}  "
+                  f"sessions/core={result['sessions_per_core']:7.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
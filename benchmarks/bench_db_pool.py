@@ -0,0 +1,79 @@
+"""
+Compares per-query latency of connect-per-call against the shared connection pool.
+
+Usage (from the repository root, with a reachable database configured in .env):
+    python -m benchmarks.bench_db_pool --iterations 50 --concurrency 4
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import oracledb
+
+from config import DB_USER, DB_PASSWORD, DB_DSN
+from core.utils import db_connection, get_pool_stats
+
+QUERY = "SELECT COUNT(*) FROM documentation_staging"
+
+
+def run_direct():
+    """Old path: open and close a dedicated connection for every query."""
+    conn = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=DB_DSN)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(QUERY)
+        cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def run_pooled():
+    """New path: borrow a connection from the process-wide pool."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(QUERY)
+        cursor.fetchone()
+        cursor.close()
+
+
+def measure(fn, iterations, concurrency):
+    def timed(_):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1000
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(iterations)))
+    wall = time.perf_counter() - wall_start
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "qps": iterations / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    # Warm the pool so its one-off creation cost is not charged to the first query
+    run_pooled()
+
+    for label, fn in (("connect-per-call", run_direct), ("pooled", run_pooled)):
+        result = measure(fn, args.iterations, args.concurrency)
+        print(
+            f"{label:<18} mean={result['mean_ms']:8.2f} ms  p50={result['p50_ms']:8.2f} ms  "
+            f"p95={result['p95_ms']:8.2f} ms  throughput={result['qps']:7.1f} q/s"
+        )
+
+    print(f"pool stats: {get_pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Measures the per-request cost of building and compiling the RAG graph against the cached path.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_graph_compile --iterations 200
+"""
+import argparse
+import statistics
+import time
+
+from core.graphs import GRAPH_VARIANTS, create_rag_graph, get_rag_graph
+
+
+def time_calls(fn, iterations):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.mean(latencies), latencies[len(latencies) // 2], latencies[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    for variant, options in GRAPH_VARIANTS.items():
+        rebuild = time_calls(lambda: create_rag_graph(**options), args.iterations)
+        get_rag_graph(variant)
+        cached = time_calls(lambda: get_rag_graph(variant), args.iterations)
+        print(f"[{variant}]")
+        print(f"  compile per request  mean={rebuild[0]:9.3f} ms  p50={rebuild[1]:9.3f} ms  max={rebuild[2]:9.3f} ms")
+        print(f"  cached graph         mean={cached[0]:9.3f} ms  p50={cached[1]:9.3f} ms  max={cached[2]:9.3f} ms")
+        print(f"  saved per request    {rebuild[0] - cached[0]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Offline comparison of vector, BM25 and hybrid (reciprocal rank fusion) retrieval; no database needed.
+
+The corpus is JSONL of {"id": ..., "text": ...} chunks and the queries are JSONL of
+{"question": ..., "relevant": [chunk ids]}. Without files, a small built-in corpus of report
+chunks that differ mainly by year and regulation number is used, the case pure vector search
+handles worst. Vectors come from sentence-transformers/all-MiniLM-L12-v2, the model behind the
+in-database ALL_MINILM_L12_V2 embeddings. Reports recall@k, MRR and latency per method.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_hybrid
+    python -m benchmarks.bench_hybrid --corpus chunks.jsonl --queries queries.jsonl --weights 0.2 0.4 0.6
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from core.lexical import BM25Index, reciprocal_rank_fusion
+from config import RRF_K
+
+TOPICS = [
+    "annual report on gambling participation and harm",
+    "licensing criteria for casino operators",
+    "responsible gambling measures operators must provide",
+    "community benefit fund grants",
+]
+YEARS = ["2015-2016", "2016-2017", "2017-2018", "2018-2019", "2019-2020", "2020-2021"]
+
+
+def synthetic_dataset():
+    corpus, queries = [], []
+    for t, topic in enumerate(TOPICS):
+        for y, years in enumerate(YEARS):
+            chunk_id = f"{t}-{y}"
+            corpus.append({"id": chunk_id, "text": f"The {years} {topic}. Findings under regulation {100 + t}.{y} are summarised."})
+            queries.append({"question": f"What does the {years} {topic.split(' on ')[0]} say?", "relevant": [chunk_id]})
+    return corpus, queries
+
+
+def load_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(rankings, queries, k):
+    recalls, reciprocal_ranks = [], []
+    for ranking, query in zip(rankings, queries):
+        relevant = set(query["relevant"])
+        top = ranking[:k]
+        recalls.append(len(relevant & set(top)) / len(relevant))
+        rank = next((i for i, key in enumerate(ranking, start=1) if key in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return statistics.mean(recalls), statistics.mean(reciprocal_ranks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL of {\"id\", \"text\"} chunks.")
+    parser.add_argument("--queries", help="JSONL of {\"question\", \"relevant\"} records.")
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.2, 0.4, 0.6], help="Lexical weights to try.")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=25, help="Results per method fed into the fusion.")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L12-v2")
+    args = parser.parse_args()
+
+    if args.corpus and args.queries:
+        corpus, queries = load_jsonl(args.corpus), load_jsonl(args.queries)
+    else:
+        corpus, queries = synthetic_dataset()
+    ids = [chunk["id"] for chunk in corpus]
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model, device="cpu")
+    chunk_vectors = model.encode([chunk["text"] for chunk in corpus], normalize_embeddings=True)
+    query_vectors = model.encode([query["question"] for query in queries], normalize_embeddings=True)
+
+    start = time.perf_counter()
+    bm25 = BM25Index((chunk["id"], chunk["text"]) for chunk in corpus)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    vector_rankings, lexical_rankings, bm25_ms = [], [], []
+    for query, vector in zip(queries, query_vectors):
+        order = np.argsort(-(chunk_vectors @ vector))[:args.depth]
+        vector_rankings.append([ids[i] for i in order])
+        start = time.perf_counter()
+        lexical_rankings.append([key for key, _ in bm25.search(query["question"], args.depth)])
+        bm25_ms.append((time.perf_counter() - start) * 1000)
+
+    print(f"corpus: {len(corpus)} chunks, {len(queries)} queries, k={args.k}")
+    print(f"bm25 index build: {build_ms:.1f} ms  query: mean={statistics.mean(bm25_ms):.3f} ms")
+    for label, rankings in [("vector", vector_rankings), ("bm25", lexical_rankings)]:
+        recall, mrr = evaluate(rankings, queries, args.k)
+        print(f"  {label:<20} recall@{args.k}={recall:.3f}  MRR={mrr:.3f}")
+    for weight in args.weights:
+        fusion_ms, fused_rankings = [], []
+        for vector_ranking, lexical_ranking in zip(vector_rankings, lexical_rankings):
+            start = time.perf_counter()
+            fused = reciprocal_rank_fusion(
+                {"vector": vector_ranking, "lexical": lexical_ranking},
+                weights={"vector": 1 - weight, "lexical": weight},
+                k=RRF_K,
+            )
+            fusion_ms.append((time.perf_counter() - start) * 1000)
+            fused_rankings.append([key for key, _ in fused])
+        recall, mrr = evaluate(fused_rankings, queries, args.k)
+        print(f"  hybrid (lexical {weight:.1f}) recall@{args.k}={recall:.3f}  MRR={mrr:.3f}  "
+              f"fusion mean={statistics.mean(fusion_ms):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Exercises the pooled LLM client against the local OpenAI-compatible stand-in.
+
+It compares a fresh requests.post per call (the old path) with the long-lived
+QwenProvider session, checks that injected 429/503 responses are retried, and
+reports time-to-first-token for streamed completions against blocking ones.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_llm_client --calls 200 --latency 0.005
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.llm_stub import LLMStubServer
+from core.llm import LLMError, QwenProvider
+
+
+def time_calls(fn, calls):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.mean(latencies), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005, help="Stub server latency in seconds.")
+    parser.add_argument("--stream-tokens", type=int, default=200, help="Tokens in the streamed completion.")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed tokens.")
+    args = parser.parse_args()
+
+    with LLMStubServer(latency=args.latency) as stub:
+        provider = QwenProvider(endpoint=stub.url)
+        payload = provider.build_payload("You are a helpful assistant.", "Hello", False)
+
+        def direct_call():
+            response = requests.post(stub.url, json=payload, timeout=120)
+            response.raise_for_status()
+
+        before = stub.connections
+        direct = time_calls(direct_call, args.calls)
+        direct_connections = stub.connections - before
+
+        before = stub.connections
+        pooled = time_calls(lambda: provider.complete("You are a helpful assistant.", "Hello"), args.calls)
+        pooled_connections = stub.connections - before
+
+        print(f"requests.post per call  mean={direct[0]:7.2f} ms  p50={direct[1]:7.2f} ms  p95={direct[2]:7.2f} ms  connections={direct_connections}")
+        print(f"pooled QwenProvider     mean={pooled[0]:7.2f} ms  p50={pooled[1]:7.2f} ms  p95={pooled[2]:7.2f} ms  connections={pooled_connections}")
+
+    # Streaming: time-to-first-token versus waiting for the whole completion
+    reply = " ".join(f"token{i}" for i in range(args.stream_tokens))
+    with LLMStubServer(latency=args.latency, token_delay=args.token_delay, reply=reply) as stub:
+        provider = QwenProvider(endpoint=stub.url)
+        start = time.perf_counter()
+        list(provider.stream("system", "user"))
+        streamed_total = (time.perf_counter() - start) * 1000
+        print(
+            f"streaming {args.stream_tokens} tokens: time to first token={provider.stats()['avg_ttft_ms']:.1f} ms  "
+            f"full completion={streamed_total:.1f} ms"
+        )
+
+    # Retry behaviour: the first two requests fail with 503 and must be retried transparently
+    with LLMStubServer(fail_first=2, fail_status=503) as stub:
+        provider = QwenProvider(endpoint=stub.url, max_retries=3)
+        answer = provider.complete("system", "user")
+        print(f"retry on 503: answer={answer!r} stats={provider.stats()}")
+
+    # Persistent throttling: retries are exhausted and the error surfaces
+    with LLMStubServer(fail_rate=1.0, fail_status=429) as stub:
+        provider = QwenProvider(endpoint=stub.url, max_retries=2)
+        try:
+            provider.complete("system", "user")
+            print("persistent 429: unexpectedly succeeded")
+        except LLMError as e:
+            print(f"persistent 429: gave up after {stub.requests} requests ({e}) stats={provider.stats()}")
+
+
+if __name__ == "__main__":
+    main()
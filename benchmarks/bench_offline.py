@@ -0,0 +1,222 @@
+"""
+Offline end-to-end benchmark of the RAG graph, one scenario per intent path; no Oracle,
+Object Storage or LLM endpoint needed.
+
+The LLM is the local OpenAI-compatible stand-in (benchmarks/llm_stub.py) with a configurable
+latency and token rate, installed with set_provider so get_llm_response and streaming both
+reach it. The database is the in-memory corpus (benchmarks/memory_store.py) installed behind
+get_db_conn. The stand-in answers each prompt kind the way the nodes expect: an intent, a
+rewritten question, an expanded query, a yes/no grade, a JSON comparison plan, or an answer
+of --answer-tokens words.
+
+Scenarios:
+- rag_query: a question the corpus answers (rewrite, cache lookup, retrieval, grading, answer).
+- comparison: plan, parallel sub-query retrieval and synthesis.
+- summarization and training_generation: retrieval without grading, then generation.
+- rewrite_loop: a follow-up with chat history about something the corpus lacks, so the question
+  is rewritten and retrieval escalates through RETRIEVAL_LADDER (with query expansion) until it gives up.
+
+For each scenario the report gives latency percentiles, time to first token, throughput at
+--concurrency, and LLM calls and database statements per question, by kind. The answer cache
+is disabled (ANSWER_CACHE_ENABLED=false unless set in the environment) so every run takes the
+full path. --output writes the results as JSON; --baseline compares with an earlier file, so
+runs can be compared across commits.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_offline --runs 20 --concurrency 4 --output bench.json
+    python -m benchmarks.bench_offline --llm-latency 0.2 --tokens-per-second 40 --baseline bench.json
+"""
+import os
+
+# Must be set before config is imported: repeated questions would otherwise be served from the cache
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.llm_stub import LLMStubServer
+from benchmarks.memory_store import InMemoryCorpus
+from core.batch import percentile, run_question
+from core.embeddings import query_embeddings
+from core.graphs import GRAPH_VARIANTS, warm_up_graphs
+from core.llm import QwenProvider, set_provider
+from core.utils import set_connection_factory
+
+SCENARIOS = {
+    "rag_query": {
+        "question": "What notice period do annual leave requests need?",
+    },
+    "comparison": {
+        "question": "Compare the travel expense policy and the remote work policy",
+    },
+    "summarization": {
+        "question": "Summarize the information security policy",
+    },
+    "training_generation": {
+        "question": "Create a quiz on the onboarding checklist",
+    },
+    "rewrite_loop": {
+        "question": "And what about the quarterly telescope calibration schedule?",
+        "chat_history": [
+            {"role": "user", "content": "Which observatory instruments need maintenance?"},
+            {"role": "assistant", "content": "The spectrograph and the guide camera are serviced monthly."},
+        ],
+    },
+}
+
+
+class StubResponder:
+    """Answers each kind of prompt the nodes send, and counts calls by kind."""
+
+    def __init__(self, answer_tokens: int = 150):
+        self.answer = " ".join(f"word{i}" for i in range(answer_tokens))
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def kind(system_prompt: str) -> str:
+        for marker, kind in (("intent classification", "intent"), ("question rewriting", "rewrite"),
+                             ("search query expert", "expand_query"), ("grader", "grade"),
+                             ("deconstructing comparison", "plan")):
+            if marker in system_prompt:
+                return kind
+        return "answer"
+
+    def __call__(self, payload):
+        messages = payload.get("messages", [])
+        system_prompt = messages[0]["content"] if messages else ""
+        user_prompt = messages[-1]["content"] if messages else ""
+        kind = self.kind(system_prompt)
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+        if kind == "intent":
+            return "rag_query"
+        if kind == "rewrite":
+            match = re.search(r"Follow-up Question: (.*)", user_prompt)
+            return match.group(1).strip() if match else user_prompt
+        if kind == "expand_query":
+            match = re.search(r"Question: (.*)", user_prompt)
+            return f"{match.group(1).strip() if match else user_prompt} details overview"
+        if kind == "grade":
+            return "yes"
+        if kind == "plan":
+            request = re.search(r'User Request: "(.*)"', user_prompt)
+            parts = re.split(r"\band\b|\bversus\b|\bvs\b", re.sub(r"^compare\s+", "", request.group(1) if request else "", flags=re.I))
+            return json.dumps({"plan": [part.strip(" ,.?") for part in parts if part.strip(" ,.?")]})
+        return self.answer
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def delta(after: dict, before: dict, runs: int) -> dict:
+    """Per-question counts between two snapshots."""
+    return {key: round((after[key] - before.get(key, 0)) / runs, 2) for key in sorted(after) if after[key] != before.get(key, 0)}
+
+def run_scenario(scenario, variant, runs, concurrency):
+    """Runs one scenario runs times, concurrency at a time, on cold query-embedding caches."""
+    query_embeddings.clear()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(lambda _: run_question(scenario, "Qwen", variant), range(runs)))
+    return results, time.perf_counter() - started
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run (repeatable; default all).")
+    parser.add_argument("--variant", default="default", choices=list(GRAPH_VARIANTS), help="Graph variant.")
+    parser.add_argument("--runs", type=int, default=20, help="Questions per scenario.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions in flight at once.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stand-in LLM latency before the first token, in seconds.")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Stand-in LLM generation rate (0 for instant).")
+    parser.add_argument("--answer-tokens", type=int, default=150, help="Words in each generated answer.")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="In-memory database round trip, in seconds.")
+    parser.add_argument("--corpus", help="JSONL of {\"filename\", \"text\"} chunks instead of the built-in corpus.")
+    parser.add_argument("--copies", type=int, default=20, help="Copies of the built-in corpus to load.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against.")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = InMemoryCorpus.from_jsonl(args.corpus, latency=args.db_latency)
+    else:
+        corpus = InMemoryCorpus.synthetic(args.copies, latency=args.db_latency)
+    set_connection_factory(corpus.connect)
+    responder = StubResponder(args.answer_tokens)
+    stub = LLMStubServer(latency=args.llm_latency, tokens_per_second=args.tokens_per_second or None, respond=responder)
+    stub.start()
+    set_provider("Qwen", QwenProvider(endpoint=stub.url))
+
+    report = {
+        "commit": current_commit(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "corpus_chunks": len(corpus.rows),
+        "scenarios": {},
+    }
+    try:
+        warm_up_graphs([args.variant])
+        for name in args.scenario or list(SCENARIOS):
+            scenario = SCENARIOS[name]
+            # One unmeasured run loads the intent classifier, tokenizers and connections
+            run_question(scenario, "Qwen", args.variant)
+            llm_before, db_before = responder.snapshot(), corpus.stats()
+            results, elapsed = run_scenario(scenario, args.variant, args.runs, args.concurrency)
+            latencies = [r["total_ms"] for r in results]
+            first_tokens = [r["first_token_ms"] for r in results if r["first_token_ms"] is not None]
+            llm_calls = delta(responder.snapshot(), llm_before, args.runs)
+            report["scenarios"][name] = {
+                "intent": results[0]["intent"],
+                "path": results[0]["path"],
+                "p50_ms": percentile(latencies, 0.50),
+                "p95_ms": percentile(latencies, 0.95),
+                "p99_ms": percentile(latencies, 0.99),
+                "mean_ms": statistics.mean(latencies),
+                "first_token_p50_ms": percentile(first_tokens, 0.50) if first_tokens else None,
+                "questions_per_second": args.runs / elapsed,
+                "llm_calls": round(sum(llm_calls.values()), 2),
+                "llm_calls_by_kind": llm_calls,
+                "db_statements": delta(corpus.stats(), db_before, args.runs),
+            }
+    finally:
+        set_connection_factory(None)
+        stub.stop()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("scenarios", {})
+    print(f"commit {report['commit']}, variant {args.variant}, {report['corpus_chunks']} chunks, "
+          f"{args.runs} questions per scenario at concurrency {args.concurrency}")
+    for name, result in report["scenarios"].items():
+        line = (f"{name:<20} p50={result['p50_ms']:8.1f} ms  p95={result['p95_ms']:8.1f} ms  "
+                f"{result['questions_per_second']:6.2f} q/s  llm calls={result['llm_calls']:4.1f}  "
+                f"db={sum(result['db_statements'].values()):4.1f}")
+        if name in baseline:
+            before = baseline[name]
+            line += (f"  | vs baseline p50 {result['p50_ms'] - before['p50_ms']:+.1f} ms, "
+                     f"llm calls {result['llm_calls'] - before['llm_calls']:+.1f}")
+        print(line)
+        print(f"{'':<20} path: {' > '.join(result['path'])}")
+        print(f"{'':<20} llm: {result['llm_calls_by_kind']}  db: {result['db_statements']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures retrieval while the knowledge base is rebuilt, to show a blue/green rebuild does
+not disturb the questions being answered.
+
+A client thread runs vector searches back to back for the whole run. Each search is
+attributed to a phase:
+- "before": the rebuild has not started yet.
+- "during": the rebuild is writing its new generation.
+- "after": the rebuild has switched generations, and the old one is being garbage-collected.
+For each phase the report gives latency percentiles and how many searches came back empty.
+An empty result means users saw no context. Truncating the live tables, as rebuilds used
+to do, shows up as empty results during the rebuild.
+
+Usage (from the repository root, with the database configured in .env):
+    python -m benchmarks.bench_rebuild docs/ --before 10 --after 20
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from core.embeddings import query_embeddings
+from core.ingestion import ingest_documents, iter_files
+from core.retrieval import search_chunks
+from benchmarks.bench_retrieval import DEFAULT_QUESTIONS
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Files or directories to rebuild the knowledge base from.")
+    parser.add_argument("--before", type=float, default=10, help="Seconds of baseline searches before the rebuild.")
+    parser.add_argument("--after", type=float, default=20, help="Seconds of searches after the switch (covers garbage collection).")
+    parser.add_argument("--question", action="append", help="Question to search for (repeatable).")
+    args = parser.parse_args()
+
+    vectors = [query_embeddings.get(question) for question in (args.question or DEFAULT_QUESTIONS)]
+    phase = ["before"]
+    samples = {"before": [], "during": [], "after": []}
+    empty = {"before": 0, "during": 0, "after": 0}
+    done = threading.Event()
+
+    def client():
+        i = 0
+        while not done.is_set():
+            current = phase[0]
+            start = time.perf_counter()
+            rows = search_chunks(vectors[i % len(vectors)])
+            samples[current].append((time.perf_counter() - start) * 1000)
+            empty[current] += not rows
+            i += 1
+
+    thread = threading.Thread(target=client, daemon=True)
+    thread.start()
+    time.sleep(args.before)
+
+    phase[0] = "during"
+    stats = ingest_documents(iter_files(args.paths), fresh=True)
+    phase[0] = "after"
+    time.sleep(args.after)
+    done.set()
+    thread.join()
+
+    print(f"rebuild: {stats['documents']} documents, {stats['chunks']} chunks in {stats['elapsed_seconds']:.1f} s, "
+          f"generation {stats['generation']} {'activated' if stats['activated'] else 'abandoned'}")
+    for name in ("before", "during", "after"):
+        values = samples[name]
+        if not values:
+            print(f"{name:<7} no searches")
+            continue
+        print(f"{name:<7} n={len(values):5d}  p50={statistics.median(values):7.1f} ms  "
+              f"p95={percentile(values, 0.95):7.1f} ms  p99={percentile(values, 0.99):7.1f} ms  "
+              f"max={max(values):7.1f} ms  empty={empty[name]}")
+
+
+if __name__ == "__main__":
+    main()
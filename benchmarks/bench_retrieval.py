@@ -0,0 +1,79 @@
+"""
+Separates query-embedding time from vector-search time and compares the bound-vector
+retrieval path with the old query that embedded the text inside the SQL.
+
+Usage (from the repository root, with a reachable database configured in .env):
+    python -m benchmarks.bench_retrieval --repeat 5 "What changed in the 2023 pulse survey?"
+"""
+import argparse
+import statistics
+import time
+
+from core.embeddings import embed_text, query_embeddings
+from core.retrieval import VECTOR_SEARCH_SQL, search_chunks
+from core.utils import db_connection
+
+# The previous retrieval query, which re-embedded the question on every execution
+INLINE_EMBEDDING_SQL = VECTOR_SEARCH_SQL.replace(
+    ":query_vector", "(VECTOR_EMBEDDING(ALL_MINILM_L12_V2 USING :query_text AS DATA))"
+)
+
+DEFAULT_QUESTIONS = [
+    "What are the key licensing criteria?",
+    "What responsible gambling measures must operators provide?",
+    "What were the main findings of the 2023 pulse survey?",
+]
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def inline_search(question):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(INLINE_EMBEDDING_SQL, {'query_text': question})
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+
+def summarize(label, samples):
+    print(f"{label:<32} mean={statistics.mean(samples):8.2f} ms  p50={statistics.median(samples):8.2f} ms  n={len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", nargs="*", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--repeat", type=int, default=5, help="Retrievals per question (as in the rewrite loop).")
+    args = parser.parse_args()
+
+    inline, embed_cold, embed_warm, search = [], [], [], []
+    query_embeddings.clear()
+    for question in args.questions:
+        for _ in range(args.repeat):
+            inline.append(timed_ms(lambda: inline_search(question))[0])
+
+        elapsed, _ = timed_ms(lambda: embed_text(question))
+        embed_cold.append(elapsed)
+        query_embeddings.get(question)
+        for _ in range(args.repeat):
+            elapsed, vector = timed_ms(lambda: query_embeddings.get(question))
+            embed_warm.append(elapsed)
+            search.append(timed_ms(lambda: search_chunks(vector))[0])
+
+    summarize("inline embedding + search (old)", inline)
+    summarize("embedding, uncached", embed_cold)
+    summarize("embedding, cached", embed_warm)
+    summarize("vector search, bound vector", search)
+    repeated = args.repeat * len(args.questions)
+    old_total = sum(inline)
+    new_total = sum(embed_cold) + sum(embed_warm) + sum(search)
+    print(f"total for {repeated} retrievals: old={old_total:.1f} ms  new={new_total:.1f} ms")
+    print(f"embedding cache: {query_embeddings.stats()}")
+
+
+if __name__ == "__main__":
+    main()
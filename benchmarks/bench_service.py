@@ -0,0 +1,203 @@
+"""
+Throughput test of the HTTP query service (core.service), offline.
+
+Each replica is a service process with the in-memory corpus (benchmarks/memory_store.py)
+installed behind its database connections and the LLM stand-in (benchmarks/llm_stub.py,
+answering like bench_offline's StubResponder) as its Qwen endpoint; the stand-in runs in a
+process of its own. Clients send requests round-robin across the replicas, as a load balancer
+would, and a request turned away with 503 is retried on the next replica after its Retry-After.
+
+For each --replicas and --sessions level, that many conversations run at once, each asking
+--questions-per-session questions back to back, first through POST /v1/query and then through
+the streaming POST /v1/query/stream. The report gives throughput, latency percentiles, the
+median time to the first streamed token and how many requests were turned away.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_service --replicas 1 2 --sessions 16 64
+    python -m benchmarks.bench_service --max-inflight 16 --sessions 64 --output service.json
+"""
+import os
+
+# Must be set before config is imported: repeated questions would otherwise be served from the cache
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import socket
+import time
+
+import aiohttp
+import requests
+import uvicorn
+
+from benchmarks.bench_async import serve_stub
+from benchmarks.bench_offline import SCENARIOS, current_commit
+from benchmarks.memory_store import InMemoryCorpus
+from core.batch import percentile
+from core.graphs import GRAPH_VARIANTS, warm_up_graphs
+from core.intent import get_intent_classifier
+from core.llm import QwenProvider, set_provider
+from core.service import create_app
+from core.utils import set_connection_factory
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def serve_replica(port, llm_url, variant, copies, db_latency, max_inflight):
+    """Runs one service replica on the stand-ins until the process is terminated."""
+    corpus = InMemoryCorpus.synthetic(copies, latency=db_latency)
+    set_connection_factory(corpus.connect, async_factory=corpus.connect_async)
+    set_provider("Qwen", QwenProvider(endpoint=llm_url))
+    warm_up_graphs([variant])
+    get_intent_classifier()
+    app = create_app(warm=False, max_inflight=max_inflight)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+def wait_until_healthy(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if requests.get(f"{url}/healthz", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Service replica at {url} did not come up within {timeout:.0f} s")
+        time.sleep(0.2)
+
+
+class LoadGenerator:
+    """Concurrent sessions against the replicas, round-robin like a load balancer in front of them."""
+
+    def __init__(self, http, urls, body):
+        self.http = http
+        self.urls = itertools.cycle(urls)
+        self.body = body
+        self.rejected = 0
+
+    async def ask(self, stream: bool):
+        """Sends one question until a replica accepts it; returns (total_ms, first_token_ms)."""
+        started = time.perf_counter()
+        while True:
+            url = next(self.urls) + ("/v1/query/stream" if stream else "/v1/query")
+            async with self.http.post(url, json=self.body) as response:
+                if response.status == 503:
+                    self.rejected += 1
+                    await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+                    continue
+                if response.status != 200:
+                    raise RuntimeError(f"{url} replied {response.status}: {await response.text()}")
+                first_token_ms = None
+                if not stream:
+                    await response.read()
+                else:
+                    async for line in response.content:
+                        if first_token_ms is None and line.startswith(b"event: token"):
+                            first_token_ms = (time.perf_counter() - started) * 1000
+                        elif line.startswith(b"event: error"):
+                            raise RuntimeError(f"{url} failed to answer: {await response.content.readline()!r}")
+                return (time.perf_counter() - started) * 1000, first_token_ms
+
+    async def run(self, stream: bool, sessions: int, questions_per_session: int):
+        async def session():
+            return [await self.ask(stream) for _ in range(questions_per_session)]
+
+        return [sample for samples in await asyncio.gather(*(session() for _ in range(sessions))) for sample in samples]
+
+async def measure(http, urls, body, stream, sessions, questions_per_session):
+    load = LoadGenerator(http, urls, body)
+    started = time.perf_counter()
+    samples = await load.run(stream, sessions, questions_per_session)
+    elapsed = time.perf_counter() - started
+    latencies = [total_ms for total_ms, _ in samples]
+    first_tokens = [ms for _, ms in samples if ms is not None]
+    return {
+        "questions": len(samples),
+        "questions_per_second": len(samples) / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "first_token_p50_ms": percentile(first_tokens, 0.50) if first_tokens else None,
+        "rejected": load.rejected,
+    }
+
+async def run_levels(urls, body, args):
+    levels = []
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        # Unmeasured questions open each replica's LLM session and connections
+        for url in urls:
+            await measure(http, [url], body, True, 1, 1)
+        for replicas in args.replicas:
+            for sessions in args.sessions:
+                level = {"replicas": replicas, "sessions": sessions}
+                for mode, stream in (("query", False), ("stream", True)):
+                    level[mode] = await measure(http, urls[:replicas], body, stream, sessions, args.questions_per_session)
+                levels.append(level)
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2], help="Service replicas behind the round-robin per level.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[16, 64], help="Concurrent sessions per level.")
+    parser.add_argument("--questions-per-session", type=int, default=3, help="Questions each session asks in turn.")
+    parser.add_argument("--scenario", default="rag_query", choices=list(SCENARIOS), help="Question each session asks.")
+    parser.add_argument("--variant", default="default", choices=list(GRAPH_VARIANTS), help="Graph variant.")
+    parser.add_argument("--max-inflight", type=int, default=64, help="Questions each replica answers at once before replying 503.")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Stand-in LLM latency before the first token, in seconds.")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="Stand-in LLM generation rate (0 for instant).")
+    parser.add_argument("--answer-tokens", type=int, default=100, help="Words in each generated answer.")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="In-memory database round trip, in seconds.")
+    parser.add_argument("--copies", type=int, default=20, help="Copies of the built-in corpus to load.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    llm_urls = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=serve_stub, args=(llm_urls, args.llm_latency, args.tokens_per_second, args.answer_tokens), daemon=True)]
+    processes[0].start()
+    llm_url = llm_urls.get(timeout=30)
+    ports = [free_port() for _ in range(max(args.replicas))]
+    for port in ports:
+        processes.append(multiprocessing.Process(
+            target=serve_replica, daemon=True,
+            args=(port, llm_url, args.variant, args.copies, args.db_latency, args.max_inflight),
+        ))
+        processes[-1].start()
+
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    body = {**SCENARIOS[args.scenario], "model_choice": "Qwen", "variant": args.variant}
+    report = {"commit": current_commit(), "settings": {k: v for k, v in vars(args).items() if k != "output"},
+              "cpu_count": os.cpu_count()}
+    try:
+        for url in urls:
+            wait_until_healthy(url)
+        report["levels"] = asyncio.run(run_levels(urls, body, args))
+    finally:
+        for process in processes:
+            process.terminate()
+
+    print(f"commit {report['commit']}, scenario {args.scenario}, variant {args.variant}, {os.cpu_count()} CPUs, "
+          f"LLM {args.llm_latency * 1000:.0f} ms + {args.tokens_per_second:.0f} tokens/s, DB {args.db_latency * 1000:.0f} ms, "
+          f"max {args.max_inflight} in flight per replica")
+    for level in report["levels"]:
+        for mode in ("query", "stream"):
+            result = level[mode]
+            first_token = f"  first token p50={result['first_token_p50_ms']:8.1f} ms" if result["first_token_p50_ms"] is not None else ""
+            print(f"{level['replicas']:>2} replicas {level['sessions']:>5} sessions {mode:<6}  "
+                  f"{result['questions_per_second']:7.2f} q/s  p50={result['p50_ms']:8.1f} ms  p95={result['p95_ms']:8.1f} ms  "
+                  f"rejected={result['rejected']:4d}{first_token}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
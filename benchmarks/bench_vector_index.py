@@ -0,0 +1,143 @@
+"""
+Recall@k and latency of exact versus approximate (vector index) search at several corpus sizes.
+
+For each size a scratch table of clustered synthetic 384-dimensional vectors (the size of the
+ALL_MINILM_L12_V2 embeddings) is loaded, a vector index is built on it, and the same query
+vectors are searched exactly and approximately. Recall@k is the share of the exact top-k that
+the approximate search also returns. The scratch table is dropped afterwards.
+
+With --doc-chunks the real doc_chunks table (and whatever vector index it has) is measured
+instead, using stored chunk embeddings as queries.
+
+Usage (from the repository root, with a reachable database configured in .env):
+    python -m benchmarks.bench_vector_index --sizes 10000 50000 100000 --index hnsw --accuracy 90 95
+    python -m benchmarks.bench_vector_index --doc-chunks --accuracy 80 90 95
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from core.retrieval import as_vector
+from core.utils import db_connection
+from core.vector_index import create_vector_index
+
+DIMENSIONS = 384
+SCRATCH_TABLE = "bench_vectors"
+SCRATCH_INDEX = "BENCH_VECTORS_IDX"
+BATCH_SIZE = 5000
+
+EXACT_SQL = """
+    SELECT {id_column} FROM {table}
+     ORDER BY VECTOR_DISTANCE({column}, :query_vector, COSINE)
+     FETCH EXACT FIRST :k ROWS ONLY
+    """
+APPROX_SQL = """
+    SELECT {id_column} FROM {table}
+     ORDER BY VECTOR_DISTANCE({column}, :query_vector, COSINE)
+     FETCH APPROX FIRST :k ROWS ONLY WITH TARGET ACCURACY {accuracy}
+    """
+
+
+def clustered_vectors(rng, count, clusters=64):
+    """Unit vectors scattered around random centroids, closer to real embeddings than uniform noise."""
+    centroids = rng.normal(size=(clusters, DIMENSIONS)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, size=count)] + 0.35 * rng.normal(size=(count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_scratch_table(cursor, conn, vectors):
+    cursor.execute(f"BEGIN EXECUTE IMMEDIATE 'DROP TABLE {SCRATCH_TABLE} PURGE'; EXCEPTION WHEN OTHERS THEN NULL; END;")
+    cursor.execute(f"CREATE TABLE {SCRATCH_TABLE} (id NUMBER PRIMARY KEY, embedding VECTOR({DIMENSIONS}, FLOAT32))")
+    for start in range(0, len(vectors), BATCH_SIZE):
+        batch = [(start + i, as_vector(vector)) for i, vector in enumerate(vectors[start:start + BATCH_SIZE])]
+        cursor.executemany(f"INSERT INTO {SCRATCH_TABLE} (id, embedding) VALUES (:1, :2)", batch)
+    conn.commit()
+
+
+def run_queries(cursor, sql, queries, k):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        cursor.execute(sql, {'query_vector': as_vector(query), 'k': k})
+        rows = cursor.fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({row[0] for row in rows})
+    return latencies, results
+
+
+def report(label, latencies, recall=None):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    line = f"  {label:<22} mean={statistics.mean(latencies):8.2f} ms  p50={statistics.median(latencies):8.2f} ms  p95={p95:8.2f} ms"
+    if recall is not None:
+        line += f"  recall@k={recall:.3f}"
+    print(line)
+
+
+def compare(cursor, table, column, id_column, queries, k, accuracies):
+    exact_sql = EXACT_SQL.format(table=table, column=column, id_column=id_column)
+    run_queries(cursor, exact_sql, queries[:3], k)  # warm-up
+    exact_latencies, exact_results = run_queries(cursor, exact_sql, queries, k)
+    report("exact", exact_latencies)
+    for accuracy in accuracies:
+        approx_sql = APPROX_SQL.format(table=table, column=column, id_column=id_column, accuracy=int(accuracy))
+        run_queries(cursor, approx_sql, queries[:3], k)
+        approx_latencies, approx_results = run_queries(cursor, approx_sql, queries, k)
+        recall = statistics.mean(
+            len(approx & exact) / len(exact) if exact else 1.0
+            for approx, exact in zip(approx_results, exact_results)
+        )
+        report(f"approx @ {accuracy}%", approx_latencies, recall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--index", choices=["hnsw", "ivf"], default="hnsw")
+    parser.add_argument("--accuracy", type=int, nargs="+", default=[90, 95])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=25, help="Rows fetched per search (the retrieval query uses 25).")
+    parser.add_argument("--doc-chunks", action="store_true", help="Measure the real doc_chunks table instead.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    with db_connection() as conn:
+        if not conn:
+            raise SystemExit("Database connection failed.")
+        cursor = conn.cursor()
+
+        if args.doc_chunks:
+            cursor.execute("SELECT COUNT(*) FROM doc_chunks")
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT chunk_embedding FROM doc_chunks SAMPLE (10) FETCH FIRST :n ROWS ONLY", {'n': args.queries}
+            )
+            queries = [np.asarray(row[0], dtype=np.float32) for row in cursor.fetchall()]
+            print(f"doc_chunks: {total} chunks, {len(queries)} queries, k={args.k}")
+            compare(cursor, "doc_chunks", "chunk_embedding", "ROWID", queries, args.k, args.accuracy)
+            cursor.close()
+            return
+
+        try:
+            for size in args.sizes:
+                vectors = clustered_vectors(rng, size)
+                # Queries are perturbed corpus vectors, as real questions land near real chunks
+                queries = vectors[rng.integers(0, size, size=args.queries)] + 0.1 * rng.normal(size=(args.queries, DIMENSIONS)).astype(np.float32)
+                start = time.perf_counter()
+                load_scratch_table(cursor, conn, vectors)
+                load_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                create_vector_index(args.index, max(args.accuracy), table=SCRATCH_TABLE, column="embedding", name=SCRATCH_INDEX)
+                index_seconds = time.perf_counter() - start
+                print(f"{size} vectors: load {load_seconds:.1f} s, {args.index.upper()} index build {index_seconds:.1f} s, "
+                      f"{args.queries} queries, k={args.k}")
+                compare(cursor, SCRATCH_TABLE, "embedding", "id", queries, args.k, args.accuracy)
+        finally:
+            cursor.execute(f"BEGIN EXECUTE IMMEDIATE 'DROP TABLE {SCRATCH_TABLE} PURGE'; EXCEPTION WHEN OTHERS THEN NULL; END;")
+            cursor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compares the score-based relevance grader with the full-context LLM grader.
+
+For each question it retrieves context once, then grades it both ways and reports how often
+the decisions agree, accuracy against optional labels, latency and characters sent to the LLM.
+The input is JSONL of {"question": ..., "relevant": true/false (optional)}.
+
+Usage (from the repository root, with the database and LLM configured in .env):
+    python -m benchmarks.eval_grading questions.jsonl --model Qwen
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+
+from core import nodes
+from core.grading import RELEVANT, IRRELEVANT, score_relevance
+from config import GRADE_LLM_TOP_CHUNKS
+
+
+def counting_llm_grade(counter):
+    """Wraps nodes.llm_grade to count calls and prompt characters."""
+    original = nodes.llm_grade
+
+    def wrapped(question, context, model_choice):
+        counter["calls"] += 1
+        counter["chars"] += len(context) + len(question)
+        return original(question, context, model_choice)
+    return wrapped
+
+
+def score_grade(question, chunks, model_choice, llm_grade):
+    decision, _ = score_relevance([chunk["distance"] for chunk in chunks])
+    if decision == RELEVANT:
+        return True, decision
+    if decision == IRRELEVANT:
+        return False, decision
+    top = sorted(chunks, key=lambda chunk: chunk["distance"])[:GRADE_LLM_TOP_CHUNKS]
+    return llm_grade(question, "".join(f"Content: {c['text']}\n\n" for c in top), model_choice), decision
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="JSONL file of questions.")
+    parser.add_argument("--model", default="Qwen", choices=["Qwen", "OCI GenAI"])
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    llm_usage, score_usage = Counter(), Counter()
+    llm_grade_full = counting_llm_grade(llm_usage)
+    llm_grade_scored = counting_llm_grade(score_usage)
+    llm_times, score_times, agree, decisions = [], [], 0, Counter()
+    correct = Counter()
+    labelled = 0
+
+    for record in records:
+        question = record["question"]
+        context, _, chunks, _ = nodes.search_context(question, args.model)
+        if not context:
+            print(f"skipped (no context): {question}")
+            continue
+
+        start = time.perf_counter()
+        llm_decision = llm_grade_full(question, context, args.model)
+        llm_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        score_decision, band = score_grade(question, chunks, args.model, llm_grade_scored)
+        score_times.append((time.perf_counter() - start) * 1000)
+
+        decisions[band] += 1
+        agree += llm_decision == score_decision
+        if "relevant" in record:
+            labelled += 1
+            correct["llm"] += llm_decision == record["relevant"]
+            correct["score"] += score_decision == record["relevant"]
+
+    graded = len(llm_times)
+    if not graded:
+        print("No questions retrieved any context.")
+        return
+    print(f"questions graded:       {graded}")
+    print(f"decision agreement:     {agree / graded:.1%}")
+    print(f"score bands:            {dict(decisions)}")
+    if labelled:
+        print(f"accuracy (labelled):    llm={correct['llm'] / labelled:.1%}  score={correct['score'] / labelled:.1%}")
+    print(f"llm grader:             mean={statistics.mean(llm_times):8.1f} ms  llm calls={llm_usage['calls']}  chars sent={llm_usage['chars']}")
+    print(f"score grader:           mean={statistics.mean(score_times):8.1f} ms  llm calls={score_usage['calls']}  chars sent={score_usage['chars']}")
+
+
+if __name__ == "__main__":
+    main()
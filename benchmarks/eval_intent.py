@@ -0,0 +1,97 @@
+"""
+Offline accuracy and latency evaluation of the in-process intent classifier.
+
+Without --eval-file it runs leave-one-out over the labeled example set: each example is
+classified against centroids built from all the other examples. With --eval-file
+(same JSONL format) the classifier is fitted on the full example set and scored on the file.
+
+Usage (from the repository root):
+    python -m benchmarks.eval_intent
+    python -m benchmarks.eval_intent --eval-file my_questions.jsonl --threshold 0.5
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+
+import numpy as np
+
+from config import INTENT_CONFIDENCE_THRESHOLD, INTENT_MARGIN
+from core.intent import IntentClassifier, load_examples
+
+
+def decide(scores, labels, threshold, margin):
+    order = np.argsort(scores)[::-1]
+    best, runner_up = scores[order[0]], scores[order[1]] if len(order) > 1 else -1.0
+    if best < threshold or best - runner_up < margin:
+        return None
+    return labels[order[0]]
+
+
+def leave_one_out(classifier, examples, threshold, margin):
+    texts = [text.lower().strip() for text, _ in examples]
+    gold = [intent for _, intent in examples]
+    vectors = classifier.encode(texts)
+    labels = sorted(set(gold))
+    predictions = []
+    for i, vector in enumerate(vectors):
+        centroids = []
+        for label in labels:
+            members = [j for j, g in enumerate(gold) if g == label and j != i]
+            centroid = vectors[members].mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        predictions.append(decide(np.stack(centroids) @ vector, labels, threshold, margin))
+    return gold, predictions
+
+
+def report(gold, predictions, latencies):
+    answered = [(g, p) for g, p in zip(gold, predictions) if p is not None]
+    correct = sum(g == p for g, p in answered)
+    print(f"examples:              {len(gold)}")
+    print(f"handled locally:       {len(answered)} ({len(answered) / len(gold):.0%}); the rest go to the LLM")
+    if answered:
+        print(f"accuracy when local:   {correct / len(answered):.1%}")
+    print(f"accuracy overall:      {correct / len(gold):.1%} (LLM fallbacks counted as wrong)")
+    print("per-intent recall (local):")
+    totals = Counter(gold)
+    hits = Counter(g for g, p in answered if g == p)
+    for intent in sorted(totals):
+        print(f"  {intent:<20} {hits[intent]}/{totals[intent]}")
+    confusions = Counter((g, p) for g, p in answered if g != p)
+    for (g, p), count in confusions.most_common(5):
+        print(f"  confused {g} -> {p}: {count}")
+    if latencies:
+        latencies = sorted(latencies)
+        print(f"latency per question:  mean={statistics.mean(latencies):.2f} ms  "
+              f"p95={latencies[int(len(latencies) * 0.95)]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval-file", help="Held-out JSONL of {\"text\", \"intent\"} records.")
+    parser.add_argument("--threshold", type=float, default=INTENT_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=INTENT_MARGIN)
+    args = parser.parse_args()
+
+    examples = load_examples()
+    start = time.perf_counter()
+    classifier = IntentClassifier(examples, threshold=args.threshold, margin=args.margin)
+    print(f"model load + fit:      {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    eval_examples = load_examples(args.eval_file) if args.eval_file else examples
+    latencies = []
+    for text, _ in eval_examples:
+        start = time.perf_counter()
+        classifier.predict(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if args.eval_file:
+        gold = [intent for _, intent in eval_examples]
+        predictions = [classifier.predict(text)[0] for text, _ in eval_examples]
+    else:
+        gold, predictions = leave_one_out(classifier, examples, args.threshold, args.margin)
+    report(gold, predictions, latencies)
+
+
+if __name__ == "__main__":
+    main()
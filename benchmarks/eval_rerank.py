@@ -0,0 +1,92 @@
+"""
+Latency and quality report for the cross-encoder rerank stage.
+
+For each question the baseline context (vector search, top documents by chunk count, packed
+into the full token budget) is compared with reranked contexts that keep only the best k of
+RERANK_CANDIDATES over-retrieved chunks. It reports prompt tokens, rerank latency and, for
+questions labelled with the expected source file, how often that file makes it into the context.
+The input is JSONL of {"question": ..., "source": "expected_file.pdf" (optional)}.
+
+Usage (from the repository root, with the database configured in .env):
+    python -m benchmarks.eval_rerank questions.jsonl --top-k 3 5 8
+"""
+import argparse
+import json
+import statistics
+import time
+
+from core import nodes
+from core.rerank import Reranker
+from config import RERANK_CANDIDATES
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="JSONL file of questions.")
+    parser.add_argument("--model", default="Qwen", choices=["Qwen", "OCI GenAI"], help="Sets the token budget and tokenizer.")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES)
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    start = time.perf_counter()
+    reranker = Reranker()
+    print(f"model load:             {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    baseline_tokens, baseline_hits = [], 0
+    rerank_tokens = {k: [] for k in args.top_k}
+    rerank_hits = {k: 0 for k in args.top_k}
+    rerank_ms, labelled = [], 0
+
+    for record in records:
+        question = record["question"]
+        source = record.get("source")
+        _, citations, _, packing = nodes.search_context(question, args.model)
+        candidates = nodes.search_candidates(question, args.candidates, args.candidates)
+        if not candidates:
+            print(f"skipped (no candidates): {question}")
+            continue
+
+        start = time.perf_counter()
+        ranked = reranker.rerank(question, candidates, top_k=max(args.top_k))
+        rerank_ms.append((time.perf_counter() - start) * 1000)
+
+        baseline_tokens.append(packing.get("used_tokens", 0))
+        if source:
+            labelled += 1
+            baseline_hits += f"`{source}`" in citations
+        for k in args.top_k:
+            _, k_citations, _, k_packing = nodes.pack_candidates(ranked[:k], args.model)
+            rerank_tokens[k].append(k_packing["used_tokens"])
+            if source:
+                rerank_hits[k] += f"`{source}`" in k_citations
+
+    if not rerank_ms:
+        print("No questions retrieved any candidates.")
+        return
+    baseline_mean = statistics.mean(baseline_tokens)
+    print(f"questions:              {len(rerank_ms)}  candidates per question: {args.candidates}")
+    print(f"rerank latency:         mean={statistics.mean(rerank_ms):.1f} ms  p50={statistics.median(rerank_ms):.1f} ms  "
+          f"p95={percentile(rerank_ms, 0.95):.1f} ms")
+    line = f"baseline context:       mean={baseline_mean:7.0f} tokens"
+    if labelled:
+        line += f"  source in context={baseline_hits / labelled:.1%}"
+    print(line)
+    for k in args.top_k:
+        mean_tokens = statistics.mean(rerank_tokens[k])
+        reduction = 1 - mean_tokens / baseline_mean if baseline_mean else 0.0
+        line = f"reranked top {k:<3}        mean={mean_tokens:7.0f} tokens  ({reduction:.0%} smaller)"
+        if labelled:
+            line += f"  source in context={rerank_hits[k] / labelled:.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+A local stand-in for an OpenAI-compatible chat completions endpoint.
+
+It answers POST /v1/chat/completions with a canned completion after a configurable
+latency, and can inject transient failures (e.g. 429/503) to exercise client retries.
+Requests with "stream": true are answered as server-sent events, one word per event.
+Each word counts as a token: with a token rate set, completions take as long to produce
+as a model generating at that rate, streamed or not.
+
+Usage (from the repository root):
+    python -m benchmarks.llm_stub --port 8088 --latency 0.05 --fail-rate 0.1
+    python -m benchmarks.llm_stub --port 8088 --latency 0.2 --tokens-per-second 40
+then point QWEN_ENDPOINT at http://127.0.0.1:8088/v1/chat/completions.
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog (5) drops bursts of concurrent connects into SYN retries
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class LLMStubServer:
+    """Runs the stub endpoint on a background thread; usable as a context manager."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0, fail_status=503,
+                 fail_first=0, reply="This is a stub answer.", token_delay=0.0, tokens_per_second=None,
+                 respond=None, retry_after=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.fail_first = fail_first
+        # Sent as the Retry-After header of injected failures when set
+        self.retry_after = retry_after
+        self.reply = reply
+        self.token_delay = 1.0 / tokens_per_second if tokens_per_second else token_delay
+        # respond(payload) -> str replaces the canned reply, e.g. to answer each prompt kind differently
+        self.respond = respond
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            fail = self.requests <= self.fail_first or random.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+            return fail
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def content(self, payload):
+        """Returns the canned completion text for a request."""
+        if self.respond is not None:
+            return self.respond(payload)
+        if payload.get("response_format", {}).get("type") == "json_object":
+            return json.dumps({"plan": ["stub query"]})
+        return self.reply
+
+    def completion(self, payload):
+        """Builds the response body for a chat completions request."""
+        content = self.content(payload)
+        prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4},
+        }
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; avoid Nagle stalls on keep-alive connections
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                stub._count_connection()
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub._should_fail():
+                    headers = {"Retry-After": str(stub.retry_after)} if stub.retry_after is not None else None
+                    self._send_json(stub.fail_status, {"error": {"message": "injected failure"}}, headers)
+                    return
+                if payload.get("stream"):
+                    self._send_stream(stub.content(payload))
+                else:
+                    body = stub.completion(payload)
+                    if stub.token_delay:
+                        # A blocking completion arrives once every token has been generated
+                        time.sleep(stub.token_delay * len(body["choices"][0]["message"]["content"].split(" ")))
+                    self._send_json(200, body)
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+            def _send_stream(self, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    if stub.token_delay:
+                        time.sleep(stub.token_delay)
+                    piece = word if i == len(words) - 1 else word + " "
+                    event = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with --fail-status.")
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between generated tokens.")
+    parser.add_argument("--tokens-per-second", type=float, help="Generation rate; overrides --token-delay.")
+    args = parser.parse_args()
+
+    server = LLMStubServer(args.host, args.port, args.latency, args.fail_rate, args.fail_status,
+                           token_delay=args.token_delay, tokens_per_second=args.tokens_per_second)
+    print(f"LLM stub listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+An in-memory stand-in for the doc_chunks and documentation_staging tables.
+
+It answers the queries the retrieval path sends to Oracle: the in-database query embedding,
+the vector search (exact and approximate), the Oracle Text search, the chunk scan behind the
+BM25 fallback, the chunk fetch by key and the active-corpus counts, with the row shapes
+python-oracledb returns. Embeddings are deterministic hashed bags of words, so chunks that
+share terms with a question are close to it. Install it behind get_db_conn (and async_db_connection) with
+core.utils.set_connection_factory:
+
+    corpus = InMemoryCorpus.synthetic()
+    set_connection_factory(corpus.connect, async_factory=corpus.connect_async)
+
+Every statement waits for the configured round-trip latency (time.sleep on sync connections,
+asyncio.sleep on async ones) and is counted by kind.
+"""
+import array
+import asyncio
+import json
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from core.lexical import BM25Index, tokenize
+
+DIMENSIONS = 384
+
+# Policy documents for the built-in corpus: (filename, topic, facts), one chunk per fact
+SYNTHETIC_DOCUMENTS = [
+    ("annual_leave_policy.pdf", "annual leave", [
+        "Annual leave requests must be submitted with a notice period of two weeks.",
+        "Employees accrue annual leave at two days per month of service.",
+        "Unused annual leave of up to five days carries over to the next year.",
+        "Annual leave during the year-end freeze needs director approval.",
+    ]),
+    ("travel_expense_policy.docx", "travel expense", [
+        "Travel expense claims are filed within thirty days of the trip.",
+        "Economy class is the default for flights under six hours of travel.",
+        "Hotel expense limits depend on the city tier of the travel destination.",
+        "Meals on travel days are reimbursed against itemised expense receipts.",
+    ]),
+    ("remote_work_policy.pdf", "remote work", [
+        "Remote work is available for up to three days per week with manager approval.",
+        "Remote work equipment such as monitors is provided on request.",
+        "Employees on remote work must be reachable during core hours of ten to four.",
+        "Remote work from another country needs approval from human resources.",
+    ]),
+    ("information_security_policy.pdf", "information security", [
+        "Information security training is mandatory for all staff every year.",
+        "Passwords must be rotated every ninety days under the information security standard.",
+        "Security incidents are reported to the information security team within one hour.",
+        "Confidential information is encrypted at rest and in transit.",
+    ]),
+    ("onboarding_checklist.docx", "onboarding checklist", [
+        "The onboarding checklist starts with account setup on the first day.",
+        "New starters meet their onboarding buddy during the first week.",
+        "The onboarding checklist includes the information security training.",
+        "Managers review the onboarding checklist at the end of the first month.",
+    ]),
+    ("procurement_guidelines.pptx", "procurement", [
+        "Procurement above ten thousand requires three competing quotes.",
+        "Procurement requests are approved by the budget holder before ordering.",
+        "Preferred suppliers are listed in the procurement catalogue.",
+        "Procurement of software goes through the information security review.",
+    ]),
+]
+
+
+def hashed_embedding(text: str, dimensions: int = DIMENSIONS):
+    """Unit-length signed feature-hashing vector of the text's terms, as float32."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in tokenize(text):
+        digest = zlib.crc32(token.encode("utf-8"))
+        vector[digest % dimensions] += 1.0 if digest & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class InMemoryCorpus:
+    """Chunks with their document filenames and embeddings, searchable like doc_chunks."""
+
+    def __init__(self, latency: float = 0.0, dimensions: int = DIMENSIONS):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.rows = []  # (doc_id, filename, chunk_id, chunk_data)
+        self._embeddings = []
+        self._vectors = None
+        self._bm25 = BM25Index()
+        self._documents = {}
+        self._chunk_counts = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @classmethod
+    def synthetic(cls, copies: int = 1, **kwargs):
+        """The built-in policy corpus; copies > 1 repeats it under new filenames for a larger search space."""
+        corpus = cls(**kwargs)
+        for copy in range(copies):
+            for filename, topic, facts in SYNTHETIC_DOCUMENTS:
+                name = filename if copy == 0 else f"{copy}_{filename}"
+                for fact in facts:
+                    corpus.add_chunk(name, f"{topic.capitalize()} policy. {fact}")
+        return corpus
+
+    @classmethod
+    def from_jsonl(cls, path, **kwargs):
+        """Loads chunks from JSONL of {"filename": ..., "text": ...} records, e.g. exported from doc_chunks."""
+        corpus = cls(**kwargs)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    corpus.add_chunk(record["filename"], record["text"])
+        return corpus
+
+    def add_chunk(self, filename: str, text: str):
+        doc_id = self._documents.setdefault(filename, len(self._documents) + 1)
+        chunk_id = self._chunk_counts[doc_id] = self._chunk_counts.get(doc_id, 0) + 1
+        self.rows.append((doc_id, filename, chunk_id, text))
+        self._embeddings.append(hashed_embedding(text, self.dimensions))
+        self._vectors = None
+        self._bm25.add(len(self.rows) - 1, text)
+
+    def vectors(self):
+        """The chunk embeddings as one matrix, stacked on first use after chunks were added."""
+        if self._vectors is None:
+            self._vectors = np.stack(self._embeddings) if self._embeddings else np.zeros((0, self.dimensions), np.float32)
+        return self._vectors
+
+    def connect(self):
+        """A connection for core.utils.set_connection_factory."""
+        return InMemoryConnection(self)
+
+    async def connect_async(self):
+        """An async connection for core.utils.set_connection_factory(async_factory=...)."""
+        return AsyncInMemoryConnection(self)
+
+    def stats(self) -> dict:
+        """Statements executed so far, by kind."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, kind: str):
+        with self._lock:
+            self._stats[kind] = self._stats.get(kind, 0) + 1
+
+    def _row(self, position: int, query):
+        doc_id, filename, chunk_id, text = self.rows[position]
+        vector = self.vectors()[position]
+        distance = 1.0 - float(vector @ query) if query is not None else None
+        return doc_id, filename, chunk_id, text, distance, array.array("f", vector)
+
+    def execute(self, sql: str, binds: dict):
+        """Runs one statement and returns its rows."""
+        if self.latency:
+            time.sleep(self.latency)
+        return self.query(sql, binds)
+
+    async def aexecute(self, sql: str, binds: dict):
+        """Runs one statement without blocking the event loop during the round trip."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.query(sql, binds)
+
+    def query(self, sql: str, binds: dict):
+        """Answers one statement with no simulated latency."""
+        if "VECTOR_EMBEDDING" in sql:
+            self._count("embed")
+            return [(array.array("f", hashed_embedding(binds["text"], self.dimensions)),)]
+        if "WITH top_chunks" in sql:
+            self._count("vector_search")
+            return self._vector_search(binds)
+        if "CONTAINS(" in sql:
+            self._count("text_search")
+            terms = " ".join(re.findall(r"\{([^}]*)\}", binds["text_query"]))
+            query = np.asarray(binds["query_vector"], dtype=np.float32)
+            return [self._row(position, query) for position, _ in self._bm25.search(terms, binds["top_chunks"])]
+        if "dc.doc_id = :d0" in sql:
+            self._count("fetch_chunks")
+            query = np.asarray(binds["query_vector"], dtype=np.float32)
+            keys = {(binds[f"d{i}"], binds[f"c{i}"]) for i in range(len(binds) // 2)}
+            return [self._row(i, query) for i, row in enumerate(self.rows) if (row[0], row[2]) in keys]
+        if "revision FROM corpus_generations" in sql:
+            self._count("corpus_version")
+            return [(1, 0)]
+        if "WHERE g.status = 'active'" in sql:
+            self._count("corpus_stats")
+            # A single generation, always active, with every document chunked
+            return [(1, len(self._documents), len(self._documents), len(self.rows))]
+        if sql.lstrip().startswith("SELECT doc_id, chunk_id, chunk_data FROM doc_chunks"):
+            self._count("chunk_scan")
+            return [(doc_id, chunk_id, text) for doc_id, _, chunk_id, text in self.rows]
+        raise NotImplementedError(f"The in-memory corpus does not support this statement: {sql.strip()[:80]}")
+
+    def _vector_search(self, binds):
+        # Nearest top_chunks chunks, grouped by document; the top_docs best-represented documents win
+        query = np.asarray(binds["query_vector"], dtype=np.float32)
+        distances = 1.0 - self.vectors() @ query
+        nearest = np.argsort(distances, kind="stable")[:binds["top_chunks"]]
+        counts = {}
+        for position in nearest:
+            doc_id = self.rows[position][0]
+            counts[doc_id] = counts.get(doc_id, 0) + 1
+        ranked = sorted(counts, key=lambda doc_id: counts[doc_id], reverse=True)[:binds["top_docs"]]
+        kept = [position for position in nearest if self.rows[position][0] in ranked]
+        kept.sort(key=lambda position: (-counts[self.rows[position][0]], distances[position]))
+        return [self._row(position, query) for position in kept]
+
+
+class InMemoryCursor:
+    """The subset of the python-oracledb cursor interface the retrieval path uses."""
+
+    def __init__(self, corpus: InMemoryCorpus):
+        self.corpus = corpus
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, binds=None, **kwargs):
+        self._rows = list(self.corpus.execute(sql, {**(binds or {}), **kwargs}))
+        self.rowcount = len(self._rows)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+    def close(self):
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InMemoryConnection:
+    def __init__(self, corpus: InMemoryCorpus):
+        self.corpus = corpus
+
+    def cursor(self):
+        return InMemoryCursor(self.corpus)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncInMemoryCursor(InMemoryCursor):
+    """The subset of the python-oracledb AsyncCursor interface the async retrieval path uses."""
+
+    async def execute(self, sql, binds=None, **kwargs):
+        self._rows = list(await self.corpus.aexecute(sql, {**(binds or {}), **kwargs}))
+        self.rowcount = len(self._rows)
+
+    async def fetchall(self):
+        return super().fetchall()
+
+    async def fetchone(self):
+        return super().fetchone()
+
+
+class AsyncInMemoryConnection:
+    def __init__(self, corpus: InMemoryCorpus):
+        self.corpus = corpus
+
+    def cursor(self):
+        return AsyncInMemoryCursor(self.corpus)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
@@ -12,30 +12,136 @@ DB_SERVICE_NAME = os.getenv("SERVICE_NAME")
 DB_DSN = f"{DB_HOSTNAME}:1521/{DB_SERVICE_NAME}"
 PAGES_DB_DSN = os.getenv("PAGES_DB_DSN")
 
+# --- Database Pool Configuration ---
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 2))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_INCREMENT = int(os.getenv("DB_POOL_INCREMENT", 1))
+DB_POOL_PING_INTERVAL = int(os.getenv("DB_POOL_PING_INTERVAL", 60))
+DB_POOL_TIMEOUT_MS = int(os.getenv("DB_POOL_TIMEOUT_MS", 5000))
+DB_POOL_WAIT_THRESHOLD_MS = float(os.getenv("DB_POOL_WAIT_THRESHOLD_MS", 5))
+
 # --- OCI Configuration ---
 OCI_CONFIG_PROFILE = os.getenv("OCI_CONFIG_PROFILE", "DEFAULT")
 OCI_AUTH_TYPE = os.getenv("OCI_AUTH_TYPE", "API_KEY")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 COMPARTMENT_ID = os.getenv("COMPARTMENT_ID")
 NAMESPACE = os.getenv("NAMESPACE")
+OBJECT_STORAGE_PART_SIZE = int(os.getenv("OBJECT_STORAGE_PART_SIZE_MB", 10)) * 1024 * 1024
+OBJECT_STORAGE_PART_WORKERS = int(os.getenv("OBJECT_STORAGE_PART_WORKERS", 4))
 
 # --- Qwen3 Configuration ---
 QWEN_ENDPOINT = os.getenv("QWEN_ENDPOINT")
 #format "https://api.qwen3.com/v1/chat/completions"
+QWEN_MODEL = os.getenv("QWEN_MODEL", "Qwen/Qwen3-4B")
+QWEN_TIMEOUT = float(os.getenv("QWEN_TIMEOUT", 120))
 
 # --- OCI GenAI Configuration ---
 GENAI_ENDPOINT = os.getenv("GENAI_ENDPOINT")
 GENAI_MODEL_ID = os.getenv("GENAI_MODEL_ID")
 GENAI_COMPARTMENT_ID = os.getenv("GENAI_COMPARTMENT_ID")
+OCI_GENAI_TIMEOUT = float(os.getenv("OCI_GENAI_TIMEOUT", 240))
+
+# --- LLM Client Configuration ---
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 10))
+LLM_HTTP_POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", 16))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 8))
 
 
 # --- Application Configuration ---
-QWEN3_CONTEXT_LIMIT_CHARS = int(os.getenv("QWEN3_CONTEXT_LIMIT_CHARS", 16000))
-OCI_GENAI_CONTEXT_LIMIT_CHARS = int(os.getenv("OCI_GENAI_CONTEXT_LIMIT_CHARS", 30000))
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", 4))
+# The *_CHARS limits of earlier releases are still honoured, converted at CHARS_PER_TOKEN
+QWEN3_CONTEXT_LIMIT_TOKENS = int(os.getenv("QWEN3_CONTEXT_LIMIT_TOKENS") or int(os.getenv("QWEN3_CONTEXT_LIMIT_CHARS", 16000)) / CHARS_PER_TOKEN)
+OCI_GENAI_CONTEXT_LIMIT_TOKENS = int(os.getenv("OCI_GENAI_CONTEXT_LIMIT_TOKENS") or int(os.getenv("OCI_GENAI_CONTEXT_LIMIT_CHARS", 30000)) / CHARS_PER_TOKEN)
+COMPARISON_MAX_WORKERS = int(os.getenv("COMPARISON_MAX_WORKERS", 4))
+COMPARISON_SUBQUERY_TIMEOUT = float(os.getenv("COMPARISON_SUBQUERY_TIMEOUT", 30))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 1024))
+
+# --- Context Grading Configuration ---
+GRADE_MODE = os.getenv("GRADE_MODE", "score")
+GRADE_ACCEPT_DISTANCE = float(os.getenv("GRADE_ACCEPT_DISTANCE", 0.45))
+GRADE_REJECT_DISTANCE = float(os.getenv("GRADE_REJECT_DISTANCE", 0.75))
+GRADE_COVERAGE_DISTANCE = float(os.getenv("GRADE_COVERAGE_DISTANCE", 0.55))
+GRADE_MIN_COVERAGE = float(os.getenv("GRADE_MIN_COVERAGE", 0.2))
+GRADE_MIN_GAP = float(os.getenv("GRADE_MIN_GAP", 0.15))
+GRADE_LLM_TOP_CHUNKS = int(os.getenv("GRADE_LLM_TOP_CHUNKS", 3))
+
+# --- Retrieval Configuration ---
+RETRIEVAL_TOP_CHUNKS = int(os.getenv("RETRIEVAL_TOP_CHUNKS", 25))
+RETRIEVAL_TOP_DOCS = int(os.getenv("RETRIEVAL_TOP_DOCS", 4))
+RETRIEVAL_WIDE_TOP_CHUNKS = int(os.getenv("RETRIEVAL_WIDE_TOP_CHUNKS", 60))
+RETRIEVAL_WIDE_TOP_DOCS = int(os.getenv("RETRIEVAL_WIDE_TOP_DOCS", 8))
+QWEN_TOKENIZER = os.getenv("QWEN_TOKENIZER", QWEN_MODEL)
+OCI_GENAI_TOKENIZER = os.getenv("OCI_GENAI_TOKENIZER", "")
+PACK_DEDUP_SIMILARITY = float(os.getenv("PACK_DEDUP_SIMILARITY", 0.95))
+PACK_MMR_LAMBDA = float(os.getenv("PACK_MMR_LAMBDA", 0.7))
+VECTOR_SEARCH_MODE = os.getenv("VECTOR_SEARCH_MODE", "approx")
+VECTOR_SEARCH_TARGET_ACCURACY = int(os.getenv("VECTOR_SEARCH_TARGET_ACCURACY", 95))
+LEXICAL_BACKEND = os.getenv("LEXICAL_BACKEND", "none")
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", 0.4))
+HYBRID_INTENT_WEIGHTS = {
+    intent.strip(): float(weight)
+    for intent, weight in (
+        item.split(":") for item in os.getenv(
+            "HYBRID_INTENT_WEIGHTS", "comparison:0.5,summarization:0.2,training_generation:0.2"
+        ).split(",") if item.strip()
+    )
+}
+RRF_K = int(os.getenv("RRF_K", 60))
+RETRIEVAL_LADDER = [s.strip() for s in os.getenv("RETRIEVAL_LADDER", "vector,wide,expanded").split(",") if s.strip()]
+
+# --- Reranking Configuration ---
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 50))
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", 8))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+
+# --- Vector Index Configuration ---
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")
+VECTOR_INDEX_TARGET_ACCURACY = int(os.getenv("VECTOR_INDEX_TARGET_ACCURACY", 95))
+VECTOR_INDEX_HNSW_NEIGHBORS = int(os.getenv("VECTOR_INDEX_HNSW_NEIGHBORS", 32))
+VECTOR_INDEX_HNSW_EFCONSTRUCTION = int(os.getenv("VECTOR_INDEX_HNSW_EFCONSTRUCTION", 200))
+VECTOR_INDEX_IVF_PARTITIONS = int(os.getenv("VECTOR_INDEX_IVF_PARTITIONS", 100))
+
+# --- Intent Classifier Configuration ---
+INTENT_CLASSIFIER_ENABLED = os.getenv("INTENT_CLASSIFIER_ENABLED", "true").lower() == "true"
+INTENT_MODEL_NAME = os.getenv("INTENT_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+INTENT_EXAMPLES_PATH = os.getenv("INTENT_EXAMPLES_PATH", os.path.join(os.path.dirname(__file__), "data", "intent_examples.jsonl"))
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", 0.45))
+INTENT_MARGIN = float(os.getenv("INTENT_MARGIN", 0.05))
+
+# --- Answer Cache Configuration ---
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 512))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+ANSWER_CACHE_CORPUS_CHECK_SECONDS = float(os.getenv("ANSWER_CACHE_CORPUS_CHECK_SECONDS", 5))
+
+# --- Query Service Configuration ---
+RAG_SERVICE_URL = os.getenv("RAG_SERVICE_URL", "http://127.0.0.1:8000")
+RAG_SERVICE_TIMEOUT = float(os.getenv("RAG_SERVICE_TIMEOUT", 180))
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", 8000))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", 1))
+SERVICE_MAX_INFLIGHT = int(os.getenv("SERVICE_MAX_INFLIGHT", 64))
+
+# --- Telemetry Configuration ---
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+TELEMETRY_SPANS_PATH = os.getenv("TELEMETRY_SPANS_PATH", "")
+TELEMETRY_MAX_TRACES = int(os.getenv("TELEMETRY_MAX_TRACES", 200))
 
 # --- Data Ingestion Configuration ---
 ALLOWED_EXTENSIONS = {"pdf", "csv", "xls", "xlsx", "ppt", "pptx", "txt", "md", "html", "json", "docx", "doc"}
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE_MB", 100)) * 1024 * 1024
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 8192))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+INGEST_UPLOAD_WORKERS = int(os.getenv("INGEST_UPLOAD_WORKERS", 4))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 8))
+CORPUS_GC_BATCH_ROWS = int(os.getenv("CORPUS_GC_BATCH_ROWS", 5000))
+CORPUS_STALE_BUILD_MINUTES = int(os.getenv("CORPUS_STALE_BUILD_MINUTES", 60))
 PAR_BASE_URL = os.getenv("BUCKET_PAR")
 PAR_READ_URL = os.getenv("PAR_READ_URL")
@@ -0,0 +1,243 @@
+"""
+Async counterparts of the graph nodes in core.nodes, used when the compiled graph is driven with
+astream/ainvoke. They share prompts, routing decisions and state shapes with the sync nodes, but
+wait on the LLM and the database without holding a thread, so one event loop can serve many
+concurrent conversations. CPU-bound steps (the intent classifier, the cross-encoder) run on
+worker threads to keep the loop responsive.
+"""
+import asyncio
+
+from core.cache import answer_cache, corpus_version_due, refresh_corpus_version
+from core.embeddings import aget_query_embedding
+from core.llm import LLMError, get_provider
+from core.nodes import (
+    _token_writer,
+    answer_prompts,
+    cache_answer,
+    cache_lookup_update,
+    comparison_outcome,
+    comparison_prompts,
+    context_update,
+    escalation_update,
+    expand_prompts,
+    grade_prompts,
+    grade_request,
+    handle_give_up,
+    handle_greeting,
+    intent_prompts,
+    is_cacheable_answer,
+    lexical_weight_for,
+    llm_failure,
+    local_intent,
+    merge_comparison,
+    normalize_plan,
+    pack_candidates,
+    parse_expansion,
+    parse_grade,
+    parse_intent,
+    parse_plan,
+    plan_prompts,
+    rank_candidates,
+    rerank_context,
+    retrieval_failed,
+    retrieval_request,
+    rewrite_prompts,
+    streamed_text,
+    summarization_prompts,
+    training_prompts,
+)
+from core.retrieval import alexical_search, asearch_chunks
+from config import (
+    ANSWER_CACHE_ENABLED,
+    COMPARISON_SUBQUERY_TIMEOUT,
+    RETRIEVAL_TOP_CHUNKS,
+    RETRIEVAL_TOP_DOCS,
+)
+
+async def aget_llm_response(model_choice: str, system_prompt: str, user_prompt: str, json_mode: bool = False, **kwargs) -> str:
+    """Async counterpart of get_llm_response."""
+    provider = get_provider(model_choice)
+    try:
+        return await provider.acomplete(system_prompt, user_prompt, json_mode=json_mode, **kwargs)
+    except LLMError as e:
+        return llm_failure(provider, e)
+
+async def astream_llm_response(model_choice: str, system_prompt: str, user_prompt: str, **kwargs) -> str:
+    """Async counterpart of stream_llm_response; tokens go to the graph's "custom" stream."""
+    provider = get_provider(model_choice)
+    write = _token_writer()
+    parts = []
+    try:
+        async for token in provider.astream(system_prompt, user_prompt, **kwargs):
+            parts.append(token)
+            write({"token": token})
+    except LLMError as e:
+        return streamed_text(provider, parts, e)
+    return streamed_text(provider, parts)
+
+async def adetect_intent(state) -> str:
+    question = state["question"].lower().strip()
+    # The classifier is CPU-bound (and loads its model on first use)
+    intent = await asyncio.to_thread(local_intent, question)
+    if intent is not None:
+        return intent
+
+    system_prompt, user_prompt = intent_prompts(question)
+    return parse_intent(await aget_llm_response(state["model_choice"], system_prompt, user_prompt))
+
+async def aclassify_intent(state):
+    return {**state, "intent": await adetect_intent(state)}
+
+async def alookup_answer_cache(state):
+    if not ANSWER_CACHE_ENABLED:
+        return {**state, "cache_hit": False}
+
+    if corpus_version_due():
+        # The lookup reads the corpus version from the database when due; not on the event loop
+        await asyncio.to_thread(refresh_corpus_version)
+    cached = answer_cache.lookup(state["question"], state["model_choice"], state["intent"])
+    if cached is None:
+        # Near-duplicate lookup; the embedding is cached, so a miss reuses it for retrieval
+        vector = await aget_query_embedding(state["question"])
+        cached = answer_cache.lookup(state["question"], state["model_choice"], state["intent"], embed_fn=lambda _: vector)
+    return cache_lookup_update(state, cached)
+
+async def astore_answer_cache(state):
+    if is_cacheable_answer(state):
+        if corpus_version_due():
+            await asyncio.to_thread(refresh_corpus_version)
+        cache_answer(state, await aget_query_embedding(state["question"]))
+    return state
+
+async def ahandle_greeting(state):
+    return handle_greeting(state)
+
+async def ahandle_give_up(state):
+    return handle_give_up(state)
+
+async def arewrite_question(state):
+    question = state["question"]
+    chat_history = state["chat_history"]
+    if not chat_history:
+        return {**state, "question": question}
+
+    system_prompt, user_prompt = rewrite_prompts(question, chat_history)
+    rewritten_question = await aget_llm_response(state["model_choice"], system_prompt, user_prompt)
+    return {**state, "question": rewritten_question or question}
+
+async def asearch_candidates(question: str, top_chunks: int = RETRIEVAL_TOP_CHUNKS, top_docs: int = RETRIEVAL_TOP_DOCS, intent: str = ""):
+    """Async counterpart of search_candidates; the vector and full-text searches run concurrently."""
+    query_vector = await aget_query_embedding(question)
+    if query_vector is None:
+        return []
+
+    lexical_weight = lexical_weight_for(intent)
+    if lexical_weight <= 0:
+        results, lexical_rows = await asearch_chunks(query_vector, top_chunks, top_docs), []
+    else:
+        results, lexical_rows = await asyncio.gather(
+            asearch_chunks(query_vector, top_chunks, top_docs),
+            alexical_search(question, query_vector, top_chunks),
+        )
+    return rank_candidates(results, lexical_rows, lexical_weight, top_chunks)
+
+async def asearch_context(question: str, model_choice: str, top_chunks: int = RETRIEVAL_TOP_CHUNKS, top_docs: int = RETRIEVAL_TOP_DOCS, intent: str = ""):
+    candidates = await asearch_candidates(question, top_chunks, top_docs, intent)
+    if not candidates:
+        return "", [], [], {}
+    return pack_candidates(candidates, model_choice)
+
+async def aretrieve_context(state):
+    top_chunks, top_docs, search_query, memo, key = retrieval_request(state)
+    if key in memo:
+        retrieved = memo[key]
+    else:
+        try:
+            retrieved = memo[key] = await asearch_context(
+                search_query, state["model_choice"], top_chunks, top_docs, state.get("intent", "")
+            )
+        except Exception as e:
+            retrieval_failed(e)
+            retrieved = ("", [], [], {})
+
+    return context_update(state, retrieved, retrieval_memo=memo)
+
+async def aretrieve_candidates(state):
+    top_chunks, top_docs, search_query, memo, key = retrieval_request(state, rerank=True)
+    if key in memo:
+        candidates = memo[key]
+    else:
+        try:
+            candidates = memo[key] = await asearch_candidates(search_query, top_chunks, top_docs, state.get("intent", ""))
+        except Exception as e:
+            retrieval_failed(e)
+            candidates = []
+
+    return {**state, "candidates": candidates, "rerank": True, "retrieval_memo": memo}
+
+async def arerank_context(state):
+    return await asyncio.to_thread(rerank_context, state)
+
+async def aexpand_query(question: str, model_choice: str) -> str:
+    system_prompt, user_prompt = expand_prompts(question)
+    return parse_expansion(question, await aget_llm_response(model_choice, system_prompt, user_prompt, max_tokens=100))
+
+async def aescalate_retrieval(state):
+    update = escalation_update(state)
+    if update is None:
+        update = escalation_update(state, await aexpand_query(state["question"], state["model_choice"]))
+    return update
+
+async def agenerate_answer(state):
+    system_prompt, user_prompt = answer_prompts(state)
+    answer = await astream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=2000)
+    return {**state, "answer": answer, "citations": state.get("citations", [])}
+
+async def agrade_context(state):
+    decision, llm_context, retry = grade_request(state)
+    if decision is not None:
+        return decision
+    system_prompt, user_prompt = grade_prompts(state["question"], llm_context)
+    score = await aget_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=10)
+    return "generate" if parse_grade(score) else retry
+
+async def adeconstruct_query(state):
+    system_prompt, user_prompt = plan_prompts(state["question"])
+    response_str = await aget_llm_response(state["model_choice"], system_prompt, user_prompt, json_mode=True, max_tokens=500)
+    return {**state, "plan": parse_plan(response_str)}
+
+async def aretrieve_for_comparison(state):
+    """
+    Async counterpart of retrieve_for_comparison. Every sub-query starts at once (there is no
+    worker pool to queue behind), so each gets COMPARISON_SUBQUERY_TIMEOUT from the same start
+    and one that runs out of time is cancelled.
+    """
+    model_choice = state["model_choice"]
+    sub_queries = normalize_plan(state.get("plan"))
+
+    tasks = [asyncio.ensure_future(asearch_context(sub_query, model_choice, intent="comparison")) for sub_query in sub_queries]
+    if tasks:
+        await asyncio.wait(tasks, timeout=COMPARISON_SUBQUERY_TIMEOUT)
+
+    outcomes = []
+    for sub_query, task in zip(sub_queries, tasks):
+        timed_out = not task.done()
+        if timed_out:
+            task.cancel()
+        outcomes.append(comparison_outcome(sub_query, task.result, timed_out))
+    return {**state, **merge_comparison(outcomes)}
+
+async def asynthesize_comparison(state):
+    system_prompt, user_prompt = comparison_prompts(state)
+    answer = await astream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=1200)
+    return {**state, "answer": answer}
+
+async def arun_summarization(state):
+    system_prompt, user_prompt = summarization_prompts(state)
+    answer = await astream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=1000)
+    return {**state, "answer": answer}
+
+async def arun_training_generation(state):
+    system_prompt, user_prompt = training_prompts(state)
+    answer = await astream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=1000)
+    return {**state, "answer": answer}
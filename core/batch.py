@@ -0,0 +1,286 @@
+"""
+Headless batch runner: answers a JSONL file of questions with the RAG graph, several at a time.
+
+Each input line is {"question": ...} with optional "id", "chat_history" (a list of
+{"role", "content"} messages), "model_choice" and "variant" (a registered graph variant).
+Each output line holds the answer, citations, intent, context packing, per-node timings and total latency
+for one question, written as soon as it finishes. Throughput and latency percentiles are
+printed at the end.
+
+With --async the graph runs with astream on one event loop, and --workers bounds the
+questions in flight instead of the threads.
+
+Usage (from the repository root, with the database and LLM endpoints configured in .env):
+    python -m core.batch questions.jsonl -o answers.jsonl --workers 8
+    python -m core.batch questions.jsonl -o answers.jsonl --workers 64 --async
+    python -m core.batch questions.jsonl -o answers.jsonl --model "OCI GenAI" --variant no_grading
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.graphs import GRAPH_VARIANTS, get_rag_graph, warm_up_graphs
+from core.llm import aclose_providers
+from core.telemetry import span
+
+# Nodes whose output is a sourced answer; other final nodes (greeting, give-up) carry no citations
+ANSWER_NODES = {"generate_answer", "synthesize_comparison", "run_summarization", "run_training_generation"}
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def _cited(path, state) -> bool:
+    """
+    Whether a turn's citations belong in its result: the answer came from an answer node or
+    the answer cache. The answer node is followed by store_answer_cache, so the whole path is
+    searched rather than its last node.
+    """
+    return any(node in ANSWER_NODES for node in path) or bool(state.get("cache_hit"))
+
+def load_questions(path):
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    for i, record in enumerate(records):
+        if not record.get("question"):
+            raise ValueError(f"Line {i + 1} of {path} has no question")
+    return records
+
+class _TurnRecorder:
+    """
+    Collects the path, per-node timings, time to first token and final state from a graph's
+    ["updates", "custom"] stream. Time between consecutive node updates is attributed to the
+    node that produced the update; nodes visited more than once (the retrieval retry ladder) accumulate.
+    """
+
+    def __init__(self):
+        self.node_ms, self.node_visits, self.path = {}, {}, []
+        self.state, self.first_token_ms = {}, None
+        self.started = self.last = time.perf_counter()
+
+    def observe(self, mode, output):
+        now = time.perf_counter()
+        if mode == "custom":
+            if self.first_token_ms is None and output.get("token"):
+                self.first_token_ms = (now - self.started) * 1000
+            return
+        for node, value in output.items():
+            self.node_ms[node] = self.node_ms.get(node, 0.0) + (now - self.last) * 1000
+            self.node_visits[node] = self.node_visits.get(node, 0) + 1
+            self.path.append(node)
+            if value:
+                self.state = value
+        self.last = now
+
+    def result(self, record, inputs, trace_id):
+        state = self.state
+        return {
+            "id": record.get("id"),
+            "question": record["question"],
+            "model_choice": inputs["model_choice"],
+            "intent": state.get("intent"),
+            "answer": state.get("answer", ""),
+            "citations": list(state.get("citations") or []) if _cited(self.path, state) else [],
+            "cache_hit": bool(state.get("cache_hit")),
+            "packing": state.get("packing") or {},
+            "path": self.path,
+            "node_ms": {node: round(ms, 1) for node, ms in self.node_ms.items()},
+            "node_visits": self.node_visits,
+            "first_token_ms": round(self.first_token_ms, 1) if self.first_token_ms is not None else None,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "trace_id": trace_id,
+        }
+
+def _turn_inputs(record, model_choice):
+    return {
+        "question": record["question"],
+        "chat_history": record.get("chat_history", []),
+        "model_choice": record.get("model_choice", model_choice),
+    }
+
+def run_question(record, model_choice: str = "Qwen", variant: str = "default"):
+    """Runs one question through the compiled graph and returns its result record."""
+    variant = record.get("variant", variant)
+    inputs = _turn_inputs(record, model_choice)
+    recorder = _TurnRecorder()
+    with span("rag.turn", **{"rag.variant": variant, "gen_ai.request.model": inputs["model_choice"]}) as turn:
+        for mode, output in get_rag_graph(variant).stream(inputs, stream_mode=["updates", "custom"]):
+            recorder.observe(mode, output)
+        turn.set("rag.intent", recorder.state.get("intent") or "unknown")
+    return recorder.result(record, inputs, turn.trace_id)
+
+async def astream_question(record, model_choice: str = "Qwen", variant: str = "default"):
+    """
+    Async counterpart of run_question that reports the turn as it runs: yields ("node", {"node": name})
+    as each node finishes and ("token", {"token": text}) as answer tokens arrive, then ("result", record).
+    """
+    variant = record.get("variant", variant)
+    inputs = _turn_inputs(record, model_choice)
+    recorder = _TurnRecorder()
+    with span("rag.turn", **{"rag.variant": variant, "gen_ai.request.model": inputs["model_choice"]}) as turn:
+        async for mode, output in get_rag_graph(variant).astream(inputs, stream_mode=["updates", "custom"]):
+            recorder.observe(mode, output)
+            if mode == "custom":
+                if output.get("token"):
+                    yield "token", {"token": output["token"]}
+                continue
+            for node in output:
+                yield "node", {"node": node}
+        turn.set("rag.intent", recorder.state.get("intent") or "unknown")
+    yield "result", recorder.result(record, inputs, turn.trace_id)
+
+async def arun_question(record, model_choice: str = "Qwen", variant: str = "default"):
+    """Async counterpart of run_question: the graph runs its async nodes under astream."""
+    async for event, data in astream_question(record, model_choice, variant):
+        if event == "result":
+            result = data
+    return result
+
+def _failed(record, error, started):
+    return {"id": record.get("id"), "question": record["question"], "error": f"{type(error).__name__}: {error}",
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+def _write(output, result):
+    output.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+    output.flush()
+
+def run_batch(records, output, workers: int = 4, model_choice: str = "Qwen", variant: str = "default", progress=None):
+    """
+    Answers records with up to workers questions in flight and writes one JSON line per result
+    to output as each finishes (with its input position as "index"). A failing question is
+    written with an "error" and does not stop the batch. Returns the result records in input order.
+    """
+    results = [None] * len(records)
+    write_lock = threading.Lock()
+
+    def run(index, record):
+        started = time.perf_counter()
+        try:
+            result = run_question(record, model_choice, variant)
+        except Exception as e:
+            result = _failed(record, e, started)
+        result["index"] = index
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch") as pool:
+        futures = [pool.submit(run, i, record) for i, record in enumerate(records)]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[result["index"]] = result
+            with write_lock:
+                _write(output, result)
+            if progress is not None:
+                progress(done, len(records), result)
+    return results
+
+async def arun_batch(records, output, concurrency: int = 4, model_choice: str = "Qwen", variant: str = "default", progress=None):
+    """Async counterpart of run_batch, with up to concurrency questions in flight on the running event loop."""
+    results = [None] * len(records)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index, record):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await arun_question(record, model_choice, variant)
+            except Exception as e:
+                result = _failed(record, e, started)
+        result["index"] = index
+        return result
+
+    tasks = [asyncio.ensure_future(run(i, record)) for i, record in enumerate(records)]
+    for done, next_result in enumerate(asyncio.as_completed(tasks), start=1):
+        result = await next_result
+        results[result["index"]] = result
+        _write(output, result)
+        if progress is not None:
+            progress(done, len(records), result)
+    return results
+
+def summarize(results, elapsed_seconds: float):
+    """Throughput, latency percentiles and mean time per node for a finished batch."""
+    ok = [r for r in results if "error" not in r]
+    latencies = [r["total_ms"] for r in ok]
+    summary = {
+        "questions": len(results),
+        "errors": len(results) - len(ok),
+        "elapsed_seconds": elapsed_seconds,
+        "questions_per_second": len(results) / elapsed_seconds if elapsed_seconds else 0.0,
+    }
+    if latencies:
+        summary.update({
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "mean_ms": statistics.mean(latencies),
+        })
+    first_tokens = [r["first_token_ms"] for r in ok if r.get("first_token_ms") is not None]
+    if first_tokens:
+        summary["first_token_p50_ms"] = percentile(first_tokens, 0.50)
+    node_totals = {}
+    for r in ok:
+        for node, ms in r["node_ms"].items():
+            node_totals.setdefault(node, []).append(ms)
+    summary["node_mean_ms"] = {node: statistics.mean(values) for node, values in node_totals.items()}
+    summary["intents"] = {}
+    for r in ok:
+        summary["intents"][r["intent"]] = summary["intents"].get(r["intent"], 0) + 1
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="JSONL file of questions.")
+    parser.add_argument("-o", "--output", help="JSONL file for the results (default: stdout).")
+    parser.add_argument("--workers", type=int, default=4, help="Questions answered concurrently.")
+    parser.add_argument("--model", default="Qwen", choices=["Qwen", "OCI GenAI"], help="Default model choice.")
+    parser.add_argument("--variant", default="default", choices=list(GRAPH_VARIANTS), help="Default graph variant.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Run the graph asynchronously on one event loop.")
+    args = parser.parse_args()
+
+    records = load_questions(args.questions)
+    warm_up_graphs()
+
+    def progress(done, total, result):
+        status = f"error: {result['error']}" if "error" in result else f"{result['total_ms']:.0f} ms"
+        print(f"[{done}/{total}] {result['question'][:60]!r} {status}", file=sys.stderr)
+
+    async def answer_async(output):
+        try:
+            return await arun_batch(records, output, args.workers, args.model, args.variant, progress)
+        finally:
+            await aclose_providers()
+
+    def answer(output):
+        if args.use_async:
+            return asyncio.run(answer_async(output))
+        return run_batch(records, output, args.workers, args.model, args.variant, progress)
+
+    started = time.perf_counter()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            results = answer(output)
+    else:
+        results = answer(sys.stdout)
+    summary = summarize(results, time.perf_counter() - started)
+
+    print(f"{summary['questions']} questions in {summary['elapsed_seconds']:.1f} s with {args.workers} workers "
+          f"({summary['questions_per_second']:.2f} questions/s), {summary['errors']} errors", file=sys.stderr)
+    if "p50_ms" in summary:
+        print(f"latency: p50={summary['p50_ms']:.0f} ms  p95={summary['p95_ms']:.0f} ms  "
+              f"p99={summary['p99_ms']:.0f} ms  mean={summary['mean_ms']:.0f} ms", file=sys.stderr)
+    if "first_token_p50_ms" in summary:
+        print(f"first token: p50={summary['first_token_p50_ms']:.0f} ms", file=sys.stderr)
+    for node, ms in sorted(summary["node_mean_ms"].items(), key=lambda item: item[1], reverse=True):
+        print(f"  {node:<28} mean={ms:8.1f} ms", file=sys.stderr)
+    print(f"intents: {summary['intents']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
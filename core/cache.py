@@ -0,0 +1,172 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from core.generations import read_corpus_version
+from config import (
+    ANSWER_CACHE_CORPUS_CHECK_SECONDS,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_SIMILARITY,
+)
+
+# The active corpus version, (generation_id, revision), as last read from corpus_generations. It
+# changes with every rebuild and every ingestion into the active generation, whichever process ran
+# it; answers cached against another version never match, and None (unreadable) bypasses the cache.
+_corpus_version = None
+_version_read_at = None
+_version_lock = threading.Lock()
+
+def corpus_version_due() -> bool:
+    """True when the corpus version was last read more than ANSWER_CACHE_CORPUS_CHECK_SECONDS ago."""
+    read_at = _version_read_at
+    return read_at is None or time.monotonic() - read_at >= ANSWER_CACHE_CORPUS_CHECK_SECONDS
+
+def refresh_corpus_version():
+    """Re-reads the active corpus version from the database and drops answers cached against any other."""
+    global _corpus_version, _version_read_at
+    try:
+        version = read_corpus_version()
+    except Exception as e:
+        print(f"Corpus version check failed: {e}")
+        version = None
+    with _version_lock:
+        changed = version != _corpus_version
+        _corpus_version, _version_read_at = version, time.monotonic()
+    if changed and version is not None:
+        answer_cache.evict_other_versions(version)
+    return version
+
+def get_corpus_version():
+    """Returns the active corpus version, re-reading it when due; None when the database cannot be read."""
+    if corpus_version_due():
+        return refresh_corpus_version()
+    return _corpus_version
+
+def normalize_question(question: str) -> str:
+    """Lower-cases, collapses whitespace and strips trailing punctuation so trivial variants share a key."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?.! ")
+
+
+class AnswerCache:
+    """
+    LRU cache of final answers with a time-to-live, scoped by model choice, intent and corpus version.
+    Lookups try the normalized question first and then fall back to embedding similarity
+    against cached questions in the same scope. version_fn() returns the current corpus
+    version; while it returns None nothing is served or stored.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY, version_fn=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn or get_corpus_version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "bypassed": 0}
+
+    @staticmethod
+    def _unit(embedding):
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expired(self, entry, now):
+        return now - entry["stored_at"] > self.ttl_seconds
+
+    def lookup(self, question: str, model_choice: str, intent: str = "", embed_fn=None):
+        """
+        Returns {"answer", "citations"} for a cached answer, or None on a miss.
+        embed_fn(question) is only called when there is no exact match.
+        """
+        version = self.version_fn()
+        if version is None:
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return None
+        scope = (model_choice, version, intent)
+        key = scope + (normalize_question(question),)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return {"answer": entry["answer"], "citations": list(entry["citations"])}
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if k[:3] == scope and e["embedding"] is not None and not self._expired(e, now)
+            ]
+
+        query = self._unit(embed_fn(question)) if embed_fn is not None and candidates else None
+        best_key, best_score = None, self.similarity_threshold
+        if query is not None:
+            for k, e in candidates:
+                score = float(np.dot(query, e["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = k, score
+
+        with self._lock:
+            entry = self._entries.get(best_key) if best_key is not None else None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            return {"answer": entry["answer"], "citations": list(entry["citations"])}
+
+    def store(self, question: str, model_choice: str, answer: str, citations, intent: str = "", embedding=None):
+        """Caches an answer and its citations, evicting the least recently used entries when full."""
+        version = self.version_fn()
+        if version is None:
+            return
+        key = (model_choice, version, intent, normalize_question(question))
+        entry = {
+            "answer": answer,
+            "citations": list(citations or []),
+            "embedding": self._unit(embedding),
+            "stored_at": time.monotonic(),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def evict_other_versions(self, version):
+        with self._lock:
+            for key in [k for k in self._entries if k[1] != version]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+answer_cache = AnswerCache()
+
+def get_answer_cache_stats() -> dict:
+    """Returns hit/miss/eviction counts and the hit rate of the process-wide answer cache."""
+    stats = answer_cache.stats()
+    stats["enabled"] = ANSWER_CACHE_ENABLED
+    stats["corpus_version"] = _corpus_version
+    return stats
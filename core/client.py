@@ -0,0 +1,158 @@
+"""
+Client for the HTTP query service (core.service), used by the Streamlit pages so they hold no
+graph, models, database pool or Object Storage client of their own.
+"""
+import json
+import threading
+
+import requests
+from config import RAG_SERVICE_TIMEOUT, RAG_SERVICE_URL
+
+
+class RAGServiceError(Exception):
+    """
+    The query service could not be reached, rejected a request or failed to answer it.
+    status is the HTTP status it replied with (or sent with a streamed "error" event), if any.
+    """
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class RAGServiceClient:
+    """Calls the query service over one pooled requests.Session; safe to share between Streamlit sessions."""
+
+    def __init__(self, base_url: str = RAG_SERVICE_URL, timeout: float = RAG_SERVICE_TIMEOUT, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def _request(self, method: str, path: str, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = self.session.request(method, self.base_url + path, **kwargs)
+        except requests.RequestException as e:
+            raise RAGServiceError(f"The query service at {self.base_url} is unreachable: {e}") from e
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error")
+            except ValueError:
+                message = None
+            response.close()
+            raise RAGServiceError(f"The query service replied {response.status_code}: {message or response.reason}",
+                                  response.status_code)
+        return response
+
+    def _events(self, method: str, path: str, **kwargs):
+        """Yields (event, data) from a Server-Sent Events response; an "error" event raises RAGServiceError."""
+        with self._request(method, path, stream=True, **kwargs) as response:
+            # Event streams are always UTF-8, whatever the Content-Type says
+            response.encoding = "utf-8"
+            event, data = None, []
+            try:
+                # chunk_size=None hands over each event as soon as it arrives
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data.append(line[len("data:"):].lstrip())
+                    elif not line and event:
+                        payload = json.loads("\n".join(data))
+                        if event == "error":
+                            raise RAGServiceError(f"The query service failed: {payload.get('error')}", payload.get("status"))
+                        yield event, payload
+                        event, data = None, []
+            except requests.RequestException as e:
+                raise RAGServiceError(f"The event stream from the query service broke off: {e}") from e
+
+    @staticmethod
+    def _query_body(question, chat_history, model_choice, variant, timings):
+        return {
+            "question": question,
+            "chat_history": [{"role": m["role"], "content": m["content"]} for m in chat_history or []],
+            "model_choice": model_choice,
+            "variant": variant,
+            "timings": timings,
+        }
+
+    def health(self) -> dict:
+        return self._request("GET", "/healthz").json()
+
+    def stats(self) -> dict:
+        """Statistics of whichever service worker answers: pool, search, LLM and cache counters."""
+        return self._request("GET", "/v1/stats").json()
+
+    def ingest_status(self) -> dict:
+        """Counts for the active corpus and every corpus generation."""
+        return self._request("GET", "/v1/ingest/status").json()
+
+    def query(self, question: str, chat_history=None, model_choice: str = "Qwen", variant: str = "default", timings: bool = False) -> dict:
+        """Answers one question and returns the service's answer record."""
+        body = self._query_body(question, chat_history, model_choice, variant, timings)
+        return self._request("POST", "/v1/query", json=body).json()
+
+    def stream_query(self, question: str, chat_history=None, model_choice: str = "Qwen", variant: str = "default", timings: bool = False):
+        """
+        Yields (event, data) as the turn runs: ("node", {"node"}) after each graph node,
+        ("token", {"token"}) for each answer token and finally ("result", answer record).
+        A turn that fails on the service raises RAGServiceError.
+        """
+        body = self._query_body(question, chat_history, model_choice, variant, timings)
+        yield from self._events("POST", "/v1/query/stream", json=body)
+
+    def ingest(self, files, fresh: bool = False):
+        """
+        Uploads (filename, bytes) files to be ingested, into a new corpus generation with fresh.
+        Yields ("progress", {"filename", "status", "detail"}) as each file moves through the
+        pipeline and finally ("result", ingestion stats). A rebuild in progress raises
+        RAGServiceError with status 409.
+        """
+        upload = [("files", (filename, data)) for filename, data in files]
+        # Writing a batch or parsing a large file can keep the stream quiet for long: only connecting is timed
+        yield from self._events("POST", "/v1/ingest", files=upload, data={"fresh": "true" if fresh else "false"},
+                                timeout=(self.timeout, None))
+
+    def indexes(self) -> dict:
+        """The vector and text indexes on doc_chunks, the vector index types and their defaults."""
+        return self._request("GET", "/v1/indexes").json()
+
+    # Index builds take as long as the corpus needs: only connecting is timed
+    def build_vector_index(self, index_type: str, target_accuracy: int) -> str:
+        """Builds (or rebuilds) the vector index; returns its DDL."""
+        body = {"index_type": index_type, "target_accuracy": target_accuracy}
+        return self._request("POST", "/v1/indexes/vector", json=body, timeout=(self.timeout, None)).json()["ddl"]
+
+    def drop_vector_index(self) -> bool:
+        """Drops the vector index; returns False if there was none."""
+        return self._request("DELETE", "/v1/indexes/vector", timeout=(self.timeout, None)).json()["dropped"]
+
+    def build_text_index(self) -> str:
+        """Builds (or rebuilds) the Oracle Text index; returns its DDL."""
+        return self._request("POST", "/v1/indexes/text", timeout=(self.timeout, None)).json()["ddl"]
+
+    def drop_text_index(self) -> bool:
+        """Drops the Oracle Text index; returns False if there was none."""
+        return self._request("DELETE", "/v1/indexes/text", timeout=(self.timeout, None)).json()["dropped"]
+
+    def documents(self) -> list:
+        """The active corpus generation's documents as dicts with id and filename."""
+        return self._request("GET", "/v1/documents").json()["documents"]
+
+    def summarize(self, doc_id: int, num_paragraphs: int = 2, model_choice: str = "Qwen", enhance: bool = True) -> dict:
+        """The database's summary of a document and, with enhance, the chat model's refinement of it."""
+        body = {"doc_id": doc_id, "num_paragraphs": num_paragraphs, "model_choice": model_choice, "enhance": enhance}
+        return self._request("POST", "/v1/summary", json=body).json()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_service_client() -> RAGServiceClient:
+    """Returns the process-wide client for RAG_SERVICE_URL, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RAGServiceClient()
+    return _client
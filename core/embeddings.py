@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+
+from core.telemetry import db_span
+from core.utils import async_db_connection, db_connection
+from config import EMBEDDING_CACHE_SIZE
+
+def embed_text(text: str):
+    """
+    Embeds text with the in-database ALL_MINILM_L12_V2 model, the same model used for doc_chunks.
+    Returns the vector as an array of floats, or None if the database is unavailable.
+    """
+    with db_span("embed", **{"db.text_chars": len(text)}) as query, db_connection() as conn:
+        if not conn:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT VECTOR_EMBEDDING(ALL_MINILM_L12_V2 USING :text AS DATA) FROM dual",
+                {'text': text}
+            )
+            row = cursor.fetchone()
+            query.set("db.rows", 1 if row else 0)
+        finally:
+            cursor.close()
+    return row[0] if row else None
+
+async def aembed_text(text: str):
+    """Async counterpart of embed_text."""
+    with db_span("embed", **{"db.text_chars": len(text)}) as query:
+        async with async_db_connection() as conn:
+            if not conn:
+                return None
+            with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT VECTOR_EMBEDDING(ALL_MINILM_L12_V2 USING :text AS DATA) FROM dual",
+                    {'text': text}
+                )
+                row = await cursor.fetchone()
+            query.set("db.rows", 1 if row else 0)
+    return row[0] if row else None
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace and case; the embedding model is uncased, so the vector is unchanged."""
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """Bounded LRU of query embeddings keyed by normalized text."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, embed_fn=embed_text, aembed_fn=aembed_text):
+        self.max_entries = max_entries
+        self.embed_fn = embed_fn
+        self.aembed_fn = aembed_fn
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "total_embed_ms": 0.0}
+
+    def get(self, text: str):
+        """Returns the embedding for text, computing it at most once while it stays cached."""
+        key = normalize_text(text)
+        vector = self._cached(key)
+        if vector is not None:
+            return vector
+        start = time.perf_counter()
+        vector = self.embed_fn(key)
+        self._store(key, vector, (time.perf_counter() - start) * 1000)
+        return vector
+
+    async def aget(self, text: str):
+        """Async counterpart of get; the cache is shared with it."""
+        key = normalize_text(text)
+        vector = self._cached(key)
+        if vector is not None:
+            return vector
+        start = time.perf_counter()
+        vector = await self.aembed_fn(key)
+        self._store(key, vector, (time.perf_counter() - start) * 1000)
+        return vector
+
+    def _cached(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+            return vector
+
+    def _store(self, key, vector, elapsed_ms):
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["total_embed_ms"] += elapsed_ms
+            # Failed embeddings (database unavailable) are not cached so the next call retries
+            if vector is not None:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["avg_embed_ms"] = stats["total_embed_ms"] / stats["misses"] if stats["misses"] else 0.0
+        return stats
+
+
+query_embeddings = EmbeddingCache()
+
+def get_query_embedding(text: str):
+    """Returns the (cached) query embedding for text, or None if it could not be computed."""
+    return query_embeddings.get(text)
+
+async def aget_query_embedding(text: str):
+    """Async counterpart of get_query_embedding."""
+    return await query_embeddings.aget(text)
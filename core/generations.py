@@ -0,0 +1,347 @@
+"""
+Corpus generations for blue/green rebuilds.
+
+Every document and chunk belongs to a generation, and exactly one generation is active.
+Retrieval reads only the active one (ACTIVE_GENERATION_SQL), so a rebuild can fill a new
+"building" generation while questions are still answered from the current corpus. Activating
+it is one UPDATE, so readers move from the old corpus to the new one in a single commit.
+Retired generations are then deleted in the background, a few thousand rows per
+transaction, so readers never wait on a large delete; so are rebuilds that stopped writing
+for CORPUS_STALE_BUILD_MINUTES (e.g. a crashed ingester).
+
+A rebuild replaces the whole corpus with the files it was given, so documents appended to
+the active generation while it runs would be dropped when it is activated. Appends are
+refused instead (RebuildInProgressError) until the rebuild is activated or abandoned; the
+active generation's row lock orders each append batch against begin_generation.
+
+The schema is created or upgraded by ingestion, or once by hand; services only check it
+(corpus_schema_exists). Garbage collection runs after each rebuild, or on demand:
+    python -m core.generations migrate    # create or upgrade the corpus and ingestion schema
+    python -m core.generations collect    # delete retired and stale generations now
+    python -m core.generations list       # list generations with their document counts
+"""
+import argparse
+import threading
+
+from core.utils import db_connection
+from config import CORPUS_GC_BATCH_ROWS, CORPUS_STALE_BUILD_MINUTES
+
+# Spliced into retrieval SQL; evaluated by the database, so no extra round trip per query
+ACTIVE_GENERATION_SQL = "(SELECT generation_id FROM corpus_generations WHERE status = 'active')"
+
+CORPUS_SCHEMA_DDL = (
+    """
+    CREATE TABLE corpus_generations (
+        generation_id NUMBER PRIMARY KEY,
+        status VARCHAR2(10) NOT NULL CHECK (status IN ('building', 'active', 'retired')),
+        created_at TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL,
+        activated_at TIMESTAMP,
+        revision NUMBER DEFAULT 0 NOT NULL,
+        updated_at TIMESTAMP
+    )
+    """,
+    "CREATE SEQUENCE corpus_generation_seq START WITH 2",
+    "ALTER TABLE documentation_staging ADD (generation_id NUMBER DEFAULT 1 NOT NULL)",
+    "ALTER TABLE doc_chunks ADD (generation_id NUMBER DEFAULT 1 NOT NULL)",
+    "CREATE INDEX doc_chunks_generation_idx ON doc_chunks (generation_id)",
+    "CREATE INDEX doc_staging_generation_idx ON documentation_staging (generation_id)",
+)
+# Columns retrieval relies on; all present means the schema is current
+CORPUS_SCHEMA_COLUMNS = (
+    ("CORPUS_GENERATIONS", "REVISION"),
+    ("CORPUS_GENERATIONS", "UPDATED_AT"),
+    ("DOCUMENTATION_STAGING", "GENERATION_ID"),
+    ("DOC_CHUNKS", "GENERATION_ID"),
+)
+CORPUS_SCHEMA_CHECK_SQL = "SELECT COUNT(*) FROM user_tab_columns WHERE (table_name, column_name) IN ({columns})".format(
+    columns=", ".join(f"('{table}', '{column}')" for table, column in CORPUS_SCHEMA_COLUMNS)
+)
+# Documents ingested before generations existed make up generation 1
+SEED_GENERATION_SQL = """
+    INSERT INTO corpus_generations (generation_id, status, activated_at)
+    SELECT 1, 'active', SYSTIMESTAMP FROM dual
+     WHERE NOT EXISTS (SELECT 1 FROM corpus_generations)
+    """
+LOCK_ACTIVE_GENERATION_SQL = "SELECT generation_id FROM corpus_generations WHERE status = 'active' FOR UPDATE"
+NEW_GENERATION_SQL = """
+    INSERT INTO corpus_generations (generation_id, status) VALUES (corpus_generation_seq.NEXTVAL, 'building')
+    RETURNING generation_id INTO :generation_id
+    """
+ACTIVATE_GENERATION_SQL = """
+    UPDATE corpus_generations
+       SET status = CASE generation_id WHEN :generation_id THEN 'active' ELSE 'retired' END,
+           activated_at = CASE generation_id WHEN :generation_id THEN SYSTIMESTAMP ELSE activated_at END
+     WHERE (generation_id = :generation_id OR status = 'active')
+       AND EXISTS (SELECT 1 FROM corpus_generations
+                    WHERE generation_id = :generation_id AND status = 'building')
+    """
+# A rebuild that has written nothing for :stale_minutes is taken to have died
+STALE_BUILD_CONDITION = (
+    "status = 'building' "
+    "AND COALESCE(updated_at, created_at) < SYSTIMESTAMP - NUMTODSINTERVAL(:stale_minutes, 'MINUTE')"
+)
+RETIRE_STALE_BUILDS_SQL = f"UPDATE corpus_generations SET status = 'retired' WHERE {STALE_BUILD_CONDITION}"
+APPEND_CHECK_SQL = f"""
+    SELECT (SELECT status FROM corpus_generations WHERE generation_id = :generation_id),
+           (SELECT MIN(generation_id) FROM corpus_generations
+             WHERE status = 'building' AND NOT ({STALE_BUILD_CONDITION}))
+      FROM dual
+    """
+GENERATIONS_SQL = """
+    SELECT g.generation_id, g.status, g.created_at, g.activated_at,
+           (SELECT COUNT(*) FROM documentation_staging ds WHERE ds.generation_id = g.generation_id)
+      FROM corpus_generations g
+     ORDER BY g.generation_id DESC
+    """
+# Counts for the active generation in one round trip; also the fingerprint services poll for corpus changes
+CORPUS_STATS_SQL = """
+    SELECT g.generation_id,
+           (SELECT COUNT(*) FROM documentation_staging ds WHERE ds.generation_id = g.generation_id),
+           (SELECT COUNT(DISTINCT dc.doc_id) FROM doc_chunks dc WHERE dc.generation_id = g.generation_id),
+           (SELECT COUNT(*) FROM doc_chunks dc WHERE dc.generation_id = g.generation_id)
+      FROM corpus_generations g
+     WHERE g.status = 'active'
+    """
+# The active corpus version answer caches are scoped by: a rebuild changes the generation, an
+# ingestion into the active generation its revision
+CORPUS_VERSION_SQL = "SELECT generation_id, revision FROM corpus_generations WHERE status = 'active'"
+TOUCH_GENERATION_SQL = """
+    UPDATE corpus_generations SET revision = revision + 1, updated_at = SYSTIMESTAMP
+     WHERE generation_id = :generation_id
+    """
+# Child rows first, a bounded number per statement
+COLLECT_GENERATION_SQL = (
+    "DELETE FROM doc_chunks WHERE generation_id = :generation_id AND ROWNUM <= :batch_rows",
+    """
+    DELETE FROM documentation_tab
+     WHERE id IN (SELECT id FROM documentation_staging WHERE generation_id = :generation_id)
+       AND ROWNUM <= :batch_rows
+    """,
+    "DELETE FROM documentation_staging WHERE generation_id = :generation_id AND ROWNUM <= :batch_rows",
+)
+
+_schema_ready = False
+_gc_lock = threading.Lock()
+_gc_thread = None
+
+
+class RebuildInProgressError(RuntimeError):
+    """Raised when documents would be appended to a generation a rebuild is about to replace."""
+
+
+def ensure_corpus_schema(cursor):
+    """
+    Creates the generations table and the generation_id columns on first use, once per process.
+    Existing documents become generation 1, which starts out active.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    for ddl in CORPUS_SCHEMA_DDL:
+        try:
+            cursor.execute(ddl)
+        except Exception as e:
+            code = getattr(e.args[0], "full_code", "") if e.args else ""
+            # ORA-00955: name already used; ORA-01408: column list already indexed; ORA-01430: column exists
+            if code not in ("ORA-00955", "ORA-01408", "ORA-01430"):
+                raise
+    cursor.execute(SEED_GENERATION_SQL)
+    cursor.connection.commit()
+    _schema_ready = True
+
+def corpus_schema_exists():
+    """
+    Whether the generations table and columns retrieval relies on are all in place, without
+    changing anything; None when the database cannot be reached.
+    """
+    try:
+        with db_connection() as conn:
+            if not conn:
+                return None
+            with conn.cursor() as cursor:
+                cursor.execute(CORPUS_SCHEMA_CHECK_SQL)
+                return cursor.fetchone()[0] == len(CORPUS_SCHEMA_COLUMNS)
+    except Exception as e:
+        print(f"Corpus schema check failed: {e}")
+        return None
+
+def get_active_generation(cursor) -> int:
+    cursor.execute("SELECT generation_id FROM corpus_generations WHERE status = 'active'")
+    row = cursor.fetchone()
+    return int(row[0]) if row else 1
+
+def begin_generation(cursor) -> int:
+    """
+    Registers a new generation for a rebuild and returns its id; it stays invisible to retrieval
+    until activated. Waits for append batches in flight to commit first, so none lands after it.
+    """
+    cursor.execute(LOCK_ACTIVE_GENERATION_SQL)
+    cursor.fetchall()
+    generation_id = cursor.var(int)
+    cursor.execute(NEW_GENERATION_SQL, {'generation_id': generation_id})
+    return int(generation_id.getvalue()[0])
+
+def activate_generation(cursor, generation_id: int):
+    """
+    Makes generation_id the active generation and retires the previous one, in one statement.
+    Raises RuntimeError if the generation is no longer being built (e.g. it was collected as
+    stale). The caller commits.
+    """
+    cursor.execute(ACTIVATE_GENERATION_SQL, {'generation_id': generation_id})
+    if not cursor.rowcount:
+        raise RuntimeError(f"Corpus generation {generation_id} is no longer being built and cannot be activated")
+
+def retire_generation(cursor, generation_id: int):
+    """Abandons a generation (e.g. a failed rebuild) so it is garbage-collected. The caller commits."""
+    cursor.execute(
+        "UPDATE corpus_generations SET status = 'retired' WHERE generation_id = :generation_id AND status = 'building'",
+        {'generation_id': generation_id},
+    )
+
+def touch_generation(cursor, generation_id: int):
+    """
+    Records that documents were added to or changed in a generation, which also keeps a rebuild
+    from being collected as stale. The caller commits, with the documents.
+    """
+    cursor.execute(TOUCH_GENERATION_SQL, {'generation_id': generation_id})
+
+def check_append(cursor, generation_id: int, stale_minutes: int = CORPUS_STALE_BUILD_MINUTES):
+    """
+    Raises RebuildInProgressError if a rebuild is running, or if generation_id is no longer the
+    active generation, so documents appended to it would be lost. Called after touch_generation
+    in the same transaction, the active row's lock orders it against begin_generation.
+    """
+    cursor.execute(APPEND_CHECK_SQL, {'generation_id': generation_id, 'stale_minutes': stale_minutes})
+    status, building = cursor.fetchone()
+    if building is not None:
+        raise RebuildInProgressError(
+            f"The knowledge base is being rebuilt (generation {building}); documents can be added once it is activated"
+        )
+    if status not in (None, "active"):
+        raise RebuildInProgressError(f"Corpus generation {generation_id} was replaced by a rebuild")
+
+def read_corpus_version():
+    """Returns the active generation's (generation_id, revision); None without a connection or an active generation."""
+    with db_connection() as conn:
+        if not conn:
+            return None
+        with conn.cursor() as cursor:
+            cursor.execute(CORPUS_VERSION_SQL)
+            row = cursor.fetchone()
+    return (int(row[0]), int(row[1])) if row else None
+
+def get_generations():
+    """Returns generations newest first as dicts with id, status, timestamps and document count; None without a connection."""
+    with db_connection() as conn:
+        if not conn:
+            return None
+        with conn.cursor() as cursor:
+            cursor.execute(GENERATIONS_SQL)
+            return [
+                {"generation_id": generation_id, "status": status, "created_at": created_at,
+                 "activated_at": activated_at, "documents": documents}
+                for generation_id, status, created_at, activated_at, documents in cursor
+            ]
+
+def get_corpus_stats():
+    """
+    Returns the active generation's id and its document, processed-document and chunk counts
+    as a dict (zeros before anything is ingested); None without a connection.
+    """
+    with db_connection() as conn:
+        if not conn:
+            return None
+        with conn.cursor() as cursor:
+            cursor.execute(CORPUS_STATS_SQL)
+            row = cursor.fetchone()
+    generation_id, documents, processed_documents, chunks = row or (None, 0, 0, 0)
+    return {"generation_id": generation_id, "documents": documents,
+            "processed_documents": processed_documents, "chunks": chunks}
+
+def collect_generation(generation_id: int, batch_rows: int = CORPUS_GC_BATCH_ROWS) -> int:
+    """Deletes a retired generation's rows in short transactions; returns the number of rows deleted."""
+    deleted = 0
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed.")
+        with conn.cursor() as cursor:
+            binds = {'generation_id': generation_id, 'batch_rows': batch_rows}
+            for sql in COLLECT_GENERATION_SQL:
+                while True:
+                    cursor.execute(sql, binds)
+                    conn.commit()
+                    deleted += cursor.rowcount
+                    if cursor.rowcount < batch_rows:
+                        break
+            cursor.execute(
+                "DELETE FROM corpus_generations WHERE generation_id = :generation_id AND status = 'retired'",
+                {'generation_id': generation_id},
+            )
+            conn.commit()
+    return deleted
+
+def collect_retired_generations(background: bool = True, stale_minutes: int = CORPUS_STALE_BUILD_MINUTES):
+    """
+    Garbage-collects every retired generation, and every rebuild that has written nothing for
+    stale_minutes (retired first, so it can no longer be activated), on a background thread by default.
+    Only one collector runs per process; returns the thread, or None when one is already running.
+    """
+    global _gc_thread
+
+    def run():
+        try:
+            with db_connection() as conn:
+                if not conn:
+                    return
+                with conn.cursor() as cursor:
+                    cursor.execute(RETIRE_STALE_BUILDS_SQL, {'stale_minutes': stale_minutes})
+                    if cursor.rowcount:
+                        print(f"Abandoned {cursor.rowcount} corpus rebuild(s) idle for over {stale_minutes} minutes")
+                    conn.commit()
+                    cursor.execute("SELECT generation_id FROM corpus_generations WHERE status = 'retired'")
+                    retired = [row[0] for row in cursor.fetchall()]
+            for generation_id in retired:
+                deleted = collect_generation(generation_id)
+                print(f"Collected corpus generation {generation_id} ({deleted} rows)")
+        except Exception as e:
+            print(f"Corpus generation garbage collection failed: {e}")
+
+    with _gc_lock:
+        if _gc_thread is not None and _gc_thread.is_alive():
+            return None
+        if not background:
+            run()
+            return None
+        _gc_thread = threading.Thread(target=run, name="corpus-gc", daemon=True)
+        _gc_thread.start()
+        return _gc_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("migrate", "collect", "list"))
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        # Ingestion's schema includes the corpus schema; imported here as core.ingestion imports this module
+        from core.ingestion import ensure_ingestion_schema
+        with db_connection() as conn:
+            if not conn:
+                parser.exit(1, "Database connection failed.\n")
+            with conn.cursor() as cursor:
+                ensure_ingestion_schema(cursor)
+            conn.commit()
+        print("Corpus schema is up to date")
+    elif args.command == "collect":
+        collect_retired_generations(background=False)
+    else:
+        generations = get_generations()
+        if generations is None:
+            parser.exit(1, "Database connection failed.\n")
+        for generation in generations:
+            print(f"{generation['generation_id']:>6} {generation['status']:<9} {generation['documents']:>7} documents  "
+                  f"created {generation['created_at']}")
+
+
+if __name__ == "__main__":
+    main()
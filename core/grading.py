@@ -0,0 +1,38 @@
+from config import (
+    GRADE_ACCEPT_DISTANCE,
+    GRADE_REJECT_DISTANCE,
+    GRADE_COVERAGE_DISTANCE,
+    GRADE_MIN_COVERAGE,
+    GRADE_MIN_GAP,
+)
+
+RELEVANT, IRRELEVANT, AMBIGUOUS = "relevant", "irrelevant", "ambiguous"
+
+def distance_features(distances) -> dict:
+    """
+    Summarizes the distance distribution of retrieved chunks:
+    top1 (best distance), gap (how far the best chunk stands out from the median)
+    and coverage (share of chunks within GRADE_COVERAGE_DISTANCE).
+    """
+    ordered = sorted(distances)
+    if not ordered:
+        return {"top1": None, "gap": 0.0, "coverage": 0.0}
+    median = ordered[len(ordered) // 2]
+    close = sum(1 for d in ordered if d <= GRADE_COVERAGE_DISTANCE)
+    return {"top1": ordered[0], "gap": median - ordered[0], "coverage": close / len(ordered)}
+
+def score_relevance(distances):
+    """
+    Decides relevance from vector distances alone.
+    Returns (decision, features) where decision is RELEVANT, IRRELEVANT or AMBIGUOUS.
+    """
+    features = distance_features(distances)
+    top1 = features["top1"]
+    if top1 is None or top1 >= GRADE_REJECT_DISTANCE:
+        return IRRELEVANT, features
+    if top1 <= GRADE_ACCEPT_DISTANCE and features["coverage"] >= GRADE_MIN_COVERAGE:
+        return RELEVANT, features
+    # A single chunk that clearly stands out from the rest is a specific match
+    if top1 <= GRADE_COVERAGE_DISTANCE and features["gap"] >= GRADE_MIN_GAP:
+        return RELEVANT, features
+    return AMBIGUOUS, features
@@ -1,11 +1,19 @@
+import threading
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
 from core.state import RAGState
+from core.telemetry import span, traced_node
 from core.nodes import (
     rewrite_question,
     retrieve_context,
+    retrieve_candidates,
+    rerank_context,
     generate_answer,
     grade_context,
+    escalate_retrieval,
     classify_intent,
+    lookup_answer_cache,
+    store_answer_cache,
     handle_greeting,
     handle_give_up,
     deconstruct_query,
@@ -14,64 +22,215 @@ from core.nodes import (
     run_summarization,
     run_training_generation,
 )
+from core.async_nodes import (
+    arewrite_question,
+    aretrieve_context,
+    aretrieve_candidates,
+    arerank_context,
+    agenerate_answer,
+    agrade_context,
+    aescalate_retrieval,
+    aclassify_intent,
+    alookup_answer_cache,
+    astore_answer_cache,
+    ahandle_greeting,
+    ahandle_give_up,
+    adeconstruct_query,
+    aretrieve_for_comparison,
+    asynthesize_comparison,
+    arun_summarization,
+    arun_training_generation,
+)
+
+# Registered graph variants and the options they are built with
+GRAPH_VARIANTS = {
+    "default": {"grading": True},
+    "no_grading": {"grading": False},
+    "rerank": {"grading": True, "rerank": True},
+    "rerank_no_grading": {"grading": False, "rerank": True},
+}
+
+_compiled_graphs = {}
+_graphs_lock = threading.Lock()
+
+def route_by_intent(state):
+    """Routes a classified question to its workflow."""
+    return state["intent"]
+
+def route_after_cache(state):
+    """Ends the turn on a cache hit; otherwise continues with the intent's retrieval step."""
+    if state.get("cache_hit"):
+        return "hit"
+    return "comparison" if state["intent"] == "comparison" else "retrieve"
+
+def route_after_escalation(state):
+    """Retrieves again with the escalated strategy, or gives up when none is left."""
+    return "give_up" if state.get("retrieval_exhausted") else "retrieve"
+
+def _route_after_retrieval(grading: bool):
+    def settled(state):
+        intent = state.get("intent")
+        if intent == "summarization":
+            return "summarize"
+        if intent == "training_generation":
+            return "train"
+        if not grading:
+            return "generate"
+        return None
+
+    def route(state):
+        decision = settled(state)
+        if decision is not None:
+            return decision
+        # Grading runs as a routing function, not a node, so it gets its own span
+        with span("grade_context", **{"rag.node": "grade_context"}) as grading_span:
+            decision = grade_context(state)
+            grading_span.set("rag.decision", decision)
+        return decision
 
-def create_rag_graph():
+    async def aroute(state):
+        decision = settled(state)
+        if decision is not None:
+            return decision
+        with span("grade_context", **{"rag.node": "grade_context"}) as grading_span:
+            decision = await agrade_context(state)
+            grading_span.set("rag.decision", decision)
+        return decision
+
+    return RunnableLambda(route, afunc=aroute, name="route_after_retrieval")
+
+def _add_node(workflow, name: str, node, anode=None):
+    """
+    Adds a node wrapped in a telemetry span named after it. With anode, its async
+    counterpart, the same compiled graph runs the sync node under stream/invoke
+    and the async one under astream/ainvoke.
+    """
+    if anode is None:
+        workflow.add_node(name, traced_node(name, node))
+    else:
+        workflow.add_node(name, RunnableLambda(traced_node(name, node), afunc=traced_node(name, anode), name=name))
+
+def create_rag_graph(grading: bool = True, rerank: bool = False):
     """
     Creates and compiles the LangGraph workflow for the RAG application.
+    With grading disabled, retrieved context goes straight to answer generation.
+    With rerank enabled, retrieval over-retrieves candidates and a cross-encoder
+    picks the chunks that are packed into the context.
     """
     workflow = StateGraph(RAGState)
 
     # Add nodes to the graph
-    workflow.add_node("rewrite_question", rewrite_question)
-    workflow.add_node("retrieve_context", retrieve_context)
-    workflow.add_node("generate_answer", generate_answer)
-    workflow.add_node("handle_greeting", handle_greeting)
-    workflow.add_node("handle_give_up", handle_give_up)
-    workflow.add_node("deconstruct_query", deconstruct_query)
-    workflow.add_node("retrieve_for_comparison", retrieve_for_comparison)
-    workflow.add_node("synthesize_comparison", synthesize_comparison)
-    workflow.add_node("run_summarization", run_summarization)
-    workflow.add_node("run_training_generation", run_training_generation)
+    _add_node(workflow, "classify_intent", classify_intent, aclassify_intent)
+    _add_node(workflow, "rewrite_question", rewrite_question, arewrite_question)
+    _add_node(workflow, "lookup_answer_cache", lookup_answer_cache, alookup_answer_cache)
+    if rerank:
+        _add_node(workflow, "retrieve_candidates", retrieve_candidates, aretrieve_candidates)
+        _add_node(workflow, "rerank_context", rerank_context, arerank_context)
+        workflow.add_edge("retrieve_candidates", "rerank_context")
+        retrieval_node, context_node = "retrieve_candidates", "rerank_context"
+    else:
+        _add_node(workflow, "retrieve_context", retrieve_context, aretrieve_context)
+        retrieval_node = context_node = "retrieve_context"
+    _add_node(workflow, "generate_answer", generate_answer, agenerate_answer)
+    _add_node(workflow, "handle_greeting", handle_greeting, ahandle_greeting)
+    _add_node(workflow, "escalate_retrieval", escalate_retrieval, aescalate_retrieval)
+    _add_node(workflow, "handle_give_up", handle_give_up, ahandle_give_up)
+    _add_node(workflow, "deconstruct_query", deconstruct_query, adeconstruct_query)
+    _add_node(workflow, "retrieve_for_comparison", retrieve_for_comparison, aretrieve_for_comparison)
+    _add_node(workflow, "synthesize_comparison", synthesize_comparison, asynthesize_comparison)
+    _add_node(workflow, "run_summarization", run_summarization, arun_summarization)
+    _add_node(workflow, "run_training_generation", run_training_generation, arun_training_generation)
+    _add_node(workflow, "store_answer_cache", store_answer_cache, astore_answer_cache)
 
 
     # Set the entry point
-    workflow.set_conditional_entry_point(
-        classify_intent,
+    workflow.set_entry_point("classify_intent")
+    workflow.add_conditional_edges(
+        "classify_intent",
+        route_by_intent,
         {
             "greeting": "handle_greeting",
             "rag_query": "rewrite_question",
-            "comparison": "deconstruct_query",
-            "summarization": "retrieve_context",
-            "training_generation": "retrieve_context",
+            "comparison": "lookup_answer_cache",
+            "summarization": "lookup_answer_cache",
+            "training_generation": "lookup_answer_cache",
         },
     )
 
-    # Add edges for the general RAG workflow
-    workflow.add_edge("rewrite_question", "retrieve_context")
+    # Answer cache sits in front of retrieval, keyed on the standalone question
+    workflow.add_edge("rewrite_question", "lookup_answer_cache")
     workflow.add_conditional_edges(
-        "retrieve_context",
-        grade_context,
+        "lookup_answer_cache",
+        route_after_cache,
         {
-            "generate": "generate_answer",
-            "rewrite": "rewrite_question",
-            "give_up": "handle_give_up",
+            "hit": END,
+            "retrieve": retrieval_node,
+            "comparison": "deconstruct_query",
         },
     )
+
+    # Add edges for the general RAG workflow
+    retrieval_routes = {
+        "generate": "generate_answer",
+        "summarize": "run_summarization",
+        "train": "run_training_generation",
+    }
+    if grading:
+        retrieval_routes.update({"retry": "escalate_retrieval", "give_up": "handle_give_up"})
+    workflow.add_conditional_edges(context_node, _route_after_retrieval(grading), retrieval_routes)
+
+    # Irrelevant context escalates to the next retrieval strategy instead of repeating the same search
+    if grading:
+        workflow.add_conditional_edges(
+            "escalate_retrieval",
+            route_after_escalation,
+            {"retrieve": retrieval_node, "give_up": "handle_give_up"},
+        )
     
     # Add edges for the comparison workflow
     workflow.add_edge("deconstruct_query", "retrieve_for_comparison")
     workflow.add_edge("retrieve_for_comparison", "synthesize_comparison")
-    workflow.add_edge("synthesize_comparison", END)
-
-    # Add edges for summarization and training generation
-    workflow.add_edge("run_summarization", END)
-    workflow.add_edge("run_training_generation", END)
 
+    # Freshly generated answers are cached before the turn ends
+    workflow.add_edge("synthesize_comparison", "store_answer_cache")
+    workflow.add_edge("run_summarization", "store_answer_cache")
+    workflow.add_edge("run_training_generation", "store_answer_cache")
+    workflow.add_edge("generate_answer", "store_answer_cache")
+    workflow.add_edge("store_answer_cache", END)
 
-    workflow.add_edge("generate_answer", END)
     workflow.add_edge("handle_greeting", END)
     workflow.add_edge("handle_give_up", END)
 
     # Compile the graph
     app = workflow.compile()
     return app
+
+def register_graph_variant(name: str, **options):
+    """
+    Registers (or replaces) a named graph variant built with the given create_rag_graph options.
+    """
+    with _graphs_lock:
+        GRAPH_VARIANTS[name] = options
+        _compiled_graphs.pop(name, None)
+
+def get_rag_graph(variant: str = "default"):
+    """
+    Returns the compiled graph for a variant, compiling it at most once per process.
+    Compiled graphs are stateless between invocations and safe to share across requests.
+    """
+    graph = _compiled_graphs.get(variant)
+    if graph is not None:
+        return graph
+    with _graphs_lock:
+        if variant not in _compiled_graphs:
+            if variant not in GRAPH_VARIANTS:
+                raise KeyError(f"Unknown graph variant '{variant}'. Registered: {', '.join(GRAPH_VARIANTS)}")
+            _compiled_graphs[variant] = create_rag_graph(**GRAPH_VARIANTS[variant])
+        return _compiled_graphs[variant]
+
+def warm_up_graphs(variants=None):
+    """
+    Compiles the given variants (all registered ones by default) ahead of the first request.
+    """
+    for variant in variants or list(GRAPH_VARIANTS):
+        get_rag_graph(variant)
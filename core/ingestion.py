@@ -0,0 +1,806 @@
+"""
+Document ingestion pipeline: parse -> chunk -> embed -> bulk insert into doc_chunks.
+
+Files move through concurrent stages joined by bounded queues: worker processes parse and
+chunk, I/O threads upload, and a single writer embeds and inserts. Re-ingesting a changed file
+under the same name creates a new version of the document that re-embeds only its changed chunks.
+Chunks are embedded by the in-database ALL_MINILM_L12_V2 model (the model used for query
+embeddings) as part of an executemany insert, so each batch costs one round trip and one commit.
+
+Headless usage (from the repository root, with the database configured in .env):
+    python -m core.ingestion reports/*.pdf --batch-size 64
+    python -m core.ingestion reports/ --fresh --upload --parse-workers 8
+"""
+import argparse
+import hashlib
+import html
+import io
+import json
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import oracledb
+from core.generations import (
+    activate_generation,
+    begin_generation,
+    check_append,
+    collect_retired_generations,
+    ensure_corpus_schema,
+    get_active_generation,
+    RebuildInProgressError,
+    retire_generation,
+    touch_generation,
+)
+from core.object_storage import LocalObjectStore, OCIObjectStore, upload_stream
+from core.utils import db_connection
+from config import (
+    ALLOWED_EXTENSIONS,
+    MAX_FILE_SIZE,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    INGEST_BATCH_SIZE,
+    INGEST_PARSE_WORKERS,
+    INGEST_UPLOAD_WORKERS,
+    INGEST_QUEUE_SIZE,
+)
+
+# Formats without a Python parser are converted to text in the database from the stored file
+DATABASE_PARSED_EXTENSIONS = {"doc", "ppt"}
+
+STAGE_DOCUMENT_SQL = """
+    INSERT INTO documentation_staging (filename, file_hash, generation_id) VALUES (:fn, :fh, :generation_id)
+    RETURNING id INTO :doc_id
+    """
+STORE_DOCUMENT_SQL = "INSERT INTO documentation_tab (id, data) VALUES (:doc_id, :data)"
+UPDATE_DOCUMENT_SQL = """
+    UPDATE documentation_staging SET file_hash = :fh, version = version + 1 WHERE id = :doc_id
+    RETURNING version INTO :version
+    """
+REPLACE_DOCUMENT_SQL = "UPDATE documentation_tab SET data = :data WHERE id = :doc_id"
+DOCUMENT_CHUNKS_SQL = "SELECT chunk_id, chunk_hash FROM doc_chunks WHERE doc_id = :doc_id"
+DELETE_CHUNK_SQL = "DELETE FROM doc_chunks WHERE doc_id = :doc_id AND chunk_id = :chunk_id"
+DATABASE_TEXT_SQL = "SELECT DBMS_VECTOR_CHAIN.UTL_TO_TEXT(data) FROM documentation_tab WHERE id = :doc_id"
+FIND_EXISTING_SQL = """
+    SELECT id, filename, file_hash FROM documentation_staging
+     WHERE generation_id = :generation_id AND filename IN ({names})
+    UNION
+    SELECT id, filename, file_hash FROM documentation_staging
+     WHERE generation_id = :generation_id AND file_hash IN ({hashes})
+    """
+# Columns and indexes incremental ingestion relies on, added to older schemas on first use
+INGESTION_SCHEMA_DDL = (
+    "ALTER TABLE documentation_staging ADD (version NUMBER DEFAULT 1 NOT NULL)",
+    "ALTER TABLE doc_chunks ADD (chunk_hash VARCHAR2(64))",
+    "CREATE UNIQUE INDEX doc_staging_gen_hash_uk ON documentation_staging (generation_id, file_hash)",
+    "CREATE INDEX doc_staging_filename_idx ON documentation_staging (filename)",
+    "CREATE INDEX doc_chunks_doc_idx ON doc_chunks (doc_id, chunk_id)",
+)
+# Content is unique within a generation; a rebuild stores the same files again in the next one,
+# so the older schema's index on the hash alone is dropped if it is still there
+LEGACY_HASH_INDEX_SQL = "SELECT COUNT(*) FROM user_indexes WHERE index_name = 'DOC_STAGING_HASH_UK'"
+DROP_LEGACY_HASH_INDEX_SQL = "DROP INDEX doc_staging_hash_uk"
+INSERT_CHUNK_SQL = """
+    INSERT INTO doc_chunks (doc_id, chunk_id, chunk_data, chunk_hash, generation_id, chunk_embedding)
+    VALUES (:doc_id, :chunk_id, :chunk_data, :chunk_hash, :generation_id,
+            VECTOR_EMBEDDING(ALL_MINILM_L12_V2 USING :chunk_data AS DATA))
+    """
+
+
+_schema_ready = False
+# Parse workers start from a fresh interpreter: forking the Streamlit process would copy its
+# threads' locks in whatever state they happen to be in
+_PARSE_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class UnsupportedDocumentError(ValueError):
+    """Raised when a file type cannot be parsed."""
+
+
+def clean_filename(name):
+    """Clean and standardize filename"""
+    name = re.sub(r'[^\w\-.]', '_', name)
+    if len(name) > 100:
+        name = name[:95] + name[-5:]
+    return name
+
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def file_extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ""
+
+def find_existing(cursor, filenames, filehashes, generation_id: int):
+    """
+    Looks up a batch of names and content hashes within a corpus generation in one round trip.
+    Returns ({filename: doc_id}
+    for names already ingested, set of content hashes already ingested). Each side of the UNION
+    can use its own index, unlike an OR across both columns.
+    """
+    filenames, filehashes = list(filenames), list(filehashes)
+    existing_names, existing_hashes = {}, set()
+    # Oracle allows at most 1000 expressions in an IN list
+    for start in range(0, max(len(filenames), len(filehashes)), 1000):
+        names, hashes = filenames[start:start + 1000] or [None], filehashes[start:start + 1000] or [None]
+        binds = {"generation_id": generation_id}
+        binds.update({f"fn{i}": name for i, name in enumerate(names)})
+        binds.update({f"fh{i}": filehash for i, filehash in enumerate(hashes)})
+        cursor.execute(FIND_EXISTING_SQL.format(
+            names=", ".join(f":fn{i}" for i in range(len(names))),
+            hashes=", ".join(f":fh{i}" for i in range(len(hashes))),
+        ), binds)
+        for doc_id, filename, filehash in cursor:
+            existing_names[filename] = doc_id
+            existing_hashes.add(filehash)
+    wanted_names = set(filenames)
+    return ({name: doc_id for name, doc_id in existing_names.items() if name in wanted_names},
+            existing_hashes & set(filehashes))
+
+def ensure_ingestion_schema(cursor):
+    """
+    Adds the document version and chunk hash columns and the indexes ingestion relies on, once
+    per process. The unique hash index makes concurrent ingesters that both pass the duplicate
+    lookup fail with ORA-00001 instead of storing the same content twice; it is skipped with a
+    warning while duplicates already exist.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    ensure_corpus_schema(cursor)
+    cursor.execute(LEGACY_HASH_INDEX_SQL)
+    if cursor.fetchone()[0]:
+        cursor.execute(DROP_LEGACY_HASH_INDEX_SQL)
+    for ddl in INGESTION_SCHEMA_DDL:
+        try:
+            cursor.execute(ddl)
+        except Exception as e:
+            code = getattr(e.args[0], "full_code", "") if e.args else ""
+            # ORA-00955: name already used; ORA-01408: column list already indexed; ORA-01430: column exists
+            if code == "ORA-01452":
+                print(f"Unique file hash index not created, documentation_staging has duplicate hashes: {e}")
+            elif code not in ("ORA-00955", "ORA-01408", "ORA-01430"):
+                raise
+    _schema_ready = True
+
+def is_unique_violation(error) -> bool:
+    """True for ORA-00001, a concurrent ingester having stored the same file first."""
+    code = getattr(error.args[0], "full_code", "") if error.args else ""
+    return code == "ORA-00001"
+
+# --- Parsing ---
+
+def _xml_text(xml: str, paragraph_tag: str) -> str:
+    xml = re.sub(rf"</{paragraph_tag}>", "\n", xml)
+    return html.unescape(re.sub(r"<[^>]+>", "", xml))
+
+def _parse_pdf(data):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(data))
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+def _parse_table(data, extension):
+    import pandas as pd
+    if extension == "csv":
+        sheets = {"": pd.read_csv(io.BytesIO(data))}
+    else:
+        sheets = pd.read_excel(io.BytesIO(data), sheet_name=None, engine="xlrd" if extension == "xls" else None)
+    parts = []
+    for name, frame in sheets.items():
+        header = f"Sheet: {name}\n" if name else ""
+        parts.append(header + frame.to_csv(index=False))
+    return "\n\n".join(parts)
+
+def _parse_docx(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return _xml_text(archive.read("word/document.xml").decode("utf-8"), "w:p")
+
+def _parse_pptx(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        slides = sorted(
+            (name for name in archive.namelist() if re.fullmatch(r"ppt/slides/slide\d+\.xml", name)),
+            key=lambda name: int(re.search(r"(\d+)\.xml$", name).group(1)),
+        )
+        return "\n\n".join(_xml_text(archive.read(name).decode("utf-8"), "a:p") for name in slides)
+
+def _parse_html(data):
+    text = data.decode("utf-8", errors="replace")
+    text = re.sub(r"(?is)<(script|style)[^>]*>.*?</\1>", " ", text)
+    text = re.sub(r"(?i)<(br|/p|/div|/li|/h[1-6]|/tr)[^>]*>", "\n", text)
+    return html.unescape(re.sub(r"<[^>]+>", " ", text))
+
+def _parse_json(data):
+    return json.dumps(json.loads(data.decode("utf-8")), indent=1, ensure_ascii=False)
+
+def parse_document(filename: str, data: bytes) -> str:
+    """
+    Extracts plain text from a file's bytes based on its extension.
+    Raises UnsupportedDocumentError for formats that need the database to parse them.
+    """
+    extension = file_extension(filename)
+    if extension == "pdf":
+        return _parse_pdf(data)
+    if extension in ("csv", "xls", "xlsx"):
+        return _parse_table(data, extension)
+    if extension == "docx":
+        return _parse_docx(data)
+    if extension == "pptx":
+        return _parse_pptx(data)
+    if extension == "html":
+        return _parse_html(data)
+    if extension == "json":
+        return _parse_json(data)
+    if extension in ("txt", "md"):
+        return data.decode("utf-8", errors="replace")
+    raise UnsupportedDocumentError(f"No parser for '.{extension}' files")
+
+# --- Chunking ---
+
+def normalize_whitespace(text: str) -> str:
+    """Collapses spaces within lines and keeps at most one blank line between paragraphs."""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+# Splits text after paragraphs, lines and sentences, keeping the separator that preceded each piece
+_UNIT_SEPARATOR_RE = re.compile(r"(\n\n|\n|(?<=[.!?]) )")
+
+def _text_units(text: str, max_length: int):
+    """(separator, piece) pairs of paragraphs, lines and sentences; pieces longer than max_length are split at spaces."""
+    parts = _UNIT_SEPARATOR_RE.split(text)
+    units = []
+    for separator, piece in zip([""] + parts[1::2], parts[0::2]):
+        while len(piece) > max_length:
+            cut = piece.rfind(" ", max_length // 2, max_length)
+            cut = max_length if cut == -1 else cut
+            units.append((separator, piece[:cut]))
+            separator, piece = " ", piece[cut:].lstrip()
+        if piece:
+            units.append((separator, piece))
+    return units
+
+def _is_anchor(unit: str) -> bool:
+    # About one sentence in four ends a chunk once it is half full, decided by content alone
+    return zlib.crc32(unit.encode("utf-8")) % 4 == 0
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+    """
+    Splits text into chunks of at most chunk_size characters, each starting with up to overlap
+    characters from the end of the previous one.
+
+    Chunks are built from whole paragraphs, lines and sentences and end where a sentence's
+    content says so (or when the next one would not fit), not at fixed offsets. An edit
+    therefore changes only the chunks around it, and the rest keep their text and hash
+    when a document is re-ingested.
+    """
+    if overlap >= chunk_size:
+        raise ValueError("CHUNK_OVERLAP must be smaller than CHUNK_SIZE")
+    # Room for the overlap and the separator joining it to the chunk
+    body = max(1, chunk_size - overlap - 2)
+    groups, current, length = [], [], 0
+    for separator, unit in _text_units(normalize_whitespace(text), body):
+        added = len(unit) + (len(separator) if current else 0)
+        if current and length + added > body:
+            groups.append(current)
+            current, length, added = [], 0, len(unit)
+        current.append((separator, unit))
+        length += added
+        if length >= body // 2 and _is_anchor(unit):
+            groups.append(current)
+            current, length = [], 0
+    if current:
+        groups.append(current)
+
+    chunks, previous = [], ""
+    for group in groups:
+        chunk = group[0][1] + "".join(separator + unit for separator, unit in group[1:])
+        if overlap and previous:
+            tail = previous[-overlap:]
+            # Start the overlap on a word boundary
+            space = tail.find(" ")
+            tail = tail[space + 1:] if space != -1 and len(previous) > overlap else tail
+            chunks.append((tail + (group[0][0] or " ") + chunk).strip())
+        else:
+            chunks.append(chunk.strip())
+        previous = chunk
+    return [chunk for chunk in chunks if chunk]
+
+# --- Database writes ---
+
+def stage_document(cursor, filename: str, filehash: str, data: bytes, generation_id: int) -> int:
+    """Inserts the staging row and the stored file into a corpus generation; returns the new document id."""
+    doc_id = cursor.var(oracledb.DB_TYPE_NUMBER)
+    cursor.execute(STAGE_DOCUMENT_SQL, {'fn': filename, 'fh': filehash, 'generation_id': generation_id, 'doc_id': doc_id})
+    doc_id = int(doc_id.getvalue()[0])
+    blob = cursor.var(oracledb.DB_TYPE_BLOB)
+    blob.setvalue(0, data)
+    cursor.execute(STORE_DOCUMENT_SQL, {'doc_id': doc_id, 'data': blob})
+    return doc_id
+
+def update_document(cursor, doc_id: int, filehash: str, data: bytes) -> int:
+    """Replaces a document's stored file and hash and bumps its version; returns the new version."""
+    version = cursor.var(oracledb.DB_TYPE_NUMBER)
+    cursor.execute(UPDATE_DOCUMENT_SQL, {'fh': filehash, 'doc_id': doc_id, 'version': version})
+    blob = cursor.var(oracledb.DB_TYPE_BLOB)
+    blob.setvalue(0, data)
+    cursor.execute(REPLACE_DOCUMENT_SQL, {'doc_id': doc_id, 'data': blob})
+    return int(version.getvalue()[0])
+
+def chunk_hash(text: str) -> str:
+    """SHA-256 of a chunk's text; chunks with the same hash share an embedding."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def diff_chunks(cursor, doc_id: int, chunks):
+    """
+    Compares a document's new chunks with the stored ones by content hash and deletes the stored
+    chunks that no longer occur. Unchanged chunks keep their rows, ids and embeddings; returns
+    (rows to embed and insert as (doc_id, chunk_id, chunk_data, chunk_hash), reused, removed).
+    New chunks get ids after the highest existing one.
+    """
+    cursor.execute(DOCUMENT_CHUNKS_SQL, {'doc_id': doc_id})
+    stored = {}
+    next_id = 1
+    for chunk_id, stored_hash in cursor.fetchall():
+        stored.setdefault(stored_hash, []).append(chunk_id)
+        next_id = max(next_id, chunk_id + 1)
+
+    rows, reused = [], 0
+    for chunk in chunks:
+        digest = chunk_hash(chunk)
+        if stored.get(digest):
+            stored[digest].pop()
+            reused += 1
+        else:
+            rows.append((doc_id, next_id, chunk, digest))
+            next_id += 1
+    # Rows ingested before chunk hashes were stored have a NULL hash and are always replaced
+    stale = [chunk_id for chunk_ids in stored.values() for chunk_id in chunk_ids]
+    if stale:
+        cursor.executemany(DELETE_CHUNK_SQL, [{'doc_id': doc_id, 'chunk_id': chunk_id} for chunk_id in stale])
+    return rows, reused, len(stale)
+
+def database_text(cursor, doc_id: int) -> str:
+    """Converts a stored file to text with DBMS_VECTOR_CHAIN (for formats without a Python parser)."""
+    cursor.execute(DATABASE_TEXT_SQL, {'doc_id': doc_id})
+    row = cursor.fetchone()
+    text = row[0] if row else ""
+    return text.read() if hasattr(text, "read") else (text or "")
+
+def insert_chunks(cursor, rows, generation_id: int, batch_size: int = INGEST_BATCH_SIZE):
+    """
+    Embeds and inserts (doc_id, chunk_id, chunk_data, chunk_hash) rows into a corpus generation
+    with array binds, batch_size rows per round trip.
+    """
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        # Text over the 4000-byte VARCHAR2 limit has to be bound as a CLOB
+        if any(len(chunk_data.encode("utf-8")) > 4000 for _, _, chunk_data, _ in batch):
+            cursor.setinputsizes(chunk_data=oracledb.DB_TYPE_CLOB)
+        cursor.executemany(INSERT_CHUNK_SQL, [
+            {'doc_id': doc_id, 'chunk_id': chunk_id, 'chunk_data': chunk_data, 'chunk_hash': digest,
+             'generation_id': generation_id}
+            for doc_id, chunk_id, chunk_data, digest in batch
+        ])
+
+# --- Pipeline ---
+
+_DONE = object()
+
+def prepare_document(filename: str, data: bytes):
+    """
+    CPU-bound part of ingestion, run in a worker process: parses and chunks one file.
+    Returns (chunks, seconds); chunks is None for formats parsed in the database.
+    """
+    start = time.perf_counter()
+    chunks = None
+    if file_extension(filename) not in DATABASE_PARSED_EXTENSIONS:
+        chunks = chunk_text(parse_document(filename, data))
+        if not chunks:
+            raise ValueError("no text could be extracted")
+    return chunks, time.perf_counter() - start
+
+def _put(q, item, stop):
+    """Blocks while q is full (backpressure) unless the pipeline is stopping; returns False if it is."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _start_stage(inbox, outbox, work, workers, stop, name):
+    """
+    Starts worker threads that move items from inbox to outbox through work(item).
+    work must not raise: failures travel downstream on the item. The last worker to see the
+    end marker passes it on.
+    """
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def run():
+        while not stop.is_set():
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                _put(inbox, _DONE, stop)  # let the sibling workers see it too
+                break
+            if not _put(outbox, work(item), stop):
+                break
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            _put(outbox, _DONE, stop)
+
+    threads = [threading.Thread(target=run, name=f"ingest-{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def _new_stats():
+    return {"documents": 0, "updated": 0, "chunks": 0, "chunks_reused": 0, "chunks_removed": 0,
+            "skipped": 0, "failed": 0, "batches": 0, "bytes": 0, "generation": None, "activated": False,
+            "parse_seconds": 0.0, "upload_seconds": 0.0, "write_seconds": 0.0, "elapsed_seconds": 0.0}
+
+def _finish_stats(stats, started):
+    stats["elapsed_seconds"] = time.perf_counter() - started
+    elapsed = stats["elapsed_seconds"] or 1e-9
+    stats["docs_per_second"] = stats["documents"] / elapsed
+    stats["chunks_per_second"] = stats["chunks"] / elapsed
+    return stats
+
+def ingest_documents(documents, batch_size: int = INGEST_BATCH_SIZE, fresh: bool = False,
+                     store=None, progress=None, parse_workers: int = INGEST_PARSE_WORKERS,
+                     upload_workers: int = INGEST_UPLOAD_WORKERS, queue_size: int = INGEST_QUEUE_SIZE):
+    """
+    Ingests (filename, bytes) pairs through a pipeline of concurrent stages joined by bounded
+    queues, so reading, parsing, uploading and writing overlap and at most a few queues' worth
+    of files are held in memory:
+
+    0. dedup: files are hashed as they are read and, queue_size at a time, checked against
+       the files seen earlier in the run and the staging table (find_existing), so duplicates
+       are never parsed or uploaded.
+    1. parse: parse_workers processes parse and chunk files (prepare_document).
+    2. upload: with a store (an OCIObjectStore or LocalObjectStore), upload_workers threads
+       stream each file to Object Storage.
+    3. write: the calling thread writes staging rows and embedded chunks, grouping documents
+       until they hold at least batch_size chunks; each group is inserted with executemany
+       and committed once. A file whose name is already ingested with other content is a new
+       version of that document: only its new chunks are embedded and its stale ones deleted
+       (diff_chunks).
+
+    Files are written into the active corpus generation. With fresh, they go into a new
+    generation instead, which retrieval ignores until it is activated in one commit after the
+    last batch; the previous generation is then deleted in the background. A rebuild that
+    ingests nothing or fails is abandoned and the current corpus keeps being served. While a
+    rebuild runs, appending raises RebuildInProgressError (or fails the batches written
+    after it started), since the rebuild would drop the appended documents.
+
+    A file that fails in any stage is reported and dropped without stopping the others.
+    progress(filename, status, detail) is called on the calling thread as files are parsed,
+    uploading (per part), uploaded, skipped, queued for writing, written ("done") or fail ("failed").
+    Returns throughput stats (documents, updated, chunks embedded, chunks_reused, chunks_removed,
+    generation, activated, docs_per_second, chunks_per_second, ...).
+    """
+    stats = _new_stats()
+    started = time.perf_counter()
+    report = progress or (lambda filename, status, detail="": None)
+    events = queue.SimpleQueue()
+    stop = threading.Event()
+    dedup_batch = max(1, queue_size)
+
+    def parse(item):
+        try:
+            item["chunks"], seconds = parse_pool.submit(prepare_document, item["filename"], item["data"]).result()
+        except Exception as e:
+            item["error"] = f"Parsing failed: {e}"
+            return item
+        item["parse_seconds"] = seconds
+        events.put((item["filename"], "parsed", "" if item["chunks"] is None else f"{len(item['chunks'])} chunks"))
+        return item
+
+    def upload(item):
+        if "error" in item or store is None:
+            return item
+        filename, data = item["filename"], item["data"]
+
+        def uploaded_bytes(done, total):
+            events.put((filename, "uploading", f"{done / total:.0%} of {total / 1024**2:.1f} MB"))
+
+        start = time.perf_counter()
+        try:
+            result = upload_stream(store, filename, io.BytesIO(data), size=len(data), progress=uploaded_bytes,
+                                   sha256=item["hash"])
+        except Exception as e:
+            item["error"] = f"Upload failed: {e}"
+            return item
+        finally:
+            item["upload_seconds"] = time.perf_counter() - start
+        resumed = f", {result['resumed_parts']} of {result['parts']} parts resumed" if result["resumed_parts"] else ""
+        events.put((filename, "uploaded", f"{result['parts']} parts{resumed}"))
+        return item
+
+    seen_names, seen_hashes = set(), set()
+
+    def deduplicate(batch):
+        """
+        Drops files repeated in this run or whose content is already ingested, and marks files
+        whose name is already ingested with different content as updates, with one lookup per batch.
+        """
+        unique = []
+        for item in batch:
+            # Hashed once, here; the upload stage reuses the digest instead of hashing the file again
+            item["hash"] = hashlib.sha256(item["data"]).hexdigest()
+            if item["filename"] in seen_names or item["hash"] in seen_hashes:
+                events.put((item["filename"], "skipped", "Duplicate file in this upload"))
+                continue
+            seen_names.add(item["filename"])
+            seen_hashes.add(item["hash"])
+            unique.append(item)
+        if not unique:
+            return []
+        with db_connection() as conn:
+            if not conn:
+                raise ConnectionError("Database connection failed.")
+            with conn.cursor() as cursor:
+                names, hashes = find_existing(cursor, (i["filename"] for i in unique), (i["hash"] for i in unique),
+                                              generation_id)
+        changed = []
+        for item in unique:
+            if item["hash"] in hashes:
+                detail = "Unchanged" if item["filename"] in names else "Duplicate file"
+                events.put((item["filename"], "skipped", detail))
+                continue
+            if item["filename"] in names:
+                item["doc_id"] = names[item["filename"]]
+            changed.append(item)
+        return changed
+
+    def feed():
+        batch = []
+
+        def forward():
+            try:
+                items = deduplicate(batch)
+            except Exception as e:
+                items = []
+                for item in batch:
+                    events.put((item["filename"], "failed", f"Duplicate check failed: {e}"))
+            batch.clear()
+            return all(_put(parse_queue, item, stop) for item in items)
+
+        try:
+            for filename, data in documents:
+                batch.append({"filename": filename, "data": data})
+                if len(batch) >= dedup_batch and not forward():
+                    return
+            if batch and not forward():
+                return
+        except Exception as e:
+            events.put(("", "failed", f"Reading files failed: {e}"))
+        _put(parse_queue, _DONE, stop)
+
+    def drain_events():
+        while True:
+            try:
+                filename, status, detail = events.get_nowait()
+            except queue.Empty:
+                return
+            if status in ("failed", "skipped"):
+                stats[status] += 1
+            report(filename, status, detail)
+
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed.")
+        cursor = conn.cursor()
+        parse_pool = ProcessPoolExecutor(max_workers=max(1, parse_workers), mp_context=_PARSE_CONTEXT)
+        generation_id, activated = None, False
+        try:
+            ensure_ingestion_schema(cursor)
+            if fresh:
+                generation_id = begin_generation(cursor)
+                conn.commit()
+            else:
+                generation_id = get_active_generation(cursor)
+                check_append(cursor, generation_id)
+            stats["generation"] = generation_id
+
+            parse_queue, upload_queue, write_queue = (queue.Queue(maxsize=max(1, queue_size)) for _ in range(3))
+            threading.Thread(target=feed, name="ingest-feed", daemon=True).start()
+            _start_stage(parse_queue, upload_queue, parse, max(1, parse_workers), stop, "parse")
+            _start_stage(upload_queue, write_queue, upload, max(1, upload_workers), stop, "upload")
+
+            pending, pending_rows = [], []
+
+            def flush():
+                if not pending:
+                    return
+                start = time.perf_counter()
+                try:
+                    insert_chunks(cursor, pending_rows, generation_id, batch_size)
+                    # Answer caches in every process drop what they hold for the previous revision (a
+                    # rebuild's generation is invisible until it is activated, and touching it keeps it
+                    # from being collected as stale)
+                    touch_generation(cursor, generation_id)
+                    if not fresh:
+                        check_append(cursor, generation_id)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    stats["failed"] += len(pending)
+                    for filename, *_ in pending:
+                        report(filename, "failed", f"Database write failed: {e}")
+                else:
+                    stats["documents"] += len(pending)
+                    stats["chunks"] += len(pending_rows)
+                    stats["batches"] += 1
+                    for filename, detail, updated, reused, removed in pending:
+                        stats["updated"] += updated
+                        stats["chunks_reused"] += reused
+                        stats["chunks_removed"] += removed
+                        report(filename, "done", detail)
+                finally:
+                    stats["write_seconds"] += time.perf_counter() - start
+                    pending.clear()
+                    pending_rows.clear()
+
+            while True:
+                try:
+                    item = write_queue.get(timeout=0.1)
+                except queue.Empty:
+                    drain_events()
+                    continue
+                drain_events()
+                if item is _DONE:
+                    break
+                filename = item["filename"]
+                stats["parse_seconds"] += item.get("parse_seconds", 0.0)
+                stats["upload_seconds"] += item.get("upload_seconds", 0.0)
+                if "error" in item:
+                    stats["failed"] += 1
+                    report(filename, "failed", item["error"])
+                    continue
+                if "skipped" in item:
+                    stats["skipped"] += 1
+                    report(filename, "skipped", item["skipped"])
+                    continue
+
+                cursor.execute("SAVEPOINT ingest_document")
+                try:
+                    doc_id, version = item.get("doc_id"), None
+                    if doc_id is None:
+                        doc_id = stage_document(cursor, filename, item["hash"], item["data"], generation_id)
+                    else:
+                        version = update_document(cursor, doc_id, item["hash"], item["data"])
+                    chunks = item["chunks"]
+                    if chunks is None:
+                        chunks = chunk_text(database_text(cursor, doc_id))
+                        if not chunks:
+                            raise ValueError("no text could be extracted")
+                    if version is None:
+                        rows, reused, removed = [(doc_id, chunk_id, chunk, chunk_hash(chunk))
+                                                 for chunk_id, chunk in enumerate(chunks, start=1)], 0, 0
+                    else:
+                        rows, reused, removed = diff_chunks(cursor, doc_id, chunks)
+                except Exception as e:
+                    # Undo only this file's staging rows; the documents queued before it stay in the batch
+                    cursor.execute("ROLLBACK TO SAVEPOINT ingest_document")
+                    if is_unique_violation(e):
+                        stats["skipped"] += 1
+                        report(filename, "skipped", "Duplicate file (ingested concurrently)")
+                    else:
+                        stats["failed"] += 1
+                        report(filename, "failed", f"Staging failed: {e}")
+                    continue
+
+                stats["bytes"] += len(item["data"])
+                if version is None:
+                    detail = f"{len(rows)} chunks"
+                else:
+                    detail = f"updated to v{version}: {reused} chunks reused, {len(rows)} added, {removed} removed"
+                pending.append((filename, detail, version is not None, reused, removed))
+                pending_rows.extend(rows)
+                report(filename, "queued", detail)
+                if len(pending_rows) >= batch_size:
+                    flush()
+            flush()
+
+            if fresh and stats["documents"]:
+                activate_generation(cursor, generation_id)
+                conn.commit()
+                activated = stats["activated"] = True
+        finally:
+            stop.set()
+            parse_pool.shutdown(wait=True, cancel_futures=True)
+            if fresh and generation_id is not None and not activated:
+                # Nothing was ingested or the rebuild failed: keep serving the current generation
+                try:
+                    conn.rollback()
+                    retire_generation(cursor, generation_id)
+                    conn.commit()
+                except Exception as e:
+                    print(f"Could not retire corpus generation {generation_id}: {e}")
+            cursor.close()
+    if fresh:
+        collect_retired_generations()
+    return _finish_stats(stats, started)
+
+def oci_object_store():
+    """The OCI Object Storage bucket (BUCKET_NAME, NAMESPACE) for uploaded files, using OCI_CONFIG_PROFILE."""
+    import oci
+    from config import BUCKET_NAME, NAMESPACE, OCI_CONFIG_PROFILE
+    client = oci.object_storage.ObjectStorageClient(oci.config.from_file(profile_name=OCI_CONFIG_PROFILE))
+    return OCIObjectStore(client, NAMESPACE, BUCKET_NAME)
+
+def iter_files(paths):
+    """Yields (cleaned filename, bytes) for allowed files under the given files and directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.path.join(root, name) for root, _, files in os.walk(path) for name in files)
+        else:
+            names = [path]
+        for name in names:
+            cleaned = clean_filename(os.path.basename(name))
+            if not allowed_file(cleaned):
+                print(f"skipped (unsupported type): {name}")
+                continue
+            if os.path.getsize(name) > MAX_FILE_SIZE:
+                print(f"skipped (too large): {name}")
+                continue
+            with open(name, "rb") as f:
+                yield cleaned, f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Files or directories to ingest.")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Chunks per insert batch and commit.")
+    parser.add_argument("--parse-workers", type=int, default=INGEST_PARSE_WORKERS, help="Processes parsing files.")
+    parser.add_argument("--upload-workers", type=int, default=INGEST_UPLOAD_WORKERS, help="Threads checking and uploading files.")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Rebuild the knowledge base in a new generation, switched to once it is complete.")
+    parser.add_argument("--upload", action="store_true", help="Also upload each file to OCI Object Storage.")
+    parser.add_argument("--local-store", metavar="DIR", help="Upload into a local directory instead (offline runs).")
+    args = parser.parse_args()
+
+    store = None
+    if args.local_store:
+        store = LocalObjectStore(args.local_store)
+    elif args.upload:
+        store = oci_object_store()
+
+    def progress(filename, status, detail=""):
+        if status in ("done", "skipped", "failed"):
+            print(f"{status:<8} {filename} {detail}")
+
+    try:
+        stats = ingest_documents(iter_files(args.paths), batch_size=args.batch_size, fresh=args.fresh,
+                                 store=store, progress=progress,
+                                 parse_workers=args.parse_workers, upload_workers=args.upload_workers)
+    except RebuildInProgressError as e:
+        parser.exit(1, f"{e}\n")
+    print(
+        f"{stats['documents']} documents, {stats['chunks']} chunks in {stats['elapsed_seconds']:.1f} s "
+        f"({stats['docs_per_second']:.2f} docs/s, {stats['chunks_per_second']:.1f} chunks/s); "
+        f"{stats['updated']} updated ({stats['chunks_reused']} chunks reused, {stats['chunks_removed']} removed); "
+        f"skipped {stats['skipped']}, failed {stats['failed']}; "
+        f"parse {stats['parse_seconds']:.1f} s, upload {stats['upload_seconds']:.1f} s, embed + write {stats['write_seconds']:.1f} s in {stats['batches']} batches"
+    )
+    if args.fresh:
+        outcome = "now active" if stats["activated"] else "abandoned, the previous generation is still active"
+        print(f"rebuild generation {stats['generation']}: {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+from config import (
+    INTENT_CLASSIFIER_ENABLED,
+    INTENT_EXAMPLES_PATH,
+    INTENT_MODEL_NAME,
+    INTENT_CONFIDENCE_THRESHOLD,
+    INTENT_MARGIN,
+)
+
+INTENTS = ["greeting", "comparison", "summarization", "training_generation", "rag_query"]
+
+def load_examples(path=INTENT_EXAMPLES_PATH):
+    """Reads labeled utterances from a JSONL file of {"text": ..., "intent": ...} records."""
+    examples = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        record = json.loads(line)
+        if record["intent"] not in INTENTS:
+            raise ValueError(f"Unknown intent '{record['intent']}' in {path}")
+        examples.append((record["text"], record["intent"]))
+    return examples
+
+
+class IntentClassifier:
+    """
+    Nearest-centroid intent classifier over sentence-transformers embeddings of labeled examples.
+    predict() only commits to an intent when the best centroid is similar enough and clearly
+    ahead of the runner-up; otherwise it returns None so the caller can fall back to the LLM.
+    """
+
+    def __init__(self, examples, model=None, model_name: str = INTENT_MODEL_NAME,
+                 threshold: float = INTENT_CONFIDENCE_THRESHOLD, margin: float = INTENT_MARGIN):
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, device="cpu")
+        self.model = model
+        self.threshold = threshold
+        self.margin = margin
+        self.fit(examples)
+
+    def encode(self, texts):
+        return np.asarray(self.model.encode(list(texts), normalize_embeddings=True), dtype=np.float32)
+
+    def fit(self, examples):
+        """Computes one unit-length centroid per intent from the labeled examples."""
+        texts = [text.lower().strip() for text, _ in examples]
+        labels = [intent for _, intent in examples]
+        vectors = self.encode(texts)
+        self.labels = sorted(set(labels))
+        centroids = np.stack([vectors[[i for i, l in enumerate(labels) if l == label]].mean(axis=0) for label in self.labels])
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+    def scores(self, text: str) -> dict:
+        """Cosine similarity of text to every intent centroid."""
+        vector = self.encode([text.lower().strip()])[0]
+        return dict(zip(self.labels, (self.centroids @ vector).tolist()))
+
+    def predict(self, text: str):
+        """Returns (intent, confidence); intent is None when the prediction is not confident enough."""
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        best_intent, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if best < self.threshold or best - runner_up < self.margin:
+            return None, best
+        return best_intent, best
+
+
+_classifier = None
+_classifier_failed = False
+_classifier_lock = threading.Lock()
+
+def get_intent_classifier():
+    """
+    Returns the process-wide classifier, loading the model on first use.
+    Returns None when disabled or when the model cannot be loaded, so callers use the LLM instead.
+    """
+    global _classifier, _classifier_failed
+    if not INTENT_CLASSIFIER_ENABLED or _classifier_failed:
+        return None
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None and not _classifier_failed:
+                try:
+                    _classifier = IntentClassifier(load_examples())
+                except Exception as e:
+                    print(f"Intent classifier unavailable, falling back to the LLM: {e}")
+                    _classifier_failed = True
+    return _classifier
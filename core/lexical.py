@@ -0,0 +1,89 @@
+import math
+import re
+from collections import Counter
+
+# Words, numbers and identifiers such as "2017", "s.12" or "GDPR"; dashes and slashes split tokens
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was "
+    "were what when where which who why will with about does did do can tell me".split()
+)
+
+def tokenize(text: str):
+    """Lower-cased word and number tokens without stopwords."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an in-memory collection of (key, text) pairs.
+    Used by the "bm25" lexical backend and by offline benchmarks.
+    """
+
+    def __init__(self, documents=(), k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.keys = []
+        self._term_freqs = []
+        self._lengths = []
+        self._postings = {}
+        for key, text in documents:
+            self.add(key, text)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, text: str):
+        tokens = tokenize(text)
+        position = len(self.keys)
+        self.keys.append(key)
+        self._term_freqs.append(Counter(tokens))
+        self._lengths.append(len(tokens))
+        for term in set(tokens):
+            self._postings.setdefault(term, []).append(position)
+
+    def search(self, query: str, top_k: int = 25):
+        """Returns up to top_k (key, score) pairs, best first; only documents sharing a term score."""
+        if not self.keys:
+            return []
+        count = len(self.keys)
+        avg_length = sum(self._lengths) / count or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position in postings:
+                tf = self._term_freqs[position][term]
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[position] / avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.keys[position], score) for position, score in ranked]
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k: int = 60):
+    """
+    Fuses ranked lists of keys with weighted reciprocal rank fusion.
+    rankings maps a name to keys ordered best first; weights maps the same names to weights
+    (default 1.0). Returns (key, score) pairs, best first.
+    """
+    weights = weights or {}
+    scores = {}
+    for name, keys in rankings.items():
+        weight = weights.get(name, 1.0)
+        if weight <= 0:
+            continue
+        for rank, key in enumerate(keys, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def oracle_text_query(question: str) -> str:
+    """
+    Builds an Oracle Text CONTAINS query that accumulates the question's terms.
+    Each term is wrapped in braces so reserved words and operators are matched literally.
+    """
+    terms = list(dict.fromkeys(tokenize(question)))
+    return " ACCUM ".join("{" + term + "}" for term in terms)
@@ -0,0 +1,550 @@
+import asyncio
+import contextvars
+import json
+import random
+import threading
+import time
+
+import aiohttp
+import oci
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_community.chat_models import ChatOCIGenAI
+from langchain_core.messages import HumanMessage
+from core.packing import estimate_tokens
+from core.telemetry import span, start_span
+from config import (
+    QWEN_ENDPOINT,
+    QWEN_MODEL,
+    QWEN_TIMEOUT,
+    GENAI_ENDPOINT,
+    GENAI_MODEL_ID,
+    GENAI_COMPARTMENT_ID,
+    OCI_GENAI_TIMEOUT,
+    OCI_AUTH_TYPE,
+    OCI_CONFIG_PROFILE,
+    LLM_CONNECT_TIMEOUT,
+    LLM_HTTP_POOL_SIZE,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+)
+
+# HTTP statuses worth retrying: throttling and transient server-side failures
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when a language model call fails."""
+
+
+class LLMResponseError(LLMError):
+    """Raised when the language model answers with something we cannot parse."""
+
+
+class RetryableLLMError(LLMError):
+    """A transient failure; retry_after (seconds) is honoured when the server provides it."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE, cap: float = LLM_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LLMProvider:
+    """
+    Base class for long-lived LLM clients. Subclasses implement _complete() and, where the
+    backend supports it, _stream(); retries, backoff and call accounting are handled here.
+    """
+    label = "language model"
+
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES):
+        self.max_retries = max_retries
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "errors": 0, "total_ms": 0.0, "streams": 0, "total_ttft_ms": 0.0}
+        # Token usage reported by the backend for the calling thread's (or task's) last completion, if any
+        self._usage = contextvars.ContextVar(f"llm_usage_{id(self)}", default=None)
+
+    def complete(self, system_prompt: str, user_prompt: str, json_mode: bool = False, **kwargs) -> str:
+        """Returns the completion text, retrying transient failures with jittered backoff."""
+        start = time.perf_counter()
+        attempt = 0
+        self._usage.set(None)
+        with span("llm.complete", **self._span_attributes("complete", system_prompt, user_prompt)) as call:
+            try:
+                while True:
+                    try:
+                        text = self._complete(system_prompt, user_prompt, json_mode, **kwargs)
+                        self._record_usage(call, system_prompt, user_prompt, text)
+                        return text
+                    except RetryableLLMError as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        delay = e.retry_after if e.retry_after is not None else backoff_delay(attempt)
+                        attempt += 1
+                        self._bump("retries")
+                        time.sleep(min(delay, LLM_BACKOFF_MAX))
+            except Exception:
+                self._bump("errors")
+                raise
+            finally:
+                call.set("llm.retries", attempt)
+                with self._stats_lock:
+                    self._stats["calls"] += 1
+                    self._stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+    def stream(self, system_prompt: str, user_prompt: str, json_mode: bool = False, **kwargs):
+        """
+        Yields the completion text as it is generated. Transient failures are retried
+        only until the first token arrives; after that they surface to the caller.
+        """
+        start = time.perf_counter()
+        first_token = False
+        attempt = 0
+        # Not made the current span: the generator is suspended between tokens
+        call = start_span("llm.stream", **self._span_attributes("stream", system_prompt, user_prompt))
+        pieces = []
+        self._usage.set(None)
+        try:
+            while True:
+                try:
+                    for piece in self._stream(system_prompt, user_prompt, json_mode, **kwargs):
+                        if not first_token:
+                            first_token = True
+                            ttft_ms = (time.perf_counter() - start) * 1000
+                            call.set("llm.time_to_first_token_ms", round(ttft_ms, 1))
+                            with self._stats_lock:
+                                self._stats["streams"] += 1
+                                self._stats["total_ttft_ms"] += ttft_ms
+                        pieces.append(piece)
+                        yield piece
+                    self._record_usage(call, system_prompt, user_prompt, "".join(pieces))
+                    return
+                except RetryableLLMError as e:
+                    if first_token or attempt >= self.max_retries:
+                        raise
+                    delay = e.retry_after if e.retry_after is not None else backoff_delay(attempt)
+                    attempt += 1
+                    self._bump("retries")
+                    time.sleep(min(delay, LLM_BACKOFF_MAX))
+        except Exception as e:
+            self._bump("errors")
+            call.record_exception(e)
+            raise
+        finally:
+            call.set("llm.retries", attempt)
+            call.end()
+            with self._stats_lock:
+                self._stats["calls"] += 1
+                self._stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+    async def acomplete(self, system_prompt: str, user_prompt: str, json_mode: bool = False, **kwargs) -> str:
+        """Async counterpart of complete(); backoff sleeps yield to the event loop."""
+        start = time.perf_counter()
+        attempt = 0
+        self._usage.set(None)
+        with span("llm.complete", **self._span_attributes("complete", system_prompt, user_prompt)) as call:
+            try:
+                while True:
+                    try:
+                        text = await self._acomplete(system_prompt, user_prompt, json_mode, **kwargs)
+                        self._record_usage(call, system_prompt, user_prompt, text)
+                        return text
+                    except RetryableLLMError as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        delay = e.retry_after if e.retry_after is not None else backoff_delay(attempt)
+                        attempt += 1
+                        self._bump("retries")
+                        await asyncio.sleep(min(delay, LLM_BACKOFF_MAX))
+            except Exception:
+                self._bump("errors")
+                raise
+            finally:
+                call.set("llm.retries", attempt)
+                with self._stats_lock:
+                    self._stats["calls"] += 1
+                    self._stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+    async def astream(self, system_prompt: str, user_prompt: str, json_mode: bool = False, **kwargs):
+        """Async counterpart of stream(), with the same retry rule."""
+        start = time.perf_counter()
+        first_token = False
+        attempt = 0
+        call = start_span("llm.stream", **self._span_attributes("stream", system_prompt, user_prompt))
+        pieces = []
+        self._usage.set(None)
+        try:
+            while True:
+                try:
+                    async for piece in self._astream(system_prompt, user_prompt, json_mode, **kwargs):
+                        if not first_token:
+                            first_token = True
+                            ttft_ms = (time.perf_counter() - start) * 1000
+                            call.set("llm.time_to_first_token_ms", round(ttft_ms, 1))
+                            with self._stats_lock:
+                                self._stats["streams"] += 1
+                                self._stats["total_ttft_ms"] += ttft_ms
+                        pieces.append(piece)
+                        yield piece
+                    self._record_usage(call, system_prompt, user_prompt, "".join(pieces))
+                    return
+                except RetryableLLMError as e:
+                    if first_token or attempt >= self.max_retries:
+                        raise
+                    delay = e.retry_after if e.retry_after is not None else backoff_delay(attempt)
+                    attempt += 1
+                    self._bump("retries")
+                    await asyncio.sleep(min(delay, LLM_BACKOFF_MAX))
+        except Exception as e:
+            self._bump("errors")
+            call.record_exception(e)
+            raise
+        finally:
+            call.set("llm.retries", attempt)
+            call.end()
+            with self._stats_lock:
+                self._stats["calls"] += 1
+                self._stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+    def _span_attributes(self, operation, system_prompt, user_prompt) -> dict:
+        return {
+            "gen_ai.system": self.label,
+            "gen_ai.operation.name": operation,
+            "gen_ai.request.model": getattr(self, "model", ""),
+            "llm.prompt_chars": len(system_prompt) + len(user_prompt),
+        }
+
+    def _record_usage(self, call, system_prompt, user_prompt, text):
+        """Sets token counts on a call's span: as reported by the backend, otherwise estimated from characters."""
+        usage = self._usage.get()
+        self._usage.set(None)
+        call.set("llm.completion_chars", len(text))
+        if usage:
+            call.set("gen_ai.usage.input_tokens", usage.get("prompt_tokens", 0))
+            call.set("gen_ai.usage.output_tokens", usage.get("completion_tokens", 0))
+        else:
+            call.set("gen_ai.usage.input_tokens", estimate_tokens(system_prompt) + estimate_tokens(user_prompt))
+            call.set("gen_ai.usage.output_tokens", estimate_tokens(text))
+            call.set("llm.tokens_estimated", True)
+
+    def _complete(self, system_prompt, user_prompt, json_mode, **kwargs) -> str:
+        raise NotImplementedError
+
+    def _stream(self, system_prompt, user_prompt, json_mode, **kwargs):
+        # Providers without native streaming deliver the whole completion as one piece
+        yield self._complete(system_prompt, user_prompt, json_mode, **kwargs)
+
+    async def _acomplete(self, system_prompt, user_prompt, json_mode, **kwargs) -> str:
+        # Providers without an async client run the blocking call on a worker thread; the
+        # copied context carries the backend's usage report back to this task
+        context = contextvars.copy_context()
+        text = await asyncio.to_thread(context.run, self._complete, system_prompt, user_prompt, json_mode, **kwargs)
+        self._usage.set(context.get(self._usage))
+        return text
+
+    async def _astream(self, system_prompt, user_prompt, json_mode, **kwargs):
+        yield await self._acomplete(system_prompt, user_prompt, json_mode, **kwargs)
+
+    async def aclose(self):
+        """Releases async clients bound to the running event loop; call it before the loop stops."""
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_ms"] = stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+        stats["avg_ttft_ms"] = stats["total_ttft_ms"] / stats["streams"] if stats["streams"] else 0.0
+        return stats
+
+
+class QwenProvider(LLMProvider):
+    """OpenAI-compatible chat completions endpoint over a pooled keep-alive HTTP session."""
+    label = "Qwen model"
+
+    def __init__(self, endpoint: str = QWEN_ENDPOINT, model: str = QWEN_MODEL, timeout: float = QWEN_TIMEOUT,
+                 pool_size: int = LLM_HTTP_POOL_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.model = model
+        self.timeout = (LLM_CONNECT_TIMEOUT, timeout)
+        self.session = requests.Session()
+        # Retries are handled by LLMProvider so they are jittered and counted
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool_size = pool_size
+        # aiohttp sessions are bound to the event loop they were created on
+        self._asession = None
+        self._asession_loop = None
+
+    def build_payload(self, system_prompt, user_prompt, json_mode, **kwargs) -> dict:
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.2,
+            "chat_template_kwargs": {"enable_thinking": False},
+            **kwargs,
+        }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    def _post(self, payload, stream=False):
+        try:
+            response = self.session.post(self.endpoint, json=payload, timeout=self.timeout, stream=stream)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise RetryableLLMError(f"Network error calling Qwen model: {e}") from e
+        except requests.exceptions.RequestException as e:
+            raise LLMError(f"Network error calling Qwen model: {e}") from e
+
+        if response.status_code in RETRYABLE_STATUS:
+            retry_after = response.headers.get("Retry-After")
+            response.close()
+            raise RetryableLLMError(
+                f"Qwen model returned HTTP {response.status_code}",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            response.close()
+            raise LLMError(f"Qwen model returned an error: {e}") from e
+        return response
+
+    def _async_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._asession is None or self._asession_loop is not loop:
+            # No cap on concurrent connections, as with the sync pool; idle ones are kept alive for reuse
+            self._asession = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0),
+                timeout=aiohttp.ClientTimeout(total=None, connect=self.timeout[0], sock_read=self.timeout[1]),
+            )
+            self._asession_loop = loop
+        return self._asession
+
+    async def aclose(self):
+        if self._asession is not None:
+            await self._asession.close()
+            self._asession = self._asession_loop = None
+
+    async def _apost(self, payload):
+        try:
+            response = await self._async_session().post(self.endpoint, json=payload)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            raise RetryableLLMError(f"Network error calling Qwen model: {e}") from e
+        except aiohttp.ClientError as e:
+            raise LLMError(f"Network error calling Qwen model: {e}") from e
+
+        if response.status in RETRYABLE_STATUS:
+            retry_after = response.headers.get("Retry-After")
+            response.release()
+            raise RetryableLLMError(
+                f"Qwen model returned HTTP {response.status}",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        if response.status >= 400:
+            response.release()
+            raise LLMError(f"Qwen model returned an error: HTTP {response.status} {response.reason} for url {self.endpoint}")
+        return response
+
+    @staticmethod
+    def _parse_event(line):
+        """Returns (done, piece) for one server-sent event line; piece is None when it carries no text."""
+        if not line or not line.startswith("data:"):
+            return False, None
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return True, None
+        try:
+            choices = json.loads(data).get("choices") or [{}]
+        except (ValueError, AttributeError) as e:
+            raise LLMResponseError(f"Error processing Qwen stream: {e}") from e
+        return False, (choices[0].get("delta") or {}).get("content") or None
+
+    def _complete(self, system_prompt, user_prompt, json_mode, **kwargs) -> str:
+        response = self._post(self.build_payload(system_prompt, user_prompt, json_mode, **kwargs))
+        try:
+            data = response.json()
+            self._usage.set(data.get("usage"))
+            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
+        except (ValueError, AttributeError, IndexError) as e:
+            raise LLMResponseError(f"Error processing Qwen response: {e}") from e
+
+    def _stream(self, system_prompt, user_prompt, json_mode, **kwargs):
+        payload = self.build_payload(system_prompt, user_prompt, json_mode, stream=True, **kwargs)
+        response = self._post(payload, stream=True)
+        # Server-sent events carry no charset; decode as UTF-8 rather than yielding bytes
+        response.encoding = "utf-8"
+        done = False
+        try:
+            # Read through to the end of the body even after [DONE] so the connection goes back to the pool
+            for line in response.iter_lines(decode_unicode=True):
+                if not done:
+                    done, piece = self._parse_event(line)
+                    if piece:
+                        yield piece
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            raise RetryableLLMError(f"Qwen stream interrupted: {e}") from e
+        finally:
+            response.close()
+
+    async def _acomplete(self, system_prompt, user_prompt, json_mode, **kwargs) -> str:
+        response = await self._apost(self.build_payload(system_prompt, user_prompt, json_mode, **kwargs))
+        try:
+            data = await response.json(content_type=None)
+            self._usage.set(data.get("usage"))
+            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
+        except (ValueError, AttributeError, IndexError) as e:
+            raise LLMResponseError(f"Error processing Qwen response: {e}") from e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise RetryableLLMError(f"Qwen response interrupted: {e}") from e
+        finally:
+            response.release()
+
+    async def _astream(self, system_prompt, user_prompt, json_mode, **kwargs):
+        payload = self.build_payload(system_prompt, user_prompt, json_mode, stream=True, **kwargs)
+        response = await self._apost(payload)
+        done = False
+        try:
+            # As in _stream, drain the body so the connection is kept alive
+            async for line in response.content:
+                if not done:
+                    done, piece = self._parse_event(line.decode("utf-8").strip())
+                    if piece:
+                        yield piece
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise RetryableLLMError(f"Qwen stream interrupted: {e}") from e
+        finally:
+            response.release()
+
+
+class OCIGenAIProvider(LLMProvider):
+    """OCI GenAI (Cohere) through a single, lazily created ChatOCIGenAI client."""
+    label = "OCI GenAI"
+
+    def __init__(self, timeout: float = OCI_GENAI_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        self.model = GENAI_MODEL_ID
+        self.timeout = (LLM_CONNECT_TIMEOUT, timeout)
+        self._chat = None
+        self._chat_lock = threading.Lock()
+
+    def _client(self):
+        if self._chat is None:
+            with self._chat_lock:
+                if self._chat is None:
+                    chat = ChatOCIGenAI(
+                        model_id=GENAI_MODEL_ID,
+                        service_endpoint=GENAI_ENDPOINT,
+                        compartment_id=GENAI_COMPARTMENT_ID,
+                        provider="cohere",
+                        auth_type=OCI_AUTH_TYPE,
+                        auth_profile=OCI_CONFIG_PROFILE,
+                    )
+                    # Retries are handled by LLMProvider; apply our own timeouts to the SDK client
+                    client = getattr(chat, "client", None)
+                    if client is not None:
+                        if hasattr(client, "retry_strategy"):
+                            client.retry_strategy = oci.retry.NoneRetryStrategy()
+                        if hasattr(client, "base_client"):
+                            client.base_client.timeout = self.timeout
+                    self._chat = chat
+        return self._chat
+
+    @staticmethod
+    def _translate(e) -> LLMError:
+        """Maps an OCI SDK failure to the LLMError raised to callers."""
+        if isinstance(e, oci.exceptions.ServiceError):
+            if e.status in RETRYABLE_STATUS:
+                return RetryableLLMError(f"OCI GenAI returned HTTP {e.status}: {e.message}")
+            return LLMError(f"OCI GenAI request failed: {e.message}")
+        if isinstance(e, (oci.exceptions.RequestException, oci.exceptions.ConnectTimeout)):
+            return RetryableLLMError(f"Network error calling OCI GenAI: {e}")
+        return LLMError(f"Error communicating with OCI GenAI: {e}")
+
+    @staticmethod
+    def _messages(system_prompt, user_prompt, json_mode, kwargs):
+        if json_mode:
+            # Cohere model on OCI GenAI supports JSON mode via additional params
+            kwargs["response_format"] = {"type": "json_object"}
+        return [HumanMessage(content=f"{system_prompt}\n\n{user_prompt}")]
+
+    def _complete(self, system_prompt, user_prompt, json_mode, **kwargs) -> str:
+        messages = self._messages(system_prompt, user_prompt, json_mode, kwargs)
+        try:
+            response = self._client().invoke(messages, **kwargs)
+        except Exception as e:
+            raise self._translate(e) from e
+        return response.content.strip()
+
+    def _stream(self, system_prompt, user_prompt, json_mode, **kwargs):
+        messages = self._messages(system_prompt, user_prompt, json_mode, kwargs)
+        try:
+            for chunk in self._client().stream(messages, **kwargs):
+                if chunk.content:
+                    yield chunk.content
+        except LLMError:
+            raise
+        except Exception as e:
+            raise self._translate(e) from e
+
+    # The OCI SDK is synchronous; LangChain's ainvoke/astream drive it from worker threads
+    async def _acomplete(self, system_prompt, user_prompt, json_mode, **kwargs) -> str:
+        messages = self._messages(system_prompt, user_prompt, json_mode, kwargs)
+        try:
+            response = await self._client().ainvoke(messages, **kwargs)
+        except Exception as e:
+            raise self._translate(e) from e
+        return response.content.strip()
+
+    async def _astream(self, system_prompt, user_prompt, json_mode, **kwargs):
+        messages = self._messages(system_prompt, user_prompt, json_mode, kwargs)
+        try:
+            async for chunk in self._client().astream(messages, **kwargs):
+                if chunk.content:
+                    yield chunk.content
+        except LLMError:
+            raise
+        except Exception as e:
+            raise self._translate(e) from e
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_provider(model_choice: str) -> LLMProvider:
+    """Returns the process-wide provider for a model choice, creating it on first use."""
+    key = "OCI GenAI" if model_choice == "OCI GenAI" else "Qwen"
+    provider = _providers.get(key)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(key)
+            if provider is None:
+                provider = OCIGenAIProvider() if key == "OCI GenAI" else QwenProvider()
+                _providers[key] = provider
+    return provider
+
+def set_provider(model_choice: str, provider: LLMProvider):
+    """Installs a provider for a model choice, e.g. one pointed at a local stand-in endpoint."""
+    with _providers_lock:
+        _providers["OCI GenAI" if model_choice == "OCI GenAI" else "Qwen"] = provider
+
+async def aclose_providers():
+    """Closes every provider's async clients, e.g. when an asyncio.run() entry point finishes."""
+    for provider in list(_providers.values()):
+        await provider.aclose()
+
+def get_llm_stats() -> dict:
+    """Returns call, retry and error counts for every provider created so far."""
+    return {name: provider.stats() for name, provider in list(_providers.items())}
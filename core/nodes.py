@@ -1,80 +1,91 @@
-import streamlit as st
-import requests
+import contextvars
 import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from langchain_core.prompts import PromptTemplate
-from langchain_community.chat_models import ChatOCIGenAI
-from langchain_core.messages import HumanMessage
-from core.utils import get_db_conn
+from langgraph.config import get_stream_writer
+from core.cache import answer_cache
+from core.embeddings import get_query_embedding, normalize_text
+from core.grading import RELEVANT, IRRELEVANT, score_relevance
+from core.intent import get_intent_classifier
+from core.llm import LLMError, LLMResponseError, get_provider
+from core.packing import format_chunk, pack_context
+from core.rerank import get_reranker
+from core.retrieval import RETRIEVAL_STRATEGIES, fuse_rows, lexical_search, search_chunks
+from core.utils import notify
 from config import (
-    QWEN_ENDPOINT,
-    QWEN3_CONTEXT_LIMIT_CHARS,
-    OCI_GENAI_CONTEXT_LIMIT_CHARS,
-    GENAI_ENDPOINT,
-    GENAI_MODEL_ID,
-    GENAI_COMPARTMENT_ID,
-    OCI_AUTH_TYPE,
-    OCI_CONFIG_PROFILE,
+    COMPARISON_MAX_WORKERS,
+    COMPARISON_SUBQUERY_TIMEOUT,
+    ANSWER_CACHE_ENABLED,
+    GRADE_MODE,
+    GRADE_LLM_TOP_CHUNKS,
+    RETRIEVAL_LADDER,
+    RETRIEVAL_TOP_CHUNKS,
+    RETRIEVAL_TOP_DOCS,
+    RERANK_CANDIDATES,
+    RERANK_TOP_K,
+    LEXICAL_BACKEND,
+    HYBRID_LEXICAL_WEIGHT,
+    HYBRID_INTENT_WEIGHTS,
 )
 
+# Shared worker pool for fanning out comparison sub-queries
+_comparison_executor = ThreadPoolExecutor(max_workers=COMPARISON_MAX_WORKERS, thread_name_prefix="comparison")
+
 def get_llm_response(model_choice: str, system_prompt: str, user_prompt: str, json_mode: bool = False, **kwargs) -> str:
     """Helper function to call the appropriate LLM."""
-    if model_choice == "OCI GenAI":
-        try:
-            full_prompt = f"{system_prompt}\n\n{user_prompt}"
-            chat = ChatOCIGenAI(
-                model_id=GENAI_MODEL_ID,
-                service_endpoint=GENAI_ENDPOINT,
-                compartment_id=GENAI_COMPARTMENT_ID,
-                provider="cohere",
-                auth_type=OCI_AUTH_TYPE,
-                auth_profile=OCI_CONFIG_PROFILE,
-                model_kwargs=kwargs
-            )
-            if json_mode:
-                # Cohere model on OCI GenAI supports JSON mode via additional params
-                chat.model_kwargs['response_format'] = {"type": "json_object"}
-
-            response = chat.invoke([HumanMessage(content=full_prompt)])
-            return response.content.strip()
-        except Exception as e:
-            st.error(f"Error communicating with OCI GenAI: {e}")
-            return f"Error: Could not connect to the OCI GenAI language model."
-
-    else: # Default to Qwen
-        payload = {
-            "model": "Qwen/Qwen3-4B",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": 0.2,
-            "chat_template_kwargs": {"enable_thinking": False},
-            **kwargs,
-        }
-        if json_mode:
-            payload["response_format"] = {"type": "json_object"}
-
-        try:
-            response = requests.post(QWEN_ENDPOINT, json=payload, timeout=120)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
-        except requests.exceptions.RequestException as e:
-            st.error(f"Network error calling Qwen model: {e}")
-            return f"Error: Could not connect to the language model."
-        except Exception as e:
-            st.error(f"Error processing Qwen response: {e}")
-            return "Error: Invalid response from the language model."
-
+    provider = get_provider(model_choice)
+    try:
+        return provider.complete(system_prompt, user_prompt, json_mode=json_mode, **kwargs)
+    except LLMError as e:
+        return llm_failure(provider, e)
+
+def llm_failure(provider, error) -> str:
+    """Reports a failed LLM call and returns the "Error: ..." text nodes check for."""
+    if isinstance(error, LLMResponseError):
+        notify(str(error))
+        return "Error: Invalid response from the language model."
+    notify(f"Error communicating with {provider.label}: {error}")
+    return "Error: Could not connect to the language model."
+
+def _token_writer():
+    """Returns the graph's custom stream writer, or a no-op when called outside a graph run."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _: None
 
-def classify_intent(state):
+def stream_llm_response(model_choice: str, system_prompt: str, user_prompt: str, **kwargs) -> str:
     """
-    Classifies the user's intent to route to the appropriate workflow.
+    Streams a completion, forwarding each token to the graph's "custom" stream as
+    {"token": ...}, and returns the full text once generation finishes.
     """
-    question = state["question"].lower().strip()
-    model_choice = state["model_choice"]
-
-    # Rule-based checks
+    provider = get_provider(model_choice)
+    write = _token_writer()
+    parts = []
+    try:
+        for token in provider.stream(system_prompt, user_prompt, **kwargs):
+            parts.append(token)
+            write({"token": token})
+    except LLMError as e:
+        return streamed_text(provider, parts, e)
+    return streamed_text(provider, parts)
+
+def streamed_text(provider, parts, error=None) -> str:
+    """
+    The text of a streamed completion. After a failure it is reported, and the tokens already
+    sent are kept and marked as interrupted; with none, the "Error: ..." text is returned.
+    """
+    if error is not None:
+        notify(f"Error communicating with {provider.label}: {error}")
+        if not parts:
+            return "Error: Could not connect to the language model."
+        parts.append("\n\n_(The response was interrupted.)_")
+    return "".join(parts).strip()
+
+def rule_based_intent(question: str):
+    """Returns the intent for questions that match a fixed pattern, or None."""
     greetings = ["hello", "hi", "hey", "bye", "good morning", "good afternoon", "good evening"]
     if question in greetings:
         return "greeting"
@@ -90,8 +101,10 @@ def classify_intent(state):
     training_starters = ["create a quiz", "generate training", "make a lesson plan"]
     if any(question.startswith(starter) for starter in training_starters):
         return "training_generation"
+    return None
 
-    # Fallback to LLM for more nuanced classification
+def intent_prompts(question: str):
+    """Returns the (system, user) prompts for LLM intent classification."""
     system_prompt = (
         "You are an intent classification expert. Classify the user's input into one of the following categories: "
         "'greeting', 'comparison', 'summarization', 'training_generation', or 'rag_query'.\n"
@@ -102,15 +115,91 @@ def classify_intent(state):
         "- 'rag_query': For all other questions seeking information.\n"
         "Respond with only the category name."
     )
-    user_prompt = f"User input: '{question}'"
-    
-    intent = get_llm_response(model_choice, system_prompt, user_prompt).strip().lower()
-    
+    return system_prompt, f"User input: '{question}'"
+
+def parse_intent(response: str) -> str:
+    intent = response.strip().lower()
     if intent in ["greeting", "comparison", "summarization", "training_generation"]:
         return intent
     else:
         return "rag_query"
 
+def local_intent(question: str):
+    """
+    Classifies a lowercased question without the LLM: rule-based checks first, then the
+    in-process classifier over labeled examples. Returns None when neither is confident.
+    """
+    intent = rule_based_intent(question)
+    if intent is not None:
+        return intent
+
+    classifier = get_intent_classifier()
+    if classifier is not None:
+        intent, _ = classifier.predict(question)
+    return intent
+
+def detect_intent(state) -> str:
+    """
+    Classifies the user's intent to route to the appropriate workflow.
+    """
+    question = state["question"].lower().strip()
+    intent = local_intent(question)
+    if intent is not None:
+        return intent
+
+    # Fallback to LLM for more nuanced classification
+    system_prompt, user_prompt = intent_prompts(question)
+    return parse_intent(get_llm_response(state["model_choice"], system_prompt, user_prompt))
+
+def classify_intent(state):
+    """
+    Records the user's intent in the state so later steps can route on it.
+    """
+    return {**state, "intent": detect_intent(state)}
+
+def lookup_answer_cache(state):
+    """
+    Serves a previously generated answer for the same (or a near-identical) standalone question.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return {**state, "cache_hit": False}
+
+    cached = answer_cache.lookup(state["question"], state["model_choice"], state["intent"], embed_fn=get_query_embedding)
+    return cache_lookup_update(state, cached)
+
+def cache_lookup_update(state, cached):
+    """The state after an answer cache lookup; cached is the hit, or None."""
+    if cached is None:
+        return {**state, "cache_hit": False}
+    return {**state, "cache_hit": True, "answer": cached["answer"], "citations": cached["citations"]}
+
+def is_cacheable_answer(state) -> bool:
+    """
+    Whether a turn's answer may be cached: one that failed, or that was given without any
+    retrieved document (e.g. while the database was unreachable), is not.
+    """
+    answer = state.get("answer", "")
+    return ANSWER_CACHE_ENABLED and bool(answer) and not answer.startswith("Error:") and bool(state.get("citations"))
+
+def store_answer_cache(state):
+    """
+    Caches a freshly generated answer together with its citations.
+    """
+    if is_cacheable_answer(state):
+        cache_answer(state, get_query_embedding(state["question"]))
+    return state
+
+def cache_answer(state, embedding):
+    """Stores a turn's answer and citations under its question's embedding."""
+    answer_cache.store(
+        state["question"],
+        state["model_choice"],
+        state["answer"],
+        state.get("citations", []),
+        intent=state["intent"],
+        embedding=embedding,
+    )
+
 def handle_greeting(state):
     """
     Provides a direct response to a greeting.
@@ -121,21 +210,8 @@ def format_chat_history(chat_history: list) -> str:
     """Format chat history into a string."""
     return "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in chat_history])
 
-def rewrite_question(state):
-    """
-    Rewrites the user's question and increments the rewrite counter.
-    """
-    question = state["question"]
-    chat_history = state["chat_history"]
-    model_choice = state["model_choice"]
-    rewrite_count = state.get("rewrite_count", 0)
-
-    # Increment rewrite counter
-    rewrite_count += 1
-
-    if not chat_history:
-        return {**state, "question": question, "rewrite_count": rewrite_count}
-
+def rewrite_prompts(question: str, chat_history: list):
+    """Returns the (system, user) prompts that turn a follow-up into a standalone question."""
     system_prompt = "You are a question rewriting expert."
     user_prompt = (
         "Given the following chat history and a follow-up question, "
@@ -146,64 +222,249 @@ def rewrite_question(state):
         f"Follow-up Question: {question}\n"
         "Standalone question:"
     )
-    
-    rewritten_question = get_llm_response(model_choice, system_prompt, user_prompt)
-    
-    return {**state, "question": rewritten_question or question, "rewrite_count": rewrite_count}
+    return system_prompt, user_prompt
 
-def retrieve_context(state):
+def rewrite_question(state):
     """
-    Retrieves context from the database based on the user's question.
+    Rewrites a follow-up question into a standalone question using the chat history.
     """
     question = state["question"]
+    chat_history = state["chat_history"]
     model_choice = state["model_choice"]
-    max_chars = OCI_GENAI_CONTEXT_LIMIT_CHARS if model_choice == "OCI GenAI" else QWEN3_CONTEXT_LIMIT_CHARS
-
-    conn = get_db_conn()
-    if not conn:
-        return {**state, "context": "", "citations": []}
-
-    query = """
-        WITH top_chunks AS (
-          SELECT doc_id, chunk_id, chunk_data, VECTOR_DISTANCE(chunk_embedding, (VECTOR_EMBEDDING(ALL_MINILM_L12_V2 USING :query_text AS DATA))) AS distance
-            FROM doc_chunks ORDER BY distance FETCH FIRST 25 ROWS ONLY ), ranked_docs AS (
-            SELECT doc_id, COUNT(*) AS score FROM top_chunks GROUP BY doc_id ORDER BY score DESC FETCH FIRST 4 ROWS ONLY)
-                SELECT tc.doc_id, ds.filename, tc.chunk_id, tc.chunk_data 
-                FROM top_chunks tc 
-                JOIN ranked_docs rd ON tc.doc_id = rd.doc_id 
-                JOIN documentation_staging ds ON tc.doc_id = ds.id
-                ORDER BY rd.score DESC, tc.distance
-        """
+
+    if not chat_history:
+        return {**state, "question": question}
+
+    system_prompt, user_prompt = rewrite_prompts(question, chat_history)
+    rewritten_question = get_llm_response(model_choice, system_prompt, user_prompt)
     
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query, {'query_text': question})
-        results = cursor.fetchall()
-        context_parts, citations, current_length = [], set(), 0
-        for doc_id, filename, chunk_id, chunk_data in results:
-            part = f"Content: {chunk_data}\n\n"
-            if current_length + len(part) > max_chars: 
-                break
-            context_parts.append(part)
-            citations.add(f"`{filename}`")
-            current_length += len(part)
-        context = "".join(context_parts)
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        st.error(f"Database retrieval failed: {e}")
-        context, citations = "", []
+    return {**state, "question": rewritten_question or question}
+
+def search_candidates(question: str, top_chunks: int = RETRIEVAL_TOP_CHUNKS, top_docs: int = RETRIEVAL_TOP_DOCS, intent: str = "",
+                      cancelled: threading.Event = None):
+    """
+    Runs the vector search for a question and returns the hits as chunk dicts with their
+    text, vector distance and embedding; raises on database errors.
+    Unless the intent's lexical weight is 0, a full-text search runs alongside and the two
+    rankings are fused, with each chunk's fused score kept as its "relevance".
+    Once cancelled is set, no further statement is sent and nothing is returned.
+    """
+    # The query embedding is computed once and cached, then bound into the vector search
+    query_vector = get_query_embedding(question)
+    if query_vector is None or _is_set(cancelled):
+        return []
+    results = search_chunks(query_vector, top_chunks, top_docs)
+    if _is_set(cancelled):
+        return []
+
+    lexical_weight = lexical_weight_for(intent)
+    lexical_rows = lexical_search(question, query_vector, top_chunks) if lexical_weight > 0 else []
+    return rank_candidates(results, lexical_rows, lexical_weight, top_chunks)
+
+def _is_set(event) -> bool:
+    return event is not None and event.is_set()
+
+def lexical_weight_for(intent: str) -> float:
+    """The full-text share of the fused ranking for an intent; 0 skips the full-text search."""
+    if LEXICAL_BACKEND == "none":
+        return 0.0
+    return HYBRID_INTENT_WEIGHTS.get(intent, HYBRID_LEXICAL_WEIGHT)
+
+def rank_candidates(results, lexical_rows, lexical_weight: float, top_chunks: int):
+    """Candidate chunk dicts from the vector hits, fused with the full-text hits unless the intent skips them."""
+    if lexical_weight <= 0:
+        return build_candidates([(row, None) for row in results])
+    return build_candidates(fuse_rows(results, lexical_rows, lexical_weight, limit=max(len(results), top_chunks)))
+
+def build_candidates(scored):
+    """Converts (row, relevance) search results into candidate chunk dicts."""
+    candidates = []
+    for (doc_id, filename, chunk_id, chunk_data, distance, embedding), relevance in scored:
+        candidate = {"doc_id": doc_id, "filename": filename, "chunk_id": chunk_id, "text": chunk_data, "distance": distance, "embedding": embedding}
+        if relevance is not None:
+            candidate["relevance"] = relevance
+        candidates.append(candidate)
+    return candidates
+
+def pack_candidates(candidates, model_choice: str):
+    """
+    Packs candidate chunks into the model's token budget.
+    Returns (context, citations, chunks, packing), where chunks carry each packed chunk's text and
+    vector distance and packing reports the budget use.
+    """
+    selected, packing = pack_context(candidates, model_choice)
+    chunks = [{key: value for key, value in chunk.items() if key != "embedding"} for chunk in selected]
+    context = "".join(format_chunk(chunk["text"]) for chunk in chunks)
+    citations = list(dict.fromkeys(f"`{chunk['filename']}`" for chunk in chunks))
+    return context, citations, chunks, packing
+
+def search_context(question: str, model_choice: str, top_chunks: int = RETRIEVAL_TOP_CHUNKS, top_docs: int = RETRIEVAL_TOP_DOCS, intent: str = "",
+                   cancelled: threading.Event = None):
+    """
+    Runs the vector search for a question and packs the hits into the model's token budget.
+    Returns (context, citations, chunks, packing); raises on database errors so callers
+    decide how to report them.
+    """
+    candidates = search_candidates(question, top_chunks, top_docs, intent, cancelled)
+    if not candidates or _is_set(cancelled):
+        return "", [], [], {}
+    return pack_candidates(candidates, model_choice)
 
-    return {**state, "context": context, "citations": list(citations)}
+def current_strategy(state) -> str:
+    """Returns the name of the retrieval strategy for the current attempt."""
+    attempt = state.get("retrieval_attempt", 0)
+    return RETRIEVAL_LADDER[min(attempt, len(RETRIEVAL_LADDER) - 1)] if RETRIEVAL_LADDER else "vector"
 
-def generate_answer(state):
+def search_size(strategy: str, rerank: bool = False):
     """
-    Generates an answer using the retrieved context and chat history.
+    Returns (top_chunks, top_docs) for a strategy. With reranking, at least RERANK_CANDIDATES
+    chunks are over-retrieved and no documents are cut, so the cross-encoder picks from all of them.
     """
+    params = RETRIEVAL_STRATEGIES[strategy]
+    if rerank:
+        top_chunks = max(params["top_chunks"], RERANK_CANDIDATES)
+        return top_chunks, top_chunks
+    return params["top_chunks"], params["top_docs"]
+
+def retrieval_key(strategy: str, search_query: str, rerank: bool = False) -> str:
+    """Memo key for a retrieval; strategies that would run the same search share a key."""
+    top_chunks, top_docs = search_size(strategy, rerank)
+    return f"{'rerank|' if rerank else ''}{top_chunks}|{top_docs}|{normalize_text(search_query)}"
+
+def retrieval_request(state, rerank: bool = False):
+    """Returns (top_chunks, top_docs, search_query, memo, key) for the current attempt; memo is a copy."""
+    strategy = current_strategy(state)
+    top_chunks, top_docs = search_size(strategy, rerank)
+    search_query = state.get("search_query") or state["question"]
+    memo = dict(state.get("retrieval_memo") or {})
+    return top_chunks, top_docs, search_query, memo, retrieval_key(strategy, search_query, rerank)
+
+def context_update(state, retrieved, **extra):
+    """The state with a retrieval's (context, citations, chunks, packing) and any extra keys."""
+    context, citations, chunks, packing = retrieved
+    return {**state, "context": context, "citations": citations, "chunks": chunks, "packing": packing, **extra}
+
+def retrieval_failed(error):
+    """Reports a failed search; the turn goes on with empty context and is graded as irrelevant."""
+    notify(f"Database retrieval failed: {error}")
+
+def retrieve_context(state):
+    """
+    Retrieves context from the database using the current attempt's strategy.
+    Results are memoized for the turn, so a retrieval that was already run is never repeated.
+    """
+    top_chunks, top_docs, search_query, memo, key = retrieval_request(state)
+
+    if key in memo:
+        retrieved = memo[key]
+    else:
+        try:
+            retrieved = memo[key] = search_context(
+                search_query, state["model_choice"], top_chunks, top_docs, state.get("intent", "")
+            )
+        except Exception as e:
+            retrieval_failed(e)
+            retrieved = ("", [], [], {})
+
+    return context_update(state, retrieved, retrieval_memo=memo)
+
+def retrieve_candidates(state):
+    """
+    Over-retrieves candidate chunks for the rerank stage using the current attempt's strategy.
+    Results are memoized for the turn like retrieve_context.
+    """
+    top_chunks, top_docs, search_query, memo, key = retrieval_request(state, rerank=True)
+
+    if key in memo:
+        candidates = memo[key]
+    else:
+        try:
+            candidates = memo[key] = search_candidates(search_query, top_chunks, top_docs, state.get("intent", ""))
+        except Exception as e:
+            retrieval_failed(e)
+            candidates = []
+
+    return {**state, "candidates": candidates, "rerank": True, "retrieval_memo": memo}
+
+def rerank_context(state):
+    """
+    Reranks the candidate chunks against the question with the cross-encoder, keeps the
+    best RERANK_TOP_K and packs them into the context. Without a reranker the candidates
+    are packed in vector-distance order.
+    """
+    candidates = state.get("candidates", [])
+    reranker = get_reranker()
+    if reranker is not None and candidates:
+        candidates = reranker.rerank(state["question"], candidates, RERANK_TOP_K)
+
+    retrieved = pack_candidates(candidates, state["model_choice"]) if candidates else ("", [], [], {})
+    return context_update(state, retrieved, candidates=[])
+
+def expand_prompts(question: str):
+    """Returns the (system, user) prompts asking for a keyword-rich search query."""
+    system_prompt = "You are a search query expert."
+    user_prompt = (
+        "Rewrite the following question as a single search query for a document search engine. "
+        "Keep the key entities and add synonyms and closely related terms. "
+        "Return only the search query."
+        f"\n\nQuestion: {question}\n"
+        "Search query:"
+    )
+    return system_prompt, user_prompt
+
+def expand_query(question: str, model_choice: str) -> str:
+    """
+    Asks the LLM for a keyword-rich search query (synonyms, related terms, key entities).
+    Falls back to the original question if the LLM is unavailable.
+    """
+    system_prompt, user_prompt = expand_prompts(question)
+    return parse_expansion(question, get_llm_response(model_choice, system_prompt, user_prompt, max_tokens=100))
+
+def parse_expansion(question: str, response: str) -> str:
+    expanded = response.strip()
+    if not expanded or expanded.startswith("Error:"):
+        return question
+    return expanded
+
+def escalate_retrieval(state):
+    """
+    Moves to the next strategy in RETRIEVAL_LADDER after irrelevant context.
+    Strategies that would repeat a retrieval already run this turn are skipped;
+    when none are left the state is marked as exhausted.
+    """
+    update = escalation_update(state)
+    if update is None:
+        update = escalation_update(state, expand_query(state["question"], state["model_choice"]))
+    return update
+
+def escalation_update(state, expansion: str = None):
+    """
+    Walks RETRIEVAL_LADDER past the current attempt and returns the escalated state. Returns None
+    if the walk reaches a strategy that needs the expanded query and none was given; the caller
+    asks the LLM for it and calls again with it as expansion.
+    """
+    attempt = state.get("retrieval_attempt", 0)
+    memo = state.get("retrieval_memo") or {}
+    search_query = state.get("search_query", "")
+
+    while attempt + 1 < len(RETRIEVAL_LADDER):
+        attempt += 1
+        strategy = RETRIEVAL_LADDER[attempt]
+        # The expansion is asked for once per turn and reused by any later strategy
+        if RETRIEVAL_STRATEGIES[strategy]["expand_query"] and not search_query:
+            if expansion is None:
+                return None
+            search_query = expansion
+        if retrieval_key(strategy, search_query or state["question"], state.get("rerank", False)) not in memo:
+            return {**state, "retrieval_attempt": attempt, "search_query": search_query, "retrieval_exhausted": False}
+
+    return {**state, "retrieval_attempt": attempt, "search_query": search_query, "retrieval_exhausted": True}
+
+def answer_prompts(state):
+    """Returns the (system, user) prompts answering the question from the retrieved context and chat history."""
     question = state["question"]
     context = state["context"]
     chat_history = state["chat_history"]
-    model_choice = state["model_choice"]
 
     system_prompt = (
         "You are a helpful assistant. "
@@ -216,29 +477,22 @@ def generate_answer(state):
         f"Question: {question}\n"
         "Answer:"
     )
+    return system_prompt, user_prompt
 
-    answer = get_llm_response(model_choice, system_prompt, user_prompt, max_tokens=2000)
+def generate_answer(state):
+    """
+    Generates an answer using the retrieved context and chat history.
+    """
+    system_prompt, user_prompt = answer_prompts(state)
+    answer = stream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=2000)
     
     # Preserve citations from the retrieval step
     citations = state.get("citations", [])
     
     return {**state, "answer": answer, "citations": citations}
 
-def grade_context(state):
-    """
-    Determines whether the retrieved context is relevant and checks the rewrite limit.
-    """
-    rewrite_count = state.get("rewrite_count", 0)
-    if rewrite_count > 1:
-        return "give_up"
-
-    question = state["question"]
-    context = state["context"]
-    model_choice = state["model_choice"]
-
-    if not context:
-        return "rewrite"
-
+def grade_prompts(question: str, context: str):
+    """Returns the (system, user) prompts asking the LLM whether the context is relevant."""
     system_prompt = (
         "You are a grader assessing the relevance of a retrieved context to a user question."
         "If the context contains information relevant to the question, respond with only the word 'yes'. "
@@ -249,13 +503,54 @@ def grade_context(state):
         f"Question: {question}\n"
         "Is the context relevant to the question? (yes/no):"
     )
-    
-    score = get_llm_response(model_choice, system_prompt, user_prompt, max_tokens=10)
-    
-    if "yes" in score.lower():
-        return "generate"
-    else:
-        return "rewrite"
+    return system_prompt, user_prompt
+
+def llm_grade(question: str, context: str, model_choice: str) -> bool:
+    """
+    Asks the LLM whether the context is relevant to the question.
+    """
+    system_prompt, user_prompt = grade_prompts(question, context)
+    return parse_grade(get_llm_response(model_choice, system_prompt, user_prompt, max_tokens=10))
+
+def parse_grade(response: str) -> bool:
+    return "yes" in response.lower()
+
+def grade_request(state):
+    """
+    Grades the retrieved context without the LLM where possible. Returns (decision, llm_context, retry):
+    decision is the route when it is settled, otherwise None and llm_context is what the LLM should
+    be asked about; retry is the route for irrelevant context ("retry" or "give_up").
+    """
+    context = state["context"]
+    retry = "retry" if state.get("retrieval_attempt", 0) + 1 < len(RETRIEVAL_LADDER) else "give_up"
+
+    if not context:
+        return retry, None, retry
+
+    if GRADE_MODE == "llm":
+        return None, context, retry
+
+    chunks = state.get("chunks", [])
+    decision, _ = score_relevance([chunk["distance"] for chunk in chunks])
+    if decision == RELEVANT:
+        return "generate", None, retry
+    if decision == IRRELEVANT:
+        return retry, None, retry
+
+    top_chunks = sorted(chunks, key=lambda chunk: chunk["distance"])[:GRADE_LLM_TOP_CHUNKS]
+    return None, "".join(f"Content: {chunk['text']}\n\n" for chunk in top_chunks), retry
+
+def grade_context(state):
+    """
+    Determines whether the retrieved context is relevant; irrelevant context is retried with
+    the next retrieval strategy until the ladder is exhausted.
+    Relevance is decided from chunk distances; only ambiguous cases ask the LLM,
+    and then only about the top few chunks.
+    """
+    decision, llm_context, retry = grade_request(state)
+    if decision is not None:
+        return decision
+    return "generate" if llm_grade(state["question"], llm_context, state["model_choice"]) else retry
 
 def handle_give_up(state):
     """
@@ -263,51 +558,122 @@ def handle_give_up(state):
     """
     return {**state, "answer": "I'm sorry, but I was unable to find a relevant answer in the documents after several attempts."}
 
-def deconstruct_query(state):
-    """
-    Deconstructs a comparison query into a list of sub-queries.
-    """
-    question = state["question"]
-    model_choice = state["model_choice"]
+def plan_prompts(question: str):
+    """Returns the (system, user) prompts that break a comparison request into search queries."""
     system_prompt = "You are an expert at deconstructing comparison questions."
     user_prompt = (
         "A user wants to compare things. Break their request into simple search queries. "
         "Return a JSON object with a single key 'plan' containing a list of strings."
         f"\n\nUser Request: \"{question}\""
     )
-    
-    response_str = get_llm_response(model_choice, system_prompt, user_prompt, json_mode=True, max_tokens=500)
+    return system_prompt, user_prompt
+
+def normalize_plan(plan) -> list:
+    """
+    Returns the plan as a list of distinct, non-empty search strings in plan order. Models
+    sometimes return a bare string or items such as {"query": ...}; anything else is dropped.
+    """
+    if isinstance(plan, str):
+        plan = [plan]
+    if not isinstance(plan, list):
+        return []
+    sub_queries = []
+    for item in plan:
+        if isinstance(item, dict):
+            item = item.get("query") or item.get("search_query") or next((v for v in item.values() if isinstance(v, str)), None)
+        if isinstance(item, (int, float)) and not isinstance(item, bool):
+            item = str(item)
+        if isinstance(item, str) and item.strip():
+            sub_queries.append(item.strip())
+    return list(dict.fromkeys(sub_queries))
+
+def parse_plan(response_str: str) -> list:
     try:
-        plan = json.loads(response_str).get("plan", [])
+        return normalize_plan(json.loads(response_str).get("plan", []))
     except (json.JSONDecodeError, AttributeError):
-        plan = []
+        return []
 
-    return {**state, "plan": plan}
+def merge_comparison(outcomes) -> dict:
+    """
+    Builds the comparison state update from (sub_query, context, citations) outcomes in plan
+    order; citations keep the order in which the sub-queries first cite each document.
+    """
+    aggregated_context = {sub_query: context for sub_query, context, _ in outcomes}
+    citations = list(dict.fromkeys(citation for _, _, cited in outcomes for citation in cited))
+    return {"aggregated_context": aggregated_context, "citations": citations}
+
+def deconstruct_query(state):
+    """
+    Deconstructs a comparison query into a list of sub-queries.
+    """
+    system_prompt, user_prompt = plan_prompts(state["question"])
+    response_str = get_llm_response(state["model_choice"], system_prompt, user_prompt, json_mode=True, max_tokens=500)
+    return {**state, "plan": parse_plan(response_str)}
 
 def retrieve_for_comparison(state):
     """
-    Retrieves context for each sub-query in the plan.
+    Retrieves context for every sub-query in the plan concurrently, keeping plan order.
+    Each sub-query gets COMPARISON_SUBQUERY_TIMEOUT from the moment a worker picks it up, and
+    at most as long again to wait for a worker on the shared pool; one that fails or runs out
+    of time contributes an empty context and stops before its next database statement.
     """
-    plan = state["plan"]
     model_choice = state["model_choice"]
-    aggregated_context = {}
-    all_citations = set()
-
-    for sub_query in plan:
-        # Reuse the existing retrieve_context logic for each sub-query
-        retrieval_state = retrieve_context({"question": sub_query, "model_choice": model_choice})
-        aggregated_context[sub_query] = retrieval_state.get("context", "")
-        all_citations.update(retrieval_state.get("citations", []))
-
-    return {**state, "aggregated_context": aggregated_context, "citations": list(all_citations)}
-
-def synthesize_comparison(state):
+    sub_queries = normalize_plan(state.get("plan"))
+    started = {}
+    cancelled = [threading.Event() for _ in sub_queries]
+
+    def run(index, sub_query):
+        started[index] = time.monotonic()
+        return search_context(sub_query, model_choice, intent="comparison", cancelled=cancelled[index])
+
+    # Each sub-query runs in a copy of this context so its spans stay under this node
+    submitted = time.monotonic()
+    futures = [
+        _comparison_executor.submit(contextvars.copy_context().run, run, index, sub_query)
+        for index, sub_query in enumerate(sub_queries)
+    ]
+    pending = set(range(len(futures)))
+    timed_out = set()
+    while pending:
+        now = time.monotonic()
+        for index in pending:
+            start = started.get(index)
+            if start is None:
+                # Still queued behind other work; one that a worker picks up meanwhile gets its own budget
+                if now >= submitted + COMPARISON_SUBQUERY_TIMEOUT and futures[index].cancel():
+                    timed_out.add(index)
+            elif now >= start + COMPARISON_SUBQUERY_TIMEOUT:
+                cancelled[index].set()
+                timed_out.add(index)
+        pending -= timed_out
+        if pending:
+            next_deadline = min(started.get(index, submitted) for index in pending) + COMPARISON_SUBQUERY_TIMEOUT
+            wait([futures[index] for index in pending], timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+            pending = {index for index in pending if not futures[index].done()}
+
+    outcomes = [comparison_outcome(sub_query, futures[index].result, index in timed_out)
+                for index, sub_query in enumerate(sub_queries)]
+    return {**state, **merge_comparison(outcomes)}
+
+def comparison_outcome(sub_query: str, result, timed_out: bool):
     """
-    Synthesizes a comparison answer from the aggregated context.
+    Returns (sub_query, context, citations) for a finished sub-query, calling result() for its
+    search_context result. One that timed out or failed is reported and contributes nothing.
     """
+    if timed_out:
+        notify(f"Retrieval timed out for '{sub_query}'; comparing without it.", "warning")
+        return sub_query, "", []
+    try:
+        context, citations, _, _ = result()
+    except Exception as e:
+        notify(f"Retrieval failed for '{sub_query}': {e}", "warning")
+        return sub_query, "", []
+    return sub_query, context, citations
+
+def comparison_prompts(state):
+    """Returns the (system, user) prompts for the comparative analysis of the aggregated context."""
     question = state["question"]
     aggregated_context = state["aggregated_context"]
-    model_choice = state["model_choice"]
 
     system_prompt = "You are an expert analyst. Perform a detailed comparative analysis of the information provided."
     
@@ -322,17 +688,20 @@ def synthesize_comparison(state):
         "Provide a comprehensive comparison based ONLY on the contexts above. "
         "Identify key similarities and differences. If information is missing for any part of the comparison, state that explicitly."
     )
+    return system_prompt, user_prompt
 
-    answer = get_llm_response(model_choice, system_prompt, user_prompt, max_tokens=1200)
-    return {**state, "answer": answer}
-
-def run_summarization(state):
+def synthesize_comparison(state):
     """
-    Generates a summary of the retrieved context.
+    Synthesizes a comparison answer from the aggregated context.
     """
+    system_prompt, user_prompt = comparison_prompts(state)
+    answer = stream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=1200)
+    return {**state, "answer": answer}
+
+def summarization_prompts(state):
+    """Returns the (system, user) prompts summarizing the retrieved context."""
     question = state["question"]
     context = state["context"]
-    model_choice = state["model_choice"]
 
     system_prompt = "You are a document summarization expert."
     user_prompt = (
@@ -343,17 +712,20 @@ def run_summarization(state):
         f"User's Request: \"{question}\"\n\n"
         "Generate the output now."
     )
+    return system_prompt, user_prompt
 
-    answer = get_llm_response(model_choice, system_prompt, user_prompt, max_tokens=1000)
-    return {**state, "answer": answer}
-
-def run_training_generation(state):
+def run_summarization(state):
     """
-    Generates training materials based on the retrieved context.
+    Generates a summary of the retrieved context.
     """
+    system_prompt, user_prompt = summarization_prompts(state)
+    answer = stream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=1000)
+    return {**state, "answer": answer}
+
+def training_prompts(state):
+    """Returns the (system, user) prompts generating training material from the retrieved context."""
     question = state["question"]
     context = state["context"]
-    model_choice = state["model_choice"]
 
     system_prompt = "You are a corporate trainer and content creator."
     user_prompt = (
@@ -367,6 +739,12 @@ def run_training_generation(state):
         "- **Dos and Don'ts List**\n\n"
         "Generate the output now."
     )
+    return system_prompt, user_prompt
 
-    answer = get_llm_response(model_choice, system_prompt, user_prompt, max_tokens=1000)
+def run_training_generation(state):
+    """
+    Generates training materials based on the retrieved context.
+    """
+    system_prompt, user_prompt = training_prompts(state)
+    answer = stream_llm_response(state["model_choice"], system_prompt, user_prompt, max_tokens=1000)
     return {**state, "answer": answer}
@@ -0,0 +1,249 @@
+"""
+Object Storage uploads that stream a file once: its size and SHA-256 are computed while
+parts are read (unless the caller already has the digest), and the parts are uploaded in
+parallel as a multipart upload.
+
+Memory stays at about (part_workers + 1) * part_size however large the file is. Uploads
+that fail part-way stay open in the store; uploading the same object again resumes them,
+sending only the parts whose MD5 differs from what the store already has.
+
+OCIObjectStore talks to an OCI bucket; LocalObjectStore keeps objects in a directory and
+stands in for it in benchmarks and offline runs.
+"""
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import OBJECT_STORAGE_PART_SIZE, OBJECT_STORAGE_PART_WORKERS
+
+
+def part_md5(data) -> str:
+    """Base64 MD5 of a part, the form Object Storage reports and verifies."""
+    return base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+
+class OCIObjectStore:
+    """Multipart uploads to an OCI Object Storage bucket."""
+
+    def __init__(self, client, namespace: str, bucket: str):
+        self.client = client
+        self.namespace = namespace
+        self.bucket = bucket
+
+    def put(self, name: str, data: bytes):
+        self.client.put_object(self.namespace, self.bucket, name, data, content_md5=part_md5(data))
+
+    def find_upload(self, name: str):
+        import oci
+        uploads = oci.pagination.list_call_get_all_results(
+            self.client.list_multipart_uploads, self.namespace, self.bucket
+        ).data
+        return next((upload.upload_id for upload in uploads if upload.object == name), None)
+
+    def list_parts(self, name: str, upload_id: str):
+        import oci
+        parts = oci.pagination.list_call_get_all_results(
+            self.client.list_multipart_upload_parts, self.namespace, self.bucket, name, upload_id
+        ).data
+        return {part.part_number: (part.md5, part.etag) for part in parts}
+
+    def create_upload(self, name: str) -> str:
+        from oci.object_storage.models import CreateMultipartUploadDetails
+        details = CreateMultipartUploadDetails(object=name)
+        return self.client.create_multipart_upload(self.namespace, self.bucket, details).data.upload_id
+
+    def upload_part(self, name: str, upload_id: str, part_num: int, data: bytes, md5: str) -> str:
+        response = self.client.upload_part(
+            self.namespace, self.bucket, name, upload_id, part_num, data, content_md5=md5
+        )
+        return response.headers["etag"]
+
+    def commit_upload(self, name: str, upload_id: str, parts):
+        from oci.object_storage.models import CommitMultipartUploadDetails, CommitMultipartUploadPartDetails
+        details = CommitMultipartUploadDetails(
+            parts_to_commit=[CommitMultipartUploadPartDetails(part_num=num, etag=etag) for num, etag in parts]
+        )
+        self.client.commit_multipart_upload(self.namespace, self.bucket, name, upload_id, details)
+
+    def abort_upload(self, name: str, upload_id: str):
+        self.client.abort_multipart_upload(self.namespace, self.bucket, name, upload_id)
+
+
+class LocalObjectStore:
+    """
+    The multipart upload interface of OCIObjectStore over a local directory.
+    Open uploads live under .uploads/ until they are committed or aborted.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._uploads = os.path.join(root, ".uploads")
+        os.makedirs(self._uploads, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def get(self, name: str) -> bytes:
+        with open(self.path(name), "rb") as f:
+            return f.read()
+
+    def _write(self, name: str, chunks):
+        fd, tmp = tempfile.mkstemp(dir=self.root)
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, self.path(name))
+
+    def put(self, name: str, data: bytes):
+        self._write(name, [data])
+
+    def find_upload(self, name: str):
+        for upload_id in sorted(os.listdir(self._uploads)):
+            try:
+                with open(os.path.join(self._uploads, upload_id, "object"), encoding="utf-8") as f:
+                    if f.read() == name:
+                        return upload_id
+            except FileNotFoundError:
+                continue
+        return None
+
+    def list_parts(self, name: str, upload_id: str):
+        folder = os.path.join(self._uploads, upload_id)
+        parts = {}
+        for entry in os.listdir(folder):
+            if entry.endswith(".md5"):
+                num = int(entry[len("part-"):-len(".md5")])
+                with open(os.path.join(folder, entry), encoding="ascii") as f:
+                    md5 = f.read()
+                parts[num] = (md5, md5)
+        return parts
+
+    def create_upload(self, name: str) -> str:
+        upload_id = uuid.uuid4().hex
+        folder = os.path.join(self._uploads, upload_id)
+        os.makedirs(folder)
+        with open(os.path.join(folder, "object"), "w", encoding="utf-8") as f:
+            f.write(name)
+        return upload_id
+
+    def upload_part(self, name: str, upload_id: str, part_num: int, data: bytes, md5: str) -> str:
+        if part_md5(data) != md5:
+            raise ValueError(f"MD5 mismatch for part {part_num} of {name}")
+        part = os.path.join(self._uploads, upload_id, f"part-{part_num}")
+        with open(part, "wb") as f:
+            f.write(data)
+        # The checksum is written last, so a part only counts as uploaded once its data is complete
+        with open(part + ".md5", "w", encoding="ascii") as f:
+            f.write(md5)
+        return md5
+
+    def commit_upload(self, name: str, upload_id: str, parts):
+        folder = os.path.join(self._uploads, upload_id)
+
+        def read_parts():
+            for num, _ in sorted(parts):
+                with open(os.path.join(folder, f"part-{num}"), "rb") as f:
+                    while chunk := f.read(1024 * 1024):
+                        yield chunk
+
+        self._write(name, read_parts())
+        shutil.rmtree(folder)
+
+    def abort_upload(self, name: str, upload_id: str):
+        shutil.rmtree(os.path.join(self._uploads, upload_id), ignore_errors=True)
+
+
+def upload_stream(store, name: str, stream, size: int = None, part_size: int = OBJECT_STORAGE_PART_SIZE,
+                  part_workers: int = OBJECT_STORAGE_PART_WORKERS, progress=None, before_commit=None,
+                  resume: bool = True, sha256: str = None):
+    """
+    Uploads a readable binary stream to store as name in a single pass.
+
+    Objects that fit in one part are sent with a single put. Larger ones become a multipart
+    upload with up to part_workers parts in flight; with resume, an open upload of the same
+    object is continued and parts the store already holds are not sent again.
+    progress(bytes_done, size) is called from the uploading threads as parts complete.
+    before_commit(size, sha256), if given, is called once the whole stream has been read and
+    hashed; returning False abandons the upload (e.g. for a duplicate) and nothing is stored.
+    sha256, if the caller already has the content's hex digest, is used instead of hashing
+    the stream again.
+
+    Returns {"size", "sha256", "parts", "resumed_parts", "committed"}. Failed uploads raise
+    and are left open so a later call can resume them.
+    """
+    report = progress or (lambda done, total: None)
+    hasher = None if sha256 else hashlib.sha256()
+    part = stream.read(part_size)
+    if hasher:
+        hasher.update(part)
+    result = {"size": len(part), "sha256": sha256, "parts": 1, "resumed_parts": 0, "committed": False}
+
+    if len(part) < part_size:
+        if hasher:
+            result["sha256"] = hasher.hexdigest()
+        if before_commit is not None and not before_commit(result["size"], result["sha256"]):
+            return result
+        store.put(name, part)
+        report(result["size"], result["size"])
+        result["committed"] = True
+        return result
+
+    upload_id = store.find_upload(name) if resume else None
+    existing = store.list_parts(name, upload_id) if upload_id else {}
+    if upload_id is None:
+        upload_id = store.create_upload(name)
+
+    etags = {}
+    done = [0]
+    lock = threading.Lock()
+    # Bounds the parts held in memory: one being read plus one per uploading thread
+    slots = threading.BoundedSemaphore(max(1, part_workers))
+
+    def completed(num, etag, length):
+        with lock:
+            etags[num] = etag
+            done[0] += length
+            sent = done[0]
+        report(sent, size)
+
+    def send(num, data, md5):
+        try:
+            completed(num, store.upload_part(name, upload_id, num, data, md5), len(data))
+        finally:
+            slots.release()
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, part_workers), thread_name_prefix="upload-part") as pool:
+        num = 1
+        while part:
+            md5 = part_md5(part)
+            if num in existing and existing[num][0] == md5:
+                result["resumed_parts"] += 1
+                completed(num, existing[num][1], len(part))
+            else:
+                slots.acquire()
+                futures.append(pool.submit(send, num, part, md5))
+            part = stream.read(part_size)
+            if part:
+                if hasher:
+                    hasher.update(part)
+                result["size"] += len(part)
+                num += 1
+        result["parts"] = num
+    for future in futures:
+        future.result()  # re-raise the first failed part; the upload stays open for resuming
+
+    if hasher:
+        result["sha256"] = hasher.hexdigest()
+    if before_commit is not None and not before_commit(result["size"], result["sha256"]):
+        store.abort_upload(name, upload_id)
+        return result
+    store.commit_upload(name, upload_id, sorted(etags.items()))
+    result["committed"] = True
+    return result
+
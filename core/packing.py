@@ -0,0 +1,120 @@
+import threading
+
+import numpy as np
+from config import (
+    QWEN3_CONTEXT_LIMIT_TOKENS,
+    OCI_GENAI_CONTEXT_LIMIT_TOKENS,
+    QWEN_TOKENIZER,
+    OCI_GENAI_TOKENIZER,
+    CHARS_PER_TOKEN,
+    PACK_DEDUP_SIMILARITY,
+    PACK_MMR_LAMBDA,
+)
+
+# Context budget and tokenizer for each model choice
+MODEL_BUDGETS = {
+    "Qwen": {"limit_tokens": QWEN3_CONTEXT_LIMIT_TOKENS, "tokenizer": QWEN_TOKENIZER},
+    "OCI GenAI": {"limit_tokens": OCI_GENAI_CONTEXT_LIMIT_TOKENS, "tokenizer": OCI_GENAI_TOKENIZER},
+}
+
+_token_counters = {}
+_token_counters_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for models without a local tokenizer."""
+    return max(1, round(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+def _load_token_counter(tokenizer_name: str):
+    if not tokenizer_name:
+        return estimate_tokens
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    except Exception as e:
+        print(f"Tokenizer '{tokenizer_name}' unavailable, estimating tokens from characters: {e}")
+        return estimate_tokens
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+def get_token_counter(model_choice: str):
+    """
+    Returns a function counting tokens the way model_choice does, loading its tokenizer once per process.
+    Falls back to a character-based estimate when no tokenizer is configured or it cannot be loaded.
+    """
+    counter = _token_counters.get(model_choice)
+    if counter is None:
+        with _token_counters_lock:
+            if model_choice not in _token_counters:
+                _token_counters[model_choice] = _load_token_counter(MODEL_BUDGETS.get(model_choice, {}).get("tokenizer", ""))
+            counter = _token_counters[model_choice]
+    return counter
+
+def get_token_budget(model_choice: str) -> int:
+    """Returns the number of context tokens available to model_choice."""
+    return MODEL_BUDGETS.get(model_choice, MODEL_BUDGETS["Qwen"])["limit_tokens"]
+
+def format_chunk(text: str) -> str:
+    """The form a chunk takes in the prompt."""
+    return f"Content: {text}\n\n"
+
+def _unit_rows(embeddings):
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def pack_context(candidates, model_choice: str, budget_tokens: int = None,
+                 dedup_similarity: float = PACK_DEDUP_SIMILARITY, mmr_lambda: float = PACK_MMR_LAMBDA):
+    """
+    Selects chunks for the prompt within a token budget.
+
+    candidates are dicts with "text" and "distance" (cosine distance to the query) and,
+    optionally, "embedding" and a "relevance" score (e.g. from a reranker) that replaces
+    1 - distance. Chunks are chosen by maximal marginal relevance among the chunks that
+    still fit, so a long chunk that overflows is skipped rather than ending the fill.
+    Near-duplicates of a packed chunk (identical text, or embeddings at least
+    dedup_similarity alike) are dropped. Returns (selected, report); selected keeps the
+    chosen candidates in pick order and report has the budget, tokens used, utilization and counts.
+    """
+    budget = get_token_budget(model_choice) if budget_tokens is None else budget_tokens
+    count_tokens = get_token_counter(model_choice)
+    report = {"budget_tokens": budget, "used_tokens": 0, "utilization": 0.0,
+              "candidates": len(candidates), "duplicates": 0, "selected": 0}
+    if not candidates:
+        return [], report
+
+    relevance = np.array([float(c.get("relevance", 1.0 - float(c["distance"]))) for c in candidates], dtype=np.float32)
+    has_embeddings = all(c.get("embedding") is not None for c in candidates)
+    similarity = None
+    if has_embeddings:
+        vectors = _unit_rows([c["embedding"] for c in candidates])
+        similarity = vectors @ vectors.T
+
+    text_keys = [" ".join(c["text"].split()) for c in candidates]
+    costs = [count_tokens(format_chunk(c["text"])) for c in candidates]
+    remaining = budget
+    selected, pool = [], list(range(len(candidates)))
+    while pool:
+        fitting = [i for i in pool if costs[i] <= remaining]
+        if not fitting:
+            break
+        if similarity is not None and selected:
+            redundancy = similarity[np.ix_(fitting, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(fitting), dtype=np.float32)
+        scores = mmr_lambda * relevance[fitting] - (1 - mmr_lambda) * redundancy
+        best = fitting[int(np.argmax(scores))]
+        selected.append(best)
+        remaining -= costs[best]
+        # Near-duplicates of a packed chunk would only repeat it
+        duplicates = [
+            i for i in pool if i != best and (
+                text_keys[i] == text_keys[best]
+                or (similarity is not None and similarity[i, best] >= dedup_similarity)
+            )
+        ]
+        report["duplicates"] += len(duplicates)
+        pool = [i for i in pool if i != best and i not in duplicates]
+
+    used = budget - remaining
+    report.update({"used_tokens": used, "utilization": used / budget if budget else 0.0, "selected": len(selected)})
+    return [candidates[i] for i in selected], report
@@ -0,0 +1,63 @@
+import math
+import threading
+
+from config import (
+    RERANK_MODEL_NAME,
+    RERANK_BATCH_SIZE,
+    RERANK_TOP_K,
+)
+
+
+class Reranker:
+    """
+    Scores (question, chunk) pairs with a small sentence-transformers cross-encoder on the CPU
+    and keeps the best chunks. Scores are squashed to 0..1 and stored on each chunk as "relevance".
+    """
+
+    def __init__(self, model=None, model_name: str = RERANK_MODEL_NAME, batch_size: int = RERANK_BATCH_SIZE):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, device="cpu")
+        self.model = model
+        self.batch_size = batch_size
+
+    def score(self, question: str, texts) -> list:
+        """Returns one relevance score in 0..1 per text."""
+        if not texts:
+            return []
+        pairs = [(question, text) for text in texts]
+        logits = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return [1.0 / (1.0 + math.exp(-float(logit))) for logit in logits]
+
+    def rerank(self, question: str, chunks, top_k: int = RERANK_TOP_K):
+        """Returns the top_k chunks by cross-encoder relevance, best first, each with a "relevance" key."""
+        scores = self.score(question, [chunk["text"] for chunk in chunks])
+        ranked = sorted(
+            ({**chunk, "relevance": score} for chunk, score in zip(chunks, scores)),
+            key=lambda chunk: chunk["relevance"],
+            reverse=True,
+        )
+        return ranked[:top_k]
+
+
+_reranker = None
+_reranker_failed = False
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """
+    Returns the process-wide reranker, loading the model on first use and keeping it in memory.
+    Returns None when the model cannot be loaded, so callers keep the vector-distance order.
+    """
+    global _reranker, _reranker_failed
+    if _reranker_failed:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None and not _reranker_failed:
+                try:
+                    _reranker = Reranker()
+                except Exception as e:
+                    print(f"Reranker unavailable, keeping vector-distance order: {e}")
+                    _reranker_failed = True
+    return _reranker
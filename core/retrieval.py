@@ -0,0 +1,359 @@
+import array
+import asyncio
+import threading
+import time
+from functools import lru_cache
+
+from core.cache import get_corpus_version
+from core.generations import ACTIVE_GENERATION_SQL
+from core.lexical import BM25Index, oracle_text_query, reciprocal_rank_fusion
+from core.telemetry import db_span
+from core.utils import async_db_connection, db_connection
+from config import (
+    LEXICAL_BACKEND,
+    RRF_K,
+    VECTOR_SEARCH_MODE,
+    VECTOR_SEARCH_TARGET_ACCURACY,
+    RETRIEVAL_TOP_CHUNKS,
+    RETRIEVAL_TOP_DOCS,
+    RETRIEVAL_WIDE_TOP_CHUNKS,
+    RETRIEVAL_WIDE_TOP_DOCS,
+)
+
+# Retrieval strategies the retry ladder escalates through, cheapest first
+RETRIEVAL_STRATEGIES = {
+    "vector": {"top_chunks": RETRIEVAL_TOP_CHUNKS, "top_docs": RETRIEVAL_TOP_DOCS, "expand_query": False},
+    "wide": {"top_chunks": RETRIEVAL_WIDE_TOP_CHUNKS, "top_docs": RETRIEVAL_WIDE_TOP_DOCS, "expand_query": False},
+    "expanded": {"top_chunks": RETRIEVAL_WIDE_TOP_CHUNKS, "top_docs": RETRIEVAL_WIDE_TOP_DOCS, "expand_query": True},
+}
+
+SEARCH_SQL_TEMPLATE = """
+    WITH top_chunks AS (
+      SELECT doc_id, chunk_id, chunk_data, chunk_embedding, VECTOR_DISTANCE(chunk_embedding, :query_vector, COSINE) AS distance
+        FROM doc_chunks WHERE generation_id = {active_generation}
+       ORDER BY VECTOR_DISTANCE(chunk_embedding, :query_vector, COSINE) {fetch_clause} ), ranked_docs AS (
+        SELECT doc_id, COUNT(*) AS score FROM top_chunks GROUP BY doc_id ORDER BY score DESC FETCH FIRST :top_docs ROWS ONLY)
+            SELECT tc.doc_id, ds.filename, tc.chunk_id, tc.chunk_data, tc.distance, tc.chunk_embedding
+            FROM top_chunks tc 
+            JOIN ranked_docs rd ON tc.doc_id = rd.doc_id 
+            JOIN documentation_staging ds ON tc.doc_id = ds.id
+            ORDER BY rd.score DESC, tc.distance
+    """
+
+SEARCH_MODES = ("exact", "approx")
+
+@lru_cache(maxsize=None)
+def build_search_sql(mode: str = "exact", target_accuracy: int = VECTOR_SEARCH_TARGET_ACCURACY) -> str:
+    """
+    Returns the retrieval query for a search mode. "exact" scans every chunk; "approx" lets
+    Oracle answer from a vector index (HNSW or IVF) at the given target accuracy, and is
+    executed exactly when no index exists.
+    """
+    if mode == "exact":
+        return SEARCH_SQL_TEMPLATE.format(fetch_clause="FETCH EXACT FIRST :top_chunks ROWS ONLY",
+                                          active_generation=ACTIVE_GENERATION_SQL)
+    if mode == "approx":
+        # Spliced into the SQL text, so only a bounded integer is accepted
+        accuracy = int(target_accuracy)
+        if not 1 <= accuracy <= 100:
+            raise ValueError(f"Target accuracy must be between 1 and 100, got {target_accuracy}")
+        return SEARCH_SQL_TEMPLATE.format(
+            fetch_clause=f"FETCH APPROX FIRST :top_chunks ROWS ONLY WITH TARGET ACCURACY {accuracy}",
+            active_generation=ACTIVE_GENERATION_SQL,
+        )
+    raise ValueError(f"Unknown vector search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}")
+
+VECTOR_SEARCH_SQL = build_search_sql("exact")
+
+_search_stats = {"exact": 0, "approx": 0, "fallbacks": 0}
+_search_stats_lock = threading.Lock()
+
+def get_search_stats() -> dict:
+    """Returns how many searches ran in each mode and how many approximate searches fell back to exact."""
+    with _search_stats_lock:
+        return dict(_search_stats)
+
+def _record_search(mode: str, fallback: bool = False):
+    with _search_stats_lock:
+        _search_stats[mode] += 1
+        if fallback:
+            _search_stats["fallbacks"] += 1
+
+TEXT_SEARCH_SQL = f"""
+    SELECT dc.doc_id, ds.filename, dc.chunk_id, dc.chunk_data,
+           VECTOR_DISTANCE(dc.chunk_embedding, :query_vector, COSINE) AS distance, dc.chunk_embedding
+      FROM doc_chunks dc
+      JOIN documentation_staging ds ON dc.doc_id = ds.id
+     WHERE CONTAINS(dc.chunk_data, :text_query, 1) > 0
+       AND dc.generation_id = {ACTIVE_GENERATION_SQL}
+     ORDER BY SCORE(1) DESC
+     FETCH FIRST :top_chunks ROWS ONLY
+    """
+
+CHUNK_TEXT_SQL = f"SELECT doc_id, chunk_id, chunk_data FROM doc_chunks WHERE generation_id = {ACTIVE_GENERATION_SQL}"
+
+def as_vector(embedding):
+    """Converts an embedding to the float32 array python-oracledb binds as a VECTOR."""
+    if isinstance(embedding, array.array) and embedding.typecode == "f":
+        return embedding
+    return array.array("f", embedding)
+
+def search_chunks(query_vector, top_chunks: int = RETRIEVAL_TOP_CHUNKS, top_docs: int = RETRIEVAL_TOP_DOCS,
+                  mode: str = VECTOR_SEARCH_MODE, target_accuracy: int = VECTOR_SEARCH_TARGET_ACCURACY):
+    """
+    Vector search over doc_chunks with a pre-computed query embedding bound as a parameter.
+    The nearest top_chunks chunks are grouped by document and the top_docs best-represented
+    documents are kept. An approximate search that fails (e.g. an unusable index) is retried exactly.
+    Returns (doc_id, filename, chunk_id, chunk_data, distance, chunk_embedding) rows, best documents first.
+    Raises on database errors; returns [] if no connection is available.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown vector search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}")
+    binds = {'query_vector': as_vector(query_vector), 'top_chunks': top_chunks, 'top_docs': top_docs}
+    with db_span("vector_search", **{"db.search_mode": mode, "db.top_chunks": top_chunks}) as query, db_connection() as conn:
+        if not conn:
+            return []
+
+        cursor = conn.cursor()
+        try:
+            if mode == "approx":
+                try:
+                    cursor.execute(build_search_sql("approx", target_accuracy), binds)
+                    rows = cursor.fetchall()
+                    _record_search("approx")
+                    query.set("db.rows", len(rows))
+                    return rows
+                except Exception as e:
+                    print(f"Approximate vector search failed, falling back to exact search: {e}")
+                    cursor.close()
+                    cursor = conn.cursor()
+                    _record_search("exact", fallback=True)
+                    query.set("db.fallback", True)
+            else:
+                _record_search("exact")
+            cursor.execute(VECTOR_SEARCH_SQL, binds)
+            rows = cursor.fetchall()
+            query.set("db.rows", len(rows))
+            return rows
+        finally:
+            cursor.close()
+
+async def asearch_chunks(query_vector, top_chunks: int = RETRIEVAL_TOP_CHUNKS, top_docs: int = RETRIEVAL_TOP_DOCS,
+                         mode: str = VECTOR_SEARCH_MODE, target_accuracy: int = VECTOR_SEARCH_TARGET_ACCURACY):
+    """Async counterpart of search_chunks."""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown vector search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}")
+    binds = {'query_vector': as_vector(query_vector), 'top_chunks': top_chunks, 'top_docs': top_docs}
+    with db_span("vector_search", **{"db.search_mode": mode, "db.top_chunks": top_chunks}) as query:
+        async with async_db_connection() as conn:
+            if not conn:
+                return []
+            if mode == "approx":
+                try:
+                    with conn.cursor() as cursor:
+                        await cursor.execute(build_search_sql("approx", target_accuracy), binds)
+                        rows = await cursor.fetchall()
+                    _record_search("approx")
+                    query.set("db.rows", len(rows))
+                    return rows
+                except Exception as e:
+                    print(f"Approximate vector search failed, falling back to exact search: {e}")
+                    _record_search("exact", fallback=True)
+                    query.set("db.fallback", True)
+            else:
+                _record_search("exact")
+            with conn.cursor() as cursor:
+                await cursor.execute(VECTOR_SEARCH_SQL, binds)
+                rows = await cursor.fetchall()
+            query.set("db.rows", len(rows))
+            return rows
+
+# Set when Oracle Text reports that doc_chunks has no text index; text searches are then skipped
+# until enable_text_search() is called or TEXT_INDEX_RECHECK_SECONDS have passed (the index may
+# have been built by another process)
+TEXT_INDEX_RECHECK_SECONDS = 300
+_text_index_missing_at = None
+_bm25_lock = threading.Lock()
+_bm25_index = None
+_bm25_version = None
+
+def enable_text_search():
+    """Re-enables Oracle Text searches, e.g. after the text index has been created."""
+    global _text_index_missing_at
+    _text_index_missing_at = None
+
+def _text_search_enabled() -> bool:
+    missing_at = _text_index_missing_at
+    return missing_at is None or time.monotonic() - missing_at >= TEXT_INDEX_RECHECK_SECONDS
+
+def is_text_index_error(error) -> bool:
+    """True for errors raised by Oracle Text itself (ORA-20000 / DRG-*), e.g. DRG-10599 when the column has no text index."""
+    code = getattr(error.args[0], "full_code", "") if error.args else ""
+    return code == "ORA-20000" or "DRG-" in str(error)
+
+def _text_search_failed(error):
+    global _text_index_missing_at
+    if is_text_index_error(error):
+        if _text_index_missing_at is None:
+            print(f"Oracle Text search unavailable, skipping the lexical search until a text index is built: {error}")
+        _text_index_missing_at = time.monotonic()
+    else:
+        # Transient (e.g. a dropped connection): this question is answered from the vector search alone
+        print(f"Oracle Text search failed: {error}")
+
+def get_corpus_bm25():
+    """
+    Returns an in-process BM25 index over every chunk's text, keyed by (doc_id, chunk_id).
+    It is built on first use and rebuilt when the corpus version changes; each process holds
+    the whole corpus text, so it is only used when LEXICAL_BACKEND is "bm25".
+    """
+    global _bm25_index, _bm25_version
+    version = get_corpus_version()
+    with _bm25_lock:
+        if _bm25_index is None or _bm25_version != version:
+            with db_span("chunk_scan") as query, db_connection() as conn:
+                if not conn:
+                    return BM25Index()
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(CHUNK_TEXT_SQL)
+                    index = BM25Index()
+                    for doc_id, chunk_id, chunk_data in cursor:
+                        index.add((doc_id, chunk_id), str(chunk_data))
+                    query.set("db.rows", len(index))
+                finally:
+                    cursor.close()
+            _bm25_index, _bm25_version = index, version
+        return _bm25_index
+
+def _fetch_chunks_query(keys, query_vector):
+    binds = {'query_vector': as_vector(query_vector)}
+    conditions = []
+    for i, (doc_id, chunk_id) in enumerate(keys):
+        conditions.append(f"(dc.doc_id = :d{i} AND dc.chunk_id = :c{i})")
+        binds[f"d{i}"], binds[f"c{i}"] = doc_id, chunk_id
+    sql = f"""
+        SELECT dc.doc_id, ds.filename, dc.chunk_id, dc.chunk_data,
+               VECTOR_DISTANCE(dc.chunk_embedding, :query_vector, COSINE) AS distance, dc.chunk_embedding
+          FROM doc_chunks dc
+          JOIN documentation_staging ds ON dc.doc_id = ds.id
+         WHERE ({" OR ".join(conditions)})
+           AND dc.generation_id = {ACTIVE_GENERATION_SQL}
+        """
+    return sql, binds
+
+def fetch_chunks(keys, query_vector):
+    """
+    Returns rows shaped like search_chunks for the given (doc_id, chunk_id) keys of the active
+    corpus generation, in key order, with each chunk's distance to the query vector.
+    """
+    if not keys:
+        return []
+    sql, binds = _fetch_chunks_query(keys, query_vector)
+    with db_span("fetch_chunks") as query, db_connection() as conn:
+        if not conn:
+            return []
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, binds)
+            rows = {(row[0], row[2]): row for row in cursor.fetchall()}
+            query.set("db.rows", len(rows))
+        finally:
+            cursor.close()
+    return [rows[key] for key in keys if key in rows]
+
+async def afetch_chunks(keys, query_vector):
+    """Async counterpart of fetch_chunks."""
+    if not keys:
+        return []
+    sql, binds = _fetch_chunks_query(keys, query_vector)
+    with db_span("fetch_chunks") as query:
+        async with async_db_connection() as conn:
+            if not conn:
+                return []
+            with conn.cursor() as cursor:
+                await cursor.execute(sql, binds)
+                rows = {(row[0], row[2]): row for row in await cursor.fetchall()}
+            query.set("db.rows", len(rows))
+    return [rows[key] for key in keys if key in rows]
+
+def lexical_search(question: str, query_vector, top_chunks: int = RETRIEVAL_TOP_CHUNKS, backend: str = LEXICAL_BACKEND):
+    """
+    Full-text search over chunk text, best matches first, in the same row shape as search_chunks.
+    "oracle_text" uses the CONTEXT index on doc_chunks.chunk_data and returns [] while there is
+    none or the search fails; "bm25" uses an in-process index over all chunk text; "none" returns [].
+    """
+    if backend == "none" or not oracle_text_query(question):
+        return []
+    if backend == "oracle_text":
+        if not _text_search_enabled():
+            return []
+        with db_span("text_search") as query, db_connection() as conn:
+            if not conn:
+                return []
+            cursor = conn.cursor()
+            try:
+                cursor.execute(TEXT_SEARCH_SQL, {
+                    'query_vector': as_vector(query_vector),
+                    'text_query': oracle_text_query(question),
+                    'top_chunks': top_chunks,
+                })
+                rows = cursor.fetchall()
+                query.set("db.rows", len(rows))
+                enable_text_search()
+                return rows
+            except Exception as e:
+                _text_search_failed(e)
+                return []
+            finally:
+                cursor.close()
+    hits = get_corpus_bm25().search(question, top_chunks)
+    return fetch_chunks([key for key, _ in hits], query_vector)
+
+async def alexical_search(question: str, query_vector, top_chunks: int = RETRIEVAL_TOP_CHUNKS, backend: str = LEXICAL_BACKEND):
+    """Async counterpart of lexical_search; the BM25 index is (re)built on a worker thread."""
+    if backend == "none" or not oracle_text_query(question):
+        return []
+    if backend == "oracle_text":
+        if not _text_search_enabled():
+            return []
+        with db_span("text_search") as query:
+            async with async_db_connection() as conn:
+                if not conn:
+                    return []
+                try:
+                    with conn.cursor() as cursor:
+                        await cursor.execute(TEXT_SEARCH_SQL, {
+                            'query_vector': as_vector(query_vector),
+                            'text_query': oracle_text_query(question),
+                            'top_chunks': top_chunks,
+                        })
+                        rows = await cursor.fetchall()
+                    query.set("db.rows", len(rows))
+                    enable_text_search()
+                    return rows
+                except Exception as e:
+                    _text_search_failed(e)
+                    return []
+    index = await asyncio.to_thread(get_corpus_bm25)
+    hits = index.search(question, top_chunks)
+    return await afetch_chunks([key for key, _ in hits], query_vector)
+
+def fuse_rows(vector_rows, lexical_rows, lexical_weight: float, limit: int, k: int = RRF_K):
+    """
+    Fuses vector and lexical result rows with weighted reciprocal rank fusion.
+    Returns up to limit (row, relevance) pairs, best first, with relevance scaled so the best is 1.0.
+    """
+    rows = {}
+    for row in list(vector_rows) + list(lexical_rows):
+        rows.setdefault((row[0], row[2]), row)
+    fused = reciprocal_rank_fusion(
+        {
+            "vector": [(row[0], row[2]) for row in vector_rows],
+            "lexical": [(row[0], row[2]) for row in lexical_rows],
+        },
+        weights={"vector": 1.0 - lexical_weight, "lexical": lexical_weight},
+        k=k,
+    )[:limit]
+    top = fused[0][1] if fused else 1.0
+    return [(rows[key], score / top) for key, score in fused]
@@ -0,0 +1,478 @@
+"""
+HTTP query service: the RAG graph behind a stateless JSON API, so question answering scales
+separately from the Streamlit UI.
+
+Every request carries the whole turn (question, chat history, model and graph variant), so any
+worker of any replica can answer it and replicas can sit behind a plain round-robin load
+balancer. Each worker process runs the async graph on one event loop with its own database pool,
+LLM HTTP sessions and embedding and answer caches, and compiles the graphs and loads the intent
+(and rerank) models before it accepts requests.
+
+Endpoints:
+    GET  /healthz            liveness and readiness for the load balancer
+    GET  /metrics            Prometheus metrics of this worker
+    POST /v1/query           {"question", "chat_history"?, "model_choice"?, "variant"?, "timings"?} -> answer record
+    POST /v1/query/stream    same body; Server-Sent Events "node" and "token" as the turn runs, then "result" or "error"
+    GET  /v1/ingest/status   counts for the active corpus and every corpus generation
+    POST /v1/ingest          multipart "files" (and "fresh"=true to rebuild); Server-Sent Events
+                             "progress" per file and stage, then "result" (ingestion stats) or "error"
+    GET  /v1/indexes         vector and Oracle Text indexes on doc_chunks
+    POST /v1/indexes/vector  {"index_type"?, "target_accuracy"?} builds (or rebuilds) the vector index
+    POST /v1/indexes/text    builds (or rebuilds) the Oracle Text index
+    DELETE /v1/indexes/vector, DELETE /v1/indexes/text   drop them
+    GET  /v1/documents       documents of the active corpus generation
+    POST /v1/summary         {"doc_id", "num_paragraphs"?, "model_choice"?, "enhance"?} -> database summary
+                             and, with "enhance", the chat model's refinement of it (or "enhance_error")
+    GET  /v1/stats           pool, vector search, LLM and cache statistics of this worker
+
+The answer record is the one core.batch writes; with "timings" it also holds the turn's
+span breakdown. A worker already answering SERVICE_MAX_INFLIGHT questions replies 503 with
+Retry-After instead of queueing more; ingestion, index and summary requests are not counted.
+Schema changes and garbage collection of corpus generations run outside the service
+(python -m core.generations); workers only check the schema at start-up. Cached answers
+are scoped by the corpus version recorded in the database, so every worker stops serving
+them once the corpus has changed.
+
+Usage (from the repository root, with the database and LLM endpoints configured in .env):
+    python -m core.service --port 8000 --workers 4
+    uvicorn core.service:app --host 0.0.0.0 --port 8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from core.batch import arun_question, astream_question
+from core.cache import get_answer_cache_stats, get_corpus_version
+from core.embeddings import query_embeddings
+from core.generations import RebuildInProgressError, corpus_schema_exists, get_corpus_stats, get_generations
+from core.graphs import GRAPH_VARIANTS, warm_up_graphs
+from core.ingestion import allowed_file, clean_filename, ingest_documents, oci_object_store
+from core.intent import get_intent_classifier
+from core.llm import LLMError, aclose_providers, get_llm_stats
+from core.rerank import get_reranker
+from core.retrieval import get_search_stats
+from core.summary import MAX_SUMMARY_PARAGRAPHS, aenhance_summary, get_documents, summarize_document
+from core.telemetry import render_metrics, turn_breakdown
+from core.utils import get_pool_stats
+from core.vector_index import (
+    VECTOR_INDEX_TYPES,
+    build_index_ddl,
+    create_text_index,
+    create_vector_index,
+    drop_text_index,
+    drop_vector_index,
+    get_text_index_info,
+    get_vector_index_info,
+)
+from config import (
+    MAX_FILE_SIZE,
+    RERANK_ENABLED,
+    SERVICE_HOST,
+    SERVICE_MAX_INFLIGHT,
+    SERVICE_PORT,
+    SERVICE_WORKERS,
+    VECTOR_INDEX_TARGET_ACCURACY,
+    VECTOR_INDEX_TYPE,
+)
+
+MODEL_CHOICES = ("Qwen", "OCI GenAI")
+# Reported with health and stats so per-worker figures can be told apart behind a load balancer
+INSTANCE = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def warm_up():
+    """Compiles every graph variant, loads the models and checks that the corpus schema is in place."""
+    warm_up_graphs()
+    get_intent_classifier()
+    if RERANK_ENABLED:
+        get_reranker()
+    # Schema changes and garbage collection belong to ingestion and `python -m core.generations`, not to every worker
+    if corpus_schema_exists() is False:
+        print("Corpus schema missing or out of date; run `python -m core.generations migrate` before serving questions")
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def _json(data, status_code: int = 200, headers=None) -> Response:
+    return Response(json.dumps(data, ensure_ascii=False, default=_encode), status_code, headers, media_type="application/json")
+
+def _error(message: str, status_code: int, headers=None) -> Response:
+    return _json({"error": message}, status_code, headers)
+
+def _event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=_encode)}\n\n"
+
+def parse_query(body):
+    """Validates a query request body; returns (record, timings) or raises ValueError."""
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError('"question" must be a non-empty string')
+    chat_history = body.get("chat_history") or []
+    if not isinstance(chat_history, list) or not all(
+        isinstance(message, dict) and isinstance(message.get("role"), str) and isinstance(message.get("content"), str)
+        for message in chat_history
+    ):
+        raise ValueError('"chat_history" must be a list of {"role", "content"} messages')
+    model_choice = body.get("model_choice", "Qwen")
+    if model_choice not in MODEL_CHOICES:
+        raise ValueError(f'"model_choice" must be one of {", ".join(MODEL_CHOICES)}')
+    variant = body.get("variant", "default")
+    if variant not in GRAPH_VARIANTS:
+        raise ValueError(f'"variant" must be one of {", ".join(GRAPH_VARIANTS)}')
+    record = {
+        "id": body.get("id"),
+        "question": question,
+        "chat_history": [{"role": message["role"], "content": message["content"]} for message in chat_history],
+        "model_choice": model_choice,
+        "variant": variant,
+    }
+    return record, bool(body.get("timings"))
+
+def parse_summary(body):
+    """Validates a summary request body; returns (doc_id, num_paragraphs, model_choice, enhance) or raises ValueError."""
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    doc_id = body.get("doc_id")
+    if not isinstance(doc_id, int) or isinstance(doc_id, bool):
+        raise ValueError('"doc_id" must be a document id')
+    num_paragraphs = body.get("num_paragraphs", 2)
+    if not isinstance(num_paragraphs, int) or not 1 <= num_paragraphs <= MAX_SUMMARY_PARAGRAPHS:
+        raise ValueError(f'"num_paragraphs" must be a whole number from 1 to {MAX_SUMMARY_PARAGRAPHS}')
+    model_choice = body.get("model_choice", "Qwen")
+    if model_choice not in MODEL_CHOICES:
+        raise ValueError(f'"model_choice" must be one of {", ".join(MODEL_CHOICES)}')
+    return doc_id, num_paragraphs, model_choice, bool(body.get("enhance", True))
+
+
+class _Admission:
+    """Counts questions in flight on one worker and turns away those beyond its limit."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.served = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def admit(self) -> bool:
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "max_in_flight": self.limit, "served": self.served,
+                "rejected": self.rejected, "errors": self.errors}
+
+
+class _EventStream(StreamingResponse):
+    """Server-Sent Events response that closes its event generator and frees its admission slot (if any) however it ends."""
+
+    def __init__(self, events, admission: _Admission = None):
+        super().__init__(events, media_type="text/event-stream",
+                         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # A client that disconnects mid-answer cancels the rest of its turn
+            await self.body_iterator.aclose()
+            if self.admission is not None:
+                self.admission.release()
+
+
+def _overloaded() -> Response:
+    return _error("The service is answering as many questions as it can; retry shortly.", 503, {"Retry-After": "1"})
+
+async def healthz(request):
+    return _json({"status": "ok", "instance": INSTANCE, "in_flight": request.app.state.admission.in_flight})
+
+async def metrics(request):
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+async def query(request):
+    try:
+        record, timings = parse_query(await request.json())
+    except ValueError as e:
+        return _error(f"Invalid request: {e}", 400)
+    admission = request.app.state.admission
+    if not admission.admit():
+        return _overloaded()
+    try:
+        result = await arun_question(record)
+    except Exception as e:
+        admission.errors += 1
+        return _error(f"{type(e).__name__}: {e}", 500)
+    finally:
+        admission.release()
+    admission.served += 1
+    if timings:
+        result["timings"] = turn_breakdown(result["trace_id"]) if result["trace_id"] else []
+    return _json(result)
+
+async def query_stream(request):
+    try:
+        record, timings = parse_query(await request.json())
+    except ValueError as e:
+        return _error(f"Invalid request: {e}", 400)
+    admission = request.app.state.admission
+    if not admission.admit():
+        return _overloaded()
+
+    async def events():
+        try:
+            async for event, data in astream_question(record):
+                if event == "result":
+                    admission.served += 1
+                    if timings:
+                        data["timings"] = turn_breakdown(data["trace_id"]) if data["trace_id"] else []
+                yield _event(event, data)
+        except Exception as e:
+            admission.errors += 1
+            yield _event("error", {"error": f"{type(e).__name__}: {e}"})
+
+    return _EventStream(events(), admission)
+
+async def ingest_status(request):
+    try:
+        corpus, generations, version = await asyncio.gather(
+            asyncio.to_thread(get_corpus_stats), asyncio.to_thread(get_generations), asyncio.to_thread(get_corpus_version),
+        )
+    except Exception as e:
+        return _error(f"Could not read the corpus status: {e}", 503)
+    if corpus is None or generations is None:
+        return _error("Database connection failed.", 503)
+    return _json({"corpus": corpus, "generations": generations, "answer_cache_version": version})
+
+async def ingest(request):
+    try:
+        form = await request.form()
+    except Exception as e:
+        return _error(f"Invalid request: {e}", 400)
+    uploads = [upload for upload in form.getlist("files") if not isinstance(upload, str)]
+    if not uploads:
+        await form.close()
+        return _error('Invalid request: no "files" were uploaded', 400)
+    fresh = form.get("fresh") == "true"
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    # Set when the client goes away: no further files are read, the ones already read are written
+    stopped = threading.Event()
+
+    def send(event, data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def progress(filename, status, detail=""):
+        send("progress", {"filename": filename, "status": status, "detail": detail})
+
+    def documents():
+        for upload in uploads:
+            if stopped.is_set():
+                return
+            filename = clean_filename(upload.filename or "")
+            if not allowed_file(filename):
+                progress(filename, "skipped", "Unsupported file type")
+            elif upload.size is not None and upload.size > MAX_FILE_SIZE:
+                progress(filename, "skipped", f"File is too large ({upload.size / 1024**2:.2f} MB)")
+            else:
+                upload.file.seek(0)
+                yield filename, upload.file.read()
+
+    def run():
+        try:
+            store = oci_object_store()
+        except Exception as e:
+            send("error", {"error": f"Object Storage is not configured: {e}", "status": 503})
+            return
+        try:
+            send("result", ingest_documents(documents(), fresh=fresh, store=store, progress=progress))
+        except RebuildInProgressError as e:
+            send("error", {"error": str(e), "status": 409})
+        except ConnectionError as e:
+            send("error", {"error": str(e), "status": 503})
+        except Exception as e:
+            send("error", {"error": f"{type(e).__name__}: {e}", "status": 500})
+        finally:
+            for upload in uploads:
+                upload.file.close()
+
+    async def stream():
+        worker = asyncio.create_task(asyncio.to_thread(run))
+        try:
+            while True:
+                event, data = await events.get()
+                yield _event(event, data)
+                if event in ("result", "error"):
+                    break
+            await worker
+        finally:
+            stopped.set()
+
+    return _EventStream(stream())
+
+async def indexes(request):
+    try:
+        vector_indexes, text_indexes = await asyncio.gather(
+            asyncio.to_thread(get_vector_index_info), asyncio.to_thread(get_text_index_info),
+        )
+    except Exception as e:
+        return _error(f"Could not read the indexes: {e}", 503)
+    if vector_indexes is None or text_indexes is None:
+        return _error("Database connection failed.", 503)
+    return _json({"vector": vector_indexes, "text": text_indexes, "vector_index_types": VECTOR_INDEX_TYPES,
+                  "default_vector_index_type": VECTOR_INDEX_TYPE,
+                  "default_target_accuracy": VECTOR_INDEX_TARGET_ACCURACY})
+
+async def _index_ddl(build, description: str):
+    """Runs an index build or drop on a worker thread, mapping its failures to error responses."""
+    try:
+        return await asyncio.to_thread(build), None
+    except ConnectionError as e:
+        return None, _error(str(e), 503)
+    except Exception as e:
+        return None, _error(f"{description} failed: {e}", 500)
+
+async def build_vector_index(request):
+    try:
+        body = await request.json() if await request.body() else {}
+        if not isinstance(body, dict):
+            raise ValueError("The request body must be a JSON object")
+        index_type = body.get("index_type", VECTOR_INDEX_TYPE)
+        if not isinstance(index_type, str):
+            raise ValueError('"index_type" must be a string')
+        target_accuracy = body.get("target_accuracy", VECTOR_INDEX_TARGET_ACCURACY)
+        build_index_ddl(index_type, target_accuracy)
+    except (TypeError, ValueError) as e:
+        return _error(f"Invalid request: {e}", 400)
+    ddl, error = await _index_ddl(lambda: create_vector_index(index_type, target_accuracy, replace=True), "Vector index build")
+    return error or _json({"ddl": ddl})
+
+async def drop_vector(request):
+    dropped, error = await _index_ddl(drop_vector_index, "Dropping the vector index")
+    return error or _json({"dropped": dropped})
+
+async def build_text_index(request):
+    ddl, error = await _index_ddl(lambda: create_text_index(replace=True), "Text index build")
+    return error or _json({"ddl": ddl})
+
+async def drop_text(request):
+    dropped, error = await _index_ddl(drop_text_index, "Dropping the text index")
+    return error or _json({"dropped": dropped})
+
+async def documents(request):
+    try:
+        docs = await asyncio.to_thread(get_documents)
+    except Exception as e:
+        return _error(f"Could not read the documents: {e}", 503)
+    if docs is None:
+        return _error("Database connection failed.", 503)
+    return _json({"documents": docs})
+
+async def summary(request):
+    try:
+        doc_id, num_paragraphs, model_choice, enhance = parse_summary(await request.json())
+    except ValueError as e:
+        return _error(f"Invalid request: {e}", 400)
+    try:
+        text = await asyncio.to_thread(summarize_document, doc_id, num_paragraphs)
+    except Exception as e:
+        return _error(f"Failed to generate the database summary: {e}", 500)
+    if text is None:
+        return _error("Database connection failed.", 503)
+    if not text:
+        return _error(f"No summary could be generated for document {doc_id}.", 404)
+    result = {"doc_id": doc_id, "summary": text}
+    if enhance:
+        # The database summary is still worth returning when the chat model cannot be reached
+        try:
+            result["enhanced_summary"] = await aenhance_summary(text, model_choice)
+        except LLMError as e:
+            result["enhanced_summary"] = None
+            result["enhance_error"] = f"Error communicating with the language model: {e}"
+    return _json(result)
+
+async def stats(request):
+    return _json({
+        "instance": INSTANCE,
+        "service": request.app.state.admission.stats(),
+        "pool": get_pool_stats(),
+        "search": get_search_stats(),
+        "llm": get_llm_stats(),
+        "answer_cache": get_answer_cache_stats(),
+        "embedding_cache": query_embeddings.stats(),
+    })
+
+
+def create_app(warm: bool = True, max_inflight: int = SERVICE_MAX_INFLIGHT):
+    """
+    Builds the ASGI application. warm=False skips warm_up (e.g. when the caller has installed
+    stand-ins and warmed up itself).
+    """
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if warm:
+            await asyncio.to_thread(warm_up)
+        try:
+            yield
+        finally:
+            await aclose_providers()
+
+    app = Starlette(
+        routes=[
+            Route("/healthz", healthz),
+            Route("/metrics", metrics),
+            Route("/v1/query", query, methods=["POST"]),
+            Route("/v1/query/stream", query_stream, methods=["POST"]),
+            Route("/v1/ingest/status", ingest_status),
+            Route("/v1/ingest", ingest, methods=["POST"]),
+            Route("/v1/indexes", indexes),
+            Route("/v1/indexes/vector", build_vector_index, methods=["POST"]),
+            Route("/v1/indexes/vector", drop_vector, methods=["DELETE"]),
+            Route("/v1/indexes/text", build_text_index, methods=["POST"]),
+            Route("/v1/indexes/text", drop_text, methods=["DELETE"]),
+            Route("/v1/documents", documents),
+            Route("/v1/summary", summary, methods=["POST"]),
+            Route("/v1/stats", stats),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.admission = _Admission(max_inflight)
+    return app
+
+
+app = create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVICE_HOST, help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Port to listen on.")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Worker processes, each with its own pools and caches.")
+    args = parser.parse_args()
+    uvicorn.run("core.service:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,19 +8,37 @@ class RAGState(TypedDict):
         question (str): The initial question from the user.
         chat_history (list): The history of the conversation.
         context (str): The retrieved context from the vector store.
+        chunks (list): The packed chunks with their text and vector distance.
+        candidates (list): Over-retrieved chunks waiting for the rerank stage.
+        rerank (bool): Whether retrieval over-retrieves candidates for the cross-encoder.
+        packing (dict): How much of the model's context token budget the packed chunks use.
         answer (str): The generated answer from the LLM.
         citations (list): A list of source documents for the answer.
-        rewrite_count (int): A counter for how many times the question has been rewritten.
+        retrieval_attempt (int): Index of the current strategy in the retrieval ladder.
+        search_query (str): The query text searched instead of the question (e.g. an LLM expansion).
+        retrieval_memo (dict): Results of the retrievals already run this turn, keyed by search.
+        retrieval_exhausted (bool): Whether every retrieval strategy has been tried.
         plan (list): A list of sub-queries for comparison tasks.
         aggregated_context (dict): Aggregated context for comparison tasks.
         model_choice (str): The language model selected by the user.
+        intent (str): The classified intent that selects the workflow.
+        cache_hit (bool): Whether the answer was served from the answer cache.
     """
     question: str
     chat_history: list
     context: str
+    chunks: List[dict]
+    candidates: List[dict]
+    rerank: bool
+    packing: dict
     answer: str
     citations: List[str]
-    rewrite_count: int
+    retrieval_attempt: int
+    search_query: str
+    retrieval_memo: dict
+    retrieval_exhausted: bool
     plan: List[str]
     aggregated_context: dict
-    model_choice: str
\ No newline at end of file
+    model_choice: str
+    intent: str
+    cache_hit: bool
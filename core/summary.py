@@ -0,0 +1,50 @@
+"""
+Document summaries for the Document Summary page, served by the query service: Oracle 23ai's
+UTL_TO_SUMMARY of a stored document, optionally refined by the chat model.
+"""
+from core.generations import ACTIVE_GENERATION_SQL
+from core.llm import get_provider
+from core.utils import db_connection
+
+DOCUMENTS_SQL = f"SELECT id, filename FROM documentation_staging WHERE generation_id = {ACTIVE_GENERATION_SQL} ORDER BY filename"
+SUMMARY_SQL = """
+    SELECT dbms_vector_chain.utl_to_summary(
+        dbms_vector_chain.utl_to_text((SELECT DATA FROM documentation_tab WHERE id = :doc_id)),
+        JSON(:params_json)
+    ) AS document_summary FROM dual
+    """
+MAX_SUMMARY_PARAGRAPHS = 5
+
+def get_documents():
+    """Returns the active generation's documents as dicts with id and filename; None without a connection."""
+    with db_connection() as conn:
+        if not conn:
+            return None
+        with conn.cursor() as cursor:
+            cursor.execute(DOCUMENTS_SQL)
+            return [{"id": doc_id, "filename": filename} for doc_id, filename in cursor.fetchall()]
+
+def summarize_document(doc_id: int, num_paragraphs: int):
+    """
+    Summarizes a stored document with Oracle 23ai's built-in UTL_TO_SUMMARY in num_paragraphs
+    paragraphs. Returns "" if the document does not exist, None without a connection.
+    """
+    params_json = f'{{"provider": "database", "glevel": "Paragraph", "numParagraphs": {int(num_paragraphs)}}}'
+    with db_connection() as conn:
+        if not conn:
+            return None
+        with conn.cursor() as cursor:
+            cursor.execute(SUMMARY_SQL, {'doc_id': doc_id, 'params_json': params_json})
+            row = cursor.fetchone()
+            summary = row[0] if row else ""
+            return summary.read() if hasattr(summary, "read") else (summary or "")
+
+def enhance_prompts(summary: str):
+    """Returns the (system, user) prompts asking the LLM to refine a summary."""
+    system_prompt = "You are an expert editor. Refine the following summary to improve its clarity, flow, and readability, while preserving the core information."
+    user_prompt = f"Please refine this summary:\n\n{summary}"
+    return system_prompt, user_prompt
+
+async def aenhance_summary(summary: str, model_choice: str) -> str:
+    """Has the LLM refine a summary's clarity and flow; raises LLMError if the model cannot be reached."""
+    return await get_provider(model_choice).acomplete(*enhance_prompts(summary), temperature=0.5)
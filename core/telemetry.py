@@ -0,0 +1,307 @@
+"""
+Tracing and metrics for RAG turns.
+
+Graph nodes, LLM calls and database queries are recorded as spans shaped after the
+OpenTelemetry data model: a trace id shared by every span of a turn, a span id, the parent
+span, start/end times in Unix nanoseconds, a status and attributes (gen_ai.* for LLM calls,
+db.* for queries, rag.* for nodes and turns). The current span is tracked in a context
+variable, so spans opened inside a node become its children; work handed to a thread pool
+keeps its parent when submitted with contextvars.copy_context().run, and asyncio tasks
+inherit it when they are created.
+
+Finished spans are
+- kept per trace for the last TELEMETRY_MAX_TRACES turns (turn_breakdown() for the UI),
+- appended as JSON lines to TELEMETRY_SPANS_PATH when set, for a collector to pick up,
+- aggregated into Prometheus counters and histograms, rendered by render_metrics() and
+  served at /metrics by the query service (core.service), one set per worker.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import TELEMETRY_ENABLED, TELEMETRY_SPANS_PATH, TELEMETRY_MAX_TRACES
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help); every metric the spans feed
+METRICS = {
+    "rag_turn_duration_seconds": ("histogram", "Wall time of a RAG turn, by intent."),
+    "rag_node_duration_seconds": ("histogram", "Wall time of a graph node."),
+    "rag_llm_request_duration_seconds": ("histogram", "Wall time of an LLM call, retries included."),
+    "rag_llm_time_to_first_token_seconds": ("histogram", "Time to the first token of a streamed LLM call."),
+    "rag_llm_tokens_total": ("counter", "LLM tokens by direction (input or output)."),
+    "rag_llm_chars_total": ("counter", "Characters sent to and received from the LLM."),
+    "rag_llm_retries_total": ("counter", "Retried LLM requests."),
+    "rag_db_query_duration_seconds": ("histogram", "Wall time of a database query, fetch included."),
+    "rag_db_rows_total": ("counter", "Rows fetched from the database."),
+    "rag_span_errors_total": ("counter", "Spans that ended with an exception."),
+}
+
+_current_span = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class Span:
+    """One timed operation; attributes may be set until it ends."""
+
+    def __init__(self, name: str, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self._start = time.perf_counter()
+        self.duration_seconds = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def add(self, key: str, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record_exception(self, error: BaseException):
+        self.status = "ERROR"
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)[:500]
+
+    def end(self):
+        """Ends the span and hands it to the exporters; later calls do nothing."""
+        if self.end_time_unix_nano is not None:
+            return
+        self.duration_seconds = time.perf_counter() - self._start
+        self.end_time_unix_nano = self.start_time_unix_nano + int(self.duration_seconds * 1e9)
+        _export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when telemetry is disabled."""
+    trace_id = span_id = parent_span_id = None
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    """The span active in this context, or None."""
+    return _current_span.get()
+
+def start_span(name: str, **attributes):
+    """
+    Starts a child of the current span without making it current; the caller ends it.
+    For work that yields control between its start and end, such as a streaming generator.
+    """
+    if not TELEMETRY_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, _current_span.get(), attributes)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times a block as a child of the current span; spans opened inside it become its children."""
+    if not TELEMETRY_ENABLED:
+        yield _NOOP_SPAN
+        return
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+def db_span(operation: str, **attributes):
+    """A span for one database query; set "db.rows" on it once the rows are fetched."""
+    return span(f"db.{operation}", **{"db.system": "oracle", "db.operation": operation}, **attributes)
+
+def traced_node(name: str, node):
+    """Wraps a graph node (sync or async) so each run is recorded as a span named after it."""
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def arun(state):
+            with span(name, **{"rag.node": name}):
+                return await node(state)
+        return arun
+
+    @functools.wraps(node)
+    def run(state):
+        with span(name, **{"rag.node": name}):
+            return node(state)
+    return run
+
+
+# --- Exporters ---
+
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+def _export(finished: Span):
+    with _traces_lock:
+        spans = _traces.get(finished.trace_id)
+        if spans is None:
+            spans = _traces[finished.trace_id] = []
+            while len(_traces) > TELEMETRY_MAX_TRACES:
+                _traces.popitem(last=False)
+        spans.append(finished)
+    _record_metrics(finished)
+    if TELEMETRY_SPANS_PATH:
+        line = json.dumps(finished.to_dict(), default=str)
+        try:
+            with _file_lock, open(TELEMETRY_SPANS_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Span export to {TELEMETRY_SPANS_PATH} failed: {e}")
+
+def get_trace(trace_id: str):
+    """Finished spans of a recent trace, in the order they ended."""
+    with _traces_lock:
+        return list(_traces.get(trace_id, ()))
+
+def turn_breakdown(trace_id: str):
+    """
+    Rows for a per-turn timing table: every span of the trace in start order with its
+    depth below the turn, start offset and duration in milliseconds and its main attributes.
+    """
+    spans = sorted(get_trace(trace_id), key=lambda s: s.start_time_unix_nano)
+    if not spans:
+        return []
+    depths = {}
+    by_id = {s.span_id: s for s in spans}
+
+    def depth(s):
+        if s.span_id not in depths:
+            parent = by_id.get(s.parent_span_id)
+            depths[s.span_id] = depth(parent) + 1 if parent is not None else 0
+        return depths[s.span_id]
+
+    origin = spans[0].start_time_unix_nano
+    details = ("gen_ai.usage.input_tokens", "gen_ai.usage.output_tokens", "llm.retries", "db.rows")
+    return [
+        {
+            "span": "  " * depth(s) + s.name,
+            "start_ms": round((s.start_time_unix_nano - origin) / 1e6, 1),
+            "duration_ms": round(s.duration_seconds * 1000, 1),
+            **{key.split(".")[-1]: s.attributes[key] for key in details if key in s.attributes},
+            "status": s.status,
+        }
+        for s in spans
+    ]
+
+
+# --- Metrics ---
+
+_counters = {}
+_histograms = {}
+_metrics_lock = threading.Lock()
+
+def _labels(labels: dict):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc(name: str, amount=1, **labels):
+    key = (name, _labels(labels))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name: str, value: float, **labels):
+    key = (name, _labels(labels))
+    with _metrics_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+def _record_metrics(finished: Span):
+    attributes = finished.attributes
+    seconds = finished.duration_seconds
+    if finished.status == "ERROR":
+        inc("rag_span_errors_total", span=finished.name)
+    if "rag.node" in attributes:
+        observe("rag_node_duration_seconds", seconds, node=attributes["rag.node"])
+    elif finished.name == "rag.turn":
+        observe("rag_turn_duration_seconds", seconds, intent=attributes.get("rag.intent", "unknown"))
+    elif "gen_ai.system" in attributes:
+        provider = attributes["gen_ai.system"]
+        observe("rag_llm_request_duration_seconds", seconds, provider=provider, operation=attributes.get("gen_ai.operation.name", ""))
+        if "llm.time_to_first_token_ms" in attributes:
+            observe("rag_llm_time_to_first_token_seconds", attributes["llm.time_to_first_token_ms"] / 1000, provider=provider)
+        for direction in ("input", "output"):
+            if f"gen_ai.usage.{direction}_tokens" in attributes:
+                inc("rag_llm_tokens_total", attributes[f"gen_ai.usage.{direction}_tokens"], provider=provider, direction=direction)
+        inc("rag_llm_chars_total", attributes.get("llm.prompt_chars", 0), provider=provider, direction="input")
+        inc("rag_llm_chars_total", attributes.get("llm.completion_chars", 0), provider=provider, direction="output")
+        if attributes.get("llm.retries"):
+            inc("rag_llm_retries_total", attributes["llm.retries"], provider=provider)
+    elif "db.operation" in attributes:
+        operation = attributes["db.operation"]
+        observe("rag_db_query_duration_seconds", seconds, operation=operation)
+        inc("rag_db_rows_total", attributes.get("db.rows", 0), operation=operation)
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    with _metrics_lock:
+        counters = dict(_counters)
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]} for key, h in _histograms.items()}
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            continue
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
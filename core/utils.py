@@ -1,6 +1,21 @@
+import asyncio
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
 import oracledb
-import streamlit as st
-from config import DB_USER, DB_PASSWORD, DB_DSN
+from config import (
+    DB_USER,
+    DB_PASSWORD,
+    DB_DSN,
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_POOL_INCREMENT,
+    DB_POOL_PING_INTERVAL,
+    DB_POOL_TIMEOUT_MS,
+    DB_POOL_WAIT_THRESHOLD_MS,
+)
 
 # Oracle client initialization
 try:
@@ -8,10 +23,216 @@ try:
 except Exception as e:
     print(f"Oracle client init warning: {e}")
 
+# Process-wide connection pool, created lazily on first use
+_pool = None
+_pool_lock = threading.Lock()
+# Async pool for async_db_connection; python-oracledb supports asyncio in thin mode only
+_async_pool = None
+# Replace the pools when set, e.g. with an in-memory stand-in for offline benchmarks
+_connection_factory = None
+_async_connection_factory = None
+_stats_lock = threading.Lock()
+_pool_stats = {
+    "acquired": 0,
+    "waits": 0,
+    "timeouts": 0,
+    "errors": 0,
+    "total_acquire_ms": 0.0,
+    "max_acquire_ms": 0.0,
+}
+
+def get_pool():
+    """Return the shared connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = oracledb.create_pool(
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    dsn=DB_DSN,
+                    min=DB_POOL_MIN,
+                    max=DB_POOL_MAX,
+                    increment=DB_POOL_INCREMENT,
+                    ping_interval=DB_POOL_PING_INTERVAL,
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                    wait_timeout=DB_POOL_TIMEOUT_MS,
+                )
+    return _pool
+
+def get_async_pool():
+    """Return the shared asyncio connection pool (thin mode only), creating it on first use."""
+    global _async_pool
+    if _async_pool is None:
+        with _pool_lock:
+            if _async_pool is None:
+                _async_pool = oracledb.create_pool_async(
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    dsn=DB_DSN,
+                    min=DB_POOL_MIN,
+                    max=DB_POOL_MAX,
+                    increment=DB_POOL_INCREMENT,
+                    ping_interval=DB_POOL_PING_INTERVAL,
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                    wait_timeout=DB_POOL_TIMEOUT_MS,
+                )
+    return _async_pool
+
+def _record_acquire(elapsed_ms):
+    with _stats_lock:
+        _pool_stats["acquired"] += 1
+        _pool_stats["total_acquire_ms"] += elapsed_ms
+        _pool_stats["max_acquire_ms"] = max(_pool_stats["max_acquire_ms"], elapsed_ms)
+        # Whether the pool had to queue this acquire is only known from how long it took
+        if elapsed_ms >= DB_POOL_WAIT_THRESHOLD_MS:
+            _pool_stats["waits"] += 1
+
+def _record_failure(timed_out):
+    with _stats_lock:
+        _pool_stats["timeouts" if timed_out else "errors"] += 1
+
+def _report_failure(e):
+    # DPY-4005 / ORA-24457: timed out waiting for a free pooled connection
+    code = getattr(e.args[0], "full_code", "") if isinstance(e, oracledb.Error) and e.args else ""
+    _record_failure(code in ("DPY-4005", "ORA-24457"))
+    notify(f"Database connection failed: {e}")
+
+def notify(message: str, level: str = "error"):
+    """
+    Reports a problem to the user: as st.error / st.warning while a Streamlit page is running
+    in this thread, otherwise (the query service, batch runs) printed. Streamlit is never
+    imported here, so the headless paths run without it.
+    """
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            getattr(st, level)(message)
+            return
+    print(f"{level.capitalize()}: {message}")
+
+def set_connection_factory(factory, async_factory=None):
+    """
+    Routes get_db_conn to factory() instead of the pool, e.g. an in-memory stand-in for
+    doc_chunks in offline benchmarks. async_factory, a coroutine function returning an async
+    connection, does the same for async_db_connection; without it the async path drives
+    factory() connections from worker threads. Connections from either are counted in
+    get_pool_stats like pooled ones. Passing None restores the pools.
+    """
+    global _connection_factory, _async_connection_factory
+    _connection_factory = factory
+    _async_connection_factory = async_factory
+
 def get_db_conn():
-    """Get database connection with error handling"""
+    """Get a pooled database connection with error handling. Closing it returns it to the pool."""
     try:
-        return oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=DB_DSN)
+        acquire = _connection_factory or get_pool().acquire
+        start = time.perf_counter()
+        conn = acquire()
+        if conn is not None:
+            _record_acquire((time.perf_counter() - start) * 1000)
+        return conn
     except Exception as e:
-        st.error(f"Database connection failed: {e}")
+        _report_failure(e)
         return None
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the duration of a block. Yields None if unavailable."""
+    conn = get_db_conn()
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"Failed to release pooled connection: {e}")
+
+class _ThreadedCursor:
+    """Awaitable facade over a synchronous cursor; each round trip runs on a worker thread."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, sql, binds=None, **kwargs):
+        await asyncio.to_thread(self._cursor.execute, sql, binds, **kwargs)
+
+    async def fetchall(self):
+        return await asyncio.to_thread(self._cursor.fetchall)
+
+    async def fetchone(self):
+        return await asyncio.to_thread(self._cursor.fetchone)
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _ThreadedConnection:
+    """The python-oracledb AsyncConnection interface over a synchronous pooled connection (thick mode)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _ThreadedCursor(self._conn.cursor())
+
+    async def commit(self):
+        await asyncio.to_thread(self._conn.commit)
+
+    async def rollback(self):
+        await asyncio.to_thread(self._conn.rollback)
+
+    async def close(self):
+        await asyncio.to_thread(self._conn.close)
+
+async def aget_db_conn():
+    """
+    Async counterpart of get_db_conn. In thin mode this borrows from the asyncio pool; in thick
+    mode, which has no asyncio support, a connection from the regular pool is driven from worker
+    threads behind the same interface (await cursor.execute/fetchall/fetchone, await close).
+    """
+    if _async_connection_factory is None and (_connection_factory is not None or not oracledb.is_thin_mode()):
+        conn = await asyncio.to_thread(get_db_conn)
+        return _ThreadedConnection(conn) if conn is not None else None
+    try:
+        acquire = _async_connection_factory or get_async_pool().acquire
+        start = time.perf_counter()
+        conn = await acquire()
+        if conn is not None:
+            _record_acquire((time.perf_counter() - start) * 1000)
+        return conn
+    except Exception as e:
+        _report_failure(e)
+        return None
+
+@asynccontextmanager
+async def async_db_connection():
+    """Borrow a connection for the duration of an async block. Yields None if unavailable."""
+    conn = await aget_db_conn()
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"Failed to release pooled connection: {e}")
+
+def get_pool_stats():
+    """Return connection pool metrics for dashboards and benchmarks."""
+    with _stats_lock:
+        stats = dict(_pool_stats)
+    stats["avg_acquire_ms"] = stats["total_acquire_ms"] / stats["acquired"] if stats["acquired"] else 0.0
+    stats["min"], stats["max"] = DB_POOL_MIN, DB_POOL_MAX
+    pools = [pool for pool in (_pool, _async_pool) if pool is not None]
+    stats["opened"] = sum(pool.opened for pool in pools)
+    stats["in_use"] = sum(pool.busy for pool in pools)
+    return stats
@@ -0,0 +1,165 @@
+from core.retrieval import enable_text_search
+from core.utils import db_connection
+from config import (
+    VECTOR_INDEX_TYPE,
+    VECTOR_INDEX_TARGET_ACCURACY,
+    VECTOR_INDEX_HNSW_NEIGHBORS,
+    VECTOR_INDEX_HNSW_EFCONSTRUCTION,
+    VECTOR_INDEX_IVF_PARTITIONS,
+)
+
+VECTOR_INDEX_NAME = "DOC_CHUNKS_VEC_IDX"
+VECTOR_INDEX_TYPES = ("hnsw", "ivf")
+TEXT_INDEX_NAME = "DOC_CHUNKS_TEXT_IDX"
+
+# Oracle Text index for the lexical half of hybrid retrieval, kept in sync as chunks are committed
+TEXT_INDEX_DDL = (
+    f"CREATE INDEX {TEXT_INDEX_NAME} ON doc_chunks (chunk_data) "
+    "INDEXTYPE IS CTXSYS.CONTEXT PARAMETERS ('SYNC (ON COMMIT)')"
+)
+
+TEXT_INDEX_INFO_SQL = """
+    SELECT index_name, status, domidx_opstatus
+      FROM user_indexes
+     WHERE table_name = :table_name AND index_type = 'DOMAIN'
+    """
+
+VECTOR_INDEX_INFO_SQL = """
+    SELECT index_name, status, last_analyzed
+      FROM user_indexes
+     WHERE table_name = :table_name AND index_type = 'VECTOR'
+    """
+
+def build_index_ddl(index_type: str = VECTOR_INDEX_TYPE, target_accuracy: int = VECTOR_INDEX_TARGET_ACCURACY,
+                    table: str = "doc_chunks", column: str = "chunk_embedding", name: str = VECTOR_INDEX_NAME) -> str:
+    """
+    Returns the CREATE VECTOR INDEX statement for an in-memory HNSW graph or an IVF
+    neighbor-partition index using cosine distance, the metric the search queries use.
+    """
+    index_type = index_type.lower()
+    if index_type not in VECTOR_INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type '{index_type}'. Use one of: {', '.join(VECTOR_INDEX_TYPES)}")
+    accuracy = _accuracy(target_accuracy)
+    if index_type == "hnsw":
+        organization = "INMEMORY NEIGHBOR GRAPH"
+        parameters = f"TYPE HNSW, NEIGHBORS {int(VECTOR_INDEX_HNSW_NEIGHBORS)}, EFCONSTRUCTION {int(VECTOR_INDEX_HNSW_EFCONSTRUCTION)}"
+    else:
+        organization = "NEIGHBOR PARTITIONS"
+        parameters = f"TYPE IVF, NEIGHBOR PARTITIONS {int(VECTOR_INDEX_IVF_PARTITIONS)}"
+    return (
+        f"CREATE VECTOR INDEX {name} ON {table} ({column}) "
+        f"ORGANIZATION {organization} DISTANCE COSINE "
+        f"WITH TARGET ACCURACY {accuracy} PARAMETERS ({parameters})"
+    )
+
+def _accuracy(target_accuracy) -> int:
+    # Target accuracy is spliced into DDL and SQL text, so only a bounded integer is accepted
+    accuracy = int(target_accuracy)
+    if not 1 <= accuracy <= 100:
+        raise ValueError(f"Target accuracy must be between 1 and 100, got {target_accuracy}")
+    return accuracy
+
+def get_vector_index_info(table: str = "DOC_CHUNKS"):
+    """
+    Returns the vector indexes on a table as dicts with name, status and last_analyzed,
+    or None if the database is unavailable.
+    """
+    with db_connection() as conn:
+        if not conn:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(VECTOR_INDEX_INFO_SQL, {'table_name': table.upper()})
+            return [
+                {"name": name, "status": status, "last_analyzed": last_analyzed}
+                for name, status, last_analyzed in cursor.fetchall()
+            ]
+        finally:
+            cursor.close()
+
+def create_vector_index(index_type: str = VECTOR_INDEX_TYPE, target_accuracy: int = VECTOR_INDEX_TARGET_ACCURACY,
+                        replace: bool = False, table: str = "doc_chunks", column: str = "chunk_embedding",
+                        name: str = VECTOR_INDEX_NAME):
+    """
+    Creates the vector index on a table's embedding column, dropping an existing one first when replace is set.
+    Raises on database errors (e.g. ORA-51962 when VECTOR_MEMORY_SIZE is too small for HNSW).
+    """
+    ddl = build_index_ddl(index_type, target_accuracy, table=table, column=column, name=name)
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed.")
+
+        cursor = conn.cursor()
+        try:
+            if replace:
+                _drop(cursor, name)
+            cursor.execute(ddl)
+        finally:
+            cursor.close()
+    return ddl
+
+def drop_vector_index(name: str = VECTOR_INDEX_NAME) -> bool:
+    """Drops the vector index; returns False if it did not exist."""
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed.")
+
+        cursor = conn.cursor()
+        try:
+            return _drop(cursor, name)
+        finally:
+            cursor.close()
+
+def get_text_index_info(table: str = "DOC_CHUNKS"):
+    """
+    Returns the Oracle Text indexes on a table as dicts with name, status and operation status,
+    or None if the database is unavailable.
+    """
+    with db_connection() as conn:
+        if not conn:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(TEXT_INDEX_INFO_SQL, {'table_name': table.upper()})
+            return [
+                {"name": name, "status": status, "operation_status": op_status}
+                for name, status, op_status in cursor.fetchall()
+            ]
+        finally:
+            cursor.close()
+
+def create_text_index(replace: bool = False):
+    """
+    Creates the Oracle Text index on doc_chunks.chunk_data used by hybrid retrieval,
+    dropping an existing one first when replace is set, and re-enables text searches.
+    """
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed.")
+
+        cursor = conn.cursor()
+        try:
+            if replace:
+                _drop(cursor, TEXT_INDEX_NAME)
+            cursor.execute(TEXT_INDEX_DDL)
+        finally:
+            cursor.close()
+    enable_text_search()
+    return TEXT_INDEX_DDL
+
+def drop_text_index() -> bool:
+    """Drops the Oracle Text index; returns False if it did not exist."""
+    return drop_vector_index(TEXT_INDEX_NAME)
+
+def _drop(cursor, name):
+    try:
+        cursor.execute(f"DROP INDEX {name}")
+    except Exception as e:
+        code = getattr(e.args[0], "full_code", "") if e.args else ""
+        # ORA-01418: specified index does not exist
+        if code == "ORA-01418":
+            return False
+        raise
+    return True
@@ -1,76 +1,14 @@
 import streamlit as st
-import os
-import hashlib
-import pandas as pd
-import oci
-import re
-import time
-from PyPDF2 import PdfReader
-import zipfile
-import xlrd
-from core.utils import get_db_conn
+from datetime import datetime
+from core.client import RAGServiceError, get_service_client
 from config import (
     ALLOWED_EXTENSIONS,
     MAX_FILE_SIZE,
-    BUCKET_NAME,
-    NAMESPACE,
-    OCI_CONFIG_PROFILE,
 )
 
-# --- OCI Configuration ---
-try:
-    config = oci.config.from_file(profile_name=OCI_CONFIG_PROFILE)
-    object_storage = oci.object_storage.ObjectStorageClient(config)
-except oci.exceptions.ConfigFileNotFound:
-    st.error("OCI config file not found. Please ensure it is correctly set up.")
-    st.stop()
-
-# --- Helper Functions ---
-
-def clean_filename(name):
-    """Clean and standardize filename"""
-    name = re.sub(r'[^\w\-.]', '_', name)
-    if len(name) > 100:
-        name = name[:95] + name[-5:]
-    return name
-
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def get_file_hash(file):
-    """Generate SHA-256 hash of file content"""
-    file.seek(0)
-    hash_val = hashlib.sha256(file.read()).hexdigest()
-    file.seek(0)
-    return hash_val
-
-def validate_file_size(file):
-    """Validate file size"""
-    file.seek(0, 2)
-    size = file.tell()
-    file.seek(0)
-    return size <= MAX_FILE_SIZE, size
-
-def is_duplicate(cursor, filename, filehash):
-    """Check if file is already in database"""
-    cursor.execute("""
-        SELECT COUNT(*) FROM documentation_staging 
-        WHERE filename = :fn OR file_hash = :fh
-    """, {'fn': filename, 'fh': filehash})
-    return cursor.fetchone()[0] > 0
-
-def upload_file_to_oci(file, cleaned_name):
-    """Uploads a file to OCI Object Storage with progress."""
-    try:
-        progress_bar = st.progress(0)
-        object_storage.put_object(NAMESPACE, BUCKET_NAME, cleaned_name, file)
-        progress_bar.progress(100)
-        st.success(f"Successfully uploaded {cleaned_name} to OCI.")
-        return True
-    except Exception as e:
-        st.error(f"Failed to upload {cleaned_name} to OCI: {e}")
-        return False
+# Ingestion, Object Storage uploads and index DDL run in the query service (python -m core.service);
+# this page only sends the files and requests and renders the progress they report
+service = get_service_client()
 
 # --- Main Streamlit App ---
 st.set_page_config(page_title="Document Ingestion", page_icon="📚", layout="wide")
@@ -90,64 +28,172 @@ if uploaded_files:
     mode = st.radio(
         "Choose ingestion mode:",
         ["Append to Existing", "Generate Fresh Knowledge Base"],
-        help="Append adds new documents. Fresh clears all existing data first."
+        help="Append adds new documents and updates changed ones, re-embedding only their changed chunks. "
+             "Fresh rebuilds the knowledge base in a new generation; chat keeps answering from the current one "
+             "until the rebuild completes, then switches over."
     )
 
     if st.button("🚀 Start Ingestion", type="primary"):
+        # The service cleans the names and checks the files again; these checks only save uploading them
         validated_files = []
         for file in uploaded_files:
-            cleaned_name = clean_filename(file.name)
-            is_valid_size, size = validate_file_size(file)
-
-            if not allowed_file(cleaned_name):
-                st.warning(f"Skipped: Unsupported file type for '{cleaned_name}'")
+            if file.name.rsplit('.', 1)[-1].lower() not in ALLOWED_EXTENSIONS:
+                st.warning(f"Skipped: Unsupported file type for '{file.name}'")
                 continue
-            if not is_valid_size:
-                st.warning(f"Skipped: File '{cleaned_name}' is too large ({size / 1024**2:.2f} MB).")
+            if file.size > MAX_FILE_SIZE:
+                st.warning(f"Skipped: File '{file.name}' is too large ({file.size / 1024**2:.2f} MB).")
                 continue
-            
-            validated_files.append((file, cleaned_name))
+
+            validated_files.append(file)
 
         if not validated_files:
             st.error("No valid files to process.")
             st.stop()
 
-        conn = get_db_conn()
-        if not conn:
-            st.error("Database connection failed.")
+        progress_bar = st.progress(0.0, text="Processing files...")
+        finished = []
+
+        def show_progress(name, status, detail=""):
+            if status == "done":
+                st.success(f"Embedded '{name}' ({detail}).")
+            elif status == "skipped":
+                st.info(f"Skipped '{name}': {detail}")
+            elif status == "failed":
+                st.error(f"Failed '{name}': {detail}")
+            else:
+                # parsed / uploaded / queued: the file is still moving through the pipeline
+                label = f"{status.capitalize()} '{name}'" + (f" ({detail})" if detail else "")
+                progress_bar.progress(len(finished) / len(validated_files), text=label)
+                return
+            finished.append(name)
+            progress_bar.progress(len(finished) / len(validated_files),
+                                  text=f"Processed {len(finished)} of {len(validated_files)} files")
+
+        stats = None
+        try:
+            with st.spinner("Uploading, parsing, chunking and embedding files..."):
+                for event, data in service.ingest(
+                    ((file.name, file.getvalue()) for file in validated_files),
+                    fresh=(mode == "Generate Fresh Knowledge Base"),
+                ):
+                    if event == "progress":
+                        show_progress(data["filename"], data["status"], data["detail"])
+                    elif event == "result":
+                        stats = data
+        except RAGServiceError as e:
+            # 409: a rebuild is running, so files cannot be appended until it is activated
+            (st.warning if e.status == 409 else st.error)(str(e))
+            st.stop()
+        if stats is None:
+            st.error("The query service ended the ingestion without reporting its result.")
             st.stop()
-        
-        cursor = conn.cursor()
 
+        col_docs, col_chunks, col_docs_rate, col_chunks_rate = st.columns(4)
+        col_docs.metric("Documents", stats["documents"])
+        col_chunks.metric("Chunks embedded", stats["chunks"])
+        col_docs_rate.metric("Docs / s", f"{stats['docs_per_second']:.2f}")
+        col_chunks_rate.metric("Chunks / s", f"{stats['chunks_per_second']:.1f}")
+        st.caption(
+            f"Updated {stats['updated']} ({stats['chunks_reused']} chunks reused, {stats['chunks_removed']} removed) · "
+            f"Skipped {stats['skipped']} · Failed {stats['failed']} · "
+            f"Parsing {stats['parse_seconds']:.1f} s · Embedding + writing {stats['write_seconds']:.1f} s "
+            f"in {stats['batches']} batches"
+        )
         if mode == "Generate Fresh Knowledge Base":
-            with st.spinner("Clearing existing knowledge base..."):
-                cursor.execute("TRUNCATE TABLE doc_chunks")
-                cursor.execute("TRUNCATE TABLE documentation_tab")
-                cursor.execute("TRUNCATE TABLE documentation_staging")
-                conn.commit()
-                st.success("Knowledge base cleared.")
-
-        with st.spinner("Processing files..."):
-            for file, name in validated_files:
-                file_hash = get_file_hash(file)
-                if is_duplicate(cursor, name, file_hash):
-                    st.info(f"Skipped duplicate file: {name}")
-                    continue
-
-                if upload_file_to_oci(file, name):
-                    try:
-                        cursor.execute(
-                            "INSERT INTO documentation_staging (filename, file_hash) VALUES (:fn, :fh)",
-                            {'fn': name, 'fh': file_hash}
-                        )
-                        conn.commit()
-                        # Add logic here to trigger embedding and chunking if needed
-                        st.success(f"Successfully staged '{name}' for processing.")
-                    except Exception as e:
-                        st.error(f"Database staging failed for '{name}': {e}")
-                        conn.rollback()
-
-        cursor.close()
-        conn.close()
-        st.balloons()
-        st.success("Ingestion process complete!")
\ No newline at end of file
+            if stats["activated"]:
+                st.success(f"Switched to corpus generation {stats['generation']}; the previous one is being removed in the background.")
+            else:
+                st.warning("No documents were ingested, so the rebuild was abandoned and the current knowledge base is still in use.")
+        if stats["documents"]:
+            st.balloons()
+        st.success("Ingestion process complete!")
+
+# --- Vector Index Management ---
+st.markdown("---")
+with st.expander("Corpus Generations", expanded=False):
+    st.markdown(
+        "Fresh ingestions build a new generation of the knowledge base next to the active one and switch to it "
+        "atomically when complete; retired generations are deleted in the background. Files cannot be appended "
+        "while a rebuild is running, since the rebuild would drop them."
+    )
+    # Read through the query service, the same view of the corpus its workers answer from
+    try:
+        generations = service.ingest_status()["generations"]
+    except RAGServiceError as e:
+        generations = None
+        st.error(f"Could not load corpus generations: {e}")
+    if generations:
+        for generation in generations:
+            created_at = datetime.fromisoformat(generation['created_at'])
+            st.caption(f"**Generation {generation['generation_id']}** · Status: {generation['status']} · "
+                       f"Documents: {generation['documents']} · Created: {created_at:%Y-%m-%d %H:%M}")
+
+try:
+    index_status = service.indexes()
+except RAGServiceError as e:
+    index_status = None
+    st.error(f"Could not load the indexes: {e}")
+
+with st.expander("Vector Index", expanded=False):
+    st.markdown(
+        "An approximate vector index on `doc_chunks` keeps retrieval fast as the knowledge base grows. "
+        "Searches run exactly whenever no index exists."
+    )
+    if index_status:
+        if index_status["vector"]:
+            for index in index_status["vector"]:
+                st.caption(f"**{index['name']}** · Status: {index['status']}")
+        else:
+            st.info("No vector index on doc_chunks; retrieval scans every chunk.")
+
+        index_types = index_status["vector_index_types"]
+        index_type = st.selectbox("Index type", index_types, index=index_types.index(index_status["default_vector_index_type"]),
+                                  format_func=str.upper, help="HNSW is an in-memory graph; IVF partitions vectors on disk.")
+        target_accuracy = st.slider("Target accuracy (%)", 50, 100, index_status["default_target_accuracy"])
+        col_create, col_drop = st.columns(2)
+        if col_create.button("Build / Rebuild Index", use_container_width=True):
+            with st.spinner("Building vector index..."):
+                try:
+                    ddl = service.build_vector_index(index_type, target_accuracy)
+                    st.success("Vector index built.")
+                    st.code(ddl, language="sql")
+                except RAGServiceError as e:
+                    st.error(f"Vector index build failed: {e}")
+        if col_drop.button("Drop Index", use_container_width=True):
+            try:
+                if service.drop_vector_index():
+                    st.success("Vector index dropped.")
+                else:
+                    st.info("There was no vector index to drop.")
+            except RAGServiceError as e:
+                st.error(f"Dropping the vector index failed: {e}")
+
+with st.expander("Text Index", expanded=False):
+    st.markdown(
+        "An Oracle Text index on chunk text lets hybrid retrieval match exact terms such as report years, "
+        "regulation numbers and product names when LEXICAL_BACKEND is oracle_text. Without it, questions "
+        "are answered from the vector search alone."
+    )
+    if index_status:
+        if index_status["text"]:
+            for index in index_status["text"]:
+                st.caption(f"**{index['name']}** · Status: {index['status']} · Operation: {index['operation_status'] or 'VALID'}")
+        else:
+            st.info("No text index on doc_chunks.")
+
+        col_create_text, col_drop_text = st.columns(2)
+        if col_create_text.button("Build / Rebuild Text Index", use_container_width=True):
+            with st.spinner("Building text index..."):
+                try:
+                    service.build_text_index()
+                    st.success("Text index built.")
+                except RAGServiceError as e:
+                    st.error(f"Text index build failed: {e}")
+        if col_drop_text.button("Drop Text Index", use_container_width=True):
+            try:
+                if service.drop_text_index():
+                    st.success("Text index dropped.")
+                else:
+                    st.info("There was no text index to drop.")
+            except RAGServiceError as e:
+                st.error(f"Dropping the text index failed: {e}")
@@ -0,0 +1,42 @@
+import pytest
+from starlette.testclient import TestClient
+from streamlit.testing.v1 import AppTest
+
+import core.cache as cache
+import core.client as client
+from core.service import create_app
+
+
+class ServiceStandIn:
+    """Answers the chat page's calls with the figures the service's own endpoints report."""
+
+    def __init__(self):
+        self.http = TestClient(create_app(warm=False))
+
+    def stats(self):
+        return self.http.get("/v1/stats").json()
+
+    def ingest_status(self):
+        return {"corpus": {"documents": 3, "processed_documents": 2, "chunks": 40}}
+
+
+@pytest.fixture
+def chat_page(monkeypatch):
+    monkeypatch.setattr(client, "_client", ServiceStandIn())
+    return AppTest.from_file("../app.py", default_timeout=30)
+
+def sidebar_captions(page):
+    return [caption.value for caption in page.sidebar.caption]
+
+
+@pytest.mark.parametrize("version, caption", [
+    ((7, 3), "Corpus generation 7, revision 3"),
+    (None, "Corpus version not read yet"),
+])
+def test_sidebar_renders_the_service_statistics(chat_page, monkeypatch, version, caption):
+    monkeypatch.setattr(cache, "_corpus_version", version)
+    chat_page.run()
+    assert not chat_page.exception
+    assert caption in sidebar_captions(chat_page)
+    assert any(text.startswith("Exact hits: 0") for text in sidebar_captions(chat_page))
+    assert [metric.value for metric in chat_page.metric][:3] == ["3", "2", "40"]
@@ -0,0 +1,60 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import core.batch as batch
+from core.batch import arun_batch, run_batch
+
+CITATIONS = [{"source": "policy.pdf", "chunk_id": 3}]
+
+
+class ScriptedGraph:
+    """Replays (node, state update) pairs as a graph's "updates" stream."""
+
+    def __init__(self, updates):
+        self.updates = updates
+
+    def stream(self, inputs, stream_mode):
+        for node, value in self.updates:
+            yield "updates", {node: value}
+
+    async def astream(self, inputs, stream_mode):
+        for node, value in self.updates:
+            yield "updates", {node: value}
+
+def final(**state):
+    return {"answer": "Twenty days.", "intent": "rag_query", "citations": CITATIONS, **state}
+
+SCRIPTS = {
+    "answered": [("classify_intent", {"intent": "rag_query"}), ("retrieve_context", {}),
+                 ("generate_answer", final()), ("store_answer_cache", final())],
+    "comparison": [("deconstruct_query", {}), ("retrieve_for_comparison", {}),
+                   ("synthesize_comparison", final(intent="comparison"))],
+    "cached": [("classify_intent", {}), ("lookup_answer_cache", final(cache_hit=True))],
+    "greeting": [("classify_intent", {}), ("handle_greeting", final(intent="greeting"))],
+    "gave_up": [("retrieve_context", {}), ("handle_give_up", final())],
+}
+
+@pytest.fixture(autouse=True)
+def scripted_graphs(monkeypatch):
+    monkeypatch.setattr(batch, "get_rag_graph", lambda variant: ScriptedGraph(SCRIPTS[variant]))
+
+def records():
+    return [{"id": name, "question": "How much leave?", "variant": name} for name in SCRIPTS]
+
+def check_citations(results):
+    cited = {result["id"]: result["citations"] for result in results}
+    assert cited == {"answered": CITATIONS, "comparison": CITATIONS, "cached": CITATIONS,
+                     "greeting": [], "gave_up": []}
+
+def test_batch_citations_follow_the_answer_node_anywhere_on_the_path():
+    output = io.StringIO()
+    results = run_batch(records(), output, workers=2)
+    check_citations(results)
+    check_citations(json.loads(line) for line in output.getvalue().splitlines())
+    assert results[0]["path"][-1] == "store_answer_cache"
+
+def test_async_batch_citations():
+    check_citations(asyncio.run(arun_batch(records(), io.StringIO(), concurrency=2)))
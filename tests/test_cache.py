@@ -0,0 +1,150 @@
+import types
+
+import numpy as np
+import pytest
+
+import core.cache as cache
+from core.cache import AnswerCache, normalize_question
+from core.nodes import is_cacheable_answer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+def make_cache(version=(1, 0), **kwargs):
+    state = {"version": version}
+    answers = AnswerCache(version_fn=lambda: state["version"], **kwargs)
+    return answers, state
+
+
+def test_normalize_question():
+    assert normalize_question("  What is   the Leave policy?? ") == "what is the leave policy"
+
+def test_exact_hit_ignores_trivial_variants():
+    answers, _ = make_cache()
+    answers.store("What is the leave policy?", "Qwen", "20 days", ["`hr.pdf`"], intent="rag_query")
+    assert answers.lookup("what is the leave policy", "Qwen", "rag_query") == {"answer": "20 days", "citations": ["`hr.pdf`"]}
+    assert answers.lookup("What is the leave policy?", "OCI GenAI", "rag_query") is None
+    assert answers.lookup("What is the leave policy?", "Qwen", "summarization") is None
+
+def test_least_recently_used_entry_is_evicted(clock):
+    answers, _ = make_cache(max_entries=2)
+    answers.store("a", "Qwen", "A", [])
+    answers.store("b", "Qwen", "B", [])
+    assert answers.lookup("a", "Qwen") is not None
+    answers.store("c", "Qwen", "C", [])
+    assert answers.lookup("b", "Qwen") is None
+    assert answers.lookup("a", "Qwen")["answer"] == "A"
+    assert answers.lookup("c", "Qwen")["answer"] == "C"
+    assert answers.stats()["evictions"] == 1
+
+def test_entries_expire_after_ttl(clock):
+    answers, _ = make_cache(ttl_seconds=60)
+    answers.store("a", "Qwen", "A", [])
+    clock.now += 60
+    assert answers.lookup("a", "Qwen")["answer"] == "A"
+    clock.now += 1
+    assert answers.lookup("a", "Qwen") is None
+    stats = answers.stats()
+    assert stats["expired"] == 1
+    assert stats["size"] == 0
+
+def test_semantic_match_above_threshold_only():
+    answers, _ = make_cache(similarity_threshold=0.9)
+    answers.store("How many vacation days do I get?", "Qwen", "20 days", ["`hr.pdf`"], embedding=[1.0, 0.0, 0.0])
+    close = [0.95, np.sqrt(1 - 0.95 ** 2), 0.0]
+    far = [0.5, np.sqrt(1 - 0.5 ** 2), 0.0]
+    assert answers.lookup("What is my annual leave allowance?", "Qwen", embed_fn=lambda _: close)["answer"] == "20 days"
+    assert answers.lookup("Who approves expenses?", "Qwen", embed_fn=lambda _: far) is None
+    stats = answers.stats()
+    assert (stats["semantic_hits"], stats["misses"]) == (1, 1)
+
+def test_semantic_match_picks_the_closest_question():
+    answers, _ = make_cache(similarity_threshold=0.5)
+    answers.store("first", "Qwen", "first answer", [], embedding=[1.0, 0.0])
+    answers.store("second", "Qwen", "second answer", [], embedding=[0.0, 1.0])
+    assert answers.lookup("other", "Qwen", embed_fn=lambda _: [0.3, 0.9])["answer"] == "second answer"
+
+def test_exact_hit_does_not_embed():
+    answers, _ = make_cache()
+    answers.store("a", "Qwen", "A", [], embedding=[1.0, 0.0])
+
+    def embed(question):
+        raise AssertionError("embedded on an exact hit")
+
+    assert answers.lookup("a", "Qwen", embed_fn=embed)["answer"] == "A"
+
+def test_answers_are_scoped_by_corpus_version():
+    answers, state = make_cache()
+    answers.store("a", "Qwen", "A", [])
+    state["version"] = (1, 1)
+    assert answers.lookup("a", "Qwen") is None
+    state["version"] = (1, 0)
+    assert answers.lookup("a", "Qwen")["answer"] == "A"
+
+def test_unknown_corpus_version_bypasses_the_cache():
+    answers, state = make_cache(version=None)
+    answers.store("a", "Qwen", "A", [])
+    assert answers.stats()["size"] == 0
+    state["version"] = (1, 0)
+    answers.store("a", "Qwen", "A", [])
+    state["version"] = None
+    assert answers.lookup("a", "Qwen") is None
+    assert answers.stats()["bypassed"] == 1
+
+
+def test_corpus_version_is_read_from_the_database_when_due(monkeypatch, clock):
+    versions = iter([(1, 0), (1, 0), (2, 0), RuntimeError("ORA-03113: end-of-file on communication channel")])
+    reads = []
+
+    def read_corpus_version():
+        reads.append(clock.now)
+        version = next(versions)
+        if isinstance(version, Exception):
+            raise version
+        return version
+
+    monkeypatch.setattr(cache, "read_corpus_version", read_corpus_version)
+    monkeypatch.setattr(cache, "ANSWER_CACHE_CORPUS_CHECK_SECONDS", 5)
+    monkeypatch.setattr(cache, "_corpus_version", None)
+    monkeypatch.setattr(cache, "_version_read_at", None)
+    answers = AnswerCache()
+    monkeypatch.setattr(cache, "answer_cache", answers)
+
+    answers.store("a", "Qwen", "A", [])
+    clock.now += 4
+    assert answers.lookup("a", "Qwen")["answer"] == "A"
+    assert len(reads) == 1
+    clock.now += 1
+    assert answers.lookup("a", "Qwen")["answer"] == "A"
+    clock.now += 5
+    # Another process activated a new generation: what was cached for the old one is dropped
+    assert answers.lookup("a", "Qwen") is None
+    assert answers.stats()["size"] == 0
+    answers.store("a", "Qwen", "A", [])
+    clock.now += 5
+    # The database cannot be read: nothing is served until it can
+    assert answers.lookup("a", "Qwen") is None
+    assert answers.stats()["bypassed"] == 1
+    assert len(reads) == 4
+
+
+@pytest.mark.parametrize("state, cacheable", [
+    ({"answer": "20 days", "citations": ["`hr.pdf`"]}, True),
+    ({"answer": "I could not find an answer in the documents.", "citations": []}, False),
+    ({"answer": "Error: Could not connect to the language model.", "citations": ["`hr.pdf`"]}, False),
+    ({"answer": "", "citations": ["`hr.pdf`"]}, False),
+])
+def test_only_grounded_answers_are_cached(monkeypatch, state, cacheable):
+    monkeypatch.setattr("core.nodes.ANSWER_CACHE_ENABLED", True)
+    assert is_cacheable_answer(state) is cacheable
@@ -0,0 +1,75 @@
+import pytest
+
+from core.ingestion import chunk_hash, chunk_text, normalize_whitespace
+
+
+def document(sentences=300, edit=None):
+    """Paragraphs of five numbered sentences; edit maps a sentence number to replacement text."""
+    edit = edit or {}
+    paragraphs = []
+    for start in range(0, sentences, 5):
+        paragraphs.append(" ".join(
+            edit.get(i, f"Sentence {i} explains rule {i * 7 % 13} of the handbook in some detail.")
+            for i in range(start, min(start + 5, sentences))
+        ))
+    return "\n\n".join(paragraphs)
+
+
+def test_normalize_whitespace():
+    assert normalize_whitespace("  a \t b \r\n\n\n\n c  \n d ") == "a b\n\nc\nd"
+
+def test_chunks_respect_the_size_limit():
+    for size, overlap in ((2000, 200), (500, 100), (120, 0)):
+        chunks = chunk_text(document(), chunk_size=size, overlap=overlap)
+        assert len(chunks) > 1
+        assert all(0 < len(chunk) <= size for chunk in chunks)
+
+def test_every_sentence_is_kept():
+    text = document(100)
+    chunks = chunk_text(text, chunk_size=400, overlap=50)
+    for i in range(100):
+        assert any(f"Sentence {i} explains" in chunk for chunk in chunks)
+
+def test_chunks_end_on_sentence_boundaries():
+    chunks = chunk_text(document(), chunk_size=600, overlap=0)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+def test_each_chunk_starts_with_the_end_of_the_previous_one():
+    chunks = chunk_text(document(), chunk_size=600, overlap=80)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        head = chunk[:30]
+        assert head in previous[-80:]
+
+def test_overlapping_chunks_start_on_a_word():
+    chunks = chunk_text(document(), chunk_size=600, overlap=80)
+    words = set(document().split())
+    assert all(chunk.split()[0] in words for chunk in chunks)
+
+def test_a_word_longer_than_a_chunk_is_split():
+    chunks = chunk_text("x" * 1000, chunk_size=300, overlap=0)
+    assert "".join(chunks) == "x" * 1000
+    assert all(len(chunk) <= 300 for chunk in chunks)
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("") == []
+    assert chunk_text(" \n\n \t") == []
+
+def test_overlap_must_be_smaller_than_the_chunk():
+    with pytest.raises(ValueError):
+        chunk_text("text", chunk_size=100, overlap=100)
+
+def test_chunking_is_deterministic():
+    assert chunk_text(document(), 500, 50) == chunk_text(document(), 500, 50)
+
+@pytest.mark.parametrize("edit", [
+    {150: "Sentence 150 now says something entirely different about the policy."},
+    {150: "A new sentence was inserted here. Sentence 150 explains rule 10 of the handbook in some detail."},
+])
+def test_an_edit_changes_only_the_chunks_around_it(edit):
+    before = {chunk_hash(chunk) for chunk in chunk_text(document(), chunk_size=500, overlap=50)}
+    after = [chunk_hash(chunk) for chunk in chunk_text(document(edit=edit), chunk_size=500, overlap=50)]
+    changed = [i for i, h in enumerate(after) if h not in before]
+    assert len(after) > 40
+    # Boundaries resynchronize on content a few chunks after the edit; everything else keeps its hash
+    assert changed == list(range(changed[0], changed[-1] + 1))
+    assert len(changed) <= len(after) // 5
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+import core.nodes as nodes
+
+
+@pytest.mark.parametrize("plan, expected", [
+    (["remote work policy", "travel policy"], ["remote work policy", "travel policy"]),
+    (["leave", " leave ", "", None, 3], ["leave", "3"]),
+    ([{"query": "leave"}, {"topic": "travel"}, ["nested"]], ["leave", "travel"]),
+    ("leave policy", ["leave policy"]),
+    ({"plan": "not a list"}, []),
+    (None, []),
+])
+def test_normalize_plan(plan, expected):
+    assert nodes.normalize_plan(plan) == expected
+
+
+def test_parse_plan_normalizes_items():
+    assert nodes.parse_plan('{"plan": [{"query": "a"}, "b", "a"]}') == ["a", "b"]
+    assert nodes.parse_plan("not json") == []
+
+
+def test_merge_comparison_keeps_plan_and_citation_order():
+    merged = nodes.merge_comparison([
+        ("b", "context b", ["`2.pdf`", "`1.pdf`"]),
+        ("a", "context a", ["`1.pdf`", "`3.pdf`"]),
+    ])
+    assert list(merged["aggregated_context"]) == ["b", "a"]
+    assert merged["citations"] == ["`2.pdf`", "`1.pdf`", "`3.pdf`"]
+
+
+def test_slow_sub_query_times_out_alone_and_stops(monkeypatch):
+    stopped = threading.Event()
+
+    def fake_search_context(sub_query, model_choice, intent="", cancelled=None):
+        if sub_query == "slow":
+            # Stops at its next stage boundary once the node gives up on it
+            if cancelled.wait(5):
+                stopped.set()
+            return "late", ["`late.pdf`"], [], {}
+        return f"context {sub_query}", [f"`{sub_query}.pdf`"], [], {}
+
+    monkeypatch.setattr(nodes, "search_context", fake_search_context)
+    monkeypatch.setattr(nodes, "COMPARISON_SUBQUERY_TIMEOUT", 0.3)
+    started = time.monotonic()
+    state = nodes.retrieve_for_comparison({"plan": ["fast", "slow", "other"], "model_choice": "Qwen"})
+    assert time.monotonic() - started < 2
+    assert state["aggregated_context"] == {"fast": "context fast", "slow": "", "other": "context other"}
+    assert state["citations"] == ["`fast.pdf`", "`other.pdf`"]
+    assert stopped.wait(2)
+
+
+def test_queued_sub_query_gets_its_own_budget(monkeypatch):
+    # One worker: the second sub-query waits behind the first, then still gets a full timeout of its own
+    monkeypatch.setattr(nodes, "_comparison_executor", nodes.ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(nodes, "COMPARISON_SUBQUERY_TIMEOUT", 0.5)
+
+    def fake_search_context(sub_query, model_choice, intent="", cancelled=None):
+        time.sleep(0.3)
+        return f"context {sub_query}", [f"`{sub_query}.pdf`"], [], {}
+
+    monkeypatch.setattr(nodes, "search_context", fake_search_context)
+    state = nodes.retrieve_for_comparison({"plan": ["first", "second"], "model_choice": "Qwen"})
+    assert state["aggregated_context"] == {"first": "context first", "second": "context second"}
@@ -0,0 +1,65 @@
+import asyncio
+
+from core.embeddings import EmbeddingCache, normalize_text
+
+
+class RecordingEmbedder:
+    """Embeds text as [len(text)] and records what it was asked; texts in fail come back as None."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return None if text in self.fail else [float(len(text))]
+
+    async def aembed(self, text):
+        return self(text)
+
+def cache_of(max_entries=3, **embedder_options):
+    embedder = RecordingEmbedder(**embedder_options)
+    return EmbeddingCache(max_entries, embed_fn=embedder, aembed_fn=embedder.aembed), embedder
+
+
+def test_normalize_text_collapses_whitespace_and_case():
+    assert normalize_text("  What IS\tthe\n leave  policy? ") == "what is the leave policy?"
+
+def test_normalized_questions_share_one_entry():
+    cache, embedder = cache_of()
+    vector = cache.get("Leave policy")
+    assert cache.get("  leave   POLICY ") is vector
+    assert embedder.calls == ["leave policy"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["size"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache, embedder = cache_of(max_entries=2)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # b is now the least recently used
+    cache.get("c")
+    assert cache.stats()["size"] == 2
+    embedder.calls.clear()
+    cache.get("a")
+    cache.get("c")
+    assert embedder.calls == []
+    cache.get("b")
+    assert embedder.calls == ["b"]
+
+def test_failed_embedding_is_not_cached():
+    cache, embedder = cache_of(fail={"leave policy"})
+    assert cache.get("leave policy") is None
+    assert cache.get("leave policy") is None
+    assert embedder.calls == ["leave policy", "leave policy"]
+    assert cache.stats()["size"] == 0
+    embedder.fail.clear()
+    assert cache.get("leave policy") == [12.0]
+    assert cache.stats()["size"] == 1
+
+def test_sync_and_async_lookups_share_the_cache():
+    cache, embedder = cache_of(fail={"pension"})
+    vector = cache.get("leave policy")
+    assert asyncio.run(cache.aget("Leave Policy")) is vector
+    assert asyncio.run(cache.aget("pension")) is None
+    assert cache.get("pension") is None
+    assert embedder.calls == ["leave policy", "pension", "pension"]
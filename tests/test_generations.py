@@ -0,0 +1,163 @@
+import pytest
+
+import core.generations as generations
+from core.generations import (
+    RebuildInProgressError,
+    activate_generation,
+    begin_generation,
+    check_append,
+    collect_retired_generations,
+    corpus_schema_exists,
+    get_generations,
+)
+from core.utils import set_connection_factory
+
+
+class GenerationsCursor:
+    """Answers the generation queries from a list of (generation_id, status, idle_minutes) rows."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, binds=None):
+        sql = " ".join(sql.split())
+        binds = binds or {}
+        table = self.connection.generations
+        self.connection.statements.append(sql)
+        stale = lambda row: row[1] == "building" and row[2] >= binds.get("stale_minutes", 0)
+        if sql.startswith(("CREATE", "ALTER")):
+            raise AssertionError(f"DDL on a read path: {sql}")
+        if sql.startswith("UPDATE corpus_generations SET status = 'retired' WHERE status = 'building'"):
+            retired = [row for row in table if stale(row)]
+            table[:] = [(g, "retired", idle) if stale((g, s, idle)) else (g, s, idle) for g, s, idle in table]
+            self.rowcount = len(retired)
+        elif sql.startswith("UPDATE corpus_generations SET status = CASE"):
+            target = binds["generation_id"]
+            if not any(g == target and s == "building" for g, s, _ in table):
+                self.rowcount = 0
+                return
+            self.rowcount = sum(1 for g, s, _ in table if g == target or s == "active")
+            table[:] = [(g, "active" if g == target else "retired" if s == "active" else s, idle)
+                        for g, s, idle in table]
+        elif sql.startswith("SELECT (SELECT status"):
+            status = next((s for g, s, _ in table if g == binds["generation_id"]), None)
+            building = [g for g, s, idle in table if s == "building" and not stale((g, s, idle))]
+            self.rows = [(status, min(building) if building else None)]
+        elif sql.startswith("SELECT generation_id FROM corpus_generations WHERE status = 'retired'"):
+            self.rows = [(g,) for g, s, _ in table if s == "retired"]
+        elif "FROM user_tab_columns" in sql:
+            self.rows = [(self.connection.schema_columns,)]
+        elif sql.startswith("SELECT g.generation_id, g.status"):
+            self.rows = [(g, s, None, None, 0) for g, s, _ in table]
+        else:
+            self.rows = []
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class GenerationsConnection:
+    def __init__(self, table):
+        self.generations = table
+        self.statements = []
+        self.schema_columns = len(generations.CORPUS_SCHEMA_COLUMNS)
+
+    def cursor(self):
+        return GenerationsCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def corpus():
+    connection = GenerationsConnection([(1, "retired", 500), (2, "active", 0)])
+    set_connection_factory(lambda: connection)
+    yield connection
+    set_connection_factory(None)
+
+
+def test_appending_is_refused_while_a_rebuild_runs(corpus):
+    cursor = corpus.cursor()
+    check_append(cursor, 2)
+    corpus.generations.append((3, "building", 5))
+    with pytest.raises(RebuildInProgressError, match="generation 3"):
+        check_append(cursor, 2)
+
+def test_a_stale_rebuild_does_not_block_appends(corpus):
+    corpus.generations.append((3, "building", generations.CORPUS_STALE_BUILD_MINUTES + 1))
+    check_append(corpus.cursor(), 2)
+
+def test_appending_to_a_replaced_generation_is_refused(corpus):
+    corpus.generations.append((3, "building", 0))
+    activate_generation(corpus.cursor(), 3)
+    with pytest.raises(RebuildInProgressError, match="replaced"):
+        check_append(corpus.cursor(), 2)
+
+def test_begin_generation_waits_for_appends_on_the_active_row(corpus):
+    cursor = corpus.cursor()
+    cursor.var = lambda kind: type("Var", (), {"getvalue": lambda self: [3]})()
+    assert begin_generation(cursor) == 3
+    assert corpus.statements[0].endswith("WHERE status = 'active' FOR UPDATE")
+
+def test_only_a_building_generation_can_be_activated(corpus):
+    with pytest.raises(RuntimeError, match="no longer being built"):
+        activate_generation(corpus.cursor(), 1)
+    assert (2, "active", 0) in corpus.generations
+
+def test_collection_retires_stale_rebuilds_first(corpus, monkeypatch):
+    collected = []
+    monkeypatch.setattr(generations, "collect_generation", lambda generation_id: collected.append(generation_id) or 0)
+    corpus.generations += [(3, "building", 120), (4, "building", 5)]
+    collect_retired_generations(background=False, stale_minutes=60)
+    assert collected == [1, 3]
+    assert (4, "building", 5) in corpus.generations
+    with pytest.raises(RuntimeError):
+        activate_generation(corpus.cursor(), 3)
+
+def test_listing_generations_runs_no_ddl(corpus, monkeypatch):
+    monkeypatch.setattr(generations, "_schema_ready", False)
+    assert [g["generation_id"] for g in get_generations()] == [1, 2]
+
+def test_schema_check_only_reads(corpus):
+    assert corpus_schema_exists() is True
+    corpus.schema_columns -= 1
+    assert corpus_schema_exists() is False
+    assert all(sql.startswith("SELECT") for sql in corpus.statements)
+
+def test_schema_check_without_a_database():
+    set_connection_factory(lambda: None)
+    try:
+        assert corpus_schema_exists() is None
+    finally:
+        set_connection_factory(None)
+
+def test_service_warm_up_runs_no_ddl_or_collection(corpus, monkeypatch, capsys):
+    import core.service as service
+    monkeypatch.setattr(service, "warm_up_graphs", lambda: None)
+    monkeypatch.setattr(service, "get_intent_classifier", lambda: None)
+    monkeypatch.setattr(generations, "collect_generation", lambda generation_id: pytest.fail("collected"))
+    service.warm_up()
+    assert capsys.readouterr().out == ""
+    corpus.schema_columns = 0
+    service.warm_up()
+    assert "python -m core.generations migrate" in capsys.readouterr().out
+    assert all(sql.startswith("SELECT") for sql in corpus.statements)
@@ -0,0 +1,70 @@
+import pytest
+
+import core.grading as grading
+import core.nodes as nodes
+from core.grading import AMBIGUOUS, IRRELEVANT, RELEVANT, distance_features, score_relevance
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    """Pins the shipped defaults so the tests do not depend on the environment."""
+    monkeypatch.setattr(grading, "GRADE_ACCEPT_DISTANCE", 0.45)
+    monkeypatch.setattr(grading, "GRADE_REJECT_DISTANCE", 0.75)
+    monkeypatch.setattr(grading, "GRADE_COVERAGE_DISTANCE", 0.55)
+    monkeypatch.setattr(grading, "GRADE_MIN_COVERAGE", 0.2)
+    monkeypatch.setattr(grading, "GRADE_MIN_GAP", 0.15)
+
+
+def test_distance_features():
+    features = distance_features([0.6, 0.3, 0.5, 0.7, 0.8])
+    assert features["top1"] == 0.3
+    assert features["gap"] == pytest.approx(0.6 - 0.3)
+    assert features["coverage"] == pytest.approx(2 / 5)
+
+def test_distance_features_without_chunks():
+    assert distance_features([]) == {"top1": None, "gap": 0.0, "coverage": 0.0}
+
+@pytest.mark.parametrize("distances, decision", [
+    ([], IRRELEVANT),
+    # Nothing within the reject distance
+    ([0.75, 0.8, 0.9], IRRELEVANT),
+    # A close best chunk backed by enough close chunks
+    ([0.4, 0.5, 0.7, 0.7, 0.7], RELEVANT),
+    ([0.45, 0.55, 0.7, 0.7, 0.7], RELEVANT),
+    # Close best chunk, but too few others nearby and no clear lead over the median
+    ([0.44, 0.56, 0.57, 0.58, 0.58, 0.59, 0.6], AMBIGUOUS),
+    # Not close enough to accept outright, but standing well clear of the rest
+    ([0.5, 0.7, 0.7], RELEVANT),
+    # Within coverage distance without a clear lead
+    ([0.5, 0.6, 0.62], AMBIGUOUS),
+    # Between the coverage and reject distances
+    ([0.6, 0.9, 0.95], AMBIGUOUS),
+])
+def test_score_relevance(distances, decision):
+    assert score_relevance(distances)[0] == decision
+
+def test_accept_threshold_is_inclusive_and_reject_threshold_exclusive():
+    assert score_relevance([0.45, 0.45])[0] == RELEVANT
+    assert score_relevance([0.7499])[0] != IRRELEVANT
+    assert score_relevance([0.75])[0] == IRRELEVANT
+
+
+def chunk(distance, text="text"):
+    return {"distance": distance, "text": text}
+
+def test_grade_request_settles_clear_cases_without_the_llm(monkeypatch):
+    monkeypatch.setattr(nodes, "GRADE_MODE", "score")
+    monkeypatch.setattr(nodes, "RETRIEVAL_LADDER", ["vector", "hybrid"])
+    relevant = {"context": "ctx", "chunks": [chunk(0.3), chunk(0.4)], "retrieval_attempt": 0}
+    assert nodes.grade_request(relevant) == ("generate", None, "retry")
+    irrelevant = {"context": "ctx", "chunks": [chunk(0.9)], "retrieval_attempt": 1}
+    assert nodes.grade_request(irrelevant) == ("give_up", None, "give_up")
+    assert nodes.grade_request({"context": "", "retrieval_attempt": 0}) == ("retry", None, "retry")
+
+def test_grade_request_asks_the_llm_about_the_closest_chunks_only(monkeypatch):
+    monkeypatch.setattr(nodes, "GRADE_MODE", "score")
+    monkeypatch.setattr(nodes, "GRADE_LLM_TOP_CHUNKS", 2)
+    chunks = [chunk(0.65, "third"), chunk(0.6, "first"), chunk(0.62, "second")]
+    decision, llm_context, _ = nodes.grade_request({"context": "ctx", "chunks": chunks, "retrieval_attempt": 0})
+    assert decision is None
+    assert llm_context == "Content: first\n\nContent: second\n\n"
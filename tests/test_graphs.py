@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+import core.graphs as graphs
+from core.graphs import get_rag_graph, register_graph_variant, warm_up_graphs
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    """Records the options of every create_rag_graph call; each "compiled graph" is a fresh object."""
+    calls = []
+
+    def create_rag_graph(**options):
+        calls.append(options)
+        return object()
+
+    monkeypatch.setattr(graphs, "create_rag_graph", create_rag_graph)
+    monkeypatch.setattr(graphs, "GRAPH_VARIANTS", dict(graphs.GRAPH_VARIANTS))
+    monkeypatch.setattr(graphs, "_compiled_graphs", {})
+    return calls
+
+
+def test_each_variant_is_compiled_once_and_reused(compiles):
+    default = get_rag_graph()
+    assert get_rag_graph("default") is default
+    no_grading = get_rag_graph("no_grading")
+    assert no_grading is not default
+    assert get_rag_graph("no_grading") is no_grading
+    assert compiles == [{"grading": True}, {"grading": False}]
+
+def test_concurrent_first_requests_share_one_compile(compiles):
+    barrier = threading.Barrier(8)
+    results = []
+
+    def first_request():
+        barrier.wait()
+        results.append(get_rag_graph("rerank"))
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(compiles) == 1
+    assert all(graph is results[0] for graph in results)
+
+def test_warm_up_compiles_every_registered_variant(compiles):
+    warm_up_graphs()
+    assert len(compiles) == len(graphs.GRAPH_VARIANTS)
+    get_rag_graph("rerank_no_grading")
+    assert len(compiles) == len(graphs.GRAPH_VARIANTS)
+
+def test_unknown_variant_is_rejected(compiles):
+    with pytest.raises(KeyError, match="Unknown graph variant 'fast'"):
+        get_rag_graph("fast")
+    assert compiles == []
+
+def test_registering_a_variant_replaces_its_compiled_graph(compiles):
+    register_graph_variant("fast", grading=False)
+    fast = get_rag_graph("fast")
+    register_graph_variant("fast", grading=False, rerank=True)
+    assert get_rag_graph("fast") is not fast
+    assert compiles == [{"grading": False}, {"grading": False, "rerank": True}]
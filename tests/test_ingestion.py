@@ -0,0 +1,178 @@
+import threading
+import time
+
+import pytest
+
+import core.ingestion as ingestion
+from core.ingestion import ingest_documents
+from core.object_storage import LocalObjectStore
+from core.utils import set_connection_factory
+
+
+class IngestConnection:
+    """
+    Stands in for the database the pipeline writes to: documents staged since the last commit
+    are pending, a rollback to the savepoint drops the one staged after it and commit keeps them.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.committed = []
+        self.savepoint = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return IngestCursor(self)
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.pending = []
+
+    def close(self):
+        pass
+
+class IngestCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, binds=None):
+        if sql == "SAVEPOINT ingest_document":
+            self.conn.savepoint = len(self.conn.pending)
+        elif sql == "ROLLBACK TO SAVEPOINT ingest_document":
+            del self.conn.pending[self.conn.savepoint:]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class FailingStore(LocalObjectStore):
+    def __init__(self, root, fail):
+        super().__init__(root)
+        self.fail = fail
+
+    def put(self, name, data):
+        if name == self.fail:
+            raise ConnectionError("connection reset by peer")
+        super().put(name, data)
+
+@pytest.fixture
+def database(monkeypatch):
+    """The pipeline's database writes, recorded on an IngestConnection; stage_document fails for "bad" files."""
+    conn = IngestConnection()
+
+    def stage_document(cursor, filename, filehash, data, generation_id):
+        if filename.startswith("bad"):
+            raise ValueError("value too large for column")
+        cursor.conn.pending.append(filename)
+        return len(cursor.conn.pending) + len(cursor.conn.committed)
+
+    monkeypatch.setattr(ingestion, "_schema_ready", True)
+    monkeypatch.setattr(ingestion, "get_active_generation", lambda cursor: 1)
+    monkeypatch.setattr(ingestion, "check_append", lambda cursor, generation_id: None)
+    monkeypatch.setattr(ingestion, "touch_generation", lambda cursor, generation_id: None)
+    monkeypatch.setattr(ingestion, "find_existing", lambda cursor, names, hashes, generation_id: ({}, set()))
+    monkeypatch.setattr(ingestion, "stage_document", stage_document)
+    monkeypatch.setattr(ingestion, "insert_chunks", lambda cursor, rows, generation_id, batch_size: None)
+    set_connection_factory(lambda: conn)
+    yield conn
+    set_connection_factory(None)
+
+def text_file(name, words=20):
+    return name, " ".join(f"{name} sentence {i}." for i in range(words)).encode()
+
+
+def test_parse_workers_do_not_fork_the_calling_process():
+    assert ingestion._PARSE_CONTEXT.get_start_method() in ("forkserver", "spawn")
+
+def test_a_failing_file_does_not_stop_or_undo_the_others(database, tmp_path):
+    reports = {}
+    files = [text_file("a.txt"), ("empty.txt", b"   "), text_file("lost.txt"), text_file("bad.txt"), text_file("b.txt")]
+    stats = ingest_documents(
+        files, batch_size=1000, store=FailingStore(str(tmp_path), fail="lost.txt"), parse_workers=1,
+        progress=lambda filename, status, detail="": reports.setdefault(filename, []).append((status, detail)),
+    )
+    assert reports["empty.txt"][-1] == ("failed", "Parsing failed: no text could be extracted")
+    assert reports["lost.txt"][-1] == ("failed", "Upload failed: connection reset by peer")
+    assert reports["bad.txt"][-1] == ("failed", "Staging failed: value too large for column")
+    # One batch: the staging failure rolled back to its own savepoint, not the documents queued before it
+    assert sorted(database.committed) == ["a.txt", "b.txt"]
+    assert database.rollbacks == 0
+    assert (stats["documents"], stats["failed"], stats["batches"]) == (2, 3, 1)
+    assert reports["a.txt"][-1][0] == reports["b.txt"][-1][0] == "done"
+
+def test_bounded_queues_hold_back_reading_while_the_writer_is_busy(database, monkeypatch):
+    stage_document = ingestion.stage_document
+    writer_busy, release = threading.Event(), threading.Event()
+
+    def slow_stage_document(cursor, *args):
+        writer_busy.set()
+        release.wait(5)
+        return stage_document(cursor, *args)
+
+    monkeypatch.setattr(ingestion, "stage_document", slow_stage_document)
+    read = []
+
+    def documents():
+        for i in range(30):
+            read.append(i)
+            yield text_file(f"doc{i}.txt", words=3)
+
+    held = {}
+
+    def watch():
+        writer_busy.wait(30)
+        time.sleep(0.5)  # the stages upstream of the writer fill up and block
+        held["read"] = len(read)
+        release.set()
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    stats = ingest_documents(documents(), queue_size=1, parse_workers=1, upload_workers=1)
+    watcher.join()
+    # Three one-item queues, one file in each stage's worker, one being deduplicated and one being written
+    assert held["read"] <= 3 + 1 + 1 + 1 + 1
+    assert stats["documents"] == 30
+
+
+class ChunksCursor:
+    """Returns a document's stored (chunk_id, chunk_hash) rows and records the deletes."""
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.deleted = []
+
+    def execute(self, sql, binds=None):
+        assert sql == ingestion.DOCUMENT_CHUNKS_SQL
+
+    def fetchall(self):
+        return self.stored
+
+    def executemany(self, sql, binds):
+        assert sql == ingestion.DELETE_CHUNK_SQL
+        self.deleted.extend(bind["chunk_id"] for bind in binds)
+
+def test_diff_chunks_reuses_unchanged_chunks_and_replaces_the_rest():
+    h = ingestion.chunk_hash
+    cursor = ChunksCursor([(1, h("intro")), (2, h("old terms")), (3, h("appendix")), (4, h("appendix")), (5, None)])
+    rows, reused, removed = ingestion.diff_chunks(cursor, 7, ["intro", "new terms", "appendix", "summary"])
+    assert reused == 2
+    # New chunks are numbered after the highest stored id
+    assert rows == [(7, 6, "new terms", h("new terms")), (7, 7, "summary", h("summary"))]
+    # The changed chunk, the second copy of a repeated one and the chunk stored without a hash go
+    assert removed == 3
+    assert sorted(cursor.deleted) == [2, 3, 5]
+
+def test_diff_chunks_of_an_unchanged_document_writes_nothing():
+    h = ingestion.chunk_hash
+    cursor = ChunksCursor([(1, h("a")), (2, h("b"))])
+    assert ingestion.diff_chunks(cursor, 7, ["a", "b"]) == ([], 2, 0)
+    assert cursor.deleted == []
@@ -0,0 +1,35 @@
+import pytest
+
+import core.ingestion as ingestion
+from core.ingestion import ensure_ingestion_schema
+
+
+class SchemaCursor:
+    def __init__(self, legacy_index):
+        self.legacy_index = legacy_index
+        self.statements = []
+
+    def execute(self, sql, binds=None):
+        self.statements.append(sql)
+
+    def fetchone(self):
+        return (1 if self.legacy_index else 0,)
+
+@pytest.fixture(autouse=True)
+def fresh_process(monkeypatch):
+    monkeypatch.setattr(ingestion, "_schema_ready", False)
+    monkeypatch.setattr(ingestion, "ensure_corpus_schema", lambda cursor: None)
+
+@pytest.mark.parametrize("legacy_index", [True, False])
+def test_the_old_hash_index_is_dropped_only_if_present(legacy_index):
+    cursor = SchemaCursor(legacy_index)
+    ensure_ingestion_schema(cursor)
+    assert ("DROP INDEX doc_staging_hash_uk" in cursor.statements) == legacy_index
+    assert cursor.statements[-len(ingestion.INGESTION_SCHEMA_DDL):] == list(ingestion.INGESTION_SCHEMA_DDL)
+
+def test_schema_is_checked_once_per_process():
+    cursor = SchemaCursor(False)
+    ensure_ingestion_schema(cursor)
+    count = len(cursor.statements)
+    ensure_ingestion_schema(cursor)
+    assert len(cursor.statements) == count
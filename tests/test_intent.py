@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pytest
+
+import core.nodes as nodes
+from core.intent import INTENTS, IntentClassifier, load_examples
+
+VOCABULARY = ["hello", "compare", "difference", "summarize", "summary", "quiz", "policy", "leave"]
+
+
+class WordModel:
+    """Stands in for a sentence-transformers model: one dimension per known word."""
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = np.zeros((len(texts), len(VOCABULARY) + 1), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.replace("?", "").split():
+                vectors[row, VOCABULARY.index(word) if word in VOCABULARY else -1] += 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+EXAMPLES = [
+    ("hello", "greeting"),
+    ("hello hello", "greeting"),
+    ("compare policy", "comparison"),
+    ("difference policy", "comparison"),
+    ("summarize policy", "summarization"),
+    ("summary policy", "summarization"),
+    ("leave", "rag_query"),
+    ("leave policy", "rag_query"),
+]
+
+def classifier(threshold=0.5, margin=0.05):
+    return IntentClassifier(EXAMPLES, model=WordModel(), threshold=threshold, margin=margin)
+
+
+def test_centroids_are_unit_length_per_intent():
+    model = classifier()
+    assert model.labels == sorted({intent for _, intent in EXAMPLES})
+    assert np.allclose(np.linalg.norm(model.centroids, axis=1), 1.0)
+
+def test_confident_prediction():
+    intent, confidence = classifier().predict("Compare policy")
+    assert intent == "comparison"
+    assert confidence > 0.5
+
+def test_low_similarity_is_not_confident():
+    intent, confidence = classifier(threshold=0.5).predict("unrelated words")
+    assert intent is None
+    assert confidence < 0.5
+
+def test_close_runner_up_is_not_confident():
+    # "policy" is as close to comparison as to summarization
+    model = classifier(threshold=0.5, margin=0.05)
+    scores = model.scores("policy")
+    assert scores["comparison"] > 0.5
+    assert abs(scores["comparison"] - scores["summarization"]) < 0.05
+    assert model.predict("policy")[0] is None
+
+
+def test_load_examples_skips_comments_and_rejects_unknown_intents(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    path.write_text("# labeled utterances\n\n" + json.dumps({"text": "hi", "intent": "greeting"}) + "\n", encoding="utf-8")
+    assert load_examples(path) == [("hi", "greeting")]
+    path.write_text(json.dumps({"text": "hi", "intent": "smalltalk"}) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="smalltalk"):
+        load_examples(path)
+
+def test_bundled_examples_cover_every_intent():
+    assert {intent for _, intent in load_examples()} == set(INTENTS)
+
+
+def test_rules_run_before_the_classifier(monkeypatch):
+    monkeypatch.setattr(nodes, "get_intent_classifier", lambda: pytest.fail("classifier consulted"))
+    assert nodes.detect_intent({"question": "Compare the two policies", "model_choice": "Qwen"}) == "comparison"
+
+def test_unsure_classifier_falls_back_to_the_llm(monkeypatch):
+    monkeypatch.setattr(nodes, "get_intent_classifier", lambda: classifier(threshold=0.99))
+    prompts = []
+
+    def llm(model_choice, system_prompt, user_prompt, **kwargs):
+        prompts.append(user_prompt)
+        return " Summarization\n"
+
+    monkeypatch.setattr(nodes, "get_llm_response", llm)
+    assert nodes.detect_intent({"question": "What does the leave policy say", "model_choice": "Qwen"}) == "summarization"
+    assert len(prompts) == 1
+
+def test_confident_classifier_skips_the_llm(monkeypatch):
+    monkeypatch.setattr(nodes, "get_intent_classifier", classifier)
+    monkeypatch.setattr(nodes, "get_llm_response", lambda *args, **kwargs: pytest.fail("LLM consulted"))
+    assert nodes.detect_intent({"question": "leave policy?", "model_choice": "Qwen"}) == "rag_query"
+
+@pytest.mark.parametrize("response, intent", [("comparison", "comparison"), ("I think it's a question", "rag_query"), ("", "rag_query")])
+def test_parse_intent(response, intent):
+    assert nodes.parse_intent(response) == intent
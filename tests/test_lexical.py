@@ -0,0 +1,187 @@
+import pytest
+
+import core.retrieval as retrieval
+from core.lexical import BM25Index, oracle_text_query, reciprocal_rank_fusion, tokenize
+from core.retrieval import enable_text_search, fuse_rows, lexical_search
+from core.utils import set_connection_factory
+
+
+def test_tokenize_keeps_identifiers_and_drops_stopwords():
+    assert tokenize("What does s.12 of the GDPR say about 2017/18?") == ["s.12", "gdpr", "say", "2017", "18"]
+
+def test_oracle_text_query_matches_terms_literally():
+    assert oracle_text_query("NEAR and ABOUT the 2017 report, report") == "{near} ACCUM {2017} ACCUM {report}"
+    assert oracle_text_query("what is the") == ""
+
+
+def test_bm25_ranks_rare_terms_and_repeated_terms_higher():
+    index = BM25Index([
+        ("a", "annual report 2017 revenue figures"),
+        ("b", "annual report 2018 revenue"),
+        ("c", "report on travel policy"),
+        ("d", "2017 2017 budget"),
+    ])
+    ranked = [key for key, _ in index.search("2017 report")]
+    assert set(ranked[:2]) == {"a", "d"}
+    assert "c" in ranked and "b" in ranked
+    assert [key for key, _ in index.search("2017 report", top_k=1)] == ranked[:1]
+
+def test_bm25_only_scores_documents_sharing_a_term():
+    index = BM25Index([("a", "leave policy"), ("b", "expense claims")])
+    assert [key for key, _ in index.search("leave")] == ["a"]
+    assert index.search("pension") == []
+    assert BM25Index().search("leave") == []
+
+def test_bm25_length_normalization():
+    index = BM25Index([("short", "gdpr fines"), ("long", "gdpr " + "filler words here " * 20)])
+    assert [key for key, _ in index.search("gdpr")] == ["short", "long"]
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion({"vector": ["a", "b", "c"], "lexical": ["b", "d", "c"]}, k=60)
+    assert fused[0][0] == "b"
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1][0] == "c"
+    assert {key for key, _ in fused} == {"a", "b", "c", "d"}
+
+def test_rrf_weights_and_zero_weight():
+    rankings = {"vector": ["a", "b"], "lexical": ["b", "a"]}
+    assert reciprocal_rank_fusion(rankings, weights={"vector": 0.8, "lexical": 0.2})[0][0] == "a"
+    assert reciprocal_rank_fusion(rankings, weights={"vector": 0.2, "lexical": 0.8})[0][0] == "b"
+    assert reciprocal_rank_fusion(rankings, weights={"vector": 1.0, "lexical": 0.0}) == [
+        ("a", pytest.approx(1 / 61)), ("b", pytest.approx(1 / 62)),
+    ]
+
+def row(doc_id, chunk_id):
+    return (doc_id, f"{doc_id}.pdf", chunk_id, f"text {doc_id}-{chunk_id}", 0.3, None)
+
+def test_fuse_rows_scales_relevance_to_the_best():
+    vector_rows = [row(1, 1), row(1, 2), row(2, 1)]
+    lexical_rows = [row(3, 1), row(1, 2)]
+    fused = fuse_rows(vector_rows, lexical_rows, lexical_weight=0.5, limit=3)
+    assert [(r[0], r[2]) for r, _ in fused] == [(1, 2), (1, 1), (3, 1)]
+    assert fused[0][1] == 1.0
+    assert all(0 < relevance <= 1.0 for _, relevance in fused)
+
+def test_fuse_rows_without_lexical_rows_keeps_the_vector_order():
+    vector_rows = [row(1, 1), row(2, 1)]
+    assert [r for r, _ in fuse_rows(vector_rows, [], lexical_weight=0.4, limit=5)] == vector_rows
+
+
+class OracleError(Exception):
+    """Shaped like oracledb errors: args[0] carries full_code."""
+
+    def __init__(self, full_code, message):
+        super().__init__(type("Error", (), {"full_code": full_code, "__str__": lambda self: message})())
+
+class TextSearchConnection:
+    def __init__(self, error=None):
+        self.error = error
+        self.statements = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, binds=None):
+        assert "CONTAINS(" in sql
+        self.statements += 1
+        if self.error is not None:
+            raise self.error
+
+    def fetchall(self):
+        return [row(1, 1)]
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def text_search(monkeypatch):
+    monkeypatch.setattr(retrieval, "_text_index_missing_at", None)
+    monkeypatch.setattr(retrieval, "get_corpus_bm25", lambda: pytest.fail("BM25 index loaded"))
+    clock = {"now": 100.0}
+    monkeypatch.setattr(retrieval, "time", type("Clock", (), {"monotonic": staticmethod(lambda: clock["now"])}))
+    connection = TextSearchConnection()
+    set_connection_factory(lambda: connection)
+    yield connection, clock
+    set_connection_factory(None)
+
+def test_missing_text_index_skips_text_search_until_rechecked(text_search):
+    connection, clock = text_search
+    connection.error = OracleError("ORA-20000", "ORA-20000: Oracle Text error:\nDRG-10599: column is not indexed")
+    assert lexical_search("2017 report", [0.1], backend="oracle_text") == []
+    assert lexical_search("2017 report", [0.1], backend="oracle_text") == []
+    assert connection.statements == 1
+    clock["now"] += retrieval.TEXT_INDEX_RECHECK_SECONDS
+    connection.error = None
+    assert lexical_search("2017 report", [0.1], backend="oracle_text") == [row(1, 1)]
+    assert connection.statements == 2
+    assert retrieval._text_index_missing_at is None
+
+def test_enable_text_search_retries_at_once(text_search):
+    connection, _ = text_search
+    connection.error = OracleError("ORA-29902", "ORA-29902: error in executing ODCIIndexStart() routine\nDRG-10599")
+    assert lexical_search("2017 report", [0.1], backend="oracle_text") == []
+    enable_text_search()
+    connection.error = None
+    assert lexical_search("2017 report", [0.1], backend="oracle_text") == [row(1, 1)]
+
+def test_transient_failure_does_not_disable_text_search(text_search):
+    connection, _ = text_search
+    connection.error = OracleError("DPY-4011", "DPY-4011: the database or network closed the connection")
+    assert lexical_search("2017 report", [0.1], backend="oracle_text") == []
+    assert retrieval._text_index_missing_at is None
+    connection.error = None
+    assert lexical_search("2017 report", [0.1], backend="oracle_text") == [row(1, 1)]
+    assert connection.statements == 2
+
+def test_no_lexical_search_without_terms_or_backend(text_search):
+    connection, _ = text_search
+    assert lexical_search("what is the", [0.1], backend="oracle_text") == []
+    assert lexical_search("2017 report", [0.1], backend="none") == []
+    assert connection.statements == 0
+
+
+class GenerationsCorpus:
+    """Chunk rows of an active (1) and a building (2) generation; honours the active-generation filter."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, binds=None):
+        active = f"generation_id = {retrieval.ACTIVE_GENERATION_SQL}" in sql
+        rows = [r for r in self.rows if r[3] == 1 or not active]
+        if "dc.doc_id = :d0" in sql:
+            keys = {(binds[f"d{i}"], binds[f"c{i}"]) for i in range((len(binds) - 1) // 2)}
+            self.result = [(d, f"{d}.pdf", c, text, 0.3, None) for d, c, text, _ in rows if (d, c) in keys]
+        else:
+            assert "FROM doc_chunks" in sql
+            self.result = [(d, c, text) for d, c, text, _ in rows]
+
+    def fetchall(self):
+        return self.result
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def close(self):
+        pass
+
+def test_bm25_search_only_sees_the_active_generation(monkeypatch):
+    monkeypatch.setattr(retrieval, "_bm25_index", None)
+    monkeypatch.setattr(retrieval, "get_corpus_version", lambda: (1, 0))
+    corpus = GenerationsCorpus([
+        (1, 1, "annual report 2017", 1),
+        (1, 1, "annual report 2017 draft rebuild", 2),
+        (2, 1, "report appendix only in the rebuild", 2),
+    ])
+    set_connection_factory(lambda: corpus)
+    try:
+        rows = lexical_search("2017 report appendix", [0.1], backend="bm25")
+    finally:
+        set_connection_factory(None)
+    assert rows == [(1, "1.pdf", 1, "annual report 2017", 0.3, None)]
+    assert len(retrieval._bm25_index) == 1
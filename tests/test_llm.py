@@ -0,0 +1,172 @@
+import asyncio
+import contextlib
+
+import pytest
+
+import core.llm as llm
+from benchmarks.llm_stub import LLMStubServer
+from core.llm import LLMError, QwenProvider, RetryableLLMError, backoff_delay
+
+
+@pytest.fixture
+def attempts(monkeypatch):
+    """Records the attempt number of every backoff and makes it immediate."""
+    recorded = []
+
+    def no_delay(attempt, *args, **kwargs):
+        recorded.append(attempt)
+        return 0.0
+
+    monkeypatch.setattr(llm, "backoff_delay", no_delay)
+    return recorded
+
+def provider(stub, max_retries=3):
+    return QwenProvider(endpoint=stub.url, max_retries=max_retries)
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    for attempt in range(10):
+        for _ in range(50):
+            assert 0 <= backoff_delay(attempt, base=0.5, cap=4) <= min(4, 0.5 * 2 ** attempt)
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_complete_retries_transient_status(attempts, status):
+    with LLMStubServer(fail_first=2, fail_status=status, reply="ok") as stub:
+        qwen = provider(stub)
+        assert qwen.complete("system", "user") == "ok"
+    assert stub.requests == 3
+    assert attempts == [0, 1]
+    assert qwen.stats()["retries"] == 2
+    assert qwen.stats()["errors"] == 0
+
+def test_complete_gives_up_after_max_retries(attempts):
+    with LLMStubServer(fail_first=10, fail_status=503) as stub:
+        qwen = provider(stub, max_retries=2)
+        with pytest.raises(RetryableLLMError, match="503"):
+            qwen.complete("system", "user")
+    assert stub.requests == 3
+    assert attempts == [0, 1]
+    assert qwen.stats()["errors"] == 1
+
+def test_client_error_is_not_retried(attempts):
+    with LLMStubServer(fail_first=1, fail_status=400) as stub:
+        qwen = provider(stub)
+        with pytest.raises(LLMError) as raised:
+            qwen.complete("system", "user")
+    assert not isinstance(raised.value, RetryableLLMError)
+    assert stub.requests == 1
+    assert attempts == []
+
+def test_retry_after_replaces_backoff(attempts):
+    with LLMStubServer(fail_first=1, fail_status=429, retry_after=0, reply="ok") as stub:
+        assert provider(stub).complete("system", "user") == "ok"
+    assert stub.requests == 2
+    assert attempts == []
+
+def test_stream_retries_before_first_token(attempts):
+    with LLMStubServer(fail_first=1, fail_status=503, reply="one two three") as stub:
+        assert "".join(provider(stub).stream("system", "user")) == "one two three"
+    assert stub.requests == 2
+    assert attempts == [0]
+
+def test_acomplete_retries_transient_status(attempts):
+    async def ask(qwen):
+        try:
+            return await qwen.acomplete("system", "user")
+        finally:
+            await qwen.aclose()
+
+    with LLMStubServer(fail_first=1, fail_status=502, reply="ok") as stub:
+        assert asyncio.run(ask(provider(stub))) == "ok"
+    assert stub.requests == 2
+    assert attempts == [0]
+
+
+def test_sequential_calls_reuse_one_connection():
+    with LLMStubServer(reply="one two") as stub:
+        qwen = provider(stub)
+        for _ in range(5):
+            assert qwen.complete("system", "user") == "one two"
+            assert "".join(qwen.stream("system", "user")) == "one two"
+    assert stub.requests == 10
+    assert stub.connections == 1
+
+def test_retried_calls_keep_the_connection(attempts):
+    with LLMStubServer(fail_first=3, fail_status=503, reply="ok") as stub:
+        qwen = provider(stub)
+        assert qwen.complete("system", "user") == "ok"
+        assert qwen.complete("system", "user") == "ok"
+    assert stub.requests == 5
+    assert stub.connections == 1
+
+def test_async_calls_reuse_one_connection():
+    async def ask(qwen):
+        try:
+            for _ in range(5):
+                assert await qwen.acomplete("system", "user") == "one two"
+                assert "".join([piece async for piece in qwen.astream("system", "user")]) == "one two"
+        finally:
+            await qwen.aclose()
+
+    with LLMStubServer(reply="one two") as stub:
+        asyncio.run(ask(provider(stub)))
+    assert stub.connections == 1
+
+
+class RecordedSpan:
+    def __init__(self, name, attributes):
+        self.name, self.attributes = name, dict(attributes)
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record_exception(self, error):
+        pass
+
+    def end(self):
+        pass
+
+@pytest.fixture
+def llm_spans(monkeypatch):
+    spans = []
+
+    def start_span(name, **attributes):
+        spans.append(RecordedSpan(name, attributes))
+        return spans[-1]
+
+    @contextlib.contextmanager
+    def span(name, **attributes):
+        yield start_span(name, **attributes)
+
+    monkeypatch.setattr(llm, "span", span)
+    monkeypatch.setattr(llm, "start_span", start_span)
+    return spans
+
+def test_reported_token_usage_is_recorded(llm_spans):
+    reply = "x" * 40
+    with LLMStubServer(reply=reply) as stub:
+        qwen = provider(stub)
+        qwen.complete("s" * 30, "u" * 10)
+        asyncio.run(qwen.acomplete("s" * 30, "u" * 10))
+        asyncio.run(qwen.aclose())
+    for call in llm_spans:
+        assert call.attributes["gen_ai.usage.input_tokens"] == 10
+        assert call.attributes["gen_ai.usage.output_tokens"] == 10
+        assert "llm.tokens_estimated" not in call.attributes
+
+def test_token_usage_is_estimated_without_a_report(llm_spans, monkeypatch):
+    monkeypatch.setattr(llm, "estimate_tokens", len)
+    with LLMStubServer(reply="one two") as stub:
+        qwen = provider(stub)
+        qwen.complete("system", "user")
+        assert "".join(qwen.stream("system", "user")) == "one two"
+    reported, streamed = llm_spans
+    assert "llm.tokens_estimated" not in reported.attributes
+    # The streamed call must not reuse the previous call's report
+    assert streamed.attributes["llm.tokens_estimated"] is True
+    assert streamed.attributes["gen_ai.usage.input_tokens"] == len("system") + len("user")
+    assert streamed.attributes["gen_ai.usage.output_tokens"] == len("one two")
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import core.async_nodes as async_nodes
+import core.nodes as nodes
+from core.llm import LLMError, LLMResponseError
+from core.utils import notify
+
+LADDER = ["vector", "wide", "expanded"]
+
+
+@pytest.fixture
+def expansions(monkeypatch):
+    """Answers query expansion prompts for both node flavours and counts them."""
+    calls = []
+
+    def complete(model_choice, system_prompt, user_prompt, **kwargs):
+        calls.append(user_prompt)
+        return " annual leave entitlement days "
+
+    async def acomplete(*args, **kwargs):
+        return complete(*args, **kwargs)
+
+    monkeypatch.setattr(nodes, "RETRIEVAL_LADDER", LADDER)
+    monkeypatch.setattr(nodes, "get_llm_response", complete)
+    monkeypatch.setattr(async_nodes, "aget_llm_response", acomplete)
+    return calls
+
+def turn(*strategies, attempt=0):
+    memo = {nodes.retrieval_key(strategy, "leave?"): ("", [], [], {}) for strategy in strategies}
+    return {"question": "leave?", "model_choice": "Qwen", "retrieval_attempt": attempt, "retrieval_memo": memo}
+
+def escalate_both(state):
+    return nodes.escalate_retrieval(state), asyncio.run(async_nodes.aescalate_retrieval(state))
+
+def test_escalation_without_expansion(expansions):
+    for update in escalate_both(turn("vector")):
+        assert update["retrieval_attempt"] == 1
+        assert update["search_query"] == ""
+        assert not update["retrieval_exhausted"]
+    assert expansions == []
+
+def test_escalation_expands_the_query_once_it_is_needed(expansions):
+    state = turn("vector", "wide")
+    assert nodes.escalation_update(state) is None
+    for update in escalate_both(state):
+        assert update["retrieval_attempt"] == 2
+        assert update["search_query"] == "annual leave entitlement days"
+    assert len(expansions) == 2
+
+def test_escalation_is_exhausted_at_the_end_of_the_ladder(expansions):
+    for update in escalate_both(turn(attempt=2)):
+        assert update["retrieval_exhausted"]
+    assert expansions == []
+
+
+class FailingProvider:
+    label = "Qwen"
+
+    def __init__(self, error, tokens=()):
+        self.error, self.tokens = error, tokens
+
+    def complete(self, *args, **kwargs):
+        raise self.error
+
+    async def acomplete(self, *args, **kwargs):
+        raise self.error
+
+    def stream(self, *args, **kwargs):
+        yield from self.tokens
+        raise self.error
+
+    async def astream(self, *args, **kwargs):
+        for token in self.tokens:
+            yield token
+        raise self.error
+
+@pytest.fixture
+def provider(monkeypatch):
+    def use(error, tokens=()):
+        failing = FailingProvider(error, tokens)
+        monkeypatch.setattr(nodes, "get_provider", lambda model_choice: failing)
+        monkeypatch.setattr(async_nodes, "get_provider", lambda model_choice: failing)
+    return use
+
+@pytest.mark.parametrize("error, text", [
+    (LLMResponseError("bad JSON"), "Error: Invalid response from the language model."),
+    (LLMError("refused"), "Error: Could not connect to the language model."),
+])
+def test_failed_llm_calls_return_the_same_error_text(provider, capsys, error, text):
+    provider(error)
+    assert nodes.get_llm_response("Qwen", "s", "u") == text
+    assert asyncio.run(async_nodes.aget_llm_response("Qwen", "s", "u")) == text
+    assert capsys.readouterr().out.count("Error: ") == 2
+
+def test_interrupted_streams_keep_the_tokens_already_sent(provider):
+    provider(LLMError("reset"), tokens=["Twenty", " days"])
+    interrupted = "Twenty days\n\n_(The response was interrupted.)_"
+    assert nodes.stream_llm_response("Qwen", "s", "u") == interrupted
+    assert asyncio.run(async_nodes.astream_llm_response("Qwen", "s", "u")) == interrupted
+    provider(LLMError("reset"))
+    assert nodes.stream_llm_response("Qwen", "s", "u") == "Error: Could not connect to the language model."
+
+
+def test_notify_prints_outside_streamlit(capsys):
+    notify("Retrieval timed out for 'a'", "warning")
+    assert capsys.readouterr().out == "Warning: Retrieval timed out for 'a'\n"
@@ -0,0 +1,169 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from core.object_storage import LocalObjectStore, part_md5, upload_stream
+
+PART = 1024
+
+
+class RecordingStore(LocalObjectStore):
+    """LocalObjectStore that records the parts it is sent and can fail or slow them down."""
+
+    def __init__(self, root, fail_parts=(), delay=0.0):
+        super().__init__(root)
+        self.fail_parts = set(fail_parts)
+        self.delay = delay
+        self.sent = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def upload_part(self, name, upload_id, part_num, data, md5):
+        with self._lock:
+            self.sent.append(part_num)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if part_num in self.fail_parts:
+                raise ConnectionError(f"part {part_num} lost")
+            return super().upload_part(name, upload_id, part_num, data, md5)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+class CountingStream(io.BytesIO):
+    """Counts the parts read from it, to compare with the parts the store has finished."""
+
+    def __init__(self, data, store):
+        super().__init__(data)
+        self.store = store
+        self.reads = 0
+        self.max_held = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if data:
+            self.reads += 1
+            finished = len(self.store.sent) - self.store.active
+            self.max_held = max(self.max_held, self.reads - finished)
+        return data
+
+def payload(size):
+    return os.urandom(size)
+
+def open_uploads(store):
+    return os.listdir(os.path.join(store.root, ".uploads"))
+
+
+def test_small_object_is_put_in_one_request(tmp_path):
+    store = RecordingStore(str(tmp_path))
+    data = payload(PART - 1)
+    result = upload_stream(store, "small.bin", io.BytesIO(data), part_size=PART)
+    assert result == {"size": len(data), "sha256": hashlib.sha256(data).hexdigest(), "parts": 1,
+                      "resumed_parts": 0, "committed": True}
+    assert store.sent == []
+    assert store.get("small.bin") == data
+
+@pytest.mark.parametrize("size, parts", [(PART, 1), (PART + 1, 2), (3 * PART, 3), (int(2.5 * PART), 3)])
+def test_multipart_part_sizing(tmp_path, size, parts):
+    store = RecordingStore(str(tmp_path))
+    data = payload(size)
+    progress = []
+    result = upload_stream(store, "big.bin", io.BytesIO(data), size=size, part_size=PART, part_workers=2,
+                           progress=lambda done, total: progress.append(done))
+    assert result["parts"] == parts
+    assert sorted(store.sent) == list(range(1, parts + 1))
+    assert result["size"] == size
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    assert store.get("big.bin") == data
+    assert max(progress) == size
+    assert open_uploads(store) == []
+
+def test_parts_in_flight_and_in_memory_are_bounded(tmp_path):
+    store = RecordingStore(str(tmp_path), delay=0.02)
+    data = payload(20 * PART)
+    stream = CountingStream(data, store)
+    upload_stream(store, "big.bin", stream, part_size=PART, part_workers=3)
+    assert store.get("big.bin") == data
+    assert store.max_active == 3
+    # One part being read plus one per uploading thread
+    assert stream.max_held <= 3 + 1
+
+def test_interrupted_upload_resumes_with_matching_parts(tmp_path):
+    data = payload(5 * PART)
+    failing = RecordingStore(str(tmp_path), fail_parts={4})
+    with pytest.raises(ConnectionError):
+        upload_stream(failing, "big.bin", io.BytesIO(data), part_size=PART, part_workers=1)
+    assert len(open_uploads(failing)) == 1
+    assert not os.path.exists(failing.path("big.bin"))
+
+    store = RecordingStore(str(tmp_path))
+    result = upload_stream(store, "big.bin", io.BytesIO(data), part_size=PART, part_workers=2)
+    assert result["committed"]
+    # Parts after the failed one were still sent, so only part 4 is missing
+    assert result["resumed_parts"] == 4
+    assert store.sent == [4]
+    assert store.get("big.bin") == data
+    assert open_uploads(store) == []
+
+def test_resumed_upload_resends_parts_whose_md5_differs(tmp_path):
+    data = payload(4 * PART)
+    with pytest.raises(ConnectionError):
+        upload_stream(RecordingStore(str(tmp_path), fail_parts={4}), "big.bin", io.BytesIO(data),
+                      part_size=PART, part_workers=1)
+
+    changed = data[:PART] + payload(PART) + data[2 * PART:]
+    store = RecordingStore(str(tmp_path))
+    result = upload_stream(store, "big.bin", io.BytesIO(changed), part_size=PART, part_workers=1)
+    assert result["resumed_parts"] == 2
+    assert sorted(store.sent) == [2, 4]
+    assert store.get("big.bin") == changed
+
+def test_resume_can_be_disabled(tmp_path):
+    data = payload(3 * PART)
+    with pytest.raises(ConnectionError):
+        upload_stream(RecordingStore(str(tmp_path), fail_parts={3}), "big.bin", io.BytesIO(data),
+                      part_size=PART, part_workers=1)
+    store = RecordingStore(str(tmp_path))
+    result = upload_stream(store, "big.bin", io.BytesIO(data), part_size=PART, resume=False)
+    assert result["resumed_parts"] == 0
+    assert sorted(store.sent) == [1, 2, 3]
+
+@pytest.mark.parametrize("size", [PART // 2, 3 * PART])
+def test_rejected_upload_is_aborted_and_nothing_stored(tmp_path, size):
+    store = RecordingStore(str(tmp_path))
+    data = payload(size)
+    seen = []
+
+    def before_commit(size, sha256):
+        seen.append((size, sha256))
+        return False
+
+    result = upload_stream(store, "dup.bin", io.BytesIO(data), part_size=PART, before_commit=before_commit)
+    assert seen == [(size, hashlib.sha256(data).hexdigest())]
+    assert result["committed"] is False
+    assert not os.path.exists(store.path("dup.bin"))
+    assert open_uploads(store) == []
+
+def test_local_store_rejects_a_corrupted_part(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    upload_id = store.create_upload("x.bin")
+    with pytest.raises(ValueError, match="MD5"):
+        store.upload_part("x.bin", upload_id, 1, b"data", part_md5(b"other"))
+    assert store.list_parts("x.bin", upload_id) == {}
+
+@pytest.mark.parametrize("size", [PART // 2, 3 * PART])
+def test_a_known_digest_is_not_computed_again(tmp_path, size, monkeypatch):
+    store = LocalObjectStore(str(tmp_path))
+    data = payload(size)
+    monkeypatch.setattr("core.object_storage.hashlib.sha256", lambda *a: pytest.fail("stream hashed again"))
+    result = upload_stream(store, "known.bin", io.BytesIO(data), part_size=PART, sha256="f" * 64,
+                           before_commit=lambda size, sha256: sha256 == "f" * 64)
+    assert result["committed"] and result["sha256"] == "f" * 64
+    assert store.get("known.bin") == data
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import core.packing as packing
+from core.packing import estimate_tokens, pack_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """Counts one token per word, so chunk costs are easy to read: format_chunk adds one ("Content:")."""
+    monkeypatch.setitem(packing._token_counters, "Qwen", lambda text: len(text.split()))
+
+
+def candidate(text, distance, embedding=None, **extra):
+    return {"text": text, "distance": distance, "embedding": embedding, **extra}
+
+def texts(selected):
+    return [c["text"] for c in selected]
+
+
+def test_estimate_tokens(monkeypatch):
+    monkeypatch.setattr(packing, "CHARS_PER_TOKEN", 4)
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("a" * 40) == 10
+
+def test_empty_candidates():
+    selected, report = pack_context([], "Qwen", budget_tokens=100)
+    assert selected == []
+    assert report["selected"] == 0 and report["used_tokens"] == 0
+
+def test_chunk_that_overflows_is_skipped_not_the_end_of_the_fill():
+    candidates = [
+        candidate("one two three", 0.1),                # 4 tokens
+        candidate(" ".join(["long"] * 20), 0.2),        # 21 tokens, never fits
+        candidate("four five", 0.3),                    # 3 tokens
+        candidate("six seven eight nine", 0.4),         # 5 tokens, no longer fits
+    ]
+    selected, report = pack_context(candidates, "Qwen", budget_tokens=10, mmr_lambda=1.0)
+    assert texts(selected) == ["one two three", "four five"]
+    assert report["used_tokens"] == 7
+    assert report["utilization"] == pytest.approx(0.7)
+    assert report["used_tokens"] <= report["budget_tokens"]
+
+def test_identical_text_is_packed_once():
+    candidates = [candidate("Leave is 20 days.", 0.1), candidate("  Leave is   20 days. ", 0.2), candidate("Other", 0.3)]
+    selected, report = pack_context(candidates, "Qwen", budget_tokens=100)
+    assert texts(selected) == ["Leave is 20 days.", "Other"]
+    assert report["duplicates"] == 1
+
+def test_near_duplicate_embeddings_are_packed_once():
+    candidates = [
+        candidate("first wording", 0.1, [1.0, 0.0]),
+        candidate("second wording", 0.15, [0.99, 0.01]),
+        candidate("different topic", 0.3, [0.0, 1.0]),
+    ]
+    selected, report = pack_context(candidates, "Qwen", budget_tokens=100, dedup_similarity=0.95)
+    assert texts(selected) == ["first wording", "different topic"]
+    assert report["duplicates"] == 1
+
+def test_mmr_prefers_a_diverse_chunk_over_a_similar_one():
+    candidates = [
+        candidate("best", 0.10, [1.0, 0.0]),
+        candidate("similar", 0.12, [0.8, 0.6]),
+        candidate("diverse", 0.20, [0.0, 1.0]),
+    ]
+    by_relevance, _ = pack_context(candidates, "Qwen", budget_tokens=4, mmr_lambda=1.0, dedup_similarity=1.1)
+    assert texts(by_relevance) == ["best", "similar"]
+    diverse, _ = pack_context(candidates, "Qwen", budget_tokens=4, mmr_lambda=0.5, dedup_similarity=1.1)
+    assert texts(diverse) == ["best", "diverse"]
+
+def test_relevance_score_replaces_distance():
+    candidates = [candidate("closer", 0.1, relevance=0.2), candidate("reranked", 0.5, relevance=0.9)]
+    selected, _ = pack_context(candidates, "Qwen", budget_tokens=2, mmr_lambda=1.0)
+    assert texts(selected) == ["reranked"]
+
+def test_without_embeddings_packs_by_relevance():
+    candidates = [candidate("c", 0.3), candidate("a", 0.1), candidate("b", 0.2)]
+    selected, _ = pack_context(candidates, "Qwen", budget_tokens=100)
+    assert texts(selected) == ["a", "b", "c"]
+
+
+def context_limits(**env):
+    environment = {k: v for k, v in os.environ.items() if "CONTEXT_LIMIT" not in k}
+    # Set, even if empty, so that a local .env cannot fill it in
+    environment["QWEN3_CONTEXT_LIMIT_TOKENS"] = ""
+    environment.update(env)
+    output = subprocess.run(
+        [sys.executable, "-c", "import config; print(config.QWEN3_CONTEXT_LIMIT_TOKENS)"],
+        cwd=ROOT, env=environment, capture_output=True, text=True, check=True,
+    ).stdout
+    return int(output.split()[-1])
+
+@pytest.mark.parametrize("env, tokens", [
+    ({"QWEN3_CONTEXT_LIMIT_TOKENS": "3000", "CHARS_PER_TOKEN": "4"}, 3000),
+    ({"QWEN3_CONTEXT_LIMIT_CHARS": "12000", "CHARS_PER_TOKEN": "4"}, 3000),
+    ({"QWEN3_CONTEXT_LIMIT_TOKENS": "2000", "QWEN3_CONTEXT_LIMIT_CHARS": "12000", "CHARS_PER_TOKEN": "4"}, 2000),
+    ({"QWEN3_CONTEXT_LIMIT_CHARS": "12000", "CHARS_PER_TOKEN": "3"}, 4000),
+    ({"CHARS_PER_TOKEN": "4"}, 4000),
+])
+def test_context_limit_falls_back_to_the_character_setting(env, tokens):
+    assert context_limits(**env) == tokens
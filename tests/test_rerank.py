@@ -0,0 +1,76 @@
+import sys
+import types
+
+import pytest
+
+import core.nodes as nodes
+import core.packing as packing
+import core.rerank as rerank
+from core.nodes import rerank_context
+from core.rerank import Reranker, get_reranker
+
+
+class StubScorer:
+    """Cross-encoder stand-in: the logit of a pair is the number of the chunk text ("chunk 3" -> 3.0)."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.batches.append((pairs, batch_size))
+        return [float(text.split()[-1]) for _, text in pairs]
+
+def candidate(number, distance):
+    return {"doc_id": number, "filename": f"doc{number}.pdf", "chunk_id": 1, "text": f"chunk {number}",
+            "distance": distance, "embedding": None}
+
+CANDIDATES = [candidate(1, 0.1), candidate(4, 0.2), candidate(2, 0.3), candidate(3, 0.4)]
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setitem(packing._token_counters, "Qwen", lambda text: len(text.split()))
+
+@pytest.fixture
+def unloaded(monkeypatch):
+    monkeypatch.setattr(rerank, "_reranker", None)
+    monkeypatch.setattr(rerank, "_reranker_failed", False)
+
+
+def test_rerank_orders_by_cross_encoder_score_and_truncates():
+    scorer = StubScorer()
+    ranked = Reranker(model=scorer, batch_size=16).rerank("question", CANDIDATES, top_k=2)
+    assert [chunk["doc_id"] for chunk in ranked] == [4, 3]
+    assert ranked[0]["relevance"] > ranked[1]["relevance"]
+    assert all(0 < chunk["relevance"] < 1 for chunk in ranked)
+    assert scorer.batches == [([("question", chunk["text"]) for chunk in CANDIDATES], 16)]
+
+def test_rerank_context_packs_only_the_best_chunks(monkeypatch):
+    monkeypatch.setattr(nodes, "get_reranker", lambda: Reranker(model=StubScorer()))
+    monkeypatch.setattr(nodes, "RERANK_TOP_K", 3)
+    state = rerank_context({"question": "question", "model_choice": "Qwen", "candidates": CANDIDATES})
+    assert [chunk["doc_id"] for chunk in state["chunks"]] == [4, 3, 2]
+    assert state["citations"] == ["`doc4.pdf`", "`doc3.pdf`", "`doc2.pdf`"]
+    assert state["candidates"] == []
+    assert state["packing"]["selected"] == 3
+
+def test_unloadable_model_keeps_the_vector_distance_order(monkeypatch, unloaded):
+    loads = []
+
+    def cross_encoder(model_name, device):
+        loads.append(model_name)
+        raise OSError("model not found")
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=cross_encoder))
+    assert get_reranker() is None
+    assert get_reranker() is None
+    assert len(loads) == 1
+
+    state = rerank_context({"question": "question", "model_choice": "Qwen", "candidates": CANDIDATES})
+    assert [chunk["doc_id"] for chunk in state["chunks"]] == [1, 4, 2, 3]
+
+def test_model_is_loaded_once(monkeypatch, unloaded):
+    loads = []
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(
+        CrossEncoder=lambda model_name, device: loads.append(model_name) or StubScorer()))
+    assert get_reranker() is get_reranker()
+    assert loads == [rerank.RERANK_MODEL_NAME]
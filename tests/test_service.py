@@ -0,0 +1,247 @@
+import io
+import json
+
+import pytest
+import requests
+from starlette.testclient import TestClient
+
+import core.cache as cache
+import core.service as service
+from benchmarks.bench_offline import StubResponder
+from benchmarks.llm_stub import LLMStubServer
+from benchmarks.memory_store import InMemoryCorpus
+from core.client import RAGServiceClient, RAGServiceError
+from core.generations import RebuildInProgressError
+from core.llm import LLMError, QwenProvider, get_provider, set_provider
+from core.object_storage import LocalObjectStore
+from core.service import create_app, parse_query, parse_summary
+from core.utils import set_connection_factory
+
+QUESTION = {"question": "How many days of annual leave do I get?", "variant": "no_grading"}
+
+
+class ServiceSession:
+    """A requests.Session stand-in that sends the client's requests to the app in-process."""
+
+    def __init__(self, http):
+        self.http = http
+
+    def request(self, method, url, stream=False, timeout=None, **kwargs):
+        reply = self.http.request(method, url, **kwargs)
+        response = requests.Response()
+        response.status_code = reply.status_code
+        response.reason = reply.reason_phrase
+        response.headers.update(reply.headers)
+        response.raw = io.BytesIO(reply.content)
+        return response
+
+class CannedSession:
+    """Replies to every request with the same status and body."""
+
+    def __init__(self, body: bytes, status_code: int = 200):
+        self.body = body
+        self.status_code = status_code
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.raw = io.BytesIO(self.body)
+        return response
+
+@pytest.fixture(scope="module")
+def stand_ins():
+    """The in-memory corpus behind every connection and the LLM stand-in as the Qwen endpoint."""
+    corpus = InMemoryCorpus.synthetic()
+    set_connection_factory(corpus.connect, async_factory=corpus.connect_async)
+    previous = get_provider("Qwen")
+    with LLMStubServer(respond=StubResponder(answer_tokens=5)) as stub:
+        set_provider("Qwen", QwenProvider(endpoint=stub.url))
+        yield
+    set_provider("Qwen", previous)
+    set_connection_factory(None)
+
+@pytest.fixture
+def http(stand_ins):
+    cache.answer_cache.clear()
+    with TestClient(create_app(warm=False)) as http:
+        yield http
+
+def sse(response):
+    """Parses a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@pytest.mark.parametrize("body, message", [
+    (["question"], "must be a JSON object"),
+    ({"question": "  "}, '"question" must be a non-empty string'),
+    ({"question": "q", "chat_history": [{"role": "user"}]}, '"chat_history" must be a list'),
+    ({"question": "q", "model_choice": "GPT"}, '"model_choice" must be one of Qwen, OCI GenAI'),
+    ({"question": "q", "variant": "fastest"}, '"variant" must be one of'),
+])
+def test_parse_query_rejects_invalid_bodies(body, message):
+    with pytest.raises(ValueError, match=message):
+        parse_query(body)
+
+def test_parse_query_keeps_only_the_turn():
+    record, timings = parse_query({"question": "q", "chat_history": [{"role": "user", "content": "hi", "ts": 1}], "extra": 1})
+    assert record == {"id": None, "question": "q", "chat_history": [{"role": "user", "content": "hi"}],
+                      "model_choice": "Qwen", "variant": "default"}
+    assert timings is False
+
+@pytest.mark.parametrize("path", ["/v1/query", "/v1/query/stream"])
+def test_invalid_queries_are_rejected_with_400(http, path):
+    response = http.post(path, json={"question": ""})
+    assert response.status_code == 400
+    assert response.json() == {"error": 'Invalid request: "question" must be a non-empty string'}
+    assert http.get("/v1/stats").json()["service"]["rejected"] == 0
+
+@pytest.mark.parametrize("path", ["/v1/query", "/v1/query/stream"])
+def test_a_full_worker_replies_503_with_retry_after(stand_ins, path):
+    with TestClient(create_app(warm=False, max_inflight=0)) as http:
+        response = http.post(path, json=QUESTION)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert http.get("/v1/stats").json()["service"]["rejected"] == 1
+
+
+def test_query_returns_the_answer_record(http):
+    response = http.post("/v1/query", json={**QUESTION, "id": "q1", "timings": True})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["id"], result["intent"], result["answer"]) == ("q1", "rag_query", "word0 word1 word2 word3 word4")
+    assert result["citations"]
+    assert result["timings"][0]["span"] == "rag.turn"
+    assert http.get("/v1/stats").json()["service"] == {"in_flight": 0, "max_in_flight": service.SERVICE_MAX_INFLIGHT,
+                                                       "served": 1, "rejected": 0, "errors": 0}
+
+def test_query_stream_sends_nodes_and_tokens_then_the_result(http):
+    response = http.post("/v1/query/stream", json=QUESTION)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse(response)
+    assert events[-1][0] == "result"
+    assert [data["node"] for event, data in events if event == "node"] == events[-1][1]["path"]
+    tokens = [data["token"] for event, data in events if event == "token"]
+    assert "".join(tokens) == events[-1][1]["answer"] == "word0 word1 word2 word3 word4"
+    # Every token arrives before the node that generated it is reported finished
+    assert events.index(("node", {"node": "generate_answer"})) > max(
+        i for i, (event, _) in enumerate(events) if event == "token")
+    assert http.get("/healthz").json()["in_flight"] == 0
+
+def test_a_failing_turn_ends_the_stream_with_an_error_event(http, monkeypatch):
+    async def astream_question(record):
+        yield "node", {"node": "classify_intent"}
+        raise TimeoutError("DPY-4024: call timeout exceeded")
+
+    monkeypatch.setattr(service, "astream_question", astream_question)
+    events = sse(http.post("/v1/query/stream", json=QUESTION))
+    assert events == [("node", {"node": "classify_intent"}),
+                      ("error", {"error": "TimeoutError: DPY-4024: call timeout exceeded"})]
+    assert http.get("/v1/stats").json()["service"]["errors"] == 1
+    assert http.get("/healthz").json()["in_flight"] == 0
+
+
+def test_client_stream_query_yields_the_service_events(http):
+    client = RAGServiceClient("http://testserver", session=ServiceSession(http))
+    events = list(client.stream_query(QUESTION["question"], variant="no_grading"))
+    assert events[0] == ("node", {"node": "classify_intent"})
+    assert events[-1][0] == "result"
+    assert "".join(data["token"] for event, data in events if event == "token") == events[-1][1]["answer"]
+
+def test_client_joins_multi_line_data_and_raises_on_an_error_event():
+    body = (b'event: token\ndata: {"token":\ndata: "a b"}\n\n'
+            b": keep-alive\n\n"
+            b'event: error\ndata: {"error": "RebuildInProgressError: rebuild running", "status": 409}\n\n'
+            b'event: result\ndata: {}\n\n')
+    events = RAGServiceClient("http://service", session=CannedSession(body)).stream_query("q")
+    assert next(events) == ("token", {"token": "a b"})
+    with pytest.raises(RAGServiceError, match="The query service failed: RebuildInProgressError") as raised:
+        next(events)
+    assert raised.value.status == 409
+
+def test_client_raises_with_the_status_of_a_rejected_request():
+    client = RAGServiceClient("http://service", session=CannedSession(b'{"error": "busy"}', status_code=503))
+    with pytest.raises(RAGServiceError, match="replied 503: busy") as raised:
+        list(client.stream_query("q"))
+    assert raised.value.status == 503
+
+
+@pytest.fixture
+def ingestion(monkeypatch, tmp_path):
+    """Replaces the pipeline with one that reports each file and returns what it was given."""
+    received = {}
+
+    def ingest_documents(documents, fresh=False, store=None, progress=None):
+        for filename, data in documents:
+            received[filename] = data
+            progress(filename, "done", "1 chunk")
+        return {"documents": len(received), "fresh": fresh}
+
+    monkeypatch.setattr(service, "oci_object_store", lambda: LocalObjectStore(str(tmp_path)))
+    monkeypatch.setattr(service, "ingest_documents", ingest_documents)
+    monkeypatch.setattr(service, "MAX_FILE_SIZE", 10)
+    return received
+
+def test_ingest_streams_progress_then_the_result(http, ingestion):
+    files = [("files", ("a policy.txt", b"policy")), ("files", ("b.exe", b"binary")), ("files", ("c.txt", b"x" * 11))]
+    events = sse(http.post("/v1/ingest", files=files, data={"fresh": "true"}))
+    assert events == [
+        ("progress", {"filename": "a_policy.txt", "status": "done", "detail": "1 chunk"}),
+        ("progress", {"filename": "b.exe", "status": "skipped", "detail": "Unsupported file type"}),
+        ("progress", {"filename": "c.txt", "status": "skipped", "detail": "File is too large (0.00 MB)"}),
+        ("result", {"documents": 1, "fresh": True}),
+    ]
+    assert ingestion == {"a_policy.txt": b"policy"}
+
+def test_ingest_without_files_is_rejected(http, ingestion):
+    response = http.post("/v1/ingest", data={"fresh": "true"})
+    assert response.status_code == 400
+
+def test_client_ingest_raises_409_for_a_rebuild_in_progress(http, monkeypatch, ingestion):
+    def ingest_documents(documents, fresh=False, store=None, progress=None):
+        raise RebuildInProgressError("A rebuild is in progress")
+
+    monkeypatch.setattr(service, "ingest_documents", ingest_documents)
+    client = RAGServiceClient("http://testserver", session=ServiceSession(http))
+    with pytest.raises(RAGServiceError, match="A rebuild is in progress") as raised:
+        list(client.ingest([("a.txt", b"policy")]))
+    assert raised.value.status == 409
+
+
+@pytest.mark.parametrize("body, message", [
+    ({"doc_id": "7"}, '"doc_id" must be a document id'),
+    ({"doc_id": True}, '"doc_id" must be a document id'),
+    ({"doc_id": 7, "num_paragraphs": 6}, '"num_paragraphs" must be a whole number from 1 to 5'),
+    ({"doc_id": 7, "model_choice": "GPT"}, '"model_choice" must be one of'),
+])
+def test_parse_summary_rejects_invalid_bodies(body, message):
+    with pytest.raises(ValueError, match=message):
+        parse_summary(body)
+
+def test_summary_returns_the_database_summary_when_enhancing_fails(http, monkeypatch):
+    async def aenhance_summary(summary, model_choice):
+        raise LLMError("503 Service Unavailable")
+
+    monkeypatch.setattr(service, "summarize_document", lambda doc_id, num_paragraphs: f"{num_paragraphs} paragraphs")
+    monkeypatch.setattr(service, "aenhance_summary", aenhance_summary)
+    response = http.post("/v1/summary", json={"doc_id": 7, "num_paragraphs": 3})
+    assert response.status_code == 200
+    assert response.json() == {"doc_id": 7, "summary": "3 paragraphs", "enhanced_summary": None,
+                               "enhance_error": "Error communicating with the language model: 503 Service Unavailable"}
+
+def test_summary_of_an_unknown_document_is_404(http, monkeypatch):
+    monkeypatch.setattr(service, "summarize_document", lambda doc_id, num_paragraphs: "")
+    assert http.post("/v1/summary", json={"doc_id": 7}).status_code == 404
+
+def test_vector_index_build_rejects_an_unknown_type(http, monkeypatch):
+    monkeypatch.setattr(service, "create_vector_index", lambda *args, **kwargs: pytest.fail("index built"))
+    response = http.post("/v1/indexes/vector", json={"index_type": "btree"})
+    assert response.status_code == 400
+    assert "Unknown vector index type 'btree'" in response.json()["error"]
+
+def test_documents_without_a_connection_are_503(http, monkeypatch):
+    monkeypatch.setattr(service, "get_documents", lambda: None)
+    assert http.get("/v1/documents").status_code == 503
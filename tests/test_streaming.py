@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.llm_stub import LLMStubServer
+from core.llm import LLMResponseError, QwenProvider
+
+
+def event(content):
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": content}}]})
+
+
+@pytest.mark.parametrize("line, expected", [
+    (event("Hello "), (False, "Hello ")),
+    ("data:" + json.dumps({"choices": [{"delta": {"content": "tight"}}]}), (False, "tight")),
+    ("data: [DONE]", (True, None)),
+    ("", (False, None)),
+    (": keep-alive", (False, None)),
+    ("event: ping", (False, None)),
+    ('data: {"choices": [{"delta": {"role": "assistant"}}]}', (False, None)),
+    ('data: {"choices": [{"delta": {"content": ""}}]}', (False, None)),
+    ('data: {"choices": []}', (False, None)),
+    ('data: {"usage": {"completion_tokens": 3}}', (False, None)),
+])
+def test_parse_event(line, expected):
+    assert QwenProvider._parse_event(line) == expected
+
+def test_parse_event_rejects_malformed_data():
+    with pytest.raises(LLMResponseError):
+        QwenProvider._parse_event("data: {not json")
+
+
+REPLY = "Les congés payés sont accordés après 3 mois — voir §4.2 ✓"
+
+def test_stream_yields_every_token_in_order():
+    with LLMStubServer(reply=REPLY) as stub:
+        pieces = list(QwenProvider(endpoint=stub.url).stream("system", "user"))
+    assert len(pieces) == len(REPLY.split(" "))
+    assert "".join(pieces) == REPLY
+
+def test_astream_yields_every_token_in_order():
+    async def collect(qwen):
+        try:
+            return [piece async for piece in qwen.astream("system", "user")]
+        finally:
+            await qwen.aclose()
+
+    with LLMStubServer(reply=REPLY) as stub:
+        pieces = asyncio.run(collect(QwenProvider(endpoint=stub.url)))
+    assert "".join(pieces) == REPLY
+
+def test_stream_records_time_to_first_token():
+    with LLMStubServer(reply="one two three", token_delay=0.01) as stub:
+        qwen = QwenProvider(endpoint=stub.url)
+        assert "".join(qwen.stream("system", "user")) == "one two three"
+    stats = qwen.stats()
+    assert stats["streams"] == 1
+    assert stats["avg_ttft_ms"] > 0
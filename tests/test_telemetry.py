@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import core.nodes as nodes
+import core.telemetry as telemetry
+from core.telemetry import current_span, db_span, get_trace, inc, observe, render_metrics, span, traced_node, turn_breakdown
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    monkeypatch.setattr(telemetry, "TELEMETRY_ENABLED", True)
+    monkeypatch.setattr(telemetry, "TELEMETRY_SPANS_PATH", "")
+    monkeypatch.setattr(telemetry, "_counters", {})
+    monkeypatch.setattr(telemetry, "_histograms", {})
+
+def names(spans):
+    return sorted(s.name for s in spans)
+
+
+def test_spans_opened_inside_a_span_are_its_children():
+    with span("rag.turn") as turn:
+        assert current_span() is turn
+        with span("classify_intent") as node:
+            with db_span("embed") as query:
+                pass
+        assert current_span() is turn
+    assert current_span() is None
+    assert turn.parent_span_id is None
+    assert node.parent_span_id == turn.span_id and query.parent_span_id == node.span_id
+    assert turn.trace_id == node.trace_id == query.trace_id
+    assert query.attributes == {"db.system": "oracle", "db.operation": "embed"}
+    assert names(get_trace(turn.trace_id)) == ["classify_intent", "db.embed", "rag.turn"]
+
+def test_threads_keep_the_parent_only_with_a_copied_context():
+    def child():
+        with span("db.search") as s:
+            return s
+
+    with span("rag.turn") as turn, ThreadPoolExecutor(2) as pool:
+        copied = pool.submit(contextvars.copy_context().run, child).result()
+        bare = pool.submit(child).result()
+    assert copied.parent_span_id == turn.span_id and copied.trace_id == turn.trace_id
+    assert bare.parent_span_id is None and bare.trace_id != turn.trace_id
+
+def test_comparison_sub_queries_are_traced_under_their_node(monkeypatch):
+    def search_context(sub_query, model_choice, intent="", cancelled=None):
+        with db_span("vector_search", **{"rag.sub_query": sub_query}):
+            return f"context {sub_query}", [f"`{sub_query}.pdf`"], [], {}
+
+    monkeypatch.setattr(nodes, "search_context", search_context)
+    node = traced_node("retrieve_for_comparison", nodes.retrieve_for_comparison)
+    with span("rag.turn") as turn:
+        node({"model_choice": "Qwen", "plan": ["leave policy", "travel policy"]})
+    spans = get_trace(turn.trace_id)
+    node_span = next(s for s in spans if s.name == "retrieve_for_comparison")
+    searches = [s for s in spans if s.name == "db.vector_search"]
+    assert node_span.parent_span_id == turn.span_id
+    assert sorted(s.attributes["rag.sub_query"] for s in searches) == ["leave policy", "travel policy"]
+    assert all(s.parent_span_id == node_span.span_id for s in searches)
+
+def test_asyncio_tasks_inherit_the_current_span():
+    async def child(name):
+        with span(name) as s:
+            await asyncio.sleep(0)
+            return s
+
+    async def turn():
+        with span("rag.turn") as parent:
+            children = await asyncio.gather(child("a"), child("b"))
+        return parent, children
+
+    parent, children = asyncio.run(turn())
+    assert [c.parent_span_id for c in children] == [parent.span_id, parent.span_id]
+
+def test_an_exception_ends_the_span_with_error_status():
+    with pytest.raises(TimeoutError):
+        with span("rag.turn") as turn:
+            with db_span("embed") as query:
+                raise TimeoutError("DPY-4024: call timeout of 5000 ms exceeded")
+    for s in (turn, query):
+        assert s.status == "ERROR"
+        assert s.attributes["exception.type"] == "TimeoutError"
+        assert s.end_time_unix_nano is not None
+    assert query.attributes["exception.message"].startswith("DPY-4024")
+    assert 'rag_span_errors_total{span="db.embed"} 1' in render_metrics().splitlines()
+    assert current_span() is None
+
+
+def test_render_metrics_counter_and_histogram_lines():
+    inc("rag_db_rows_total", 2, operation="embed")
+    inc("rag_db_rows_total", 3, operation="embed")
+    observe("rag_db_query_duration_seconds", 0.03, operation="embed")
+    observe("rag_db_query_duration_seconds", 4.0, operation="embed")
+    inc("rag_llm_retries_total", provider='say "Qwen"')
+    lines = render_metrics().splitlines()
+
+    assert "# HELP rag_db_rows_total Rows fetched from the database." in lines
+    assert "# TYPE rag_db_rows_total counter" in lines
+    assert 'rag_db_rows_total{operation="embed"} 5' in lines
+    assert 'rag_llm_retries_total{provider="say \\"Qwen\\""} 1' in lines
+
+    assert "# TYPE rag_db_query_duration_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("rag_db_query_duration_seconds_bucket")]
+    assert len(buckets) == len(telemetry.DURATION_BUCKETS) + 1
+    assert 'rag_db_query_duration_seconds_bucket{operation="embed",le="0.025"} 0' in buckets
+    assert 'rag_db_query_duration_seconds_bucket{operation="embed",le="0.05"} 1' in buckets
+    assert 'rag_db_query_duration_seconds_bucket{operation="embed",le="5.0"} 2' in buckets
+    assert buckets[-1] == 'rag_db_query_duration_seconds_bucket{operation="embed",le="+Inf"} 2'
+    assert 'rag_db_query_duration_seconds_sum{operation="embed"} 4.03' in lines
+    assert 'rag_db_query_duration_seconds_count{operation="embed"} 2' in lines
+    # Metrics nothing has fed yet are still declared
+    assert "# TYPE rag_turn_duration_seconds histogram" in lines
+
+def test_finished_spans_feed_the_metrics():
+    with span("rag.turn", **{"rag.intent": "rag_query"}):
+        with db_span("vector_search") as query:
+            query.set("db.rows", 25)
+    lines = render_metrics().splitlines()
+    assert 'rag_db_rows_total{operation="vector_search"} 25' in lines
+    assert 'rag_turn_duration_seconds_count{intent="rag_query"} 1' in lines
+
+
+def test_turn_breakdown_lists_spans_in_start_order_by_depth():
+    with span("rag.turn") as turn:
+        with span("classify_intent", **{"rag.node": "classify_intent"}):
+            with db_span("embed") as query:
+                query.set("db.rows", 1)
+        with span("generate_answer", **{"rag.node": "generate_answer"}) as node:
+            node.set("gen_ai.usage.output_tokens", 42)
+    rows = turn_breakdown(turn.trace_id)
+    assert [row["span"] for row in rows] == ["rag.turn", "  classify_intent", "    db.embed", "  generate_answer"]
+    assert rows[0]["start_ms"] == 0.0
+    assert [row["start_ms"] for row in rows] == sorted(row["start_ms"] for row in rows)
+    assert rows[2]["rows"] == 1 and rows[3]["output_tokens"] == 42
+    assert {row["status"] for row in rows} == {"OK"}
+    assert turn_breakdown("0" * 32) == []
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+import core.utils as utils
+from core.utils import async_db_connection, db_connection, get_pool_stats, set_connection_factory
+
+
+class Connection:
+    def close(self):
+        pass
+
+class AsyncConnection:
+    async def close(self):
+        pass
+
+class SlowFactory:
+    """Hands out connections after a delay, like a pool with none free."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+
+    def __call__(self):
+        time.sleep(self.delays.pop(0))
+        return Connection()
+
+    async def connect(self):
+        await asyncio.sleep(self.delays.pop(0))
+        return AsyncConnection()
+
+@pytest.fixture
+def pool_stats(monkeypatch):
+    monkeypatch.setattr(utils, "_pool_stats", dict.fromkeys(utils._pool_stats, 0))
+    monkeypatch.setattr(utils, "DB_POOL_WAIT_THRESHOLD_MS", 20)
+    yield
+    set_connection_factory(None)
+
+
+def test_only_slow_acquires_count_as_waits(pool_stats):
+    set_connection_factory(SlowFactory([0, 0.05, 0]))
+    for _ in range(3):
+        with db_connection() as conn:
+            assert conn is not None
+    stats = get_pool_stats()
+    assert stats["acquired"] == 3
+    assert stats["waits"] == 1
+    assert stats["max_acquire_ms"] >= 50
+    assert stats["avg_acquire_ms"] == pytest.approx(stats["total_acquire_ms"] / 3)
+
+def test_async_acquires_are_counted(pool_stats):
+    factory = SlowFactory([0.05, 0])
+    set_connection_factory(None, async_factory=factory.connect)
+
+    async def borrow_twice():
+        for _ in range(2):
+            async with async_db_connection() as conn:
+                assert conn is not None
+
+    asyncio.run(borrow_twice())
+    stats = get_pool_stats()
+    assert (stats["acquired"], stats["waits"]) == (2, 1)
+
+def test_failed_acquire_is_an_error_not_an_acquire(pool_stats):
+    def refuse():
+        raise ConnectionError("listener refused the connection")
+
+    set_connection_factory(refuse)
+    with db_connection() as conn:
+        assert conn is None
+    set_connection_factory(lambda: None)
+    with db_connection() as conn:
+        assert conn is None
+    stats = get_pool_stats()
+    assert (stats["acquired"], stats["errors"], stats["timeouts"]) == (0, 1, 0)
@@ -0,0 +1,104 @@
+import pytest
+
+import core.retrieval as retrieval
+from core.retrieval import build_search_sql, search_chunks
+from core.utils import set_connection_factory
+from core.vector_index import build_index_ddl
+
+
+def test_hnsw_index_ddl(monkeypatch):
+    monkeypatch.setattr("core.vector_index.VECTOR_INDEX_HNSW_NEIGHBORS", 32)
+    monkeypatch.setattr("core.vector_index.VECTOR_INDEX_HNSW_EFCONSTRUCTION", 200)
+    assert build_index_ddl("HNSW", 90) == (
+        "CREATE VECTOR INDEX DOC_CHUNKS_VEC_IDX ON doc_chunks (chunk_embedding) "
+        "ORGANIZATION INMEMORY NEIGHBOR GRAPH DISTANCE COSINE "
+        "WITH TARGET ACCURACY 90 PARAMETERS (TYPE HNSW, NEIGHBORS 32, EFCONSTRUCTION 200)"
+    )
+
+def test_ivf_index_ddl(monkeypatch):
+    monkeypatch.setattr("core.vector_index.VECTOR_INDEX_IVF_PARTITIONS", 64)
+    ddl = build_index_ddl("ivf", 95, table="bench_chunks", name="BENCH_IDX")
+    assert ddl.startswith("CREATE VECTOR INDEX BENCH_IDX ON bench_chunks (chunk_embedding) ORGANIZATION NEIGHBOR PARTITIONS")
+    assert "DISTANCE COSINE" in ddl
+    assert ddl.endswith("PARAMETERS (TYPE IVF, NEIGHBOR PARTITIONS 64)")
+
+@pytest.mark.parametrize("index_type, accuracy", [("flat", 95), ("hnsw", 0), ("hnsw", 101), ("ivf", "95; DROP TABLE doc_chunks")])
+def test_index_ddl_rejects_bad_settings(index_type, accuracy):
+    with pytest.raises(ValueError):
+        build_index_ddl(index_type, accuracy)
+
+
+def test_search_sql_modes():
+    exact = build_search_sql("exact")
+    approx = build_search_sql("approx", 80)
+    assert "FETCH EXACT FIRST :top_chunks ROWS ONLY" in exact
+    assert "FETCH APPROX FIRST :top_chunks ROWS ONLY WITH TARGET ACCURACY 80" in approx
+    for sql in (exact, approx):
+        assert "VECTOR_DISTANCE(chunk_embedding, :query_vector, COSINE)" in sql
+        assert "status = 'active'" in sql
+
+@pytest.mark.parametrize("mode, accuracy", [("fuzzy", 95), ("approx", 0), ("approx", 101)])
+def test_search_sql_rejects_bad_settings(mode, accuracy):
+    with pytest.raises(ValueError):
+        build_search_sql(mode, accuracy)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, sql, binds=None):
+        self.connection.statements.append(sql)
+        if "APPROX" in sql and self.connection.approx_error:
+            raise self.connection.approx_error
+        self.rows = [(1, "a.pdf", 1, "text", 0.1, None)]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, approx_error=None):
+        self.approx_error = approx_error
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def connection():
+    connections = []
+
+    def connect(**kwargs):
+        connections.append(FakeConnection(**kwargs))
+        return connections[-1]
+
+    yield connect
+    set_connection_factory(None)
+
+def test_approximate_search_uses_the_index(connection, monkeypatch):
+    conn = connection()
+    set_connection_factory(lambda: conn)
+    monkeypatch.setattr(retrieval, "_search_stats", {"exact": 0, "approx": 0, "fallbacks": 0})
+    assert search_chunks([0.1, 0.2], mode="approx", target_accuracy=90) == [(1, "a.pdf", 1, "text", 0.1, None)]
+    assert len(conn.statements) == 1 and "WITH TARGET ACCURACY 90" in conn.statements[0]
+    assert retrieval.get_search_stats() == {"exact": 0, "approx": 1, "fallbacks": 0}
+
+def test_failed_approximate_search_falls_back_to_exact(connection, monkeypatch):
+    conn = connection(approx_error=RuntimeError("ORA-51815: vector index unusable"))
+    set_connection_factory(lambda: conn)
+    monkeypatch.setattr(retrieval, "_search_stats", {"exact": 0, "approx": 0, "fallbacks": 0})
+    assert search_chunks([0.1, 0.2], mode="approx") == [(1, "a.pdf", 1, "text", 0.1, None)]
+    assert ["APPROX" in sql for sql in conn.statements] == [True, False]
+    assert "FETCH EXACT" in conn.statements[1]
+    assert retrieval.get_search_stats() == {"exact": 1, "approx": 0, "fallbacks": 1}
+
+def test_unknown_search_mode_is_rejected_before_the_database():
+    with pytest.raises(ValueError):
+        search_chunks([0.1], mode="fuzzy")